@@ -1,4 +1,7 @@
+from contextlib import asynccontextmanager
+
 import uvicorn
+from api_helpers.helpers.simulation import warm_up
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 
@@ -8,12 +11,21 @@ from .controllers.todays_api import router as TodaysAPIRouter
 
 API_PREFIX_V2 = "/racing-api/api/v2"
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the place simulation before the first horse-race-info request
+    warm_up()
+    yield
+
+
 app = FastAPI(
     title="Racing API",
     description="Racing API",
     version="0.1.0",
     openapi_url="/racing-api/openapi.json",
     docs_url="/racing-api/docs",
+    lifespan=lifespan,
 )
 
 # Frontend dev origins (adjust as needed)
@@ -1,4 +1,16 @@
+from datetime import date, timedelta
+
+import pandas as pd
+from api_helpers.clients.postgres_partitions import (
+    BETFAIR_PRICES,
+    betfair_prices_archive_path,
+    drop_partitions_before,
+    ensure_partitions,
+)
+from api_helpers.clients.s3_client import S3Client
+from api_helpers.config import config
 from api_helpers.helpers.logging_config import I
+from api_helpers.helpers.time_utils import get_uk_time_now
 from api_helpers.interfaces.storage_client_interface import IStorageClient
 
 
@@ -6,8 +18,12 @@ class CleanTablesService:
     def __init__(
         self,
         postgres_client: IStorageClient,
+        archive_client: S3Client | None = None,
+        price_retention_days: int = config.betfair_prices_retention_days,
     ):
         self.postgres_client = postgres_client
+        self.archive_client = archive_client
+        self.price_retention_days = price_retention_days
 
     def run_table_cleanup(self) -> None:
         self._clean_betfair_price_data()
@@ -15,9 +31,27 @@ class CleanTablesService:
         self._clean_status_tables()
 
     def _clean_betfair_price_data(self) -> None:
-        I("Cleaning old records from live_betting.betfair_prices...")
-        self.postgres_client.execute_query("TRUNCATE live_betting.betfair_prices")
-        I("Old records from live_betting.betfair_prices cleaned.")
+        # Partitioned by race_date, so old days are dropped whole and the
+        # last price_retention_days stay available for backtests
+        I("Cleaning old partitions from live_betting.betfair_prices...")
+        today = get_uk_time_now().date()
+        ensure_partitions(
+            self.postgres_client,
+            BETFAIR_PRICES,
+            today,
+            config.betfair_prices_partitions_ahead,
+        )
+        dropped = drop_partitions_before(
+            self.postgres_client,
+            BETFAIR_PRICES,
+            today - timedelta(days=self.price_retention_days),
+            archive=self._archive_betfair_prices if self.archive_client else None,
+        )
+        I(f"Dropped {len(dropped)} days from live_betting.betfair_prices.")
+
+    def _archive_betfair_prices(self, day: date, data: pd.DataFrame) -> None:
+        I(f"Archiving {len(data)} live_betting.betfair_prices rows for {day}")
+        self.archive_client.store_data(data, betfair_prices_archive_path(day))
 
     def _clean_market_state_data(self) -> None:
         I("Cleaning old records from live_betting.market_state...")
@@ -6,9 +6,15 @@ from typing import Sequence
 
 from api_helpers.clients import get_postgres_client
 from api_helpers.clients.postgres_client import PostgresClient
+from api_helpers.clients.postgres_partitions import (
+    BETFAIR_PRICES,
+    convert_to_partitioned,
+    ensure_partitions,
+)
 from api_helpers.config import config
 from api_helpers.helpers.file_utils import create_todays_log_file
 from api_helpers.helpers.logging_config import I
+from api_helpers.helpers.time_utils import get_uk_time_now
 
 from .data_types.pipeline_status_types import JOB_REGISTRY
 from .pipelines.clean_tables_pipeline import run_clean_tables_pipeline
@@ -86,6 +92,35 @@ def reset_specific_jobs(db_client: PostgresClient, job_names: list[str]):
     I("Specific jobs reset.")
 
 
+# Tables written with store_latest_data, keyed by unique_id
+LATEST_BY_KEY_TABLES = [
+    "bf_unmatched_horses_historical",
+    "bf_unmatched_horses_today",
+    "tf_unmatched_horses_historical",
+    "tf_unmatched_horses_todays",
+]
+
+
+def migrate_latest_by_key_tables(db_client: PostgresClient):
+    """One-off: give the store_latest_data tables the unique index they need."""
+    for table in LATEST_BY_KEY_TABLES:
+        I(f"Migrating data_quality.{table} to latest-by-key storage...")
+        db_client.migrate_to_latest_by_key(table, "data_quality", "unique_id")
+    I("Latest-by-key migration complete.")
+
+
+def partition_betfair_prices(db_client: PostgresClient):
+    """One-off: convert live_betting.betfair_prices to daily partitions."""
+    convert_to_partitioned(db_client, BETFAIR_PRICES)
+    ensure_partitions(
+        db_client,
+        BETFAIR_PRICES,
+        get_uk_time_now().date(),
+        config.betfair_prices_partitions_ahead,
+    )
+    I("live_betting.betfair_prices partitioning complete.")
+
+
 def list_available_jobs():
     """Print all available job names."""
     print("\nAvailable jobs:")
@@ -143,6 +178,13 @@ Examples:
 
   # Force re-run all jobs in a stage (legacy)
   python -m racing_etl.main --reset-stage-ids 1
+
+  # One-off: add the unique indexes store_latest_data needs
+  python -m racing_etl.main --migrate-latest-by-key
+
+  # One-off: convert live_betting.betfair_prices to daily partitions
+  # (stop the trader first; rows are copied and dependent views recreated)
+  python -m racing_etl.main --partition-betfair-prices
         """,
     )
     parser.add_argument(
@@ -164,6 +206,16 @@ Examples:
         action="store_true",
         help="List all available job names and exit.",
     )
+    parser.add_argument(
+        "--migrate-latest-by-key",
+        action="store_true",
+        help="Add the unique indexes store_latest_data needs to the data_quality tables and exit.",
+    )
+    parser.add_argument(
+        "--partition-betfair-prices",
+        action="store_true",
+        help="Convert live_betting.betfair_prices to daily partitions and exit.",
+    )
     parser.add_argument(
         "--no-random-sleep",
         action="store_true",
@@ -205,6 +257,13 @@ def main():
 
     stage_ids = normalize_stage_ids(args.reset_stage_ids)
     pg_client = get_postgres_client()
+
+    if args.migrate_latest_by_key:
+        migrate_latest_by_key_tables(pg_client)
+        return
+    if args.partition_betfair_prices:
+        partition_betfair_prices(pg_client)
+        return
     create_centralized_log_files()
 
     # Reset by stage IDs (legacy)
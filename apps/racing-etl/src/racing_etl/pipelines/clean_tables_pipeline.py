@@ -1,7 +1,12 @@
+from api_helpers.clients import get_s3_client
+from api_helpers.config import config
 from api_helpers.interfaces.storage_client_interface import IStorageClient
 from racing_etl.clean.clean_live_tables import CleanTablesService
 
 
 def run_clean_tables_pipeline(storage_client: IStorageClient):
-    clean_tables = CleanTablesService(postgres_client=storage_client)
+    clean_tables = CleanTablesService(
+        postgres_client=storage_client,
+        archive_client=get_s3_client() if config.betfair_prices_archive else None,
+    )
     clean_tables.run_table_cleanup()
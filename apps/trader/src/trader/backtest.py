@@ -0,0 +1,753 @@
+"""
+Backtest - Replay recorded prices through the decision engine.
+
+decide() and calculate_sizing() are pure, so a staking change can be tried
+on recorded days instead of live. Each day's live_betting.betfair_prices
+rows become a price timeline: for every runner and fetch cycle, the
+position of the latest row at or before that cycle, held in one integer
+array. Every price a selection sees is then a gather from that array
+rather than a query per tick.
+
+SelectionState is rebuilt from the timeline with the same code the live
+SelectionCache uses, and only for the cycles where decide() could act on
+a selection: its price is acceptable and stake remains, its runner or
+race has been invalidated, or it has been voided by hand. In every other
+cycle decide() would return nothing for it, so the result is the same as
+stepping every cycle while doing a small fraction of the work.
+
+Orders fill at their price against a share of the displayed size
+(FillModel); the rest is cancelled, as reconcile does at the end of a
+live cycle. Cash outs hedge every position in the market at the current
+prices. Positions settle against finishing_position when the selections
+carry results, and runners removed by the last snapshot are void.
+
+Usage:
+    python -m trader.backtest --start 2026-06-01 --end 2026-06-30
+"""
+
+import argparse
+import heapq
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+from api_helpers.clients.postgres_client import PostgresClient
+from api_helpers.helpers.logging_config import logger
+
+from .decision_engine import CASH_OUT_COMPLETED, decide
+from .models import MarketType, SelectionType
+from .price_store import SHORT_PRICE_THRESHOLD, RunnerPrice
+from .reconciliation import calculate_liability
+from .selection_cache import (
+    PLACE_TERMS_MIN_RUNNERS,
+    StakingConfig,
+    build_selection_state,
+    load_staking_config,
+)
+
+MANUAL_CASH_OUT = "Manual Cash Out"
+
+# Invalidations decide() makes itself; the backtest derives these from the
+# prices, whereas any other reason was a manual void applied at invalidated_at
+ENGINE_INVALIDATION_REASONS = (
+    "Runner removed from market",
+    "Short-priced runner (<10.0) removed from race",
+)
+PLACE_TERMS_REASON_SUFFIX = "PLACE bet invalid"
+
+PRICE_COLUMNS = [
+    "race_date",
+    "status",
+    "market_id_win",
+    "market_id_place",
+    "selection_id",
+    "current_runner_count",
+    "back_price_1_win",
+    "back_price_1_depth_win",
+    "lay_price_1_win",
+    "lay_price_1_depth_win",
+    "back_price_1_place",
+    "back_price_1_depth_place",
+    "lay_price_1_place",
+    "lay_price_1_depth_place",
+    "created_at",
+]
+
+TEXT_COLUMNS = {"status", "market_id_win", "market_id_place"}
+
+PRICES_QUERY = """
+    SELECT {columns}
+    FROM live_betting.betfair_prices bp
+    WHERE bp.race_date BETWEEN '{start}' AND '{end}'
+      AND bp.market_id_win IN (
+          SELECT DISTINCT ms.market_id_win
+          FROM live_betting.market_state ms
+          WHERE ms.race_date BETWEEN '{start}' AND '{end}'
+      )
+"""
+
+SELECTIONS_QUERY = """
+    SELECT s.unique_id,
+           s.race_id,
+           s.race_time,
+           s.race_date,
+           s.horse_id,
+           s.horse_name,
+           s.selection_type,
+           s.market_type,
+           s.requested_odds,
+           s.stake_points,
+           s.market_id,
+           s.selection_id,
+           s.valid,
+           s.invalidated_at,
+           s.invalidated_reason,
+           ms.number_of_runners AS original_runners,
+           ms.back_price_win AS original_price,
+           r.finishing_position,
+           r.number_of_runners
+    FROM live_betting.selections s
+    LEFT JOIN live_betting.market_state ms
+        ON s.unique_id = ms.unique_id AND s.selection_id = ms.selection_id
+    LEFT JOIN public.unioned_results_data r
+        ON s.horse_id = r.horse_id AND s.race_id = r.race_id
+    WHERE s.race_date BETWEEN '{start}' AND '{end}'
+      AND s.market_id <> 'feedback'
+"""
+
+
+@dataclass(frozen=True)
+class FillModel:
+    """
+    How much of an order matches.
+
+    depth_fraction: Share of the size offered at the best price that an
+        order at that price takes; the remainder is cancelled
+    """
+
+    depth_fraction: float = 1.0
+
+
+# ============================================================================
+# PRICE TIMELINE
+# ============================================================================
+
+
+class PriceTimeline:
+    """
+    Latest betfair_prices row of every runner at every fetch cycle of a day.
+
+    created_at is truncated to the minute, so the n-th row of a runner
+    within a minute is taken as the n-th cycle of that minute and the
+    cycles are spread evenly across it (as in bench_price_history_delta).
+    latest[runner, cycle] is the position of the runner's latest row, or
+    -1 before its first.
+    """
+
+    def __init__(self, prices: pd.DataFrame):
+        created_at = pd.to_datetime(prices["created_at"]).to_numpy("datetime64[ns]")
+        market_codes, _ = pd.factorize(prices["market_id_win"].astype(str))
+        selection_ids = prices["selection_id"].to_numpy(np.int64)
+        _, runner_index = np.unique(
+            market_codes * (selection_ids.max(initial=0) + 1) + selection_ids,
+            return_inverse=True,
+        )
+
+        # Position of each row among its runner's rows in the same minute
+        by_runner = np.lexsort((created_at, runner_index))
+        group_start = np.ones(len(by_runner), dtype=bool)
+        group_start[1:] = (np.diff(runner_index[by_runner]) != 0) | (
+            np.diff(created_at[by_runner]) != np.timedelta64(0)
+        )
+        positions = np.arange(len(by_runner))
+        cycle = np.empty(len(by_runner), dtype=np.int64)
+        cycle[by_runner] = positions - np.maximum.accumulate(
+            np.where(group_start, positions, 0)
+        )
+        minutes, minute_index = np.unique(created_at, return_inverse=True)
+        cycles_in_minute = np.zeros(len(minutes), dtype=np.int64)
+        np.maximum.at(cycles_in_minute, minute_index, cycle + 1)
+        snapshot_at = created_at + (
+            cycle * 60e9 / cycles_in_minute[minute_index]
+        ).astype("timedelta64[ns]")
+
+        order = np.argsort(snapshot_at, kind="stable")
+        self.prices = prices.iloc[order].reset_index(drop=True)
+        runner_index = runner_index[order]
+        self.cycle_times, cycle_index = np.unique(
+            snapshot_at[order], return_inverse=True
+        )
+        n_runners = int(runner_index.max()) + 1 if len(runner_index) else 0
+
+        # Rows are in time order, so the running maximum of row positions
+        # along each runner's cycles is its latest row
+        latest = np.full((n_runners, len(self.cycle_times)), -1, dtype=np.int64)
+        latest[runner_index, cycle_index] = np.arange(len(self.prices))
+        self.latest = np.maximum.accumulate(latest, axis=1)
+
+        first_rows = self.prices.iloc[np.unique(runner_index, return_index=True)[1]]
+        self.runners: dict[tuple[str, int], int] = {}
+        for runner, row in enumerate(first_rows.to_dict("records")):
+            selection_id = int(row["selection_id"])
+            self.runners[(str(row["market_id_win"]), selection_id)] = runner
+            self.runners[(str(row["market_id_place"]), selection_id)] = runner
+
+        # Trailing null, so that row -1 reads as missing
+        self._columns = {
+            column: (
+                np.append(self.prices[column].astype(str).to_numpy(object), None)
+                if column in TEXT_COLUMNS
+                else np.append(
+                    pd.to_numeric(self.prices[column]).to_numpy(float), np.nan
+                )
+            )
+            for column in PRICE_COLUMNS
+            if column not in ("race_date", "created_at")
+        }
+
+        # Short-priced removals per race, as LatestPriceStore derives them
+        with np.errstate(invalid="ignore"):
+            removed_short = (self._columns["status"] == "REMOVED") & (
+                self._columns["back_price_1_win"] < SHORT_PRICE_THRESHOLD
+            )
+        self.runner_markets, market_ids = pd.factorize(
+            first_rows["market_id_win"].astype(str)
+        )
+        self.market_codes = {market_id: i for i, market_id in enumerate(market_ids)}
+        self.short_price_removed = np.zeros(
+            (len(market_ids), len(self.cycle_times)), dtype=bool
+        )
+        np.logical_or.at(
+            self.short_price_removed, self.runner_markets, removed_short[self.latest]
+        )
+
+    def runner_indices(self, keys: list[tuple[str, int]]) -> np.ndarray:
+        """Runner of each (market_id, selection_id), -1 if it has no prices."""
+        return np.array([self.runners.get(key, -1) for key in keys], dtype=np.int64)
+
+    def rows(self, runners: np.ndarray) -> np.ndarray:
+        """Latest row of each runner at every cycle."""
+        rows = self.latest[np.maximum(runners, 0)]
+        rows[runners < 0] = -1
+        return rows
+
+    def column(self, column: str, rows: np.ndarray) -> np.ndarray:
+        return self._columns[column][rows]
+
+    def runner_price(self, row: int) -> RunnerPrice | None:
+        if row < 0:
+            return None
+
+        def value(column: str):
+            v = self._columns[column][row]
+            return None if v is None or v != v else v
+
+        return RunnerPrice(
+            market_id_win=str(value("market_id_win")),
+            market_id_place=str(value("market_id_place")),
+            selection_id=int(value("selection_id")),
+            status=value("status"),
+            back_price_win=value("back_price_1_win"),
+            lay_price_win=value("lay_price_1_win"),
+            back_price_place=value("back_price_1_place"),
+            lay_price_place=value("lay_price_1_place"),
+            current_runner_count=int(value("current_runner_count") or 0),
+            created_at=None,
+        )
+
+
+class _CyclePrices:
+    """The LatestPriceStore interface over one cycle of a PriceTimeline."""
+
+    def __init__(self, timeline: PriceTimeline, cycle: int):
+        self.timeline = timeline
+        self.cycle = cycle
+
+    def get(self, market_id: str, selection_id: int) -> RunnerPrice | None:
+        runner = self.timeline.runners.get((market_id, selection_id))
+        if runner is None:
+            return None
+        return self.timeline.runner_price(int(self.timeline.latest[runner, self.cycle]))
+
+    def short_price_removed(self, market_id_win: str) -> bool:
+        code = self.timeline.market_codes.get(market_id_win)
+        return code is not None and bool(
+            self.timeline.short_price_removed[code, self.cycle]
+        )
+
+
+# ============================================================================
+# RESULTS
+# ============================================================================
+
+
+@dataclass
+class BacktestResult:
+    """
+    Fills, per-cycle decisions and settled selections of a backtest.
+
+    bets: One row per fill, kind "order" or "cash_out"
+    cycles: One row per cycle in which decide() was run
+    selections: One row per selection with its settled pnl, NaN when the
+        selection has an open position and no result
+    """
+
+    bets: pd.DataFrame
+    cycles: pd.DataFrame
+    selections: pd.DataFrame
+    seconds: float = 0.0
+
+    @property
+    def pnl(self) -> float:
+        return float(self.selections["pnl"].sum())
+
+    @property
+    def turnover(self) -> float:
+        return float(self.bets["size"].sum()) if not self.bets.empty else 0.0
+
+    def summary(self) -> pd.DataFrame:
+        """P&L, turnover and decision counts per race_date."""
+        days = self.selections.groupby("race_date").agg(
+            selections=("unique_id", "count"), pnl=("pnl", "sum")
+        )
+        if not self.bets.empty:
+            days = days.join(
+                self.bets.groupby("race_date").agg(
+                    fills=("size", "count"), turnover=("size", "sum")
+                )
+            )
+        if not self.cycles.empty:
+            days = days.join(
+                self.cycles.groupby("race_date")[
+                    ["orders", "cash_outs", "invalidations"]
+                ].sum()
+            )
+        return days.fillna(0)
+
+
+# ============================================================================
+# BACKTEST
+# ============================================================================
+
+
+def run_backtest(
+    prices: pd.DataFrame,
+    selections: pd.DataFrame,
+    staking: StakingConfig,
+    fill_model: FillModel = FillModel(),
+    quiet: bool = True,
+) -> BacktestResult:
+    """
+    Replay recorded days through decide().
+
+    Args:
+        prices: live_betting.betfair_prices rows (at least PRICE_COLUMNS)
+        selections: Rows of SELECTIONS_QUERY; finishing_position and
+            number_of_runners are optional and only used to settle
+        staking: Staking limits and tiers to test
+        fill_model: How much of each order matches
+        quiet: Silence the decision engine's INFO logging while running
+    """
+    started = perf_counter()
+    level = logger.level
+    if quiet:
+        logger.setLevel(logging.WARNING)
+    try:
+        prices_by_day = dict(list(prices.groupby("race_date", sort=False)))
+        days = [
+            _run_day(
+                prices_by_day.get(race_date, prices.iloc[:0]),
+                day_selections.reset_index(drop=True),
+                staking,
+                fill_model,
+            )
+            for race_date, day_selections in selections.groupby("race_date")
+        ]
+    finally:
+        logger.setLevel(level)
+
+    def concat(frames: list[pd.DataFrame]) -> pd.DataFrame:
+        frames = [frame for frame in frames if not frame.empty]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    return BacktestResult(
+        bets=concat([day[0] for day in days]),
+        cycles=concat([day[1] for day in days]),
+        selections=concat([day[2] for day in days]),
+        seconds=perf_counter() - started,
+    )
+
+
+def _is_manual_invalidation(reason) -> bool:
+    if reason is None or (not isinstance(reason, str) and pd.isna(reason)):
+        return False
+    return reason not in ENGINE_INVALIDATION_REASONS and not reason.endswith(
+        PLACE_TERMS_REASON_SUFFIX
+    )
+
+
+def _run_day(
+    prices: pd.DataFrame,
+    selections: pd.DataFrame,
+    staking: StakingConfig,
+    fill_model: FillModel,
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    race_date = selections["race_date"].iloc[0]
+    timeline = PriceTimeline(prices)
+    cycle_times = timeline.cycle_times
+    n = len(selections)
+
+    keys = [
+        (str(m), int(s))
+        for m, s in zip(selections["market_id"], selections["selection_id"])
+    ]
+    runners = timeline.runner_indices(keys)
+    rows = timeline.rows(runners)  # (selections, cycles)
+    is_back = (selections["selection_type"] == SelectionType.BACK).to_numpy()
+    is_win = (selections["market_type"] == MarketType.WIN).to_numpy()
+    requested = selections["requested_odds"].astype(float).to_numpy()[:, None]
+
+    back = np.where(
+        is_win[:, None],
+        timeline.column("back_price_1_win", rows),
+        timeline.column("back_price_1_place", rows),
+    )
+    lay = np.where(
+        is_win[:, None],
+        timeline.column("lay_price_1_win", rows),
+        timeline.column("lay_price_1_place", rows),
+    )
+    depth = np.where(
+        is_back[:, None],
+        np.where(
+            is_win[:, None],
+            timeline.column("back_price_1_depth_win", rows),
+            timeline.column("back_price_1_depth_place", rows),
+        ),
+        np.where(
+            is_win[:, None],
+            timeline.column("lay_price_1_depth_win", rows),
+            timeline.column("lay_price_1_depth_place", rows),
+        ),
+    )
+
+    # Cycles in which decide() could act, mirroring _decide_selection
+    with np.errstate(invalid="ignore"):
+        acceptable = np.where(
+            is_back[:, None], back >= requested, (lay <= requested) & (lay > 1.0)
+        )
+        runner_count = timeline.column("current_runner_count", rows)
+        original_runners = (
+            pd.to_numeric(selections["original_runners"]).fillna(0).to_numpy()
+        )
+        place_terms_changed = (
+            ~is_win[:, None]
+            & (rows >= 0)
+            & (original_runners[:, None] >= PLACE_TERMS_MIN_RUNNERS)
+            & (runner_count < PLACE_TERMS_MIN_RUNNERS)
+        )
+    removed = timeline.column("status", rows) == "REMOVED"
+    short_price = np.zeros_like(removed)
+    has_prices = runners >= 0
+    short_price[has_prices] = timeline.short_price_removed[
+        timeline.runner_markets[runners[has_prices]]
+    ]
+    engine_invalid = removed | place_terms_changed | short_price
+
+    race_times = pd.to_datetime(selections["race_time"]).to_numpy("datetime64[ns]")
+    before_off = race_times[:, None] > cycle_times[None, :]
+    manual = selections["invalidated_reason"].map(_is_manual_invalidation).to_numpy()
+    invalidated_at = (
+        pd.to_datetime(selections["invalidated_at"])
+        .to_numpy("datetime64[ns]")
+        .astype("int64")
+    )
+    manual_due = manual[:, None] & (
+        invalidated_at[:, None] <= cycle_times.astype("int64")[None, :]
+    )
+
+    minutes_to_race = (race_times[:, None] - cycle_times[None, :]) / np.timedelta64(
+        1, "m"
+    )
+    calculated_stake = _calculated_stakes(selections, staking, minutes_to_race)
+
+    reference = selections.to_dict("records")
+    for row, is_manual in zip(reference, manual):
+        # Engine invalidations are re-derived from the prices; manual voids
+        # take effect once their invalidated_at has passed
+        row["valid"] = True
+        row["manual_reason"] = row["invalidated_reason"] if is_manual else None
+        row["invalidated_reason"] = None
+        row["total_matched"] = row["total_liability"] = 0.0
+        row["bet_count"] = 0
+
+    matched = np.zeros(n)
+    liability = np.zeros(n)
+    win_pnl = np.zeros(n)
+    lose_pnl = np.zeros(n)
+    closed = np.zeros(n, dtype=bool)
+    by_market: dict[str, list[int]] = {}
+    for i, key in enumerate(keys):
+        by_market.setdefault(key[0], []).append(i)
+    index_of = {row["unique_id"]: i for i, row in enumerate(reference)}
+
+    bets: list[dict] = []
+    cycles: list[dict] = []
+    could_act = before_off & (acceptable | engine_invalid | manual_due)
+
+    def next_cycle(i: int, after: int) -> int | None:
+        """First cycle from after in which decide() could act on selection i."""
+        filled = matched[i] if is_back[i] else liability[i]
+        acts = could_act[i, after:] & (
+            (acceptable[i, after:] & (calculated_stake[i, after:] - filled >= 1.0))
+            | engine_invalid[i, after:]
+            | manual_due[i, after:]
+        )
+        first = int(acts.argmax()) if len(acts) else 0
+        return after + first if len(acts) and acts[first] else None
+
+    # Each open selection waits on its next actionable cycle, so a cycle
+    # costs nothing unless some selection is due in it
+    due = [(cycle, i) for i in range(n) if (cycle := next_cycle(i, 0)) is not None]
+    heapq.heapify(due)
+    while due:
+        cycle = due[0][0]
+        candidates = []
+        while due and due[0][0] == cycle:
+            candidates.append(heapq.heappop(due)[1])
+        candidates.sort()
+
+        now = pd.Timestamp(cycle_times[cycle]).to_pydatetime()
+        cycle_prices = _CyclePrices(timeline, cycle)
+        for i in candidates:
+            row = reference[i]
+            if manual_due[i, cycle] and row["valid"]:
+                row["valid"] = False
+                row["invalidated_reason"] = (
+                    MANUAL_CASH_OUT
+                    if row["manual_reason"] == CASH_OUT_COMPLETED
+                    else row["manual_reason"]
+                )
+        states = [
+            build_selection_state(reference[i], staking, cycle_prices, now)
+            for i in candidates
+        ]
+        decision = decide(states)
+
+        for order_with_state in decision.orders:
+            order = order_with_state.order
+            i = index_of[order.strategy]
+            # The executor caps the stake by what bet_log shows as matched
+            size = min(order.size, order_with_state.target_stake - matched[i])
+            if size <= 0:
+                continue
+            available = depth[i, cycle] * fill_model.depth_fraction
+            size = np.floor(min(size, 0 if np.isnan(available) else available) * 100)
+            size /= 100
+            if size <= 0:
+                continue
+            _fill(order.side, order.price, size, i, win_pnl, lose_pnl)
+            matched[i] += size
+            liability[i] += calculate_liability(order.side, size, order.price) or 0
+            row = reference[i]
+            row["total_matched"] = matched[i]
+            row["total_liability"] = liability[i]
+            row["bet_count"] += 1
+            bets.append(_bet(race_date, now, row, order.side, order.price, size))
+
+        for market_id in decision.cash_out_market_ids:
+            for i in by_market.get(market_id, []):
+                hedge = _hedge(win_pnl[i], lose_pnl[i], back[i, cycle], lay[i, cycle])
+                if hedge is None:
+                    continue
+                side, price, size = hedge
+                _fill(side, price, size, i, win_pnl, lose_pnl)
+                bets.append(
+                    _bet(race_date, now, reference[i], side, price, size, "cash_out")
+                )
+
+        for unique_id, reason in decision.invalidations:
+            i = index_of[unique_id]
+            closed[i] = True
+            reference[i]["valid"] = False
+            reference[i]["invalidated_reason"] = reason
+
+        cycles.append(
+            {
+                "race_date": race_date,
+                "cycle_time": now,
+                "selections": len(states),
+                "orders": len(decision.orders),
+                "cash_outs": len(decision.cash_out_market_ids),
+                "invalidations": len(decision.invalidations),
+            }
+        )
+        for i in candidates:
+            if not closed[i] and (after := next_cycle(i, cycle + 1)) is not None:
+                heapq.heappush(due, (after, i))
+
+    void = removed[:, -1] if len(cycle_times) else np.zeros(n, dtype=bool)
+    settled = selections[["race_date", "unique_id", "selection_type", "market_type"]]
+    settled = settled.assign(
+        matched=matched,
+        liability=liability,
+        pnl=_settle(selections, win_pnl, lose_pnl, void),
+    )
+    return pd.DataFrame(bets), pd.DataFrame(cycles), settled
+
+
+def _calculated_stakes(
+    selections: pd.DataFrame, staking: StakingConfig, minutes_to_race: np.ndarray
+) -> np.ndarray:
+    """StakingConfig.multiplier and the stake formula, over every cycle at once."""
+    multiplier = np.full(minutes_to_race.shape, np.nan)
+    for minutes_threshold, tier_multiplier in staking.tiers:
+        multiplier = np.where(
+            np.isnan(multiplier) & (minutes_threshold <= minutes_to_race),
+            tier_multiplier,
+            multiplier,
+        )
+    max_stake = np.where(
+        selections["selection_type"] == SelectionType.BACK,
+        staking.max_back,
+        staking.max_lay,
+    )
+    stake_points = pd.to_numeric(selections["stake_points"]).fillna(0).to_numpy()
+    stake_points = np.where(stake_points == 0, 1.0, stake_points)
+    stakes = np.round(multiplier * (max_stake * stake_points)[:, None], 2)
+    return np.nan_to_num(stakes, nan=0.0)
+
+
+def _fill(
+    side: str,
+    price: float,
+    size: float,
+    i: int,
+    win_pnl: np.ndarray,
+    lose_pnl: np.ndarray,
+) -> None:
+    if side == SelectionType.BACK:
+        win_pnl[i] += size * (price - 1)
+        lose_pnl[i] -= size
+    else:
+        win_pnl[i] -= size * (price - 1)
+        lose_pnl[i] += size
+
+
+def _hedge(
+    win_pnl: float, lose_pnl: float, back_price: float, lay_price: float
+) -> tuple[str, float, float] | None:
+    """The bet that equalises a position's outcomes at the current prices."""
+    if win_pnl > lose_pnl:
+        side, price = SelectionType.LAY, lay_price
+    else:
+        side, price = SelectionType.BACK, back_price
+    if np.isnan(price) or price <= 1:
+        return None
+    size = round(abs(win_pnl - lose_pnl) / price, 2)
+    if size <= 0:
+        return None
+    return side, float(price), size
+
+
+def _bet(
+    race_date: date,
+    now: datetime,
+    row: dict,
+    side: str,
+    price: float,
+    size: float,
+    kind: str = "order",
+) -> dict:
+    return {
+        "race_date": race_date,
+        "cycle_time": now,
+        "unique_id": row["unique_id"],
+        "market_id": row["market_id"],
+        "selection_id": row["selection_id"],
+        "side": str(getattr(side, "value", side)),
+        "price": float(price),
+        "size": float(size),
+        "kind": kind,
+    }
+
+
+def _settle(
+    selections: pd.DataFrame,
+    win_pnl: np.ndarray,
+    lose_pnl: np.ndarray,
+    void: np.ndarray,
+) -> np.ndarray:
+    """Each selection's pnl given its result; hedged positions need none."""
+    position = (
+        selections["finishing_position"].astype("string")
+        if "finishing_position" in selections
+        else pd.Series(pd.NA, index=selections.index, dtype="string")
+    )
+    runners = (
+        pd.to_numeric(selections["number_of_runners"])
+        if "number_of_runners" in selections
+        else pd.Series(np.nan, index=selections.index)
+    )
+    places = np.where(runners < PLACE_TERMS_MIN_RUNNERS, 2, 3)
+    finished = pd.to_numeric(position, errors="coerce").to_numpy(float)
+    is_win = (selections["market_type"] == MarketType.WIN).to_numpy()
+    won = np.where(is_win, finished == 1, finished <= places)
+
+    pnl = np.where(won, win_pnl, lose_pnl)
+    pnl = np.where(position.isna().to_numpy(), np.nan, pnl)
+    pnl = np.where(np.isclose(win_pnl, lose_pnl, atol=0.01), win_pnl, pnl)
+    return np.where(void, 0.0, pnl)
+
+
+# ============================================================================
+# LOADING
+# ============================================================================
+
+
+def load_backtest_data(
+    postgres_client: PostgresClient, start: date, end: date
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """betfair_prices and selections with results for race dates start to end."""
+    prices = postgres_client.fetch_data(
+        PRICES_QUERY.format(
+            columns=", ".join(PRICE_COLUMNS),
+            start=start.isoformat(),
+            end=end.isoformat(),
+        )
+    )
+    selections = postgres_client.fetch_data(
+        SELECTIONS_QUERY.format(start=start.isoformat(), end=end.isoformat())
+    )
+    return prices, selections
+
+
+def main():
+    from api_helpers.clients import get_postgres_client
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--start", type=date.fromisoformat, required=True)
+    parser.add_argument("--end", type=date.fromisoformat, required=True)
+    parser.add_argument("--depth-fraction", type=float, default=1.0)
+    args = parser.parse_args()
+
+    postgres_client = get_postgres_client()
+    prices, selections = load_backtest_data(postgres_client, args.start, args.end)
+    result = run_backtest(
+        prices,
+        selections,
+        load_staking_config(postgres_client),
+        FillModel(depth_fraction=args.depth_fraction),
+    )
+    print(result.summary().to_string())
+    print(
+        f"\npnl {result.pnl:,.2f}  turnover {result.turnover:,.2f}  "
+        f"({result.seconds:.2f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -13,19 +13,30 @@ is handled by the reconciliation module at the start of each cycle.
 
 from dataclasses import dataclass
 
-import pandas as pd
 from api_helpers.clients.betfair_client import (
     BetFairClient,
     BetFairOrder,
     CurrentOrder,
     OrderResult,
 )
+from api_helpers.clients.cash_out_engine import CashOutEngine, cash_out_bets
 from api_helpers.clients.postgres_client import PostgresClient
 from api_helpers.helpers.logging_config import D, E, I, W
 
 from .decision_engine import DecisionResult, OrderWithState
-from .models import SelectionState, SelectionType
-from .reconciliation import get_matched_total_from_log
+from .models import SelectionType
+from .reconciliation import BetLogSnapshot
+
+# Invalidations go through PostgresClient's prepared-statement channel
+INVALIDATION_STATEMENT = "trader_record_invalidation"
+
+INVALIDATION_QUERY = """
+    UPDATE live_betting.selections
+    SET valid = FALSE,
+        invalidated_at = COALESCE(invalidated_at, NOW()),
+        invalidated_reason = :reason
+    WHERE unique_id = :unique_id
+"""
 
 # ============================================================================
 # ORDER HELPERS
@@ -122,6 +133,8 @@ def execute(
     betfair_client: BetFairClient,
     postgres_client: PostgresClient,
     customer_refs: list[str],
+    bet_log: BetLogSnapshot | None = None,
+    cash_out_engine: CashOutEngine | None = None,
 ) -> ExecutionSummary:
     """
     Execute the decisions from the decision engine.
@@ -130,21 +143,62 @@ def execute(
         decision: DecisionResult from decide()
         betfair_client: Betfair API client
         postgres_client: Database client
+        bet_log: Matched totals per selection, loaded here if not given
+        cash_out_engine: Cashes out markets in the background, and no order
+            is placed in a market it is still cashing out; without one cash
+            outs block until the markets are flat
 
     Returns:
         ExecutionSummary with counts of actions taken
     """
     summary = ExecutionSummary()
+    if bet_log is None:
+        bet_log = BetLogSnapshot(postgres_client)
 
     current_orders: list[CurrentOrder] = betfair_client.get_current_orders(
         customer_strategy_refs=customer_refs
     )
 
-    # 1. Place new orders
-    for order_with_state in decision.orders:
-        result: OrderResult | str | None = _place_order(
-            order_with_state, current_orders, betfair_client, postgres_client
+    # 1. Place new orders, all sent together once each has been checked.
+    # Stakes are capped by bet_log, so without it nothing is placed.
+    orders = decision.orders
+    try:
+        bet_log.load()
+    except Exception as e:
+        E(f"Bet log unavailable, skipping order placement this cycle: {e}")
+        summary.orders_skipped += len(orders)
+        orders = []
+
+    # A market being cashed out is left alone until it is flat: the worker
+    # cancels the market's unmatched orders on every hedging round
+    if cash_out_engine is not None and orders:
+        cashing_out = set(cash_out_engine.running())
+        busy = [o for o in orders if o.order.market_id in cashing_out]
+        for order_with_state in busy:
+            D(
+                f"[{order_with_state.order.strategy}] Market is being cashed out, skipping"
+            )
+        summary.orders_skipped += len(busy)
+        orders = [o for o in orders if o.order.market_id not in cashing_out]
+
+    to_place: list[BetFairOrder] = []
+    results: list[OrderResult | str | None] = []
+    for order_with_state in orders:
+        prepared = _prepare_order(
+            order_with_state, current_orders, betfair_client, postgres_client, bet_log
         )
+        if isinstance(prepared, BetFairOrder):
+            to_place.append(prepared)
+        else:
+            results.append(prepared)
+
+    if to_place:
+        for order, result in zip(to_place, betfair_client.place_orders(to_place)):
+            if not result.success:
+                E(f"[{order.strategy}] Order failed: {result.message}")
+            results.append(result)
+
+    for result in results:
         if result is None:
             summary.orders_skipped += 1
         elif result == "cancelled":
@@ -160,7 +214,10 @@ def execute(
     if decision.cash_out_market_ids:
         I(f"Cashing out {len(decision.cash_out_market_ids)} markets")
         try:
-            betfair_client.cash_out_bets(market_ids=decision.cash_out_market_ids)
+            if cash_out_engine is not None:
+                cash_out_engine.submit(decision.cash_out_market_ids)
+            else:
+                cash_out_bets(betfair_client, decision.cash_out_market_ids)
             summary.cash_outs = len(decision.cash_out_market_ids)
         except Exception as e:
             E(f"Error cashing out markets: {e}")
@@ -179,19 +236,21 @@ def execute(
     return summary
 
 
-def _place_order(
+def _prepare_order(
     order_with_state: OrderWithState,
     current_orders: list[CurrentOrder],
     betfair_client: BetFairClient,
     postgres_client: PostgresClient,
-) -> OrderResult | str | None:
+    bet_log: BetLogSnapshot | None = None,
+) -> BetFairOrder | OrderResult | str | None:
     """
-    Place a single order, handling existing orders.
+    Decide what to send for an order, handling existing orders.
 
     Returns:
-        - OrderResult if order was placed
+        - BetFairOrder to place, with its stake capped by bet_log
+        - OrderResult if the order is invalid
         - "cancelled" if existing order was cancelled for better price (will retry next loop)
-        - None if skipped (active order exists)
+        - None if skipped (active order exists or already fully staked)
     """
     order: BetFairOrder = order_with_state.order
     unique_id: str = order.strategy
@@ -241,7 +300,9 @@ def _place_order(
             return None
 
     # No existing order - verify against bet_log before placing (source of truth)
-    matched_in_log = get_matched_total_from_log(postgres_client, unique_id)
+    if bet_log is None:
+        bet_log = BetLogSnapshot(postgres_client)
+    matched_in_log = bet_log.matched_total(unique_id)
     target_stake = order_with_state.target_stake
 
     # Calculate remaining based on what's actually in bet_log
@@ -271,14 +332,8 @@ def _place_order(
             strategy=order.strategy,
         )
 
-    # Place the order
     I(f"[{unique_id}] Placing {order.side} order: {order.size} @ {order.price}")
-    result = betfair_client.place_order(order)
-
-    if not result.success:
-        E(f"[{unique_id}] Order failed: {result.message}")
-
-    return result
+    return order
 
 
 def _record_invalidation(
@@ -287,46 +342,12 @@ def _record_invalidation(
     postgres_client: PostgresClient,
 ) -> None:
     """Update the selections table to mark a selection as invalid or update the reason."""
-    query = """
-        UPDATE live_betting.selections 
-        SET valid = FALSE,
-            invalidated_at = COALESCE(invalidated_at, NOW()),
-            invalidated_reason = :reason
-        WHERE unique_id = :unique_id
-    """
     try:
-        postgres_client.execute_query(
-            query,
+        postgres_client.execute_prepared(
+            INVALIDATION_QUERY,
+            INVALIDATION_STATEMENT,
             {"unique_id": unique_id, "reason": reason},
         )
         I(f"[{unique_id}] Marked invalid: {reason}")
     except Exception as e:
         E(f"[{unique_id}] Failed to record invalidation: {e}")
-
-
-def fetch_selection_state(postgres_client: PostgresClient) -> list[SelectionState]:
-    """
-    Fetch the current state of all selections from v_selection_state.
-    """
-    query = """
-        SELECT * 
-        FROM live_betting.v_selection_state 
-        WHERE race_time::date = current_date
-        """
-    data: pd.DataFrame = postgres_client.fetch_data(query)
-
-    return SelectionState.from_dataframe(df=data)
-
-
-def fetch_todays_unique_ids(postgres_client: PostgresClient) -> list[str]:
-    """
-    Fetch the current state of all selections from v_selection_state.
-    """
-    query = """
-        SELECT DISTINCT unique_id
-        FROM live_betting.v_selection_state 
-        WHERE race_time::date = current_date
-        """
-    data: pd.DataFrame = postgres_client.fetch_data(query)
-
-    return list(data["unique_id"])
@@ -2,46 +2,73 @@
 Trader main loop.
 
 Flow each cycle:
-1. Fetch prices from Betfair
+1. Fetch prices from Betfair into the in-process price store
 2. Decide: What orders to place?
 3. Execute: Place orders, cash out, record invalidations
-4. Sleep 5s (let orders match)
+4. Sleep 5s (let orders match), fetching the next cycle's prices meanwhile
 5. Reconcile: Cancel unmatched, sync matched to bet_log
 
 Reconciling at end means bet_log is accurate after each cycle,
 with only a short stale window during the sleep.
+
+Selection state is built in memory from the price store and a cached copy
+of selections/market_state/bet_log; price snapshots reach Postgres on a
+background writer purely for history, by default only for runners whose
+prices changed (PRICE_HISTORY_DELTA=false writes every snapshot in full).
+
+Each race is polled at a cadence set by its time to the off, faster for
+races with selections (PRICE_POLL_ADAPTIVE=false fetches the whole card
+every cycle).
+
+Cash outs are handed to a CashOutEngine, which hedges each market on its
+own worker while the cycles carry on.
+
+With BETFAIR_STREAM=true, market ladders and our orders are kept current
+by the Betfair Exchange Stream, so price polls, execute and reconcile read
+memory rather than calling listMarketBook and listCurrentOrders. It is off
+by default until it has been run live, and a dropped stream uses REST.
 """
 
 import sys
+from functools import partial
 from time import sleep
+from typing import Callable
 
 from api_helpers.clients import get_betfair_client, get_postgres_client
 from api_helpers.clients.betfair_client import BetFairClient
+from api_helpers.clients.betfair_stream import BetfairStream
+from api_helpers.clients.cash_out_engine import CashOutEngine
 from api_helpers.clients.postgres_client import PostgresClient
+from api_helpers.clients.postgres_partitions import BETFAIR_PRICES, ensure_partitions
+from api_helpers.config import config
 from api_helpers.helpers.logging_config import E, I, W
 from api_helpers.helpers.network_utils import (
     handle_network_outage,
     is_network_available,
     is_network_error,
 )
+from api_helpers.helpers.simulation import warm_up as warm_up_simulation
 from api_helpers.helpers.time_utils import get_uk_time_now
 from trader.models import SelectionState
 
 from .decision_engine import DecisionResult, decide
-from .executor import (
-    execute,
-    fetch_selection_state,
-    fetch_todays_unique_ids,
-)
+from .executor import execute
+from .pipeline import POLL_INTERVAL_SECONDS, CyclePrefetcher, FullCardPoller
 from .price_data import fetch_prices
-from .reconciliation import reconcile
-
-POLL_INTERVAL_SECONDS = 5
+from .price_store import LatestPriceStore, PriceDeltaFilter, PriceHistoryWriter
+from .reconciliation import BetLogSnapshot, ReconciliationResult, reconcile
+from .scheduler import AdaptivePricePoller, PollTier
+from .selection_cache import SelectionCache
+from .selection_state import require_selection_state
 
 
 def run_trading_cycle(
     betfair_client: BetFairClient,
     postgres_client: PostgresClient,
+    selection_cache: SelectionCache,
+    bet_log: BetLogSnapshot,
+    wait: Callable[[], None] | None = None,
+    cash_out_engine: CashOutEngine | None = None,
 ) -> None:
     """
     Run one cycle of the trading loop.
@@ -50,15 +77,18 @@ def run_trading_cycle(
     1. Fetch selection state (bet_log is accurate from previous reconcile)
     2. Decide: What orders to place?
     3. Execute: Place orders, cash out, record invalidations
-    4. Sleep (let orders match)
+    4. Sleep (let orders match), through wait when given
     5. Reconcile: Cancel unmatched, sync matched to bet_log
     """
-    customer_refs: list[str] = fetch_todays_unique_ids(postgres_client)
+    customer_refs: list[str] = selection_cache.unique_ids()
 
     # 1. Fetch: Get current selection state (bet_log accurate from last reconcile)
-    selections: list[SelectionState] = fetch_selection_state(postgres_client)
+    selections: list[SelectionState] = selection_cache.selection_states()
 
     if not selections:
+        # Nothing to trade, but keep to the poll cadence rather than spinning
+        if wait is not None:
+            wait()
         return
 
     # 2. Decide: What orders to place?
@@ -66,13 +96,29 @@ def run_trading_cycle(
 
     # 3. Execute: Place orders, cash out, record invalidations
     if decision.orders or decision.cash_out_market_ids or decision.invalidations:
-        execute(decision, betfair_client, postgres_client, customer_refs)
+        execute(
+            decision,
+            betfair_client,
+            postgres_client,
+            customer_refs,
+            bet_log,
+            cash_out_engine,
+        )
+        if decision.invalidations:
+            selection_cache.invalidate()
 
     # 4. Sleep: Give orders time to match
-    sleep(POLL_INTERVAL_SECONDS)
+    if wait is not None:
+        wait()
+    else:
+        sleep(POLL_INTERVAL_SECONDS)
 
     # 5. Reconcile: Cancel unmatched, sync matched to bet_log
-    reconcile(betfair_client, postgres_client, customer_refs)
+    result: ReconciliationResult = reconcile(
+        betfair_client, postgres_client, customer_refs, bet_log
+    )
+    if result.selections_upserted:
+        selection_cache.invalidate()
 
 
 def handle_network_issue(error: Exception) -> bool:
@@ -100,8 +146,72 @@ def handle_network_issue(error: Exception) -> bool:
 
 
 if __name__ == "__main__":
+    I(f"Place simulation ready in {warm_up_simulation():.2f}s")
     betfair_client: BetFairClient = get_betfair_client()
     postgres_client: PostgresClient = get_postgres_client()
+    # Price history is written to today's betfair_prices partition
+    ensure_partitions(
+        postgres_client,
+        BETFAIR_PRICES,
+        get_uk_time_now().date(),
+        config.betfair_prices_partitions_ahead,
+    )
+    require_selection_state(postgres_client)
+
+    betfair_stream: BetfairStream | None = None
+    if config.betfair_stream:
+        betfair_stream = BetfairStream(
+            betfair_client, record_path=config.betfair_stream_record_path
+        )
+        try:
+            betfair_stream.start()
+        except Exception as e:
+            W(f"Betfair stream unavailable, using REST: {e}")
+
+    price_store = LatestPriceStore()
+    history_writer = PriceHistoryWriter(
+        postgres_client,
+        delta_filter=(
+            PriceDeltaFilter(config.price_history_keep_alive_seconds)
+            if config.price_history_delta
+            else None
+        ),
+        # Rows dated after the startup partitions get theirs on first write
+        ensure_partition=partial(
+            ensure_partitions,
+            postgres_client,
+            BETFAIR_PRICES,
+            days_ahead=config.betfair_prices_partitions_ahead,
+        ),
+    )
+    selection_cache = SelectionCache(postgres_client, price_store)
+    bet_log = BetLogSnapshot(postgres_client)
+    # Cash outs run on background workers so the cycle does not wait on them
+    cash_out_engine = CashOutEngine(betfair_client)
+
+    def fetch_card_prices(market_ids: list[str] | None = None):
+        return fetch_prices(
+            betfair_client=betfair_client,
+            postgres_client=postgres_client,
+            price_store=price_store,
+            history_writer=history_writer,
+            market_ids=market_ids,
+        )
+
+    prefetcher = CyclePrefetcher(
+        (
+            AdaptivePricePoller(
+                fetch_card_prices,
+                betfair_client.get_market_start_times,
+                selection_cache.cached_market_ids,
+                tiers=tuple(PollTier(*tier) for tier in config.price_poll_tiers),
+                default_interval=config.price_poll_default_seconds,
+            )
+            if config.price_poll_adaptive
+            else FullCardPoller(fetch_card_prices)
+        ),
+        selection_cache,
+    )
 
     min_race_time, max_race_time = betfair_client.get_min_and_max_race_times()
 
@@ -116,18 +226,28 @@ if __name__ == "__main__":
         try:
             now_timestamp = get_uk_time_now()
 
-            # --- Price Service ---
-            fetch_prices(
-                betfair_client=betfair_client,
-                postgres_client=postgres_client,
-            )
+            # --- Price Service (already fetched during the last cycle's wait) ---
+            prefetcher.fetch()
 
             # --- Trading Loop ---
-            run_trading_cycle(betfair_client, postgres_client)
+            run_trading_cycle(
+                betfair_client,
+                postgres_client,
+                selection_cache,
+                bet_log,
+                wait=prefetcher.wait_for_matching,
+                cash_out_engine=cash_out_engine,
+            )
 
             # --- Exit Condition ---
             if now_timestamp > max_race_time:
                 W("Max race time reached. Exiting.")
+                I(f"Statement latency:\n{postgres_client.latency_report()}")
+                prefetcher.close()
+                cash_out_engine.shutdown()
+                history_writer.close()
+                if betfair_stream is not None:
+                    betfair_stream.stop()
                 sys.exit()
 
         except Exception as e:
@@ -25,13 +25,14 @@ class MarketType(str, Enum):
     PLACE = "PLACE"
 
 
-@dataclass
+@dataclass(slots=True)
 class SelectionState:
     """
     State of a single selection from v_selection_state view.
 
     This is the single source of truth for what the decision engine sees.
-    All fields map directly to view columns.
+    All fields map directly to view columns. Slotted, as a cycle builds one
+    per selection.
     """
 
     # Identity
@@ -89,8 +90,8 @@ class SelectionState:
     within_stake_limit: bool
 
     @classmethod
-    def from_row(cls, row: pd.Series) -> "SelectionState":
-        """Create SelectionState from a DataFrame row."""
+    def from_row(cls, row: pd.Series | dict) -> "SelectionState":
+        """Create SelectionState from a DataFrame row or a column dict."""
         return cls(
             unique_id=row["unique_id"],
             race_id=row["race_id"],
@@ -0,0 +1,113 @@
+"""
+Cycle Pipeline - Fetch the next cycle's inputs while orders rest.
+
+Each cycle sleeps for POLL_INTERVAL_SECONDS between execute and reconcile
+to give orders time to match. CyclePrefetcher uses that wait to poll prices
+for the next cycle and refresh the selection cache on worker threads, so a
+cycle costs about max(fetch, wait) + reconcile rather than
+fetch + wait + reconcile.
+
+Reconcile still runs after the wait and before the next decide: the wait
+only returns once both prefetches have finished, never raises, and a
+reconcile that writes to bet_log invalidates the selection cache as before,
+so the next decide never sees bet_log from before the reconcile.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic, sleep
+from typing import Callable
+
+from api_helpers.helpers.logging_config import D, W
+
+from .scheduler import AdaptivePricePoller
+from .selection_cache import SelectionCache
+
+POLL_INTERVAL_SECONDS = 5
+
+
+class FullCardPoller:
+    """
+    Fetch the whole card on each poll.
+
+    During the wait the fetch is started late enough that, going by the
+    last fetch time, it finishes as the wait ends, keeping the snapshot as
+    fresh as a fetch made straight after the wait.
+    """
+
+    def __init__(self, fetch_prices: Callable[[], object]):
+        self.fetch_prices = fetch_prices
+        self.last_fetch_seconds: float = 0.0
+
+    def poll(self) -> None:
+        started = monotonic()
+        self.fetch_prices()
+        self.last_fetch_seconds = monotonic() - started
+
+    def poll_until(self, deadline: float) -> None:
+        sleep(max(0.0, deadline - monotonic() - self.last_fetch_seconds))
+        self.poll()
+
+
+class CyclePrefetcher:
+    """
+    Run the price poller and selection cache refresh during the matching wait.
+
+    poller is a FullCardPoller or an AdaptivePricePoller: poll() fetches
+    what is due now and poll_until(deadline) keeps prices fresh until the
+    deadline, a time.monotonic() value.
+    """
+
+    def __init__(
+        self,
+        poller: FullCardPoller | AdaptivePricePoller,
+        selection_cache: SelectionCache,
+        wait_seconds: float = POLL_INTERVAL_SECONDS,
+    ):
+        self.poller = poller
+        self.selection_cache = selection_cache
+        self.wait_seconds = wait_seconds
+        self._prefetched = False
+        self._executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="cycle-prefetch"
+        )
+
+    def fetch(self) -> None:
+        """Fetch prices now, unless the last wait already fetched them."""
+        if self._prefetched:
+            self._prefetched = False
+            return
+        self.poller.poll()
+
+    def wait_for_matching(self) -> None:
+        """
+        Wait wait_seconds while the next cycle's prices and selections load.
+
+        Returns after the wait and both prefetches are done. Errors are
+        logged rather than raised so reconcile always runs; after a failed
+        price prefetch the next fetch() fetches again, raising as it would
+        without the pipeline.
+        """
+        started = monotonic()
+        self._prefetched = False
+        prices = self._executor.submit(
+            self.poller.poll_until, started + self.wait_seconds
+        )
+        selections = self._executor.submit(self.selection_cache.prefetch)
+
+        sleep(max(0.0, self.wait_seconds - (monotonic() - started)))
+        try:
+            selections.result()
+        except Exception as e:
+            W(f"Selection cache prefetch failed: {e}")
+        try:
+            prices.result()
+            self._prefetched = True
+        except Exception as e:
+            W(f"Price prefetch failed, fetching again next cycle: {e}")
+        D(
+            f"Matching wait took {monotonic() - started:.2f}s "
+            f"(last price fetch {self.poller.last_fetch_seconds:.2f}s)"
+        )
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
@@ -1,11 +1,14 @@
 import hashlib
 from datetime import datetime
 
+import numpy as np
 import pandas as pd
 from api_helpers.clients.betfair_client import BetFairClient
 from api_helpers.clients.postgres_client import PostgresClient
-from api_helpers.helpers.simulation import simulate_place_counts
-from api_helpers.helpers.time_utils import convert_col_utc_to_uk, get_uk_time_now
+from api_helpers.helpers.simulation import card_place_probabilities
+from api_helpers.helpers.time_utils import convert_col_utc_to_uk
+
+from .price_store import LatestPriceStore, PriceHistoryWriter
 
 
 def _calculate_num_places(n_runners: int) -> int:
@@ -17,34 +20,52 @@ def _calculate_num_places(n_runners: int) -> int:
     return 4
 
 
-def _simulate_race_place_prices(race_df: pd.DataFrame) -> pd.DataFrame:
-    """Run place simulation for a single race and return with sim columns."""
-    n_runners = len(race_df)
-    n_places = _calculate_num_places(n_runners)
-
-    sim_results = simulate_place_counts(
-        race_df,
-        price_col="betfair_win_sp",
-        horse_col="horse_name",
-        n_places=n_places,
-        n_sims=10000,
-        seed=7,
+def _simulate_card_place_prices(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add sim_place_prob and sim_place_price for every race on the card.
+
+    Races are simulated together in one card_place_probabilities call;
+    a race with any runner missing a win price is left null.
+    """
+    priced = data["betfair_win_sp"] > 0
+    complete = priced.groupby(data["market_id_win"]).transform("all")
+    races = data[complete].sort_values("market_id_win", kind="stable")
+
+    sim_place_prob = pd.Series(np.nan, index=data.index)
+    if not races.empty:
+        sizes = races.groupby("market_id_win", sort=True).size().to_numpy()
+        _, place_probs = card_place_probabilities(
+            offsets=np.concatenate([[0], np.cumsum(sizes)]),
+            prices=races["betfair_win_sp"].to_numpy(dtype=float),
+            n_places=[_calculate_num_places(size) for size in sizes],
+            n_sims=10000,
+            seed=7,
+        )
+        sim_place_prob[races.index] = place_probs
+
+    return data.assign(
+        sim_place_prob=sim_place_prob, sim_place_price=1 / sim_place_prob
     )
 
-    # Merge simulation results back
-    return race_df.merge(
-        sim_results[["horse", "sim_place_prob", "sim_place_price"]],
-        left_on="horse_name",
-        right_on="horse",
-        how="left",
-    ).drop(columns=["horse"])
-
 
 def fetch_prices(
     betfair_client: BetFairClient,
     postgres_client: PostgresClient,
-):
-    new_data = betfair_client.create_market_data()
+    price_store: LatestPriceStore | None = None,
+    history_writer: PriceHistoryWriter | None = None,
+    market_ids: list[str] | None = None,
+) -> pd.DataFrame:
+    """
+    Fetch a price snapshot for every runner on today's card.
+
+    The snapshot is applied to price_store when given, and persisted to
+    live_betting.betfair_prices through history_writer when given,
+    otherwise synchronously. market_ids limits the snapshot to those
+    markets; a race's WIN and PLACE markets must be requested together.
+    """
+    new_data = betfair_client.create_market_data(market_ids)
+    if new_data.empty:
+        return new_data
     new_data = new_data.assign(
         created_at=datetime.now().replace(microsecond=0, second=0),
         race_date=new_data["race_time"].dt.date,
@@ -139,51 +160,18 @@ def fetch_prices(
         ]
     )
 
-    # Simulate place prices for races starting in the next 10 minutes
-    now = pd.Timestamp(get_uk_time_now()).tz_localize(None)
-    cutoff = now + pd.Timedelta(minutes=10)
+    new_processed_data = _simulate_card_place_prices(new_processed_data)
 
-    imminent_mask = (new_processed_data["race_time"] > now) & (
-        new_processed_data["race_time"] <= cutoff
-    )
-    imminent_races = new_processed_data[imminent_mask]
-
-    # Initialize sim columns as null
-    new_processed_data["sim_place_prob"] = None
-    new_processed_data["sim_place_price"] = None
-
-    if not imminent_races.empty:
-        # Process each imminent race
-        simulated_parts = []
-        for race_time in imminent_races["race_time"].unique():
-            race_df = imminent_races[imminent_races["race_time"] == race_time].copy()
-            # Only simulate if we have valid win prices
-            if (
-                race_df["betfair_win_sp"].notna().all()
-                and (race_df["betfair_win_sp"] > 0).all()
-            ):
-                sim_df = _simulate_race_place_prices(race_df)
-                simulated_parts.append(sim_df)
-
-        if simulated_parts:
-            simulated = pd.concat(simulated_parts, ignore_index=True)
-            # Update the main dataframe with simulation results
-            sim_lookup = simulated.set_index("unique_id")[
-                ["sim_place_prob", "sim_place_price"]
-            ]
-            new_processed_data.loc[imminent_mask, "sim_place_prob"] = (
-                new_processed_data.loc[imminent_mask, "unique_id"].map(
-                    sim_lookup["sim_place_prob"]
-                )
-            )
-            new_processed_data.loc[imminent_mask, "sim_place_price"] = (
-                new_processed_data.loc[imminent_mask, "unique_id"].map(
-                    sim_lookup["sim_place_price"]
-                )
-            )
-
-    postgres_client.store_data(
-        new_processed_data,
-        table="betfair_prices",
-        schema="live_betting",
-    )
+    if price_store is not None:
+        price_store.update(new_processed_data)
+
+    if history_writer is not None:
+        history_writer.submit(new_processed_data)
+    else:
+        postgres_client.store_data(
+            new_processed_data,
+            table="betfair_prices",
+            schema="live_betting",
+        )
+
+    return new_processed_data
@@ -0,0 +1,258 @@
+"""
+Price Store - In-process latest prices and background price history.
+
+The trader reads current prices from LatestPriceStore, which fetch_prices
+updates directly from each market book snapshot. Postgres only receives the
+snapshots for history, written off the trading thread by PriceHistoryWriter.
+In delta mode PriceDeltaFilter drops runners whose prices have not changed
+since they were last written, apart from a periodic keep-alive row.
+"""
+
+import queue
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+from api_helpers.clients.postgres_client import PostgresClient
+from api_helpers.helpers.logging_config import E, W
+
+# A runner removed at shorter odds than this moves the market enough to
+# invalidate the race (mirrors short_price_removals in v_selection_state)
+SHORT_PRICE_THRESHOLD = 10.0
+
+HISTORY_QUEUE_SIZE = 100
+
+# Unchanged runners are still written this often so time-series queries
+# over betfair_prices always find a recent row for every runner
+KEEP_ALIVE_SECONDS = 300
+
+# Columns that make a betfair_prices row worth persisting when they change
+FINGERPRINT_COLUMNS = [
+    "status",
+    "current_runner_count",
+    "betfair_win_sp",
+    "betfair_place_sp",
+    *[
+        f"{side}_price_{level}{depth}_{market}"
+        for market in ("win", "place")
+        for side in ("back", "lay")
+        for level in (1, 2)
+        for depth in ("", "_depth")
+    ],
+]
+
+
+@dataclass(frozen=True)
+class RunnerPrice:
+    """Latest prices for one runner across its WIN and PLACE markets."""
+
+    market_id_win: str
+    market_id_place: str
+    selection_id: int
+    status: str
+    back_price_win: float | None
+    lay_price_win: float | None
+    back_price_place: float | None
+    lay_price_place: float | None
+    current_runner_count: int
+    created_at: datetime | None
+
+
+class LatestPriceStore:
+    """
+    Latest price per (market_id, selection_id), replacing v_latest_betfair_prices.
+
+    Each runner is reachable from both its WIN and PLACE market ids, so a
+    selection can be looked up by whichever market it is betting on.
+    """
+
+    def __init__(self):
+        self._prices: dict[tuple[str, int], RunnerPrice] = {}
+        self._short_price_removed: set[str] = set()
+        self._lock = threading.Lock()
+
+    def update(self, prices: pd.DataFrame) -> None:
+        """Apply a processed betfair_prices snapshot (one row per runner)."""
+        runner_prices = [
+            _runner_price_from_row(row) for row in prices.to_dict("records")
+        ]
+        with self._lock:
+            for runner_price in runner_prices:
+                self._prices[
+                    (runner_price.market_id_win, runner_price.selection_id)
+                ] = runner_price
+                self._prices[
+                    (runner_price.market_id_place, runner_price.selection_id)
+                ] = runner_price
+            self._short_price_removed = {
+                p.market_id_win
+                for p in self._prices.values()
+                if p.status == "REMOVED"
+                and p.back_price_win is not None
+                and p.back_price_win < SHORT_PRICE_THRESHOLD
+            }
+
+    def get(self, market_id: str, selection_id: int) -> RunnerPrice | None:
+        with self._lock:
+            return self._prices.get((market_id, selection_id))
+
+    def short_price_removed(self, market_id_win: str) -> bool:
+        with self._lock:
+            return market_id_win in self._short_price_removed
+
+
+def _runner_price_from_row(row: dict) -> RunnerPrice:
+    return RunnerPrice(
+        market_id_win=str(row["market_id_win"]),
+        market_id_place=str(row["market_id_place"]),
+        selection_id=int(row["selection_id"]),
+        status=row["status"],
+        back_price_win=_to_float_or_none(row.get("back_price_1_win")),
+        lay_price_win=_to_float_or_none(row.get("lay_price_1_win")),
+        back_price_place=_to_float_or_none(row.get("back_price_1_place")),
+        lay_price_place=_to_float_or_none(row.get("lay_price_1_place")),
+        current_runner_count=int(row.get("current_runner_count") or 0),
+        created_at=row.get("created_at"),
+    )
+
+
+def _to_float_or_none(value) -> float | None:
+    if value is None or pd.isna(value):
+        return None
+    return float(value)
+
+
+class PriceDeltaFilter:
+    """
+    Reduce price snapshots to the rows that changed since they were last written.
+
+    A fingerprint of FINGERPRINT_COLUMNS is kept per (market_id_win,
+    selection_id). A row is kept when its fingerprint differs from the last
+    written row for that runner, or when the runner has not been written for
+    keep_alive_seconds. Ages are measured on created_at, so a recorded day
+    replays exactly as it ran live.
+
+    filter() only selects rows; commit() records them once they are stored,
+    so rows from a failed write are selected again by the next snapshot.
+    """
+
+    def __init__(self, keep_alive_seconds: int = KEEP_ALIVE_SECONDS):
+        self.keep_alive = timedelta(seconds=keep_alive_seconds)
+        self._last_written: dict[
+            tuple[str, int], tuple[tuple[str, bytes], datetime]
+        ] = {}
+
+    def filter(self, prices: pd.DataFrame) -> pd.DataFrame:
+        if prices.empty:
+            return prices
+        keep = []
+        for key, fingerprint, created_at in _fingerprints(prices):
+            last = self._last_written.get(key)
+            keep.append(
+                last is None
+                or last[0] != fingerprint
+                or created_at - last[1] >= self.keep_alive
+            )
+        return prices[keep]
+
+    def commit(self, written: pd.DataFrame) -> None:
+        """Record rows returned by filter() as written."""
+        if written.empty:
+            return
+        for key, fingerprint, created_at in _fingerprints(written):
+            self._last_written[key] = (fingerprint, created_at)
+
+
+def _fingerprints(prices: pd.DataFrame):
+    """(runner key, fingerprint, created_at) for each row of prices."""
+    keys = zip(
+        prices["market_id_win"].astype(str).tolist(),
+        prices["selection_id"].astype(int).tolist(),
+    )
+    numeric_columns = [
+        c for c in FINGERPRINT_COLUMNS if c != "status" and c in prices.columns
+    ]
+    # Compare numbers as float64 bytes so a column that is all None in one
+    # snapshot and numeric in the next only differs where values do
+    numbers = prices[numeric_columns].to_numpy(dtype="float64", na_value=np.nan)
+    fingerprints = zip(prices["status"].tolist(), [row.tobytes() for row in numbers])
+    return zip(keys, fingerprints, prices["created_at"].tolist())
+
+
+class PriceHistoryWriter:
+    """
+    Persist price snapshots to live_betting.betfair_prices on a worker thread.
+
+    History is not on the trading path, so a full queue drops the snapshot
+    with a warning rather than blocking the cycle. With a delta_filter only
+    the changed rows of each snapshot are written, and they are committed to
+    the filter only once stored.
+
+    betfair_prices has no default partition, so a row for a day without one
+    fails the whole write. With ensure_partition, it is called with each
+    race_date the writer has not seen before writing its rows, so a trader
+    running past midnight creates the new day's partition itself. If it
+    fails the day is tried again with the next snapshot.
+    """
+
+    def __init__(
+        self,
+        postgres_client: PostgresClient,
+        max_queue_size: int = HISTORY_QUEUE_SIZE,
+        delta_filter: PriceDeltaFilter | None = None,
+        ensure_partition: Callable[[date], None] | None = None,
+    ):
+        self.postgres_client = postgres_client
+        self.delta_filter = delta_filter
+        self.ensure_partition = ensure_partition
+        self._partition_days: set[date] = set()
+        self._queue: queue.Queue[pd.DataFrame | None] = queue.Queue(
+            maxsize=max_queue_size
+        )
+        self._thread = threading.Thread(
+            target=self._run, name="price-history-writer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, prices: pd.DataFrame) -> None:
+        try:
+            self._queue.put_nowait(prices)
+        except queue.Full:
+            W(f"Price history queue full, dropping snapshot of {len(prices)} rows")
+
+    def close(self, timeout: float | None = None) -> None:
+        """Flush queued snapshots and stop the worker."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            prices = self._queue.get()
+            if prices is None:
+                return
+            try:
+                if self.delta_filter is not None:
+                    prices = self.delta_filter.filter(prices)
+                    if prices.empty:
+                        continue
+                self._ensure_partitions(prices)
+                self.postgres_client.store_data(
+                    prices,
+                    table="betfair_prices",
+                    schema="live_betting",
+                )
+                if self.delta_filter is not None:
+                    self.delta_filter.commit(prices)
+            except Exception as e:
+                E(f"Failed to store price history: {e}")
+
+    def _ensure_partitions(self, prices: pd.DataFrame) -> None:
+        if self.ensure_partition is None or "race_date" not in prices:
+            return
+        for day in pd.to_datetime(prices["race_date"].dropna()).dt.date.unique():
+            if day not in self._partition_days:
+                self.ensure_partition(day)
+                self._partition_days.add(day)
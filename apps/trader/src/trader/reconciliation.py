@@ -15,7 +15,8 @@ and work with what matched.
 """
 
 from collections import defaultdict
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from time import monotonic
 
 from api_helpers.clients.betfair_client import BetFairClient, CurrentOrder
 from api_helpers.clients.postgres_client import PostgresClient
@@ -46,13 +47,25 @@ class ReconciliationResult:
     orders_cancelled: int = 0
     selections_upserted: int = 0
     errors: int = 0
+    failed_unique_ids: list[str] = field(default_factory=list)
     current_orders: list[CurrentOrder] | None = None  # Orders after reconciliation
 
+    # Wall time per step, fetch includes the re-fetch after cancelling
+    fetch_seconds: float = 0.0
+    cancel_seconds: float = 0.0
+    upsert_seconds: float = 0.0
+    total_seconds: float = 0.0
+
     def to_dict(self) -> dict:
         return {
             "orders_cancelled": self.orders_cancelled,
             "selections_upserted": self.selections_upserted,
             "errors": self.errors,
+            "failed_unique_ids": self.failed_unique_ids,
+            "fetch_ms": round(self.fetch_seconds * 1000, 1),
+            "cancel_ms": round(self.cancel_seconds * 1000, 1),
+            "upsert_ms": round(self.upsert_seconds * 1000, 1),
+            "total_ms": round(self.total_seconds * 1000, 1),
         }
 
     def has_activity(self) -> bool:
@@ -60,6 +73,98 @@ class ReconciliationResult:
         return self.orders_cancelled > 0 or self.selections_upserted > 0
 
 
+# ============================================================================
+# BET LOG SNAPSHOT
+# ============================================================================
+
+BET_LOG_SNAPSHOT_STATEMENT = "trader_bet_log_snapshot"
+
+# Totals by left(selection_unique_id, 11), as selection_state (which
+# SelectionCache reads) and v_selection_state aggregate them, so the stake cap at placement agrees
+# with the state decide() saw
+BET_LOG_SNAPSHOT_QUERY = """
+    SELECT s.unique_id,
+           s.selection_type,
+           COALESCE(cb.total_matched, 0) AS total_matched,
+           COALESCE(cb.matched_liability, 0) AS total_liability
+    FROM live_betting.selections s
+    LEFT JOIN (
+        SELECT left(bl.selection_unique_id, 11) AS base_unique_id,
+               sum(COALESCE(bl.matched_size, 0)) AS total_matched,
+               sum(COALESCE(bl.matched_liability, 0)) AS matched_liability
+        FROM live_betting.bet_log bl
+        WHERE bl.status = 'MATCHED'
+        GROUP BY left(bl.selection_unique_id, 11)
+    ) cb ON s.unique_id = cb.base_unique_id
+    WHERE s.race_date = current_date
+"""
+
+
+@dataclass(frozen=True)
+class BetLogTotals:
+    """bet_log totals for one selection."""
+
+    selection_type: str
+    total_matched: float
+    total_liability: float
+
+
+class BetLogSnapshot:
+    """
+    bet_log totals and selection types for today's selections.
+
+    Loaded with a single query on first use and reused until invalidate(),
+    which reconcile() calls after upserting to bet_log. This replaces the
+    per-selection get_matched_total_from_log and get_selection_type lookups.
+
+    A failed load raises rather than reporting nothing matched, which would
+    lift the stake cap on every selection; execute() calls load() first and
+    skips placement for the cycle when it fails.
+    """
+
+    def __init__(self, postgres_client: PostgresClient):
+        self.postgres_client = postgres_client
+        self._totals: dict[str, BetLogTotals] | None = None
+
+    def invalidate(self) -> None:
+        self._totals = None
+
+    def matched_total(self, unique_id: str) -> float:
+        totals = self._get(unique_id)
+        return totals.total_matched if totals else 0.0
+
+    def matched_liability(self, unique_id: str) -> float:
+        totals = self._get(unique_id)
+        return totals.total_liability if totals else 0.0
+
+    def selection_type(self, unique_id: str, fallback: str) -> str:
+        totals = self._get(unique_id)
+        return totals.selection_type if totals else fallback
+
+    def load(self) -> None:
+        """Load the totals unless already loaded; raises if the query fails."""
+        if self._totals is None:
+            self._totals = self._fetch()
+
+    def _get(self, unique_id: str) -> BetLogTotals | None:
+        self.load()
+        return self._totals.get(unique_id)
+
+    def _fetch(self) -> dict[str, BetLogTotals]:
+        _, rows = self.postgres_client.fetch_rows(
+            BET_LOG_SNAPSHOT_QUERY, BET_LOG_SNAPSHOT_STATEMENT
+        )
+        D(f"Bet log snapshot loaded: {len(rows)} selections")
+        return {
+            unique_id: BetLogTotals(
+                selection_type=selection_type,
+                total_matched=float(total_matched),
+                total_liability=float(total_liability),
+            )
+            for unique_id, selection_type, total_matched, total_liability in rows
+        }
+
+
 # ============================================================================
 # MAIN RECONCILIATION FUNCTION
 # ============================================================================
@@ -69,6 +174,7 @@ def reconcile(
     betfair_client: BetFairClient,
     postgres_client: PostgresClient,
     customer_refs: list[str],
+    bet_log: BetLogSnapshot | None = None,
 ) -> ReconciliationResult:
     """
     Reconcile Betfair orders with our database.
@@ -76,24 +182,30 @@ def reconcile(
     Simplified process:
     1. Get all current orders from Betfair
     2. Cancel any EXECUTABLE orders (unmatched portions)
-    3. Re-fetch orders (now all EXECUTION_COMPLETE)
+    3. Re-fetch orders (now all EXECUTION_COMPLETE), only if any were cancelled
     4. Aggregate by selection and upsert totals to bet_log
 
+    With an order stream attached to betfair_client both reads come from
+    its cache rather than listCurrentOrders.
+
     Args:
         betfair_client: Betfair API client
         postgres_client: Database client
         customer_refs: List of customer strategy refs to filter by
+        bet_log: Snapshot supplying selection types, invalidated after upserts
 
     Returns:
         ReconciliationResult with counts of actions taken
     """
     result = ReconciliationResult()
+    started = monotonic()
 
     try:
         # Step 1: Get current orders
         current_orders: list[CurrentOrder] = betfair_client.get_current_orders(
             customer_strategy_refs=customer_refs
         )
+        result.fetch_seconds = monotonic() - started
 
         if not current_orders:
             return result
@@ -106,6 +218,7 @@ def reconcile(
         ]
 
         if executable_orders:
+            cancel_started = monotonic()
             # Get unique market IDs to cancel
             market_ids: list[str] = list(set(o.market_id for o in executable_orders))
             betfair_client.check_session()
@@ -118,12 +231,18 @@ def reconcile(
                 except Exception as e:
                     W(f"Failed to cancel orders in market {market_id}: {e}")
             result.orders_cancelled = len(executable_orders)
-
-        # Step 3: Re-fetch orders (now should all be EXECUTION_COMPLETE)
-        current_orders: list[CurrentOrder] = betfair_client.get_current_orders(
-            customer_strategy_refs=customer_refs
-        )
-        result.current_orders: list[CurrentOrder] = current_orders
+            result.cancel_seconds = monotonic() - cancel_started
+
+            # Step 3: Re-fetch orders (now should all be EXECUTION_COMPLETE).
+            # A live order stream reports the cancellations within
+            # milliseconds, otherwise this is a second listCurrentOrders call.
+            fetch_started = monotonic()
+            settled = betfair_client.wait_for_cancelled_orders(market_ids)
+            current_orders = betfair_client.get_current_orders(
+                customer_strategy_refs=customer_refs, from_stream=settled
+            )
+            result.fetch_seconds += monotonic() - fetch_started
+        result.current_orders = current_orders
 
         if not current_orders:
             return result
@@ -143,16 +262,24 @@ def reconcile(
             completed_orders
         )
 
-        # Step 5: Upsert aggregated totals to bet_log
-        for unique_id, agg_order in aggregated.items():
-            try:
-                if upsert_aggregated_order(agg_order, postgres_client):
-                    result.selections_upserted += 1
-            except Exception as e:
-                E(f"Error upserting aggregated order for {unique_id}: {e}")
+        # Step 5: Upsert aggregated totals to bet_log in one batch
+        upsert_started = monotonic()
+        upserted: dict[str, bool] = upsert_aggregated_orders(
+            list(aggregated.values()), postgres_client, bet_log
+        )
+        result.upsert_seconds = monotonic() - upsert_started
+        for unique_id, ok in upserted.items():
+            if ok:
+                result.selections_upserted += 1
+            else:
+                result.failed_unique_ids.append(unique_id)
                 result.errors += 1
 
+        if bet_log is not None and result.selections_upserted:
+            bet_log.invalidate()
+
         if result.has_activity() or result.errors > 0:
+            result.total_seconds = monotonic() - started
             I(f"Reconciliation: {result.to_dict()}")
 
         return result
@@ -162,6 +289,9 @@ def reconcile(
         result.errors += 1
         return result
 
+    finally:
+        result.total_seconds = monotonic() - started
+
 
 # ============================================================================
 # ORDER AGGREGATION
@@ -250,76 +380,156 @@ def is_trader_order(order: CurrentOrder) -> bool:
 # DATABASE OPERATIONS
 # ============================================================================
 
+# Hot statements go through PostgresClient's prepared-statement channel
+BET_LOG_UPSERT_STATEMENT = "trader_bet_log_upsert"
+
+BET_LOG_UPSERT_QUERY = """
+    INSERT INTO live_betting.bet_log (
+        selection_unique_id, bet_id, market_id, selection_id, side,
+        selection_type, requested_price, requested_size,
+        matched_size, matched_price, size_remaining, size_lapsed, size_cancelled,
+        matched_liability, betfair_status, status, placed_at, matched_at
+    )
+    VALUES (
+        :unique_id, :bet_id, :market_id, :selection_id, :side,
+        :selection_type, :matched_price, :requested_size,
+        :matched_size, :matched_price, 0, 0, :size_cancelled,
+        :matched_liability, 'EXECUTION_COMPLETE', 'MATCHED', :placed_at, :matched_at
+    )
+    ON CONFLICT (selection_unique_id) DO UPDATE SET
+        bet_id = EXCLUDED.bet_id,
+        matched_size = EXCLUDED.matched_size,
+        matched_price = EXCLUDED.matched_price,
+        requested_size = EXCLUDED.requested_size,
+        size_remaining = 0,
+        size_cancelled = EXCLUDED.size_cancelled,
+        matched_liability = EXCLUDED.matched_liability,
+        betfair_status = 'EXECUTION_COMPLETE',
+        status = 'MATCHED',
+        matched_at = EXCLUDED.matched_at
+"""
+
+
+def upsert_aggregated_orders(
+    agg_orders: list[AggregatedOrder],
+    postgres_client: PostgresClient,
+    bet_log: BetLogSnapshot | None = None,
+) -> dict[str, bool]:
+    """
+    Upsert aggregated order totals to bet_log in one transaction.
+
+    Each row runs the prepared BET_LOG_UPSERT_QUERY, the whole batch in one
+    transaction and round trip. If the batch fails, each row is retried on
+    its own so a bad row only fails its own selection.
+
+    Args:
+        agg_orders: Aggregated orders, at most one per selection
+        postgres_client: Database client
+        bet_log: Snapshot to read selection_type from, queried per selection if None
+
+    Returns:
+        Whether each unique_id was upserted
+    """
+    if bet_log is not None:
+        try:
+            bet_log.load()
+        except Exception as e:
+            W(f"Bet log snapshot unavailable, reading selection types singly: {e}")
+            bet_log = None
+
+    results: dict[str, bool] = {}
+    rows: list[tuple[str, dict]] = []
+    for agg_order in agg_orders:
+        try:
+            rows.append(
+                (
+                    agg_order.unique_id,
+                    _bet_log_params(agg_order, postgres_client, bet_log),
+                )
+            )
+        except Exception as e:
+            E(f"[{agg_order.unique_id}] Failed to build bet_log row: {e}")
+            results[agg_order.unique_id] = False
+
+    if not rows:
+        return results
+
+    try:
+        postgres_client.execute_prepared_batch(
+            BET_LOG_UPSERT_QUERY, BET_LOG_UPSERT_STATEMENT, [row for _, row in rows]
+        )
+        results.update({unique_id: True for unique_id, _ in rows})
+    except Exception as e:
+        W(f"Batch upsert of {len(rows)} rows to bet_log failed, retrying singly: {e}")
+        for unique_id, row in rows:
+            results[unique_id] = _execute_bet_log_upsert(
+                unique_id, row, postgres_client
+            )
+
+    return results
+
 
 def upsert_aggregated_order(
     agg_order: AggregatedOrder,
     postgres_client: PostgresClient,
+    bet_log: BetLogSnapshot | None = None,
 ) -> bool:
     """
     Upsert aggregated order totals to bet_log.
 
-    Uses ON CONFLICT DO UPDATE on selection_unique_id.
-    One row per selection in bet_log, with summed totals.
+    Uses ON CONFLICT to update existing row or insert new one.
+    One row per selection_unique_id.
 
     Args:
         agg_order: Aggregated order data
         postgres_client: Database client
+        bet_log: Snapshot to read selection_type from, queried per selection if None
 
     Returns:
         True if upserted successfully, False otherwise
     """
+    params = _bet_log_params(agg_order, postgres_client, bet_log)
+    return _execute_bet_log_upsert(agg_order.unique_id, params, postgres_client)
+
+
+def _bet_log_params(
+    agg_order: AggregatedOrder,
+    postgres_client: PostgresClient,
+    bet_log: BetLogSnapshot | None,
+) -> dict:
     unique_id = agg_order.unique_id
-    selection_type = get_selection_type(postgres_client, unique_id, agg_order.side)
+    if bet_log is not None:
+        selection_type = bet_log.selection_type(unique_id, agg_order.side)
+    else:
+        selection_type = get_selection_type(postgres_client, unique_id, agg_order.side)
     matched_liability = calculate_liability(
         agg_order.side, agg_order.total_matched, agg_order.weighted_avg_price
     )
 
-    # Store all bet IDs as comma-separated string
-    bet_ids_str = ",".join(agg_order.bet_ids)
-
-    query = """
-        INSERT INTO live_betting.bet_log (
-            selection_unique_id, bet_id, market_id, selection_id, side,
-            selection_type, requested_price, requested_size,
-            matched_size, matched_price, size_remaining, size_lapsed, size_cancelled,
-            matched_liability, betfair_status, status, placed_at, matched_at
-        ) VALUES (
-            :unique_id, :bet_id, :market_id, :selection_id, :side,
-            :selection_type, :matched_price, :requested_size,
-            :matched_size, :matched_price, 0, 0, :size_cancelled,
-            :matched_liability, 'EXECUTION_COMPLETE', 'MATCHED', :placed_at, :matched_at
-        )
-        ON CONFLICT (selection_unique_id) DO UPDATE SET
-            bet_id = EXCLUDED.bet_id,
-            matched_size = EXCLUDED.matched_size,
-            matched_price = EXCLUDED.matched_price,
-            requested_size = EXCLUDED.requested_size,
-            size_remaining = 0,
-            size_cancelled = EXCLUDED.size_cancelled,
-            matched_liability = EXCLUDED.matched_liability,
-            betfair_status = 'EXECUTION_COMPLETE',
-            status = 'MATCHED',
-            matched_at = EXCLUDED.matched_at
-    """
-
+    return {
+        "unique_id": unique_id,
+        # Store all bet IDs as comma-separated string
+        "bet_id": ",".join(agg_order.bet_ids),
+        "market_id": agg_order.market_id,
+        "selection_id": agg_order.selection_id,
+        "side": agg_order.side,
+        "selection_type": selection_type,
+        "requested_size": agg_order.total_requested,
+        "matched_size": agg_order.total_matched,
+        "matched_price": agg_order.weighted_avg_price,
+        "size_cancelled": agg_order.size_cancelled,
+        "matched_liability": matched_liability,
+        "placed_at": agg_order.latest_placed_at,
+        "matched_at": agg_order.latest_matched_at or agg_order.latest_placed_at,
+    }
+
+
+def _execute_bet_log_upsert(
+    unique_id: str, params: dict, postgres_client: PostgresClient
+) -> bool:
     try:
-        postgres_client.execute_query(
-            query,
-            {
-                "unique_id": unique_id,
-                "bet_id": bet_ids_str,
-                "market_id": agg_order.market_id,
-                "selection_id": agg_order.selection_id,
-                "side": agg_order.side,
-                "selection_type": selection_type,
-                "requested_size": agg_order.total_requested,
-                "matched_size": agg_order.total_matched,
-                "matched_price": agg_order.weighted_avg_price,
-                "size_cancelled": agg_order.size_cancelled,
-                "matched_liability": matched_liability,
-                "placed_at": agg_order.latest_placed_at,
-                "matched_at": agg_order.latest_matched_at or agg_order.latest_placed_at,
-            },
+        postgres_client.execute_prepared(
+            BET_LOG_UPSERT_QUERY, BET_LOG_UPSERT_STATEMENT, params
         )
         return True
     except Exception as e:
@@ -0,0 +1,174 @@
+"""
+Adaptive Polling - Refresh each race's prices at a cadence set by time to the off.
+
+Fetching the whole card every cycle spends most of the API weight, and the
+CPU to process it, on races hours away whose prices barely move, while the
+races about to go off are no fresher than anything else. AdaptivePricePoller
+groups markets into slots by start time, so a race's WIN and PLACE markets
+are always fetched together, and polls each slot at the interval of its
+PollTier:
+
+    inside 2 minutes of the off    every 1s
+    inside 10 minutes              every 5s
+    otherwise                      every 60s
+
+Slots with a selection in them move up one tier. Due slots are fetched
+soonest race first.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from time import monotonic, sleep
+from typing import Callable
+
+from api_helpers.helpers.logging_config import D
+from api_helpers.helpers.time_utils import get_uk_time_now
+
+
+@dataclass(frozen=True)
+class PollTier:
+    """Poll every interval_seconds while within max_minutes_to_race of the off."""
+
+    max_minutes_to_race: float
+    interval_seconds: float
+
+
+DEFAULT_POLL_TIERS = (PollTier(2, 1), PollTier(10, 5))
+DEFAULT_POLL_INTERVAL_SECONDS = 60
+
+# Slack when comparing a slot's age with its interval, so a slot polled one
+# interval ago is due again despite timer jitter. Capped at a tenth of the
+# interval for very short tiers.
+POLL_TOLERANCE_SECONDS = 0.1
+
+
+def poll_interval(
+    minutes_to_race: float,
+    tiers: tuple[PollTier, ...] = DEFAULT_POLL_TIERS,
+    default_interval: float = DEFAULT_POLL_INTERVAL_SECONDS,
+    has_selections: bool = False,
+) -> float:
+    """
+    Interval of the first tier whose window contains minutes_to_race.
+
+    Args:
+        minutes_to_race: Minutes until the off
+        tiers: Tiers ordered by max_minutes_to_race, nearest first
+        default_interval: Interval beyond the last tier
+        has_selections: Use the next faster tier, for races we are betting on
+
+    Returns:
+        Seconds between polls
+    """
+    intervals = [tier.interval_seconds for tier in tiers] + [default_interval]
+    index = next(
+        (i for i, t in enumerate(tiers) if minutes_to_race <= t.max_minutes_to_race),
+        len(tiers),
+    )
+    if has_selections:
+        index = max(0, index - 1)
+    return intervals[index]
+
+
+class AdaptivePricePoller:
+    """
+    Fetch prices for the race slots that are due under their PollTier.
+
+    poll() fetches whatever is due now. poll_until() keeps polling during
+    the matching wait: fast slots are polled whenever due, and slots whose
+    interval is longer than the time left are held for a final poll timed
+    to finish as the wait ends, so they are fresh for the next decide.
+    """
+
+    def __init__(
+        self,
+        fetch_prices: Callable[[list[str]], object],
+        market_start_times: Callable[[], dict[str, datetime]],
+        selected_market_ids: Callable[[], set[str]],
+        tiers: tuple[PollTier, ...] = DEFAULT_POLL_TIERS,
+        default_interval: float = DEFAULT_POLL_INTERVAL_SECONDS,
+    ):
+        self.fetch_prices = fetch_prices
+        self.market_start_times = market_start_times
+        self.selected_market_ids = selected_market_ids
+        self.tiers = tuple(sorted(tiers, key=lambda t: t.max_minutes_to_race))
+        self.default_interval = default_interval
+        self.last_fetch_seconds: float = 0.0
+        self._last_polled: dict[datetime, float] = {}
+
+    def poll(self) -> list[str]:
+        """Fetch every slot that is due now, returning the market ids fetched."""
+        return self._poll(horizon=0.0)
+
+    def poll_until(self, deadline: float) -> None:
+        """
+        Keep prices fresh until deadline, a time.monotonic() value.
+
+        Returns once the final poll, started last_fetch_seconds before the
+        deadline, has finished.
+        """
+        while True:
+            remaining = deadline - monotonic()
+            if remaining <= self.last_fetch_seconds:
+                self._poll(horizon=max(0.0, remaining))
+                return
+            self._poll(horizon=0.0, max_interval=remaining)
+            next_due = self.seconds_until_next_due(max_interval=remaining)
+            until_final = deadline - monotonic() - self.last_fetch_seconds
+            sleep(max(0.0, min(next_due, until_final)))
+
+    def seconds_until_next_due(self, max_interval: float | None = None) -> float:
+        """Seconds until the next slot with an interval up to max_interval is due."""
+        clock = monotonic()
+        waits = [
+            self._last_polled.get(start, float("-inf")) + interval - clock
+            for start, _, interval in self._slots()
+            if max_interval is None or interval < max_interval
+        ]
+        return max(0.0, min(waits, default=float("inf")))
+
+    def _slots(self) -> list[tuple[datetime, list[str], float]]:
+        """(start time, market ids, interval) per race slot yet to go off, soonest first."""
+        now = get_uk_time_now()
+        selected = self.selected_market_ids()
+        by_start: dict[datetime, list[str]] = {}
+        for market_id, start in self.market_start_times().items():
+            if start > now:
+                by_start.setdefault(start, []).append(market_id)
+
+        slots = []
+        for start in sorted(by_start):
+            market_ids = by_start[start]
+            interval = poll_interval(
+                (start - now).total_seconds() / 60,
+                self.tiers,
+                self.default_interval,
+                has_selections=any(m in selected for m in market_ids),
+            )
+            slots.append((start, market_ids, interval))
+        return slots
+
+    def _poll(self, horizon: float, max_interval: float | None = None) -> list[str]:
+        clock = monotonic()
+        due_starts = []
+        due_market_ids = []
+        for start, market_ids, interval in self._slots():
+            if max_interval is not None and interval >= max_interval:
+                continue
+            age = clock + horizon - self._last_polled.get(start, float("-inf"))
+            if age >= interval - min(POLL_TOLERANCE_SECONDS, interval / 10):
+                due_starts.append(start)
+                due_market_ids.extend(market_ids)
+
+        if not due_market_ids:
+            return []
+
+        self.fetch_prices(due_market_ids)
+        self.last_fetch_seconds = monotonic() - clock
+        for start in due_starts:
+            self._last_polled[start] = clock
+        D(
+            f"Polled {len(due_starts)} races ({len(due_market_ids)} markets) "
+            f"in {self.last_fetch_seconds:.2f}s"
+        )
+        return due_market_ids
@@ -0,0 +1,276 @@
+"""
+Selection Cache - Build SelectionState in-process instead of via v_selection_state.
+
+v_selection_state joins selections to v_latest_betfair_prices, a window over
+every price snapshot of the day, so reading it gets slower as the day goes
+on. Here the small, slowly changing columns (selections, market_state and
+bet_log totals) are read from live_betting.selection_state, a table kept
+current by triggers, then cached and joined in memory with LatestPriceStore,
+so the per-cycle cost stays flat from the first race to the last.
+
+The derived columns follow the view definition in live_betting_schema.sql.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from time import monotonic
+
+import pandas as pd
+from api_helpers.clients.postgres_client import PostgresClient
+from api_helpers.helpers.logging_config import D
+from api_helpers.helpers.time_utils import get_uk_time_now
+
+from .models import MarketType, SelectionState, SelectionType
+from .price_store import LatestPriceStore
+from .selection_state import STORED_COLUMNS
+
+# Selections can be added or voided from the frontend at any time, so even
+# without our own writes the cached copy is re-read on this interval
+REFERENCE_MAX_AGE_SECONDS = 10
+
+# PLACE bets struck with this many runners lose a place if the field drops below it
+PLACE_TERMS_MIN_RUNNERS = 8
+
+# Prepared once on the channel; see PostgresClient.fetch_rows
+REFERENCE_STATEMENT = "trader_selection_reference"
+
+# selection_state holds these columns, kept current by triggers on the
+# source tables; its race index makes this a range scan
+REFERENCE_QUERY = f"""
+    SELECT {", ".join(STORED_COLUMNS)}
+    FROM live_betting.selection_state
+    WHERE race_date = current_date
+"""
+
+STAKING_CONFIG_QUERY = """
+    SELECT max_back, max_lay FROM live_betting.staking_config WHERE id = 1
+"""
+
+STAKING_TIERS_QUERY = """
+    SELECT minutes_threshold, multiplier
+    FROM live_betting.staking_tiers
+    ORDER BY minutes_threshold DESC
+"""
+
+
+@dataclass(frozen=True)
+class StakingConfig:
+    """Staking limits and time-to-race multipliers."""
+
+    max_back: float
+    max_lay: float
+    tiers: list[tuple[int, float]]  # (minutes_threshold, multiplier), descending
+
+    def multiplier(self, minutes_to_race: float) -> float | None:
+        """Multiplier of the highest tier at or below minutes_to_race."""
+        for minutes_threshold, multiplier in self.tiers:
+            if minutes_threshold <= minutes_to_race:
+                return multiplier
+        return None
+
+
+class SelectionCache:
+    """
+    Cached selections, market_state and bet_log totals for today.
+
+    The cache is re-read when older than max_age_seconds or after
+    invalidate(), which the trading loop calls whenever it writes to
+    selections or bet_log itself.
+    """
+
+    def __init__(
+        self,
+        postgres_client: PostgresClient,
+        price_store: LatestPriceStore,
+        max_age_seconds: float = REFERENCE_MAX_AGE_SECONDS,
+    ):
+        self.postgres_client = postgres_client
+        self.price_store = price_store
+        self.max_age_seconds = max_age_seconds
+        self._reference: list[dict] | None = None
+        self._staking: StakingConfig | None = None
+        self._loaded_at: float = 0.0
+
+    def invalidate(self) -> None:
+        self._reference = None
+
+    def cached_market_ids(self) -> set[str]:
+        """Market ids of the cached selections, without refreshing the cache."""
+        reference = self._reference or []
+        return {str(row["market_id"]) for row in reference}
+
+    def prefetch(self) -> None:
+        """Reload now if stale, so the next cycle's lookups hit the cache."""
+        self._refresh_if_stale()
+
+    def selection_states(self) -> list[SelectionState]:
+        self._refresh_if_stale()
+        return build_selection_states(
+            self._reference, self._staking, self.price_store, _uk_now_naive()
+        )
+
+    def unique_ids(self) -> list[str]:
+        """Unique ids of today's selections that have not yet raced."""
+        self._refresh_if_stale()
+        now = _uk_now_naive()
+        return [row["unique_id"] for row in self._reference if row["race_time"] > now]
+
+    def _refresh_if_stale(self) -> None:
+        if (
+            self._reference is not None
+            and monotonic() - self._loaded_at < self.max_age_seconds
+        ):
+            return
+        columns, rows = self.postgres_client.fetch_rows(
+            REFERENCE_QUERY, REFERENCE_STATEMENT
+        )
+        self._reference = [dict(zip(columns, row)) for row in rows]
+        self._staking = load_staking_config(self.postgres_client)
+        self._loaded_at = monotonic()
+        D(f"Selection cache refreshed: {len(self._reference)} selections")
+
+
+def load_staking_config(postgres_client: PostgresClient) -> StakingConfig:
+    staking_config = postgres_client.fetch_data(STAKING_CONFIG_QUERY)
+    staking_tiers = postgres_client.fetch_data(STAKING_TIERS_QUERY)
+    return StakingConfig(
+        max_back=float(staking_config.iloc[0]["max_back"]),
+        max_lay=float(staking_config.iloc[0]["max_lay"]),
+        tiers=[
+            (int(row["minutes_threshold"]), float(row["multiplier"]))
+            for row in staking_tiers.to_dict("records")
+        ],
+    )
+
+
+def build_selection_states(
+    reference: list[dict],
+    staking: StakingConfig,
+    price_store: LatestPriceStore,
+    now: datetime,
+) -> list[SelectionState]:
+    """
+    Join cached selection rows with the latest prices.
+
+    Args:
+        reference: Rows from REFERENCE_QUERY
+        staking: Staking config and tiers
+        price_store: Latest prices keyed by (market_id, selection_id)
+        now: Current UK time, timezone-naive like race_time
+
+    Returns:
+        SelectionState per selection whose race has not started
+    """
+    states = []
+    for row in reference:
+        if row["race_time"] <= now:
+            continue
+        states.append(build_selection_state(row, staking, price_store, now))
+    return states
+
+
+def build_selection_state(
+    row: dict,
+    staking: StakingConfig,
+    price_store: LatestPriceStore,
+    now: datetime,
+) -> SelectionState:
+    """
+    SelectionState for one reference row, priced from price_store at now.
+
+    Shared by the live cache and the backtest, which passes its own
+    replayed prices.
+    """
+    market_type = MarketType(row["market_type"])
+    selection_type = SelectionType(row["selection_type"])
+    market_id = str(row["market_id"])
+    selection_id = int(row["selection_id"])
+
+    price = price_store.get(market_id, selection_id)
+    if price is None:
+        current_back_price = current_lay_price = None
+    elif market_type == MarketType.WIN:
+        current_back_price = price.back_price_win
+        current_lay_price = price.lay_price_win
+    else:
+        current_back_price = price.back_price_place
+        current_lay_price = price.lay_price_place
+    current_runners = price.current_runner_count if price else 0
+
+    minutes_to_race = (row["race_time"] - now).total_seconds() / 60
+    stake_points = _to_float(row.get("stake_points")) or 1.0
+    max_stake = (
+        staking.max_back if selection_type == SelectionType.BACK else staking.max_lay
+    )
+    multiplier = staking.multiplier(minutes_to_race)
+    calculated_stake = (
+        round(multiplier * max_stake * stake_points, 2)
+        if multiplier is not None
+        else 0.0
+    )
+
+    total_matched = _to_float(row.get("total_matched"))
+    total_liability = _to_float(row.get("total_liability"))
+    bet_count = int(row.get("bet_count") or 0)
+    original_runners = int(_to_float(row.get("original_runners")))
+    valid = not _is_null(row["valid"]) and bool(row["valid"])
+    invalid = not _is_null(row["valid"]) and not valid
+    invalidated_reason = (
+        None if _is_null(row.get("invalidated_reason")) else row["invalidated_reason"]
+    )
+
+    return SelectionState(
+        unique_id=row["unique_id"],
+        race_id=row["race_id"],
+        race_time=row["race_time"],
+        race_date=row["race_date"],
+        horse_id=row["horse_id"],
+        horse_name=row["horse_name"],
+        selection_type=selection_type,
+        market_type=market_type,
+        requested_odds=float(row["requested_odds"]),
+        stake_points=stake_points,
+        market_id=market_id,
+        selection_id=selection_id,
+        valid=valid,
+        invalidated_reason=invalidated_reason,
+        original_runners=original_runners,
+        original_price=_to_float(row.get("original_price")),
+        current_back_price=current_back_price,
+        current_lay_price=current_lay_price,
+        runner_status=(price.status if price else None) or "ACTIVE",
+        current_runners=current_runners,
+        total_matched=total_matched,
+        total_liability=total_liability,
+        bet_count=bet_count,
+        has_bet=bet_count > 0,
+        calculated_stake=calculated_stake,
+        minutes_to_race=minutes_to_race,
+        short_price_removed=(
+            price is not None and price_store.short_price_removed(price.market_id_win)
+        ),
+        place_terms_changed=(
+            market_type == MarketType.PLACE
+            and price is not None
+            and original_runners >= PLACE_TERMS_MIN_RUNNERS
+            and current_runners < PLACE_TERMS_MIN_RUNNERS
+        ),
+        cash_out_requested=invalidated_reason == "Manual Cash Out" and invalid,
+        within_stake_limit=(
+            total_matched <= staking.max_back
+            if selection_type == SelectionType.BACK
+            else total_liability <= staking.max_lay
+        ),
+    )
+
+
+def _is_null(value) -> bool:
+    return value is None or (not isinstance(value, str) and pd.isna(value))
+
+
+def _to_float(value, default: float = 0.0) -> float:
+    return default if _is_null(value) else float(value)
+
+
+def _uk_now_naive() -> datetime:
+    return get_uk_time_now().replace(tzinfo=None)
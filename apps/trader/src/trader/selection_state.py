@@ -0,0 +1,400 @@
+"""
+Selection State Table - The stored columns of v_selection_state, kept by triggers.
+
+v_selection_state recomputes everything on every read, including regrouping
+bet_log by left(selection_unique_id, 11). live_betting.selection_state
+stores the columns that only change when selections, market_state or
+bet_log change, one row per selection, and triggers on those tables keep it
+current in the writer's transaction. The triggers are statement-level over
+the transition tables, so an upsert of many bets or selections refreshes
+each selection once.
+
+Prices are not stored: the trader reads them from LatestPriceStore, and a
+trigger on every betfair_prices insert would cost each price write more
+than any reader saves. The time- and staking-dependent columns are not
+stored either.
+
+SelectionCache reads today's rows from the table, an index range scan in
+place of the join over the source tables. Installing it is a one-off step,
+not part of trader startup, which only checks the table is there, and
+check_selection_state diffs it against v_selection_state in one statement,
+so both sides see the same now():
+
+    python -m trader.selection_state [--install] [--rebuild]
+"""
+
+import argparse
+import sys
+
+import pandas as pd
+from api_helpers.clients.postgres_client import PostgresClient
+from api_helpers.helpers.logging_config import I, W
+
+# ============================================================================
+# SCHEMA
+# ============================================================================
+
+SELECTION_STATE_DDL = """
+CREATE TABLE IF NOT EXISTS live_betting.selection_state (
+    unique_id character varying(255) PRIMARY KEY,
+    race_id integer NOT NULL,
+    race_time timestamp without time zone NOT NULL,
+    race_date date NOT NULL,
+    horse_id integer NOT NULL,
+    horse_name character varying(255) NOT NULL,
+    selection_type character varying(50) NOT NULL,
+    market_type character varying(50) NOT NULL,
+    requested_odds numeric(8,2) NOT NULL,
+    stake_points numeric,
+    market_id character varying(255),
+    selection_id bigint,
+    valid boolean,
+    invalidated_reason text,
+    original_runners integer,
+    original_price numeric(8,2),
+    total_matched numeric NOT NULL,
+    total_liability numeric NOT NULL,
+    bet_count bigint NOT NULL,
+    updated_at timestamp without time zone DEFAULT now() NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_selection_state_race
+    ON live_betting.selection_state (race_date, race_time);
+
+-- Recompute the given selections (all when ids is NULL) as v_selection_state does
+CREATE OR REPLACE FUNCTION live_betting.refresh_selection_state(ids text[])
+RETURNS void LANGUAGE sql AS $$
+    INSERT INTO live_betting.selection_state AS t (
+        unique_id, race_id, race_time, race_date, horse_id, horse_name,
+        selection_type, market_type, requested_odds, stake_points, market_id,
+        selection_id, valid, invalidated_reason, original_runners, original_price,
+        total_matched, total_liability, bet_count, updated_at
+    )
+    WITH completed_bets AS (
+        SELECT left(bl.selection_unique_id, 11) AS base_unique_id,
+               sum(COALESCE(bl.matched_size, 0)) AS total_matched,
+               sum(COALESCE(bl.matched_liability, 0)) AS matched_liability,
+               count(*) AS bet_count
+        FROM live_betting.bet_log bl
+        WHERE bl.status = 'MATCHED'
+          AND (ids IS NULL OR left(bl.selection_unique_id, 11) = ANY (ids))
+        GROUP BY left(bl.selection_unique_id, 11)
+    )
+    SELECT s.unique_id, s.race_id, s.race_time, s.race_date, s.horse_id,
+           s.horse_name, s.selection_type, s.market_type, s.requested_odds,
+           s.stake_points, s.market_id, s.selection_id, s.valid,
+           s.invalidated_reason,
+           ms.number_of_runners,
+           ms.back_price_win,
+           COALESCE(cb.total_matched, 0),
+           COALESCE(cb.matched_liability, 0),
+           COALESCE(cb.bet_count, 0),
+           now()
+    FROM live_betting.selections s
+    LEFT JOIN live_betting.market_state ms
+        ON s.unique_id = ms.unique_id AND s.selection_id = ms.selection_id
+    LEFT JOIN completed_bets cb ON s.unique_id = cb.base_unique_id
+    WHERE s.unique_id IS NOT NULL
+      AND s.race_date >= CURRENT_DATE
+      AND (ids IS NULL OR s.unique_id = ANY (ids))
+    -- A consistent lock order for writers refreshing overlapping selections
+    ORDER BY s.unique_id
+    ON CONFLICT (unique_id) DO UPDATE SET
+        race_id = EXCLUDED.race_id,
+        race_time = EXCLUDED.race_time,
+        race_date = EXCLUDED.race_date,
+        horse_id = EXCLUDED.horse_id,
+        horse_name = EXCLUDED.horse_name,
+        selection_type = EXCLUDED.selection_type,
+        market_type = EXCLUDED.market_type,
+        requested_odds = EXCLUDED.requested_odds,
+        stake_points = EXCLUDED.stake_points,
+        market_id = EXCLUDED.market_id,
+        selection_id = EXCLUDED.selection_id,
+        valid = EXCLUDED.valid,
+        invalidated_reason = EXCLUDED.invalidated_reason,
+        original_runners = EXCLUDED.original_runners,
+        original_price = EXCLUDED.original_price,
+        total_matched = EXCLUDED.total_matched,
+        total_liability = EXCLUDED.total_liability,
+        bet_count = EXCLUDED.bet_count,
+        updated_at = EXCLUDED.updated_at;
+
+    -- Selections deleted, or moved off today, leave the table
+    DELETE FROM live_betting.selection_state ss
+    WHERE (ids IS NULL OR ss.unique_id = ANY (ids))
+      AND NOT EXISTS (
+          SELECT 1 FROM live_betting.selections s
+          WHERE s.unique_id = ss.unique_id AND s.race_date >= CURRENT_DATE
+      );
+$$;
+
+CREATE OR REPLACE FUNCTION live_betting.rebuild_selection_state()
+RETURNS void LANGUAGE plpgsql AS $$
+BEGIN
+    DELETE FROM live_betting.selection_state;
+    PERFORM live_betting.refresh_selection_state(NULL);
+END;
+$$;
+
+-- One refresh per statement for the selections its rows belong to. Each
+-- branch reads only the transition tables its trigger declares, and a
+-- TRUNCATE, which has none, refreshes every selection.
+CREATE OR REPLACE FUNCTION live_betting.selection_state_on_bet_log()
+RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM live_betting.refresh_selection_state(ARRAY(
+            SELECT DISTINCT left(selection_unique_id, 11) FROM new_bets
+        ));
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM live_betting.refresh_selection_state(ARRAY(
+            SELECT left(selection_unique_id, 11) FROM new_bets
+            UNION
+            SELECT left(selection_unique_id, 11) FROM old_bets
+        ));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM live_betting.refresh_selection_state(ARRAY(
+            SELECT DISTINCT left(selection_unique_id, 11) FROM old_bets
+        ));
+    ELSE
+        PERFORM live_betting.refresh_selection_state(NULL);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- selections and market_state both key the selection by unique_id
+CREATE OR REPLACE FUNCTION live_betting.selection_state_on_selection()
+RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM live_betting.refresh_selection_state(ARRAY(
+            SELECT DISTINCT unique_id::text FROM new_rows
+        ));
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM live_betting.refresh_selection_state(ARRAY(
+            SELECT unique_id::text FROM new_rows
+            UNION
+            SELECT unique_id::text FROM old_rows
+        ));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM live_betting.refresh_selection_state(ARRAY(
+            SELECT DISTINCT unique_id::text FROM old_rows
+        ));
+    ELSE
+        PERFORM live_betting.refresh_selection_state(NULL);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- A transition table can only be declared on a single-event trigger
+DROP TRIGGER IF EXISTS selection_state_bet_log_insert ON live_betting.bet_log;
+CREATE TRIGGER selection_state_bet_log_insert
+    AFTER INSERT ON live_betting.bet_log
+    REFERENCING NEW TABLE AS new_bets
+    FOR EACH STATEMENT EXECUTE FUNCTION live_betting.selection_state_on_bet_log();
+
+DROP TRIGGER IF EXISTS selection_state_bet_log_update ON live_betting.bet_log;
+CREATE TRIGGER selection_state_bet_log_update
+    AFTER UPDATE ON live_betting.bet_log
+    REFERENCING OLD TABLE AS old_bets NEW TABLE AS new_bets
+    FOR EACH STATEMENT EXECUTE FUNCTION live_betting.selection_state_on_bet_log();
+
+DROP TRIGGER IF EXISTS selection_state_bet_log_delete ON live_betting.bet_log;
+CREATE TRIGGER selection_state_bet_log_delete
+    AFTER DELETE ON live_betting.bet_log
+    REFERENCING OLD TABLE AS old_bets
+    FOR EACH STATEMENT EXECUTE FUNCTION live_betting.selection_state_on_bet_log();
+
+DROP TRIGGER IF EXISTS selection_state_bet_log_truncate ON live_betting.bet_log;
+CREATE TRIGGER selection_state_bet_log_truncate
+    AFTER TRUNCATE ON live_betting.bet_log
+    FOR EACH STATEMENT EXECUTE FUNCTION live_betting.selection_state_on_bet_log();
+
+DROP TRIGGER IF EXISTS selection_state_selections_insert ON live_betting.selections;
+CREATE TRIGGER selection_state_selections_insert
+    AFTER INSERT ON live_betting.selections
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION live_betting.selection_state_on_selection();
+
+DROP TRIGGER IF EXISTS selection_state_selections_update ON live_betting.selections;
+CREATE TRIGGER selection_state_selections_update
+    AFTER UPDATE ON live_betting.selections
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION live_betting.selection_state_on_selection();
+
+DROP TRIGGER IF EXISTS selection_state_selections_delete ON live_betting.selections;
+CREATE TRIGGER selection_state_selections_delete
+    AFTER DELETE ON live_betting.selections
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION live_betting.selection_state_on_selection();
+
+DROP TRIGGER IF EXISTS selection_state_selections_truncate ON live_betting.selections;
+CREATE TRIGGER selection_state_selections_truncate
+    AFTER TRUNCATE ON live_betting.selections
+    FOR EACH STATEMENT EXECUTE FUNCTION live_betting.selection_state_on_selection();
+
+DROP TRIGGER IF EXISTS selection_state_market_state_insert ON live_betting.market_state;
+CREATE TRIGGER selection_state_market_state_insert
+    AFTER INSERT ON live_betting.market_state
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION live_betting.selection_state_on_selection();
+
+DROP TRIGGER IF EXISTS selection_state_market_state_update ON live_betting.market_state;
+CREATE TRIGGER selection_state_market_state_update
+    AFTER UPDATE ON live_betting.market_state
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION live_betting.selection_state_on_selection();
+
+DROP TRIGGER IF EXISTS selection_state_market_state_delete ON live_betting.market_state;
+CREATE TRIGGER selection_state_market_state_delete
+    AFTER DELETE ON live_betting.market_state
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION live_betting.selection_state_on_selection();
+
+DROP TRIGGER IF EXISTS selection_state_market_state_truncate ON live_betting.market_state;
+CREATE TRIGGER selection_state_market_state_truncate
+    AFTER TRUNCATE ON live_betting.market_state
+    FOR EACH STATEMENT EXECUTE FUNCTION live_betting.selection_state_on_selection();
+"""
+
+# Every column of selection_state but updated_at, each also a column of
+# v_selection_state
+STORED_COLUMNS = [
+    "unique_id",
+    "race_id",
+    "race_time",
+    "race_date",
+    "horse_id",
+    "horse_name",
+    "selection_type",
+    "market_type",
+    "requested_odds",
+    "stake_points",
+    "market_id",
+    "selection_id",
+    "valid",
+    "invalidated_reason",
+    "original_runners",
+    "original_price",
+    "total_matched",
+    "total_liability",
+    "bet_count",
+]
+
+# ============================================================================
+# CONSISTENCY CHECK
+# ============================================================================
+
+_COLUMN_LIST = ", ".join(STORED_COLUMNS)
+
+_MISMATCHES = ",\n               ".join(
+    f"CASE WHEN m.{name} IS DISTINCT FROM r.{name} THEN '{name}' END"
+    for name in STORED_COLUMNS
+)
+
+_ANY_MISMATCH = "\n       OR ".join(
+    f"m.{name} IS DISTINCT FROM r.{name}" for name in STORED_COLUMNS
+)
+
+# The view holds today's races still to run, so the table is compared on those
+CHECK_QUERY = f"""
+    WITH materialized AS (
+        SELECT {_COLUMN_LIST}
+        FROM live_betting.selection_state
+        WHERE race_date = current_date AND race_time > now()
+    ),
+    reference AS (
+        SELECT {_COLUMN_LIST}
+        FROM live_betting.v_selection_state
+    )
+    SELECT COALESCE(m.unique_id, r.unique_id) AS unique_id,
+           m.unique_id IS NOT NULL AS in_table,
+           r.unique_id IS NOT NULL AS in_view,
+           array_remove(ARRAY[
+               {_MISMATCHES}
+           ], NULL) AS mismatched
+    FROM materialized m
+    FULL JOIN reference r ON m.unique_id = r.unique_id
+    WHERE {_ANY_MISMATCH}
+"""
+
+
+def require_selection_state(postgres_client: PostgresClient) -> None:
+    """Raise unless selection_state is installed; SelectionCache reads it."""
+    installed = postgres_client.fetch_data(
+        "SELECT to_regclass('live_betting.selection_state') IS NOT NULL AS installed"
+    )
+    if not installed.iloc[0]["installed"]:
+        raise ValueError(
+            "live_betting.selection_state does not exist; run"
+            " python -m trader.selection_state --install once first"
+        )
+
+
+def install_selection_state(postgres_client: PostgresClient) -> None:
+    """
+    Create or update the table, functions and triggers, then rebuild.
+
+    A one-off step run from the command line, not at trader startup.
+    """
+    postgres_client.execute_query(SELECTION_STATE_DDL)
+    rebuild_selection_state(postgres_client)
+
+
+def rebuild_selection_state(postgres_client: PostgresClient) -> None:
+    """Recompute selection_state from scratch."""
+    postgres_client.execute_query("SELECT live_betting.rebuild_selection_state()")
+    I("selection_state rebuilt")
+
+
+def check_selection_state(postgres_client: PostgresClient) -> pd.DataFrame:
+    """
+    Diff selection_state against v_selection_state.
+
+    Returns:
+        One row per selection that differs: unique_id, in_table, in_view and
+        the mismatched column names. Empty when the table is consistent.
+    """
+    differences = postgres_client.fetch_data(CHECK_QUERY)
+    for row in differences.itertuples():
+        if not row.in_table:
+            W(f"[{row.unique_id}] In v_selection_state but not selection_state")
+        elif not row.in_view:
+            W(f"[{row.unique_id}] In selection_state but not v_selection_state")
+        else:
+            W(f"[{row.unique_id}] selection_state differs in {list(row.mismatched)}")
+    return differences
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Check live_betting.selection_state against v_selection_state"
+    )
+    parser.add_argument(
+        "--install", action="store_true", help="Create or update the table first"
+    )
+    parser.add_argument(
+        "--rebuild", action="store_true", help="Rebuild the table before checking"
+    )
+    args = parser.parse_args(argv)
+
+    from api_helpers.clients import get_postgres_client
+
+    postgres_client = get_postgres_client()
+    if args.install:
+        install_selection_state(postgres_client)
+    elif args.rebuild:
+        rebuild_selection_state(postgres_client)
+
+    differences = check_selection_state(postgres_client)
+    if differences.empty:
+        I("selection_state matches v_selection_state")
+        return 0
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
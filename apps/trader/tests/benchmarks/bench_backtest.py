@@ -0,0 +1,139 @@
+"""
+Backtest synthetic days and report how many days run per minute.
+
+Each day is a card of races whose runners' ladders random-walk for the
+hour before the off, snapshotted every --cycle-seconds as the live loop
+records them, with a share of runners carrying back or lay selections.
+
+Usage:
+    python -m tests.benchmarks.bench_backtest --days 20 --races 30
+"""
+
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from trader.backtest import run_backtest
+from trader.selection_cache import StakingConfig
+
+STAKING = StakingConfig(
+    max_back=40.0, max_lay=60.0, tiers=[(120, 0.5), (30, 0.8), (0, 1.0)]
+)
+
+
+def synthetic_day(
+    day: int,
+    n_races: int,
+    n_runners: int,
+    cycle_seconds: int,
+    selections_per_race: int,
+    rng: np.random.Generator,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    first_race = datetime(2026, 6, 1, 13, 0) + timedelta(days=day)
+    n_cycles = 3600 // cycle_seconds
+    prices, selections = [], []
+    for race in range(n_races):
+        race_time = first_race + timedelta(minutes=15 * race)
+        market_win, market_place = f"1.{day:03d}{race:03d}1", f"1.{day:03d}{race:03d}2"
+        start_price = rng.uniform(2, 20, n_runners)
+        walk = np.exp(np.cumsum(rng.normal(0, 0.01, (n_cycles, n_runners)), axis=0))
+        back = np.round(np.maximum(1.01, start_price * walk), 2)
+        snapshot_at = (
+            race_time
+            - timedelta(hours=1)
+            + pd.to_timedelta(np.arange(n_cycles) * cycle_seconds, unit="s")
+        )
+        prices.append(
+            pd.DataFrame(
+                {
+                    "race_date": race_time.date(),
+                    "status": "ACTIVE",
+                    "market_id_win": market_win,
+                    "market_id_place": market_place,
+                    "selection_id": np.tile(np.arange(n_runners), n_cycles),
+                    "current_runner_count": n_runners,
+                    "back_price_1_win": back.ravel(),
+                    "back_price_1_depth_win": rng.uniform(5, 200, back.size),
+                    "lay_price_1_win": (back * 1.02).round(2).ravel(),
+                    "lay_price_1_depth_win": rng.uniform(5, 200, back.size),
+                    "back_price_1_place": (1 + (back - 1) / 4).round(2).ravel(),
+                    "back_price_1_depth_place": rng.uniform(5, 200, back.size),
+                    "lay_price_1_place": (1 + (back * 1.02 - 1) / 4).round(2).ravel(),
+                    "lay_price_1_depth_place": rng.uniform(5, 200, back.size),
+                    "created_at": np.repeat(snapshot_at.floor("min"), n_runners),
+                }
+            )
+        )
+        for i in rng.choice(n_runners, selections_per_race, replace=False):
+            side = "BACK" if rng.random() < 0.5 else "LAY"
+            market_type = "WIN" if rng.random() < 0.7 else "PLACE"
+            price = (
+                start_price[i] if market_type == "WIN" else 1 + (start_price[i] - 1) / 4
+            )
+            selections.append(
+                {
+                    "unique_id": f"{day:04d}{race:03d}{i:04d}",
+                    "race_id": race,
+                    "race_time": race_time,
+                    "race_date": race_time.date(),
+                    "horse_id": i,
+                    "horse_name": f"Horse {i}",
+                    "selection_type": side,
+                    "market_type": market_type,
+                    "requested_odds": round(price, 2),
+                    "stake_points": 1.0,
+                    "market_id": market_win if market_type == "WIN" else market_place,
+                    "selection_id": int(i),
+                    "valid": True,
+                    "invalidated_at": None,
+                    "invalidated_reason": None,
+                    "original_runners": n_runners,
+                    "original_price": start_price[i],
+                    "finishing_position": str(rng.integers(1, n_runners + 1)),
+                    "number_of_runners": n_runners,
+                }
+            )
+    return pd.concat(prices, ignore_index=True), pd.DataFrame(selections)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=20)
+    parser.add_argument("--races", type=int, default=30)
+    parser.add_argument("--runners", type=int, default=10)
+    parser.add_argument("--cycle-seconds", type=int, default=5)
+    parser.add_argument("--selections-per-race", type=int, default=2)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    days = [
+        synthetic_day(
+            day,
+            args.races,
+            args.runners,
+            args.cycle_seconds,
+            args.selections_per_race,
+            rng,
+        )
+        for day in range(args.days)
+    ]
+    prices = pd.concat([day[0] for day in days], ignore_index=True)
+    selections = pd.concat([day[1] for day in days], ignore_index=True)
+
+    result = run_backtest(prices, selections, STAKING)
+
+    print(
+        f"{args.days} days, {len(prices):,} price rows, "
+        f"{len(selections):,} selections in {result.seconds:.2f}s "
+        f"({args.days / result.seconds * 60:,.0f} days/minute)"
+    )
+    print(
+        f"decide() ran in {len(result.cycles):,} cycles, "
+        f"{len(result.bets):,} fills, turnover {result.turnover:,.2f}, "
+        f"pnl {result.pnl:,.2f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark the trader's per-cycle reads, SQLAlchemy against the prepared channel.
+
+Needs the configured Postgres (whatever is in it today). For the two hot
+reads of a trading cycle, the selection cache's reference query and
+reconciliation's bet_log snapshot, times fetch_data, the path before the
+channel (pooled connection, transaction, sqlalchemy.text, DataFrame),
+against fetch_rows on the channel (one persistent connection, EXECUTE of a
+statement prepared once), then prints the channel's latency histograms.
+
+Writes (bet_log upserts, invalidations) are not timed here, to keep the
+benchmark read-only; they take the same EXECUTE path.
+
+Usage:
+    python -m tests.benchmarks.bench_cycle_db --repeats 50
+"""
+
+import argparse
+from time import perf_counter
+
+from api_helpers.clients import get_postgres_client
+from trader.reconciliation import BET_LOG_SNAPSHOT_QUERY, BET_LOG_SNAPSHOT_STATEMENT
+from trader.selection_cache import REFERENCE_QUERY, REFERENCE_STATEMENT
+
+READS = [
+    (REFERENCE_QUERY, REFERENCE_STATEMENT),
+    (BET_LOG_SNAPSHOT_QUERY, BET_LOG_SNAPSHOT_STATEMENT),
+]
+
+
+def median_seconds(repeats: int, load) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = perf_counter()
+        load()
+        timings.append(perf_counter() - start)
+    return sorted(timings)[len(timings) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    postgres_client = get_postgres_client()
+    print(f"{'statement':<30}{'rows':>7}{'fetch_data ms':>15}{'channel ms':>12}")
+    total_data = total_channel = 0.0
+    for query, name in READS:
+        # Connect, and prepare, outside the timings
+        _, rows = postgres_client.fetch_rows(query, name)
+        postgres_client.fetch_data(query)
+        fetch_data = median_seconds(
+            args.repeats, lambda: postgres_client.fetch_data(query)
+        )
+        channel = median_seconds(
+            args.repeats, lambda: postgres_client.fetch_rows(query, name)
+        )
+        total_data += fetch_data
+        total_channel += channel
+        print(
+            f"{name:<30}{len(rows):>7}{fetch_data * 1000:>15.2f}"
+            f"{channel * 1000:>12.2f}"
+        )
+    print(
+        f"{'per cycle':<30}{'':>7}{total_data * 1000:>15.2f}{total_channel * 1000:>12.2f}"
+    )
+    print(f"\n{postgres_client.latency_report()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Replay a day of betfair_prices through PriceDeltaFilter and report the savings.
+
+A recorded day is an export of live_betting.betfair_prices (CSV or Parquet),
+e.g.
+
+    \\copy (SELECT * FROM live_betting.betfair_prices) TO 'prices.csv' CSV HEADER
+
+Without --path a synthetic card is generated instead. Each cycle is written
+in full and in delta mode. By default the target is an in-memory SQLite
+table written with to_sql, which shows the rows saved but not the write
+time of the production path. With --postgres each cycle goes through
+PostgresClient.store_data, as PriceHistoryWriter does, into a scratch
+table created LIKE live_betting.betfair_prices on the configured database
+and dropped afterwards.
+
+Usage:
+    python -m tests.benchmarks.bench_price_history_delta --path prices.csv
+    python -m tests.benchmarks.bench_price_history_delta --races 30 --hours 2
+    python -m tests.benchmarks.bench_price_history_delta --postgres
+"""
+
+import argparse
+from datetime import datetime, timedelta
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from trader.price_store import KEEP_ALIVE_SECONDS, PriceDeltaFilter
+
+CYCLE_SECONDS = 5
+
+
+def load_recorded_cycles(path: str) -> list[pd.DataFrame]:
+    """Split a betfair_prices export back into one frame per fetch cycle."""
+    prices = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+    prices["created_at"] = pd.to_datetime(prices["created_at"])
+    # created_at is truncated to the minute, so several cycles share a value;
+    # the n-th row of a runner within a minute belongs to the n-th cycle
+    prices["_cycle"] = prices.groupby(
+        ["created_at", "market_id_win", "selection_id"]
+    ).cumcount()
+    return [
+        cycle.drop(columns="_cycle").reset_index(drop=True)
+        for _, cycle in prices.groupby(["created_at", "_cycle"], sort=True)
+    ]
+
+
+def synthetic_cycles(
+    n_races: int, n_runners: int, hours: float, change_rate: float, seed: int = 0
+) -> list[pd.DataFrame]:
+    """A card where each runner's ladder moves with probability change_rate per cycle."""
+    rng = np.random.default_rng(seed)
+    n = n_races * n_runners
+    base = pd.DataFrame(
+        {
+            "market_id_win": np.repeat(
+                [f"1.{i:06d}" for i in range(n_races)], n_runners
+            ),
+            "market_id_place": np.repeat(
+                [f"1.{i + n_races:06d}" for i in range(n_races)], n_runners
+            ),
+            "selection_id": np.tile(np.arange(1, n_runners + 1), n_races),
+            "status": "ACTIVE",
+            "current_runner_count": n_runners,
+        }
+    )
+    ladder = {
+        f"{side}_price_{level}{depth}_{market}": rng.uniform(2, 20, n).round(2)
+        for market in ("win", "place")
+        for side in ("back", "lay")
+        for level in (1, 2)
+        for depth in ("", "_depth")
+    }
+    start = datetime(2026, 6, 6, 12, 0)
+    cycles = []
+    for i in range(int(hours * 3600 / CYCLE_SECONDS)):
+        moved = rng.random(n) < change_rate
+        for column, values in ladder.items():
+            values[moved] = rng.uniform(2, 20, moved.sum()).round(2)
+        created_at = start + timedelta(seconds=i * CYCLE_SECONDS)
+        cycles.append(
+            base.assign(
+                **{column: values.copy() for column, values in ladder.items()},
+                created_at=created_at.replace(second=0),
+            )
+        )
+    return cycles
+
+
+BENCH_SCHEMA = "public"
+BENCH_TABLE = "bench_betfair_prices"
+
+
+def sqlite_writer():
+    engine = create_engine("sqlite://")
+    return lambda cycle: cycle.to_sql(
+        "betfair_prices", engine, if_exists="append", index=False
+    )
+
+
+def postgres_writer(postgres_client):
+    postgres_client.execute_query(f"DROP TABLE IF EXISTS {BENCH_SCHEMA}.{BENCH_TABLE}")
+    postgres_client.execute_query(
+        f"CREATE TABLE {BENCH_SCHEMA}.{BENCH_TABLE} "
+        "(LIKE live_betting.betfair_prices INCLUDING DEFAULTS)"
+    )
+    return lambda cycle: postgres_client.store_data(
+        cycle, table=BENCH_TABLE, schema=BENCH_SCHEMA
+    )
+
+
+def replay(cycles: list[pd.DataFrame], delta: PriceDeltaFilter | None, write):
+    rows = 0
+    filter_seconds = 0.0
+    write_seconds = 0.0
+    for cycle in cycles:
+        if delta is not None:
+            start = perf_counter()
+            cycle = delta.filter(cycle)
+            filter_seconds += perf_counter() - start
+        if cycle.empty:
+            continue
+        start = perf_counter()
+        write(cycle)
+        write_seconds += perf_counter() - start
+        if delta is not None:
+            delta.commit(cycle)
+        rows += len(cycle)
+    return rows, filter_seconds, write_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--path", help="CSV or Parquet export of betfair_prices")
+    parser.add_argument("--races", type=int, default=30)
+    parser.add_argument("--runners", type=int, default=10)
+    parser.add_argument("--hours", type=float, default=2.0)
+    parser.add_argument(
+        "--change-rate", type=float, default=0.1, help="Synthetic moves per cycle"
+    )
+    parser.add_argument("--keep-alive", type=int, default=KEEP_ALIVE_SECONDS)
+    parser.add_argument(
+        "--postgres", action="store_true", help="Write to the configured Postgres"
+    )
+    args = parser.parse_args()
+
+    cycles = (
+        load_recorded_cycles(args.path)
+        if args.path
+        else synthetic_cycles(args.races, args.runners, args.hours, args.change_rate)
+    )
+    print(f"{len(cycles)} cycles, {sum(len(c) for c in cycles)} snapshot rows")
+
+    if args.postgres:
+        from api_helpers.clients import get_postgres_client
+
+        postgres_client = get_postgres_client()
+
+        def writer():
+            return postgres_writer(postgres_client)
+
+    else:
+        writer = sqlite_writer
+    try:
+        full_rows, _, full_time = replay(cycles, None, writer())
+        delta_rows, filter_time, delta_time = replay(
+            cycles, PriceDeltaFilter(args.keep_alive), writer()
+        )
+    finally:
+        if args.postgres:
+            postgres_client.execute_query(
+                f"DROP TABLE IF EXISTS {BENCH_SCHEMA}.{BENCH_TABLE}"
+            )
+
+    print(f"{'mode':<8}{'rows':>12}{'filter s':>10}{'write s':>10}")
+    print(f"{'full':<8}{full_rows:>12}{0:>10.3f}{full_time:>10.3f}")
+    print(f"{'delta':<8}{delta_rows:>12}{filter_time:>10.3f}{delta_time:>10.3f}")
+    print(
+        f"rows saved: {1 - delta_rows / full_rows:.1%}, "
+        f"write time saved: {1 - delta_time / full_time:.1%}"
+    )
+
+
+if __name__ == "__main__":
+    main()
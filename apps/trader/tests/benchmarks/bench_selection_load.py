@@ -0,0 +1,168 @@
+"""
+Benchmark turning selection rows into SelectionState, pandas against cursor rows.
+
+For 50, 500 and 5,000 selections, starts from the rows the driver returns
+for REFERENCE_QUERY and times:
+  - pandas: the frame pd.read_sql builds (NUMERIC as Decimal, coerced to
+    float), to_dict("records"), then build_selection_states, as
+    SelectionCache did before fetch_rows
+  - rows: dict per row straight from the cursor tuples (NUMERIC already
+    float), then build_selection_states
+
+With --postgres, also times fetch_data against fetch_rows for
+REFERENCE_QUERY on the configured database (whatever is in it today).
+
+Usage:
+    python -m tests.benchmarks.bench_selection_load --repeats 20
+"""
+
+import argparse
+from datetime import datetime, timedelta
+from decimal import Decimal
+from time import perf_counter
+
+import pandas as pd
+from trader.price_store import LatestPriceStore
+from trader.selection_cache import (
+    REFERENCE_QUERY,
+    REFERENCE_STATEMENT,
+    StakingConfig,
+    build_selection_states,
+)
+
+COLUMNS = [
+    "unique_id",
+    "race_id",
+    "race_time",
+    "race_date",
+    "horse_id",
+    "horse_name",
+    "selection_type",
+    "market_type",
+    "requested_odds",
+    "stake_points",
+    "market_id",
+    "selection_id",
+    "valid",
+    "invalidated_reason",
+    "original_runners",
+    "original_price",
+    "total_matched",
+    "total_liability",
+    "bet_count",
+]
+STAKING = StakingConfig(
+    max_back=40.0, max_lay=60.0, tiers=[(120, 0.5), (30, 0.8), (0, 1.0)]
+)
+
+
+def make_rows(n: int, now: datetime, numeric) -> list[tuple]:
+    return [
+        (
+            f"{i:011d}",
+            i // 10,
+            now + timedelta(minutes=5 + i % 240),
+            now.date(),
+            i,
+            f"Horse {i}",
+            "BACK" if i % 2 else "LAY",
+            "WIN" if i % 3 else "PLACE",
+            numeric("3.5"),
+            numeric("1.0"),
+            f"1.{200_000 + i // 10}",
+            i,
+            True,
+            None,
+            10,
+            numeric("3.4"),
+            numeric("12.5"),
+            numeric("30.0"),
+            1,
+        )
+        for i in range(n)
+    ]
+
+
+def make_store(n: int, now: datetime) -> LatestPriceStore:
+    store = LatestPriceStore()
+    store.update(
+        pd.DataFrame(
+            {
+                "market_id_win": [f"1.{200_000 + i // 10}" for i in range(n)],
+                "market_id_place": [f"1.{300_000 + i // 10}" for i in range(n)],
+                "selection_id": range(n),
+                "status": "ACTIVE",
+                "back_price_1_win": 3.6,
+                "lay_price_1_win": 3.7,
+                "back_price_1_place": 1.5,
+                "lay_price_1_place": 1.6,
+                "current_runner_count": 10,
+                "created_at": now,
+            }
+        )
+    )
+    return store
+
+
+def best_of(repeats: int, load) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = perf_counter()
+        load()
+        timings.append(perf_counter() - start)
+    return min(timings)
+
+
+def in_memory(repeats: int) -> None:
+    now = datetime(2026, 6, 6, 13, 0)
+    print(f"{'selections':>10}{'pandas ms':>12}{'rows ms':>10}")
+    for n in (50, 500, 5000):
+        decimal_rows = make_rows(n, now, Decimal)
+        float_rows = make_rows(n, now, float)
+        store = make_store(n, now)
+
+        def pandas_path():
+            frame = pd.DataFrame.from_records(
+                decimal_rows, columns=COLUMNS, coerce_float=True
+            )
+            build_selection_states(frame.to_dict("records"), STAKING, store, now)
+
+        def rows_path():
+            reference = [dict(zip(COLUMNS, row)) for row in float_rows]
+            build_selection_states(reference, STAKING, store, now)
+
+        print(
+            f"{n:>10}{best_of(repeats, pandas_path) * 1000:>12.2f}"
+            f"{best_of(repeats, rows_path) * 1000:>10.2f}"
+        )
+
+
+def on_postgres(repeats: int) -> None:
+    from api_helpers.clients import get_postgres_client
+
+    postgres_client = get_postgres_client()
+    fetch_data = best_of(repeats, lambda: postgres_client.fetch_data(REFERENCE_QUERY))
+    fetch_rows = best_of(
+        repeats,
+        lambda: postgres_client.fetch_rows(REFERENCE_QUERY, REFERENCE_STATEMENT),
+    )
+    _, rows = postgres_client.fetch_rows(REFERENCE_QUERY, REFERENCE_STATEMENT)
+    print(
+        f"\nPostgres, {len(rows)} selections: fetch_data {fetch_data * 1000:.2f}ms, "
+        f"fetch_rows {fetch_rows * 1000:.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--postgres", action="store_true")
+    args = parser.parse_args()
+
+    in_memory(args.repeats)
+    if args.postgres:
+        on_postgres(args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Run the trading loop against the simulated exchange and report cycle latency.
+
+Needs a Postgres server with the live_betting schema, configured through the
+usual DB_* settings. Selections and market_state rows are seeded for the
+simulated card under unique_ids starting "bench" and removed afterwards,
+along with their bet_log rows. Betfair itself is SimulatedExchange, so
+every API call the real BetFairClient makes costs --latency seconds and
+orders match against the simulated ladders.
+
+Prices come from a synthetic card, or with --path from a betfair_prices
+export replayed from its first snapshot (see bench_price_history_delta).
+
+Usage:
+    python -m tests.benchmarks.bench_trading_cycle --races 30 --selections 40
+    python -m tests.benchmarks.bench_trading_cycle --path prices.csv --latency 0.08
+"""
+
+import argparse
+from datetime import date
+from time import perf_counter, sleep
+
+import numpy as np
+import pandas as pd
+from api_helpers.clients import get_postgres_client
+from api_helpers.clients.betfair_simulator import (
+    LatencyModel,
+    MatchingRules,
+    PriceReplay,
+    SimulatedExchange,
+    simulated_client,
+    synthetic_card,
+)
+from api_helpers.helpers.time_utils import make_uk_time_aware
+from trader.main import run_trading_cycle
+from trader.price_data import fetch_prices
+from trader.price_store import LatestPriceStore, PriceHistoryWriter
+from trader.reconciliation import BetLogSnapshot
+from trader.selection_cache import SelectionCache
+
+UNIQUE_ID_PREFIX = "bench"
+
+
+def seed_selections(
+    postgres_client, exchange: SimulatedExchange, n_selections: int, seed: int = 0
+) -> None:
+    """Back or lay WIN selections at their current prices, one per runner."""
+    rng = np.random.default_rng(seed)
+    markets = {m.market_id: m for m in exchange.markets.values()}
+    win_markets = [m for m in markets.values() if m.market_type == "WIN"]
+    place_ids = {
+        m.start_time: m.market_id for m in markets.values() if m.market_type == "PLACE"
+    }
+    runners = [(m, r) for m in win_markets for r in m.runners.values() if r.back]
+    picks = rng.choice(len(runners), min(n_selections, len(runners)), replace=False)
+
+    selections, market_state = [], []
+    for i, pick in enumerate(picks):
+        market, runner = runners[pick]
+        race_time = make_uk_time_aware(market.start_time).replace(tzinfo=None)
+        unique_id = f"{UNIQUE_ID_PREFIX}{i:06d}"
+        side = "BACK" if i % 2 == 0 else "LAY"
+        selections.append(
+            {
+                "unique_id": unique_id,
+                "race_id": i,
+                "race_time": race_time,
+                "race_date": date.today(),
+                "horse_id": runner.selection_id,
+                "horse_name": runner.name,
+                "selection_type": side,
+                "market_type": "WIN",
+                "market_id": market.market_id,
+                "selection_id": runner.selection_id,
+                "requested_odds": (runner.back if side == "BACK" else runner.lay)[0][0],
+                "stake_points": 1.0,
+                "valid": True,
+                "fully_matched": False,
+            }
+        )
+        market_state.append(
+            {
+                "unique_id": unique_id,
+                "selection_id": runner.selection_id,
+                "horse_id": runner.selection_id,
+                "race_id": i,
+                "race_date": date.today(),
+                "race_time": race_time,
+                "market_id_win": market.market_id,
+                "market_id_place": place_ids.get(market.start_time),
+                "number_of_runners": len(market.runners),
+                "back_price_win": runner.back[0][0],
+            }
+        )
+    postgres_client.store_data(
+        pd.DataFrame(selections), table="selections", schema="live_betting"
+    )
+    postgres_client.store_data(
+        pd.DataFrame(market_state), table="market_state", schema="live_betting"
+    )
+
+
+def clear_selections(postgres_client) -> None:
+    for table, column in (
+        ("bet_log", "selection_unique_id"),
+        ("market_state", "unique_id"),
+        ("selections", "unique_id"),
+    ):
+        postgres_client.execute_query(
+            f"DELETE FROM live_betting.{table} "
+            f"WHERE {column} LIKE '{UNIQUE_ID_PREFIX}%'"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--path", help="CSV or Parquet export of betfair_prices")
+    parser.add_argument("--races", type=int, default=30)
+    parser.add_argument("--runners", type=int, default=10)
+    parser.add_argument("--selections", type=int, default=40)
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Seconds per API call"
+    )
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--take-fraction", type=float, default=0.5)
+    parser.add_argument("--cycles", type=int, default=20)
+    parser.add_argument(
+        "--wait", type=float, default=1.0, help="Matching wait per cycle, seconds"
+    )
+    args = parser.parse_args()
+
+    if args.path:
+        path = args.path
+        prices = (
+            pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+        )
+        exchange_kwargs = {"replay": PriceReplay(prices)}
+    else:
+        exchange_kwargs = {
+            "markets": synthetic_card(n_races=args.races, n_runners=args.runners),
+            "price_walk": 0.002,
+        }
+    exchange = SimulatedExchange(
+        matching=MatchingRules(take_fraction=args.take_fraction),
+        latency=LatencyModel.uniform(args.latency, jitter=args.jitter),
+        **exchange_kwargs,
+    )
+    betfair_client = simulated_client(exchange)
+
+    postgres_client = get_postgres_client()
+    clear_selections(postgres_client)
+    seed_selections(postgres_client, exchange, args.selections)
+
+    price_store = LatestPriceStore()
+    history_writer = PriceHistoryWriter(postgres_client)
+    selection_cache = SelectionCache(postgres_client, price_store)
+    bet_log = BetLogSnapshot(postgres_client)
+
+    waited = []
+
+    def wait() -> None:
+        start = perf_counter()
+        sleep(args.wait)
+        waited.append(perf_counter() - start)
+
+    fetch_seconds, cycle_seconds = [], []
+    try:
+        for _ in range(args.cycles):
+            start = perf_counter()
+            fetch_prices(
+                betfair_client=betfair_client,
+                postgres_client=postgres_client,
+                price_store=price_store,
+                history_writer=history_writer,
+            )
+            fetched = perf_counter()
+            run_trading_cycle(
+                betfair_client, postgres_client, selection_cache, bet_log, wait=wait
+            )
+            # Decide, execute and reconcile, without the matching wait
+            cycle_seconds.append(perf_counter() - fetched - waited.pop())
+            fetch_seconds.append(fetched - start)
+    finally:
+        history_writer.close()
+        orders = list(exchange.orders.values())
+        clear_selections(postgres_client)
+
+    print(f"{'stage':<12}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for stage, seconds in (("fetch", fetch_seconds), ("cycle", cycle_seconds)):
+        ms = np.array(seconds) * 1000
+        print(
+            f"{stage:<12}{np.percentile(ms, 50):>10.1f}"
+            f"{np.percentile(ms, 95):>10.1f}{ms.max():>10.1f}"
+        )
+    print()
+    for endpoint, calls in sorted(exchange.calls.items()):
+        print(f"{endpoint:<16}{calls:>6} calls")
+    matched = sum(o.size_matched for o in orders)
+    print(f"\n{len(orders)} orders placed, {matched:,.2f} matched")
+
+
+if __name__ == "__main__":
+    main()
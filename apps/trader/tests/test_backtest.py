@@ -0,0 +1,229 @@
+"""
+Tests for the backtest engine.
+
+These tests verify:
+1. Orders fill against the displayed size and stop at the target stake
+2. Skipping cycles gives the same decisions as stepping every cycle
+3. Short-priced removals invalidate and cash out at the current prices
+4. Manual voids apply from invalidated_at
+5. Positions settle against finishing_position
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from trader.backtest import FillModel, PriceTimeline, run_backtest
+from trader.decision_engine import decide
+from trader.price_store import LatestPriceStore
+from trader.selection_cache import StakingConfig, build_selection_states
+
+START = datetime(2026, 6, 6, 13, 0)
+RACE_TIME = START + timedelta(minutes=30)
+SELECTION_ID = 11
+
+STAKING = StakingConfig(max_back=20.0, max_lay=30.0, tiers=[(15, 0.5), (0, 1.0)])
+
+
+def make_prices(
+    back: list[float],
+    depth: float = 100.0,
+    removed_at: int | None = None,
+    removed_price: float = 4.0,
+    per_minute: int = 1,
+) -> pd.DataFrame:
+    """Snapshots of a four-runner race, one per cycle, the first runner at back."""
+    rows = []
+    for cycle, price in enumerate(back):
+        created_at = START + timedelta(minutes=cycle // per_minute)
+        for runner in range(4):
+            selection_id = SELECTION_ID + runner
+            removed = runner == 1 and removed_at is not None and cycle >= removed_at
+            runner_back = (
+                price if runner == 0 else (removed_price if runner == 1 else 8.0)
+            )
+            rows.append(
+                {
+                    "race_date": START.date(),
+                    "status": "REMOVED" if removed else "ACTIVE",
+                    "market_id_win": "1.1",
+                    "market_id_place": "1.2",
+                    "selection_id": selection_id,
+                    "current_runner_count": (
+                        3 if removed_at is not None and cycle >= removed_at else 4
+                    ),
+                    "back_price_1_win": runner_back,
+                    "back_price_1_depth_win": depth,
+                    "lay_price_1_win": round(runner_back + 0.1, 2),
+                    "lay_price_1_depth_win": depth,
+                    "back_price_1_place": 1.5,
+                    "back_price_1_depth_place": depth,
+                    "lay_price_1_place": 1.6,
+                    "lay_price_1_depth_place": depth,
+                    "created_at": created_at,
+                }
+            )
+    return pd.DataFrame(rows)
+
+
+def make_selection(**overrides) -> dict:
+    row = {
+        "unique_id": "bt000000001",
+        "race_id": 1,
+        "race_time": RACE_TIME,
+        "race_date": START.date(),
+        "horse_id": 100,
+        "horse_name": "Alpha",
+        "selection_type": "BACK",
+        "market_type": "WIN",
+        "requested_odds": 3.0,
+        "stake_points": 1.0,
+        "market_id": "1.1",
+        "selection_id": SELECTION_ID,
+        "valid": True,
+        "invalidated_at": None,
+        "invalidated_reason": None,
+        "original_runners": 4,
+        "original_price": 3.0,
+        "finishing_position": "1",
+        "number_of_runners": 4,
+    }
+    row.update(overrides)
+    return row
+
+
+def selections(*rows: dict) -> pd.DataFrame:
+    return pd.DataFrame(list(rows))
+
+
+class TestFills:
+    def test_order_fills_to_the_target_stake(self):
+        result = run_backtest(
+            make_prices([3.2] * 10), selections(make_selection()), STAKING
+        )
+
+        # 30 minutes out the 0.5 tier applies: 10.0 of the 20.0 max
+        assert result.bets["size"].tolist() == [10.0]
+        assert result.bets["price"].tolist() == [3.2]
+        assert result.turnover == 10.0
+        assert result.pnl == pytest.approx(10.0 * 2.2)
+
+    def test_depth_limits_each_fill(self):
+        result = run_backtest(
+            make_prices([3.2] * 10, depth=4.0), selections(make_selection()), STAKING
+        )
+
+        assert result.bets["size"].tolist() == [4.0, 4.0, 2.0]
+        assert result.cycles["orders"].tolist() == [1, 1, 1]
+
+    def test_nothing_fills_below_the_requested_price(self):
+        result = run_backtest(
+            make_prices([2.8] * 10), selections(make_selection()), STAKING
+        )
+
+        assert result.bets.empty
+        assert result.cycles.empty
+        assert result.pnl == 0
+
+    def test_lay_fills_by_liability_and_loses_when_the_horse_wins(self):
+        lay = make_selection(selection_type="LAY", requested_odds=4.0)
+
+        result = run_backtest(make_prices([3.2] * 10), selections(lay), STAKING)
+
+        # 15.0 liability at 3.3 is a 6.52 stake
+        assert result.bets["size"].tolist() == [6.52]
+        assert result.pnl == pytest.approx(-6.52 * 2.3)
+
+
+class TestCycleSkipping:
+    def test_matches_stepping_every_cycle(self):
+        back = list(np.linspace(2.6, 3.6, 40).round(2))
+        prices = make_prices(back, per_minute=2)
+        rows = selections(
+            make_selection(),
+            make_selection(
+                unique_id="bt000000002", selection_type="LAY", requested_odds=3.1
+            ),
+        )
+
+        result = run_backtest(prices, rows, STAKING, FillModel(depth_fraction=0))
+
+        timeline = PriceTimeline(prices)
+        reference = rows.assign(
+            total_matched=0.0, total_liability=0.0, bet_count=0
+        ).to_dict("records")
+        store = LatestPriceStore()
+        stepped = []
+        for cycle, cycle_time in enumerate(timeline.cycle_times):
+            rows_now = timeline.latest[:, cycle]
+            store.update(timeline.prices.iloc[rows_now[rows_now >= 0]])
+            now = pd.Timestamp(cycle_time).to_pydatetime()
+            states = build_selection_states(reference, STAKING, store, now)
+            orders = len(decide(states).orders)
+            if orders:
+                stepped.append((now, orders))
+
+        assert len(stepped) > 10
+        assert list(zip(result.cycles["cycle_time"], result.cycles["orders"])) == (
+            stepped
+        )
+
+
+class TestInvalidation:
+    def test_short_price_removal_cashes_out_the_position(self):
+        back = [3.2] * 4 + [2.5] * 6
+        prices = make_prices(back, removed_at=4)
+
+        result = run_backtest(prices, selections(make_selection()), STAKING)
+
+        assert result.bets["kind"].tolist() == ["order", "cash_out"]
+        hedge = result.bets.iloc[1]
+        assert (hedge["side"], hedge["price"]) == ("LAY", 2.6)
+        assert result.cycles["invalidations"].sum() == 1
+        # Hedged: the same pnl whatever the result
+        assert result.pnl == pytest.approx(10.0 * 3.2 / 2.6 - 10.0, abs=0.02)
+
+    def test_longer_priced_removal_keeps_trading(self):
+        prices = make_prices([3.2] * 10, removed_at=4, removed_price=15.0)
+
+        result = run_backtest(prices, selections(make_selection()), STAKING)
+
+        assert result.cycles["invalidations"].sum() == 0
+
+    def test_manual_void_applies_from_invalidated_at(self):
+        voided = make_selection(
+            requested_odds=3.5,
+            invalidated_at=START + timedelta(minutes=5),
+            invalidated_reason="Manual Void",
+        )
+        back = [3.2] * 6 + [3.6] * 4
+
+        result = run_backtest(make_prices(back), selections(voided), STAKING)
+
+        assert result.bets.empty
+        assert result.cycles["invalidations"].tolist() == [1]
+
+
+class TestSettlement:
+    def test_losing_back_and_unknown_results(self):
+        rows = selections(
+            make_selection(finishing_position="2"),
+            make_selection(unique_id="bt000000002", finishing_position=None),
+        )
+
+        result = run_backtest(make_prices([3.2] * 10, depth=15.0), rows, STAKING)
+
+        settled = result.selections.set_index("unique_id")["pnl"]
+        assert settled["bt000000001"] == pytest.approx(-10.0)
+        assert np.isnan(settled["bt000000002"])
+
+    def test_summary_per_day(self):
+        result = run_backtest(
+            make_prices([3.2] * 10), selections(make_selection()), STAKING
+        )
+
+        day = result.summary().loc[START.date()]
+        assert day["turnover"] == 10.0
+        assert day["orders"] == 1
+        assert day["pnl"] == pytest.approx(22.0)
@@ -11,13 +11,16 @@ These tests verify:
 2. Stake limit failsafe is respected
 3. Price improvement triggers order replacement
 4. Existing orders are handled correctly
+5. Cash outs go to the background engine when one is given, and no order
+   is placed in a market it is still cashing out
+6. Nothing is placed in a cycle whose bet_log totals cannot be read
 """
 
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 from api_helpers.clients.betfair_client import BetFairOrder, OrderResult
 from trader.decision_engine import DecisionResult, OrderWithState
-from trader.executor import _place_order, execute
+from trader.executor import _prepare_order, execute
 
 
 class TestOrderPlacement:
@@ -40,21 +43,12 @@ class TestOrderPlacement:
         )
 
         mock_betfair = MagicMock()
-        mock_betfair.get_current_orders.return_value = []
-        mock_betfair.place_order.return_value = OrderResult(
-            success=True,
-            message="OK",
-            size_matched=0.0,
-            average_price_matched=None,
-        )
-
         mock_postgres = MagicMock()
-        mock_postgres.fetch_data.return_value = MagicMock(empty=True)
+        mock_postgres.fetch_rows.return_value = ([], [])
 
-        result = _place_order(order_with_state, [], mock_betfair, mock_postgres)
+        result = _prepare_order(order_with_state, [], mock_betfair, mock_postgres)
 
-        mock_betfair.place_order.assert_called_once()
-        assert result.success is True
+        assert result == order
 
     def test_skips_when_active_order_exists(self):
         """Should skip placing when active order exists at same price."""
@@ -82,12 +76,12 @@ class TestOrderPlacement:
         mock_betfair = MagicMock()
         mock_postgres = MagicMock()
 
-        result = _place_order(
+        result = _prepare_order(
             order_with_state, [existing_order], mock_betfair, mock_postgres
         )
 
         # Should not place order
-        mock_betfair.place_order.assert_not_called()
+        mock_betfair.cancel_orders.assert_not_called()
         assert result is None
 
 
@@ -116,22 +110,25 @@ class TestExecuteSummary:
 
         mock_betfair = MagicMock()
         mock_betfair.get_current_orders.return_value = []
-        mock_betfair.place_order.return_value = OrderResult(
-            success=True,
-            message="OK",
-            size_matched=0.0,
-            average_price_matched=None,
-        )
+        mock_betfair.place_orders.return_value = [
+            OrderResult(
+                success=True,
+                message="OK",
+                size_matched=0.0,
+                average_price_matched=None,
+            )
+        ]
 
         mock_postgres = MagicMock()
         mock_postgres.fetch_data.return_value = MagicMock(empty=True)
+        mock_postgres.fetch_rows.return_value = ([], [])
 
         summary = execute(
             decision, mock_betfair, mock_postgres, customer_refs=["test_exec"]
         )
 
         assert summary.orders_placed == 1
-        mock_betfair.place_order.assert_called_once()
+        mock_betfair.place_orders.assert_called_once()
 
     def test_execute_counts_matched_orders(self):
         """Execute should count matched orders."""
@@ -155,15 +152,18 @@ class TestExecuteSummary:
 
         mock_betfair = MagicMock()
         mock_betfair.get_current_orders.return_value = []
-        mock_betfair.place_order.return_value = OrderResult(
-            success=True,
-            message="OK",
-            size_matched=10.0,  # Fully matched
-            average_price_matched=3.0,
-        )
+        mock_betfair.place_orders.return_value = [
+            OrderResult(
+                success=True,
+                message="OK",
+                size_matched=10.0,  # Fully matched
+                average_price_matched=3.0,
+            )
+        ]
 
         mock_postgres = MagicMock()
         mock_postgres.fetch_data.return_value = MagicMock(empty=True)
+        mock_postgres.fetch_rows.return_value = ([], [])
 
         summary = execute(
             decision, mock_betfair, mock_postgres, customer_refs=["test_matched"]
@@ -172,6 +172,90 @@ class TestExecuteSummary:
         assert summary.orders_placed == 1
         assert summary.orders_matched == 1
 
+    def test_execute_sends_orders_in_one_batch(self):
+        """Orders are checked one by one, then placed together."""
+        orders = [
+            OrderWithState(
+                order=BetFairOrder(
+                    size=10.0,
+                    price=3.0,
+                    selection_id=str(selection_id),
+                    market_id="1.234567",
+                    side="BACK",
+                    strategy=f"test_batch_{selection_id}",
+                ),
+                within_stake_limit=True,
+                target_stake=10.0,
+            )
+            for selection_id in (1, 2, 3)
+        ]
+        decision = DecisionResult(
+            orders=orders, cash_out_market_ids=[], invalidations=[]
+        )
+
+        # Selection 2 already has an order resting at the same price
+        existing_order = MagicMock()
+        existing_order.customer_strategy_ref = "test_batch_2"
+        existing_order.price = 3.0
+        existing_order.execution_status = "EXECUTABLE"
+
+        mock_betfair = MagicMock()
+        mock_betfair.get_current_orders.return_value = [existing_order]
+        mock_betfair.place_orders.side_effect = lambda placed: [
+            OrderResult(success=True, message="OK") for _ in placed
+        ]
+
+        mock_postgres = MagicMock()
+        mock_postgres.fetch_data.return_value = MagicMock(empty=True)
+        mock_postgres.fetch_rows.return_value = ([], [])
+
+        summary = execute(decision, mock_betfair, mock_postgres, customer_refs=[])
+
+        [placed] = mock_betfair.place_orders.call_args[0]
+        assert [o.strategy for o in placed] == ["test_batch_1", "test_batch_3"]
+        assert summary.orders_placed == 2
+        assert summary.orders_skipped == 1
+        mock_betfair.place_order.assert_not_called()
+
+
+class TestBetLogUnavailable:
+    """Stakes are capped by bet_log, so a failed read skips placement."""
+
+    def test_placement_is_skipped_when_bet_log_cannot_be_read(self):
+        order = BetFairOrder(
+            size=10.0,
+            price=3.0,
+            selection_id="12345",
+            market_id="1.234567",
+            side="BACK",
+            strategy="test_no_log",
+        )
+        decision = DecisionResult(
+            orders=[
+                OrderWithState(order=order, within_stake_limit=True, target_stake=10.0)
+            ],
+            cash_out_market_ids=["1.999"],
+            invalidations=[],
+        )
+        mock_betfair = MagicMock()
+        mock_betfair.get_current_orders.return_value = []
+        mock_postgres = MagicMock()
+        mock_postgres.fetch_rows.side_effect = Exception("connection lost")
+        engine = MagicMock()
+
+        summary = execute(
+            decision,
+            mock_betfair,
+            mock_postgres,
+            customer_refs=["test_no_log"],
+            cash_out_engine=engine,
+        )
+
+        mock_betfair.place_orders.assert_not_called()
+        assert summary.orders_skipped == 1
+        # Cash outs do not depend on the totals
+        engine.submit.assert_called_once_with(["1.999"])
+
 
 class TestOrderResultHandling:
     """Test handling of various order results."""
@@ -198,15 +282,18 @@ class TestOrderResultHandling:
 
         mock_betfair = MagicMock()
         mock_betfair.get_current_orders.return_value = []
-        mock_betfair.place_order.return_value = OrderResult(
-            success=False,
-            message="API Error",
-            size_matched=None,
-            average_price_matched=None,
-        )
+        mock_betfair.place_orders.return_value = [
+            OrderResult(
+                success=False,
+                message="API Error",
+                size_matched=None,
+                average_price_matched=None,
+            )
+        ]
 
         mock_postgres = MagicMock()
         mock_postgres.fetch_data.return_value = MagicMock(empty=True)
+        mock_postgres.fetch_rows.return_value = ([], [])
 
         summary = execute(
             decision, mock_betfair, mock_postgres, customer_refs=["test_fail"]
@@ -237,15 +324,18 @@ class TestOrderResultHandling:
 
         mock_betfair = MagicMock()
         mock_betfair.get_current_orders.return_value = []
-        mock_betfair.place_order.return_value = OrderResult(
-            success=True,
-            message="OK",
-            size_matched=5.0,  # Partial match
-            average_price_matched=3.0,
-        )
+        mock_betfair.place_orders.return_value = [
+            OrderResult(
+                success=True,
+                message="OK",
+                size_matched=5.0,  # Partial match
+                average_price_matched=3.0,
+            )
+        ]
 
         mock_postgres = MagicMock()
         mock_postgres.fetch_data.return_value = MagicMock(empty=True)
+        mock_postgres.fetch_rows.return_value = ([], [])
 
         summary = execute(
             decision, mock_betfair, mock_postgres, customer_refs=["test_partial"]
@@ -253,3 +343,89 @@ class TestOrderResultHandling:
 
         assert summary.orders_placed == 1
         assert summary.orders_matched == 1  # Partial still counts
+
+
+class TestCashOut:
+    """Test that cash outs are handed to the engine when there is one."""
+
+    def test_cash_out_is_submitted_to_the_engine(self):
+        decision = DecisionResult(
+            orders=[], cash_out_market_ids=["1.234567"], invalidations=[]
+        )
+        mock_betfair = MagicMock()
+        mock_betfair.get_current_orders.return_value = []
+        mock_postgres = MagicMock()
+        mock_postgres.fetch_data.return_value = MagicMock(empty=True)
+        mock_postgres.fetch_rows.return_value = ([], [])
+        engine = MagicMock()
+
+        with patch("trader.executor.cash_out_bets") as cash_out_bets:
+            summary = execute(
+                decision,
+                mock_betfair,
+                mock_postgres,
+                customer_refs=[],
+                cash_out_engine=engine,
+            )
+
+        engine.submit.assert_called_once_with(["1.234567"])
+        cash_out_bets.assert_not_called()
+        assert summary.cash_outs == 1
+
+    def test_cash_out_blocks_without_an_engine(self):
+        decision = DecisionResult(
+            orders=[], cash_out_market_ids=["1.234567"], invalidations=[]
+        )
+        mock_betfair = MagicMock()
+        mock_betfair.get_current_orders.return_value = []
+        mock_postgres = MagicMock()
+        mock_postgres.fetch_data.return_value = MagicMock(empty=True)
+        mock_postgres.fetch_rows.return_value = ([], [])
+
+        with patch("trader.executor.cash_out_bets") as cash_out_bets:
+            execute(decision, mock_betfair, mock_postgres, customer_refs=[])
+
+        cash_out_bets.assert_called_once_with(mock_betfair, ["1.234567"])
+
+    def test_no_orders_in_a_market_being_cashed_out(self):
+        def order_in(market_id: str, strategy: str) -> OrderWithState:
+            return OrderWithState(
+                order=BetFairOrder(
+                    size=10.0,
+                    price=3.0,
+                    selection_id="12345",
+                    market_id=market_id,
+                    side="BACK",
+                    strategy=strategy,
+                ),
+                within_stake_limit=True,
+                target_stake=10.0,
+            )
+
+        decision = DecisionResult(
+            orders=[order_in("1.111", "busy_001"), order_in("1.222", "free_001")],
+            cash_out_market_ids=[],
+            invalidations=[],
+        )
+        mock_betfair = MagicMock()
+        mock_betfair.get_current_orders.return_value = []
+        mock_betfair.place_orders.return_value = [
+            OrderResult(success=True, message="OK", size_matched=0.0)
+        ]
+        mock_postgres = MagicMock()
+        mock_postgres.fetch_rows.return_value = ([], [])
+        engine = MagicMock()
+        engine.running.return_value = ["1.111"]
+
+        summary = execute(
+            decision,
+            mock_betfair,
+            mock_postgres,
+            customer_refs=["busy_001", "free_001"],
+            cash_out_engine=engine,
+        )
+
+        placed = mock_betfair.place_orders.call_args.args[0]
+        assert [order.market_id for order in placed] == ["1.222"]
+        assert summary.orders_placed == 1
+        assert summary.orders_skipped == 1
@@ -0,0 +1,121 @@
+"""
+Tests for the cycle pipeline.
+
+These tests verify:
+1. The price fetch overlaps the matching wait instead of following it
+2. A prefetched snapshot is not fetched again at the top of the next cycle
+3. Prefetch errors never stop reconcile from running
+4. run_trading_cycle reconciles only after the wait has returned
+"""
+
+from time import monotonic, sleep
+from unittest.mock import MagicMock
+
+import pytest
+from trader import main
+from trader.decision_engine import DecisionResult
+from trader.pipeline import CyclePrefetcher, FullCardPoller
+
+
+def make_prefetcher(fetch_seconds: float = 0.0, wait_seconds: float = 0.1):
+    fetches = []
+
+    def fetch_prices():
+        fetches.append(monotonic())
+        sleep(fetch_seconds)
+
+    prefetcher = CyclePrefetcher(
+        FullCardPoller(fetch_prices), MagicMock(), wait_seconds=wait_seconds
+    )
+    return prefetcher, fetches
+
+
+class TestCyclePrefetcher:
+    def test_wait_overlaps_the_price_fetch(self):
+        prefetcher, fetches = make_prefetcher(fetch_seconds=0.08, wait_seconds=0.1)
+        prefetcher.fetch()
+
+        started = monotonic()
+        prefetcher.wait_for_matching()
+        elapsed = monotonic() - started
+
+        assert len(fetches) == 2
+        # max(fetch, wait) rather than fetch + wait
+        assert elapsed < 0.17
+        prefetcher.selection_cache.prefetch.assert_called_once()
+
+    def test_fetch_is_timed_to_finish_as_the_wait_ends(self):
+        prefetcher, fetches = make_prefetcher(fetch_seconds=0.05, wait_seconds=0.2)
+        prefetcher.fetch()
+
+        started = monotonic()
+        prefetcher.wait_for_matching()
+
+        assert prefetcher.poller.last_fetch_seconds == pytest.approx(0.05, abs=0.03)
+        assert fetches[1] - started == pytest.approx(0.15, abs=0.04)
+
+    def test_prefetched_snapshot_is_not_fetched_again(self):
+        prefetcher, fetches = make_prefetcher(wait_seconds=0.01)
+
+        prefetcher.fetch()
+        prefetcher.wait_for_matching()
+        prefetcher.fetch()
+        prefetcher.fetch()
+
+        assert len(fetches) == 3
+
+    def test_failed_prefetch_is_logged_and_fetched_again(self):
+        calls = []
+
+        def fetch_prices():
+            calls.append(1)
+            if len(calls) == 1:
+                raise ConnectionError("reset")
+
+        selection_cache = MagicMock()
+        selection_cache.prefetch.side_effect = Exception("DB Error")
+        prefetcher = CyclePrefetcher(
+            FullCardPoller(fetch_prices), selection_cache, wait_seconds=0.01
+        )
+
+        prefetcher.wait_for_matching()
+        prefetcher.fetch()
+
+        assert len(calls) == 2
+
+
+class TestRunTradingCycle:
+    def test_reconciles_after_the_wait(self, monkeypatch):
+        events = []
+        selection_cache = MagicMock()
+        selection_cache.selection_states.return_value = [MagicMock()]
+        monkeypatch.setattr(
+            main, "decide", lambda selections: DecisionResult([], [], [])
+        )
+        monkeypatch.setattr(
+            main,
+            "reconcile",
+            lambda *args: events.append("reconcile")
+            or MagicMock(selections_upserted=0),
+        )
+
+        main.run_trading_cycle(
+            MagicMock(),
+            MagicMock(),
+            selection_cache,
+            MagicMock(),
+            wait=lambda: events.append("wait"),
+        )
+
+        assert events == ["wait", "reconcile"]
+
+    def test_waits_without_selections(self):
+        selection_cache = MagicMock()
+        selection_cache.selection_states.return_value = []
+        wait = MagicMock()
+
+        main.run_trading_cycle(
+            MagicMock(), MagicMock(), selection_cache, MagicMock(), wait=wait
+        )
+
+        wait.assert_called_once()
@@ -0,0 +1,132 @@
+"""
+Tests for delta-only persistence of price snapshots.
+"""
+
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pandas as pd
+from trader.price_store import PriceDeltaFilter, PriceHistoryWriter
+
+START = datetime(2026, 6, 6, 14, 0)
+
+
+def make_snapshot(
+    created_at: datetime, overrides: dict[int, dict] | None = None
+) -> pd.DataFrame:
+    rows = []
+    for selection_id in (1, 2):
+        row = {
+            "market_id_win": "1.111",
+            "market_id_place": "1.222",
+            "selection_id": selection_id,
+            "status": "ACTIVE",
+            "back_price_1_win": 3.0 + selection_id,
+            "back_price_1_depth_win": 100.0,
+            "lay_price_1_win": 3.1 + selection_id,
+            "lay_price_1_depth_win": None,
+            "current_runner_count": 10,
+            "sim_place_price": None,
+            "created_at": created_at,
+        }
+        row.update((overrides or {}).get(selection_id, {}))
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def write(delta: PriceDeltaFilter, snapshot: pd.DataFrame) -> pd.DataFrame:
+    """Filter a snapshot and commit what was kept, as a successful write does."""
+    changed = delta.filter(snapshot)
+    delta.commit(changed)
+    return changed
+
+
+class TestPriceDeltaFilter:
+    def test_first_snapshot_written_in_full(self):
+        delta = PriceDeltaFilter()
+        assert len(write(delta, make_snapshot(START))) == 2
+
+    def test_unchanged_snapshot_dropped(self):
+        delta = PriceDeltaFilter()
+        write(delta, make_snapshot(START))
+        assert write(delta, make_snapshot(START + timedelta(minutes=1))).empty
+
+    def test_only_changed_runner_written(self):
+        delta = PriceDeltaFilter()
+        write(delta, make_snapshot(START))
+        changed = write(
+            delta,
+            make_snapshot(
+                START + timedelta(minutes=1), {2: {"lay_price_1_depth_win": 5.0}}
+            ),
+        )
+        assert changed["selection_id"].tolist() == [2]
+
+    def test_status_and_runner_count_changes_written(self):
+        delta = PriceDeltaFilter()
+        write(delta, make_snapshot(START))
+        changed = write(
+            delta,
+            make_snapshot(
+                START + timedelta(minutes=1),
+                {
+                    1: {"status": "REMOVED", "current_runner_count": 9},
+                    2: {"current_runner_count": 9},
+                },
+            ),
+        )
+        assert changed["selection_id"].tolist() == [1, 2]
+
+    def test_keep_alive_rewrites_unchanged_runners(self):
+        delta = PriceDeltaFilter(keep_alive_seconds=300)
+        write(delta, make_snapshot(START))
+        assert write(delta, make_snapshot(START + timedelta(minutes=4))).empty
+        assert len(write(delta, make_snapshot(START + timedelta(minutes=5)))) == 2
+        assert write(delta, make_snapshot(START + timedelta(minutes=6))).empty
+
+    def test_rows_not_committed_are_selected_again(self):
+        delta = PriceDeltaFilter()
+        delta.filter(make_snapshot(START))
+        assert len(delta.filter(make_snapshot(START + timedelta(minutes=1)))) == 2
+
+
+def test_failed_history_write_is_retried_with_the_next_snapshot():
+    postgres = MagicMock()
+    postgres.store_data.side_effect = [Exception("connection lost"), None, None]
+    writer = PriceHistoryWriter(postgres, delta_filter=PriceDeltaFilter())
+
+    writer.submit(make_snapshot(START))
+    writer.submit(make_snapshot(START + timedelta(minutes=1)))
+    writer.submit(make_snapshot(START + timedelta(minutes=2)))
+    writer.close(timeout=5)
+
+    written = [c.args[0] for c in postgres.store_data.call_args_list]
+    assert [len(rows) for rows in written] == [2, 2]
+
+
+def test_partition_is_ensured_once_per_new_race_date():
+    postgres = MagicMock()
+    ensured = []
+    writer = PriceHistoryWriter(postgres, ensure_partition=ensured.append)
+    today, tomorrow = START.date(), START.date() + timedelta(days=1)
+
+    writer.submit(make_snapshot(START).assign(race_date=today))
+    writer.submit(make_snapshot(START).assign(race_date=[today, tomorrow]))
+    writer.submit(make_snapshot(START).assign(race_date=tomorrow))
+    writer.close(timeout=5)
+
+    assert ensured == [today, tomorrow]
+    assert postgres.store_data.call_count == 3
+
+
+def test_failed_partition_is_retried_and_its_rows_not_written():
+    postgres = MagicMock()
+    ensure = MagicMock(side_effect=[Exception("lock timeout"), None])
+    writer = PriceHistoryWriter(postgres, ensure_partition=ensure)
+
+    writer.submit(make_snapshot(START).assign(race_date=START.date()))
+    writer.submit(make_snapshot(START).assign(race_date=START.date()))
+    writer.close(timeout=5)
+
+    assert ensure.call_count == 2
+    assert postgres.store_data.call_count == 1
@@ -17,16 +17,21 @@ from unittest.mock import MagicMock
 from zoneinfo import ZoneInfo
 
 import pandas as pd
+import pytest
 from trader.reconciliation import (
     AggregatedOrder,
+    BetLogSnapshot,
     ReconciliationResult,
     _aggregate_orders_by_selection,
     calculate_liability,
     get_matched_total_from_log,
     get_selection_type,
+    BET_LOG_UPSERT_QUERY,
+    BET_LOG_UPSERT_STATEMENT,
     is_trader_order,
     reconcile,
     upsert_aggregated_order,
+    upsert_aggregated_orders,
 )
 
 # ============================================================================
@@ -315,12 +320,12 @@ class TestUpsertAggregatedOrder:
         result = upsert_aggregated_order(agg_order, mock_postgres)
 
         assert result is True
-        mock_postgres.execute_query.assert_called_once()
-        call_args = mock_postgres.execute_query.call_args
-        assert "ON CONFLICT" in call_args[0][0]
-        assert "DO UPDATE" in call_args[0][0]
+        mock_postgres.execute_prepared.assert_called_once()
+        query, statement, params = mock_postgres.execute_prepared.call_args[0]
+        assert "ON CONFLICT" in query
+        assert "DO UPDATE" in query
+        assert statement == BET_LOG_UPSERT_STATEMENT
         # Check bet_ids are comma-joined
-        params = call_args[0][1]
         assert params["bet_id"] == "BET-1,BET-2"
 
     def test_returns_false_on_error(self):
@@ -328,7 +333,7 @@ class TestUpsertAggregatedOrder:
         mock_postgres.fetch_data.return_value = pd.DataFrame(
             [{"selection_type": "BACK"}]
         )
-        mock_postgres.execute_query.side_effect = Exception("DB Error")
+        mock_postgres.execute_prepared.side_effect = Exception("DB Error")
 
         agg_order = AggregatedOrder(
             unique_id="sel-123",
@@ -349,6 +354,64 @@ class TestUpsertAggregatedOrder:
         assert result is False
 
 
+def make_agg_order(unique_id: str, **kwargs) -> AggregatedOrder:
+    return AggregatedOrder(
+        unique_id=unique_id,
+        market_id=kwargs.get("market_id", "1.234567890"),
+        selection_id=kwargs.get("selection_id", 12345),
+        side=kwargs.get("side", "BACK"),
+        total_matched=kwargs.get("total_matched", 10.0),
+        total_requested=10.0,
+        weighted_avg_price=3.5,
+        size_cancelled=0.0,
+        bet_ids=["BET-1"],
+        latest_placed_at=None,
+        latest_matched_at=None,
+    )
+
+
+class TestUpsertAggregatedOrders:
+    """Test the batched bet_log upsert."""
+
+    def test_all_rows_in_one_batch(self):
+        mock_postgres = MagicMock()
+        mock_postgres.fetch_data.return_value = pd.DataFrame()
+
+        results = upsert_aggregated_orders(
+            [make_agg_order("sel-1"), make_agg_order("sel-2", side="LAY")],
+            mock_postgres,
+        )
+
+        assert results == {"sel-1": True, "sel-2": True}
+        mock_postgres.execute_prepared_batch.assert_called_once()
+        query, statement, rows = mock_postgres.execute_prepared_batch.call_args[0]
+        assert (query, statement) == (BET_LOG_UPSERT_QUERY, BET_LOG_UPSERT_STATEMENT)
+        assert [row["unique_id"] for row in rows] == ["sel-1", "sel-2"]
+        assert rows[1]["side"] == "LAY"
+        assert rows[1]["selection_type"] == "LAY"
+
+    def test_failed_batch_retries_rows_singly(self):
+        mock_postgres = MagicMock()
+        mock_postgres.fetch_data.return_value = pd.DataFrame()
+        mock_postgres.execute_prepared_batch.side_effect = Exception("batch failed")
+        mock_postgres.execute_prepared.side_effect = [1, Exception("bad row")]
+
+        results = upsert_aggregated_orders(
+            [make_agg_order("sel-1"), make_agg_order("sel-2")], mock_postgres
+        )
+
+        assert results == {"sel-1": True, "sel-2": False}
+        assert [
+            c[0][2]["unique_id"] for c in mock_postgres.execute_prepared.call_args_list
+        ] == ["sel-1", "sel-2"]
+
+    def test_empty_batch_executes_nothing(self):
+        mock_postgres = MagicMock()
+
+        assert upsert_aggregated_orders([], mock_postgres) == {}
+        mock_postgres.execute_prepared_batch.assert_not_called()
+
+
 # ============================================================================
 # HELPER FUNCTION TESTS
 # ============================================================================
@@ -412,6 +475,58 @@ class TestGetMatchedTotalFromLog:
         assert result == 0.0
 
 
+class TestBetLogSnapshot:
+    """Test the per-cycle bet_log snapshot."""
+
+    def make_postgres(self) -> MagicMock:
+        mock_postgres = MagicMock()
+        mock_postgres.fetch_rows.return_value = (
+            ["unique_id", "selection_type", "total_matched", "total_liability"],
+            [("sel-1", "LAY", 25.0, 75.0), ("sel-2", "BACK", 0, 0)],
+        )
+        return mock_postgres
+
+    def test_loads_once_for_many_lookups(self):
+        mock_postgres = self.make_postgres()
+        bet_log = BetLogSnapshot(mock_postgres)
+
+        assert bet_log.matched_total("sel-1") == 25.0
+        assert bet_log.matched_liability("sel-1") == 75.0
+        assert bet_log.matched_total("sel-2") == 0.0
+        assert bet_log.selection_type("sel-1", "BACK") == "LAY"
+
+        mock_postgres.fetch_rows.assert_called_once()
+
+    def test_unknown_selection_uses_defaults(self):
+        bet_log = BetLogSnapshot(self.make_postgres())
+
+        assert bet_log.matched_total("sel-9") == 0.0
+        assert bet_log.selection_type("sel-9", "BACK") == "BACK"
+
+    def test_invalidate_reloads_on_next_lookup(self):
+        mock_postgres = self.make_postgres()
+        bet_log = BetLogSnapshot(mock_postgres)
+
+        bet_log.matched_total("sel-1")
+        bet_log.invalidate()
+        bet_log.matched_total("sel-1")
+
+        assert mock_postgres.fetch_rows.call_count == 2
+
+    def test_load_error_raises_and_is_retried(self):
+        mock_postgres = self.make_postgres()
+        mock_postgres.fetch_rows.side_effect = [
+            Exception("DB Error"),
+            self.make_postgres().fetch_rows.return_value,
+        ]
+        bet_log = BetLogSnapshot(mock_postgres)
+
+        with pytest.raises(Exception, match="DB Error"):
+            bet_log.matched_total("sel-1")
+        assert bet_log.matched_total("sel-1") == 25.0
+        assert mock_postgres.fetch_rows.call_count == 2
+
+
 # ============================================================================
 # RECONCILIATION RESULT TESTS
 # ============================================================================
@@ -488,6 +603,32 @@ class TestReconcile:
         assert result.orders_cancelled == 1
         mock_betfair.trading_client.betting.cancel_orders.assert_called_once()
 
+    def test_refetch_uses_the_stream_once_it_reports_the_cancels(self):
+        mock_betfair = MagicMock()
+        mock_betfair.get_current_orders.side_effect = [
+            [make_executable_order(bet_id="1", unique_id="sel-1", market_id="1.111")],
+            [make_completed_order(bet_id="1", unique_id="sel-1", size_matched=5.0)],
+        ]
+        mock_betfair.wait_for_cancelled_orders.return_value = False
+
+        reconcile(mock_betfair, MagicMock(), customer_refs=["sel-1"])
+
+        mock_betfair.wait_for_cancelled_orders.assert_called_once_with(["1.111"])
+        # Without a settled stream the re-fetch goes to REST
+        assert mock_betfair.get_current_orders.call_args.kwargs["from_stream"] is False
+
+    def test_orders_fetched_once_when_nothing_to_cancel(self):
+        mock_betfair = MagicMock()
+        mock_betfair.get_current_orders.return_value = [
+            make_completed_order(bet_id="1", unique_id="sel-1", size_matched=5.0),
+        ]
+
+        result = reconcile(mock_betfair, MagicMock(), customer_refs=["sel-1"])
+
+        mock_betfair.get_current_orders.assert_called_once()
+        mock_betfair.wait_for_cancelled_orders.assert_not_called()
+        assert len(result.current_orders) == 1
+
     def test_aggregates_completed_orders(self):
         """Completed orders should be aggregated and upserted."""
         mock_betfair = MagicMock()
@@ -506,7 +647,73 @@ class TestReconcile:
 
         # Two orders aggregated into one selection
         assert result.selections_upserted == 1
-        mock_postgres.execute_query.assert_called_once()
+        mock_postgres.execute_prepared_batch.assert_called_once()
+
+    def test_bet_log_snapshot_invalidated_after_upserts(self):
+        mock_betfair = MagicMock()
+        mock_betfair.get_current_orders.return_value = [
+            make_completed_order(bet_id="1", unique_id="sel-1", size_matched=5.0),
+            make_completed_order(bet_id="2", unique_id="sel-2", size_matched=5.0),
+        ]
+        mock_postgres = MagicMock()
+        mock_postgres.fetch_rows.return_value = (
+            ["unique_id", "selection_type", "total_matched", "total_liability"],
+            [("sel-1", "LAY", 0, 0)],
+        )
+        bet_log = BetLogSnapshot(mock_postgres)
+
+        result = reconcile(
+            mock_betfair, mock_postgres, customer_refs=["sel-1"], bet_log=bet_log
+        )
+
+        assert result.selections_upserted == 2
+        # One snapshot query for both selection types, none per selection
+        mock_postgres.fetch_rows.assert_called_once()
+        mock_postgres.fetch_data.assert_not_called()
+        rows = mock_postgres.execute_prepared_batch.call_args.args[2]
+        assert [row["selection_type"] for row in rows] == ["LAY", "BACK"]
+        assert bet_log._totals is None
+
+    def test_snapshot_failure_falls_back_to_per_selection_types(self):
+        mock_betfair = MagicMock()
+        mock_betfair.get_current_orders.return_value = [
+            make_completed_order(bet_id="1", unique_id="sel-1", size_matched=5.0),
+            make_completed_order(bet_id="2", unique_id="sel-2", size_matched=5.0),
+        ]
+        mock_postgres = MagicMock()
+        mock_postgres.fetch_rows.side_effect = Exception("DB Error")
+        mock_postgres.fetch_data.return_value = pd.DataFrame(
+            {"selection_type": ["LAY"]}
+        )
+        bet_log = BetLogSnapshot(mock_postgres)
+
+        result = reconcile(
+            mock_betfair, mock_postgres, customer_refs=["sel-1"], bet_log=bet_log
+        )
+
+        assert result.selections_upserted == 2
+        # The snapshot is tried once, not once per selection
+        mock_postgres.fetch_rows.assert_called_once()
+        assert mock_postgres.fetch_data.call_count == 2
+
+    def test_failed_upserts_counted_per_selection(self):
+        mock_betfair = MagicMock()
+        mock_betfair.get_current_orders.return_value = [
+            make_completed_order(bet_id="1", unique_id="sel-1"),
+            make_completed_order(bet_id="2", unique_id="sel-2"),
+        ]
+        mock_postgres = MagicMock()
+        mock_postgres.fetch_data.return_value = pd.DataFrame()
+        mock_postgres.execute_prepared_batch.side_effect = Exception("batch failed")
+        mock_postgres.execute_prepared.side_effect = [Exception("bad row"), 1]
+
+        result = reconcile(mock_betfair, mock_postgres, customer_refs=["sel-1"])
+
+        assert result.selections_upserted == 1
+        assert result.errors == 1
+        assert result.failed_unique_ids == ["sel-1"]
+        assert result.total_seconds >= result.upsert_seconds > 0
+        assert result.to_dict()["upsert_ms"] >= 0
 
     def test_returns_current_orders(self):
         """Result should include current_orders for reuse."""
@@ -598,8 +805,7 @@ class TestReconciliationEdgeCases:
         upsert_aggregated_order(agg_order, mock_postgres)
 
         # Verify liability = 10 * (4.0 - 1) = 30
-        call_args = mock_postgres.execute_query.call_args
-        params = call_args[0][1]
+        params = mock_postgres.execute_prepared.call_args[0][2]
         assert params["matched_liability"] == 30.0
 
     def test_weighted_average_with_uneven_amounts(self):
@@ -0,0 +1,104 @@
+"""
+Tests for the adaptive price poller.
+
+These tests verify:
+1. Poll intervals follow the time-to-off tiers, one tier faster with selections
+2. A race's markets are always fetched together, soonest race first
+3. Slots are only fetched again once their interval has passed
+4. During a wait, fast slots are polled repeatedly and slow ones at the end
+"""
+
+from datetime import timedelta
+from time import monotonic, sleep
+
+import pytest
+from api_helpers.helpers.time_utils import get_uk_time_now
+from trader.scheduler import AdaptivePricePoller, PollTier, poll_interval
+
+
+def make_poller(start_times, selected=(), tiers=None, default_interval=60):
+    fetched: list[tuple[float, list[str]]] = []
+    poller = AdaptivePricePoller(
+        lambda market_ids: fetched.append((monotonic(), market_ids)),
+        lambda: start_times,
+        lambda: set(selected),
+        **({"tiers": tiers} if tiers else {}),
+        default_interval=default_interval,
+    )
+    return poller, fetched
+
+
+def card(*minutes_to_race: float) -> dict:
+    """WIN and PLACE market per race, ids 1.<race>1 and 1.<race>2."""
+    now = get_uk_time_now()
+    return {
+        f"1.{race}{market}": now + timedelta(minutes=minutes)
+        for race, minutes in enumerate(minutes_to_race)
+        for market in (1, 2)
+    }
+
+
+class TestPollInterval:
+    @pytest.mark.parametrize(
+        "minutes, has_selections, expected",
+        [
+            (1, False, 1),
+            (2, False, 1),
+            (5, False, 5),
+            (30, False, 60),
+            (1, True, 1),
+            (5, True, 1),
+            (30, True, 5),
+        ],
+    )
+    def test_tiers(self, minutes, has_selections, expected):
+        assert poll_interval(minutes, has_selections=has_selections) == expected
+
+
+class TestAdaptivePricePoller:
+    def test_first_poll_fetches_every_race_soonest_first(self):
+        poller, fetched = make_poller(card(30, 5, -1))
+
+        polled = poller.poll()
+
+        assert polled == ["1.11", "1.12", "1.01", "1.02"]
+        assert [ids for _, ids in fetched] == [polled]
+
+    def test_slots_are_due_again_after_their_interval(self):
+        tiers = (PollTier(2, 0.05),)
+        poller, fetched = make_poller(card(1, 30), tiers=tiers, default_interval=10)
+
+        poller.poll()
+        assert poller.poll() == []
+        sleep(0.06)
+
+        assert poller.poll() == ["1.01", "1.02"]
+
+    def test_selections_promote_a_race(self):
+        tiers = (PollTier(2, 0.05), PollTier(10, 10))
+        poller, _ = make_poller(
+            card(5, 5.5), selected={"1.12"}, tiers=tiers, default_interval=60
+        )
+
+        poller.poll()
+        sleep(0.06)
+
+        assert poller.poll() == ["1.11", "1.12"]
+
+    def test_wait_polls_fast_races_and_finishes_slow_ones_last(self):
+        tiers = (PollTier(2, 0.04),)
+        poller, fetched = make_poller(card(1, 30), tiers=tiers, default_interval=60)
+        # Both races were polled before the wait, the slow one long enough ago
+        # to be due by the time the wait ends
+        poller.poll()
+        slow_start = max(poller._last_polled)
+        poller._last_polled[slow_start] -= 59.9
+
+        started = monotonic()
+        poller.poll_until(started + 0.2)
+
+        fast = [t - started for t, ids in fetched[1:] if "1.01" in ids]
+        slow = [t - started for t, ids in fetched[1:] if "1.11" in ids]
+        assert len(fast) >= 3
+        assert len(slow) == 1
+        assert slow[0] > 0.15
@@ -0,0 +1,204 @@
+"""
+Tests for building SelectionState in-process from the price store.
+
+The selection cache replaces v_selection_state, so these tests pin the
+derived columns to the behaviour of the view.
+"""
+
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import pandas as pd
+from trader.models import MarketType, SelectionType
+from trader.price_store import LatestPriceStore
+from trader.selection_cache import (
+    SelectionCache,
+    StakingConfig,
+    build_selection_states,
+)
+
+NOW = datetime(2026, 6, 6, 14, 0)
+
+STAKING = StakingConfig(
+    max_back=40.0,
+    max_lay=60.0,
+    tiers=[(120, 0.5), (30, 0.8), (0, 1.0)],
+)
+
+
+def make_reference_row(**overrides) -> dict:
+    row = {
+        "unique_id": "abc12345678",
+        "race_id": 1,
+        "race_time": NOW + timedelta(minutes=20),
+        "race_date": NOW.date(),
+        "horse_id": 100,
+        "horse_name": "Test Horse",
+        "selection_type": "BACK",
+        "market_type": "WIN",
+        "requested_odds": 3.0,
+        "stake_points": 1.0,
+        "market_id": "1.111",
+        "selection_id": 55,
+        "valid": True,
+        "invalidated_reason": None,
+        "original_runners": 10,
+        "original_price": 3.0,
+        "total_matched": 0.0,
+        "total_liability": 0.0,
+        "bet_count": 0,
+    }
+    row.update(overrides)
+    return row
+
+
+def make_price_row(**overrides) -> dict:
+    row = {
+        "market_id_win": "1.111",
+        "market_id_place": "1.222",
+        "selection_id": 55,
+        "status": "ACTIVE",
+        "back_price_1_win": 3.1,
+        "lay_price_1_win": 3.2,
+        "back_price_1_place": 1.5,
+        "lay_price_1_place": 1.6,
+        "current_runner_count": 10,
+        "created_at": NOW,
+    }
+    row.update(overrides)
+    return row
+
+
+def make_store(*price_rows: dict) -> LatestPriceStore:
+    store = LatestPriceStore()
+    store.update(pd.DataFrame(list(price_rows) or [make_price_row()]))
+    return store
+
+
+class TestPrices:
+    def test_win_selection_uses_win_prices(self):
+        [state] = build_selection_states(
+            [make_reference_row()], STAKING, make_store(), NOW
+        )
+        assert state.current_back_price == 3.1
+        assert state.current_lay_price == 3.2
+        assert state.runner_status == "ACTIVE"
+        assert state.current_runners == 10
+
+    def test_place_selection_uses_place_prices(self):
+        row = make_reference_row(market_type="PLACE", market_id="1.222")
+        [state] = build_selection_states([row], STAKING, make_store(), NOW)
+        assert state.market_type == MarketType.PLACE
+        assert state.current_back_price == 1.5
+        assert state.current_lay_price == 1.6
+
+    def test_latest_snapshot_wins(self):
+        store = make_store()
+        store.update(pd.DataFrame([make_price_row(back_price_1_win=3.5)]))
+        [state] = build_selection_states([make_reference_row()], STAKING, store, NOW)
+        assert state.current_back_price == 3.5
+
+    def test_missing_price_defaults(self):
+        row = make_reference_row(selection_id=999)
+        [state] = build_selection_states([row], STAKING, make_store(), NOW)
+        assert state.current_back_price is None
+        assert state.runner_status == "ACTIVE"
+        assert state.current_runners == 0
+
+
+class TestDerivedFlags:
+    def test_started_races_excluded(self):
+        row = make_reference_row(race_time=NOW - timedelta(minutes=1))
+        assert build_selection_states([row], STAKING, make_store(), NOW) == []
+
+    def test_calculated_stake_uses_tier_for_minutes_to_race(self):
+        far = make_reference_row(race_time=NOW + timedelta(minutes=150))
+        near = make_reference_row(
+            unique_id="near0000000",
+            selection_type="LAY",
+            stake_points=2.0,
+        )
+        far_state, near_state = build_selection_states(
+            [far, near], STAKING, make_store(), NOW
+        )
+        assert far_state.calculated_stake == 20.0
+        assert near_state.selection_type == SelectionType.LAY
+        assert near_state.calculated_stake == 120.0
+
+    def test_place_terms_changed_when_field_drops_below_eight(self):
+        row = make_reference_row(
+            market_type="PLACE", market_id="1.222", original_runners=8
+        )
+        store = make_store(make_price_row(current_runner_count=7))
+        [state] = build_selection_states([row], STAKING, store, NOW)
+        assert state.place_terms_changed is True
+
+    def test_short_price_removed_flags_whole_market(self):
+        store = make_store(
+            make_price_row(),
+            make_price_row(selection_id=66, status="REMOVED", back_price_1_win=4.0),
+        )
+        [state] = build_selection_states([make_reference_row()], STAKING, store, NOW)
+        assert state.short_price_removed is True
+
+    def test_cash_out_requested_on_manual_cash_out(self):
+        row = make_reference_row(
+            valid=False, invalidated_reason="Manual Cash Out", bet_count=1
+        )
+        [state] = build_selection_states([row], STAKING, make_store(), NOW)
+        assert state.cash_out_requested is True
+        assert state.has_bet is True
+
+    def test_stake_limit_uses_liability_for_lay(self):
+        row = make_reference_row(
+            selection_type="LAY", total_matched=10.0, total_liability=61.0
+        )
+        [state] = build_selection_states([row], STAKING, make_store(), NOW)
+        assert state.within_stake_limit is False
+
+
+class TestSelectionCache:
+    def make_postgres(self) -> MagicMock:
+        results = {
+            "live_betting.staking_config": pd.DataFrame(
+                [{"max_back": 40.0, "max_lay": 60.0}]
+            ),
+            "live_betting.staking_tiers": pd.DataFrame(
+                [{"minutes_threshold": 0, "multiplier": 1.0}]
+            ),
+        }
+        reference = make_reference_row(race_time=datetime.max)
+
+        def fetch_data(query: str) -> pd.DataFrame:
+            table = next(t for t in results if f"FROM {t}" in query)
+            return results[table]
+
+        postgres = MagicMock()
+        postgres.fetch_data.side_effect = fetch_data
+        postgres.fetch_rows.return_value = (
+            list(reference),
+            [tuple(reference.values())],
+        )
+        return postgres
+
+    def test_reference_data_is_cached(self):
+        postgres = self.make_postgres()
+        cache = SelectionCache(postgres, make_store(), max_age_seconds=60)
+
+        cache.unique_ids()
+        [state] = cache.selection_states()
+
+        assert state.unique_id == make_reference_row()["unique_id"]
+        assert postgres.fetch_rows.call_count == 1
+        assert postgres.fetch_data.call_count == 2
+
+    def test_invalidate_forces_reload(self):
+        postgres = self.make_postgres()
+        cache = SelectionCache(postgres, make_store(), max_age_seconds=60)
+
+        cache.selection_states()
+        cache.invalidate()
+        cache.selection_states()
+
+        assert postgres.fetch_rows.call_count == 2
+        assert postgres.fetch_data.call_count == 4
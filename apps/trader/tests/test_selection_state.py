@@ -0,0 +1,161 @@
+"""
+Tests for the selection_state table and its consistency checker.
+
+These tests verify:
+1. SelectionCache builds SelectionState from rows of the stored columns
+2. Trader startup stops when the table is not installed
+3. The checker reports each kind of difference
+4. Installing runs the DDL and then rebuilds
+
+test_selection_state_postgres.py runs the SQL against a real database.
+"""
+
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+import pytest
+from trader.models import MarketType, SelectionType
+from trader.price_store import LatestPriceStore
+from trader.selection_cache import SelectionCache
+from trader.selection_state import (
+    CHECK_QUERY,
+    SELECTION_STATE_DDL,
+    STORED_COLUMNS,
+    check_selection_state,
+    install_selection_state,
+    main,
+    require_selection_state,
+)
+
+COLUMNS = STORED_COLUMNS
+
+
+def stored_row(race_time: datetime) -> tuple:
+    """A selection_state row in STORED_COLUMNS order, as the driver returns it."""
+    return (
+        "abc12345678",
+        1,
+        race_time,
+        race_time.date(),
+        100,
+        "Test Horse",
+        "LAY",
+        "PLACE",
+        4.5,
+        2.0,
+        "1.222",
+        55,
+        True,
+        None,
+        9,
+        3.5,
+        12.0,
+        30.0,
+        2,
+    )
+
+
+class TestTraderRead:
+    def make_postgres(self, row: tuple) -> MagicMock:
+        postgres = MagicMock()
+        postgres.fetch_rows.return_value = (list(STORED_COLUMNS), [row])
+        postgres.fetch_data.side_effect = [
+            pd.DataFrame([{"max_back": 40.0, "max_lay": 60.0}]),
+            pd.DataFrame([{"minutes_threshold": 0, "multiplier": 1.0}]),
+        ]
+        return postgres
+
+    def test_cache_builds_states_from_stored_rows(self):
+        race_time = datetime(2100, 6, 6, 14, 0)
+        cache = SelectionCache(
+            self.make_postgres(stored_row(race_time)), LatestPriceStore()
+        )
+
+        [state] = cache.selection_states()
+
+        assert state.unique_id == "abc12345678"
+        assert state.race_time == race_time
+        assert state.selection_type == SelectionType.LAY
+        assert state.market_type == MarketType.PLACE
+        assert state.market_id == "1.222"
+        assert state.original_runners == 9
+        assert state.total_matched == 12.0
+        assert state.total_liability == 30.0
+        assert state.bet_count == 2
+        assert state.calculated_stake == 120.0
+
+    def test_started_races_are_left_out(self):
+        race_time = datetime.now() - timedelta(days=1)
+        cache = SelectionCache(
+            self.make_postgres(stored_row(race_time)), LatestPriceStore()
+        )
+
+        assert cache.selection_states() == []
+        assert cache.unique_ids() == []
+
+    def test_startup_requires_the_table(self):
+        postgres = MagicMock()
+        postgres.fetch_data.return_value = pd.DataFrame([{"installed": False}])
+
+        with pytest.raises(ValueError, match="--install"):
+            require_selection_state(postgres)
+
+        postgres.fetch_data.return_value = pd.DataFrame([{"installed": True}])
+        require_selection_state(postgres)
+
+    def test_no_bind_parameters_in_the_ddl(self):
+        # execute_query runs the DDL through sqlalchemy.text
+        from api_helpers.clients.postgres_channel import positional_parameters
+
+        assert positional_parameters(SELECTION_STATE_DDL)[1] == []
+
+
+class TestChecker:
+    def test_consistent_table(self):
+        postgres = MagicMock()
+        postgres.fetch_data.return_value = pd.DataFrame(
+            columns=["unique_id", "in_table", "in_view", "mismatched"]
+        )
+
+        assert check_selection_state(postgres).empty
+        postgres.fetch_data.assert_called_once_with(CHECK_QUERY)
+
+    def test_differences_are_returned(self):
+        postgres = MagicMock()
+        postgres.fetch_data.return_value = pd.DataFrame(
+            [
+                ("sel-1", True, True, ["total_matched", "bet_count"]),
+                ("sel-2", False, True, COLUMNS),
+                ("sel-3", True, False, COLUMNS),
+            ],
+            columns=["unique_id", "in_table", "in_view", "mismatched"],
+        )
+
+        differences = check_selection_state(postgres)
+
+        assert differences["unique_id"].tolist() == ["sel-1", "sel-2", "sel-3"]
+
+    def test_main_exit_code(self):
+        postgres = MagicMock()
+        postgres.fetch_data.return_value = pd.DataFrame(
+            [("sel-1", True, True, ["valid"])],
+            columns=["unique_id", "in_table", "in_view", "mismatched"],
+        )
+        with patch("api_helpers.clients.get_postgres_client", return_value=postgres):
+            assert main(["--rebuild"]) == 1
+
+        postgres.execute_query.assert_called_once_with(
+            "SELECT live_betting.rebuild_selection_state()"
+        )
+
+
+def test_install_runs_ddl_then_rebuilds():
+    postgres = MagicMock()
+
+    install_selection_state(postgres)
+
+    assert [c.args[0] for c in postgres.execute_query.call_args_list] == [
+        SELECTION_STATE_DDL,
+        "SELECT live_betting.rebuild_selection_state()",
+    ]
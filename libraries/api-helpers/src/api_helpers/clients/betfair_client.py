@@ -1,7 +1,8 @@
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import asdict, dataclass
 from datetime import datetime, timedelta
-from time import sleep
-from typing import List, Literal, Optional
+from time import monotonic, sleep
+from typing import TYPE_CHECKING, Literal, Optional
 
 import betfairlightweight
 import numpy as np
@@ -10,6 +11,9 @@ import requests
 from api_helpers.helpers.logging_config import D, I
 from api_helpers.helpers.time_utils import get_uk_time_now, make_uk_time_aware
 
+if TYPE_CHECKING:
+    from .betfair_stream import StreamCache
+
 MARKET_FILTER = betfairlightweight.filters.market_filter(
     event_type_ids=["7"],
     market_countries=["GB"],
@@ -37,6 +41,87 @@ PRICE_PROJECTION = betfairlightweight.filters.price_projection(
     price_data=betfairlightweight.filters.price_data(ex_all_offers=True)
 )
 
+# Betfair rejects listMarketBook requests whose summed market weight exceeds
+# 200 points, each market costing the weight of its requested price data.
+MAX_REQUEST_WEIGHT = 200
+PRICE_DATA_WEIGHTS = {
+    "SP_AVAILABLE": 3,
+    "SP_TRADED": 7,
+    "EX_BEST_OFFERS": 5,
+    "EX_ALL_OFFERS": 17,
+    "EX_TRADED": 17,
+}
+NO_PRICE_DATA_WEIGHT = 2
+MARKET_BOOK_WORKERS = 8
+
+# Columns of the frame built by BetFairClient._process_combined_market_data
+MARKET_DATA_COLUMNS = [
+    "race_time",
+    "market",
+    "race",
+    "course",
+    "horse",
+    "status",
+    "market_id",
+    "todays_betfair_selection_id",
+    "last_traded_price",
+    "total_matched",
+    "back_price_1",
+    "back_price_1_depth",
+    "back_price_2",
+    "back_price_2_depth",
+    "back_price_3",
+    "back_price_3_depth",
+    "back_price_4",
+    "back_price_4_depth",
+    "back_price_5",
+    "back_price_5_depth",
+    "lay_price_1",
+    "lay_price_1_depth",
+    "lay_price_2",
+    "lay_price_2_depth",
+    "lay_price_3",
+    "lay_price_3_depth",
+    "lay_price_4",
+    "lay_price_4_depth",
+    "lay_price_5",
+    "lay_price_5_depth",
+    "total_matched_event",
+    "percent_back_win_book",
+    "percent_lay_win_book",
+    "market_width",
+]
+
+# Betfair accepts up to 200 instructions in a single placeOrders request
+MAX_PLACE_INSTRUCTIONS = 200
+PLACE_ORDER_WORKERS = 8
+
+# The day's catalogue rarely changes, so it is refetched on this interval or
+# when a market book reports a runner the cached catalogue does not know.
+CATALOGUE_TTL_SECONDS = 300
+
+# How long reconcile waits for the order stream to report cancelled orders
+# before reading current orders over REST instead
+ORDER_STREAM_SETTLE_SECONDS = 2.0
+
+
+def price_projection_weight(price_projection: dict) -> int:
+    """Data weight of a single market requested with the given price projection."""
+    price_data = price_projection.get("priceData") or []
+    if not price_data:
+        return NO_PRICE_DATA_WEIGHT
+    return sum(PRICE_DATA_WEIGHTS[data] for data in price_data)
+
+
+def batch_market_ids(
+    market_ids: list[str], price_projection: dict = PRICE_PROJECTION
+) -> list[list[str]]:
+    """Split market ids into the largest batches that stay within MAX_REQUEST_WEIGHT."""
+    batch_size = max(1, MAX_REQUEST_WEIGHT // price_projection_weight(price_projection))
+    return [
+        market_ids[i : i + batch_size] for i in range(0, len(market_ids), batch_size)
+    ]
+
 
 @dataclass(frozen=True)
 class BetFairCancelOrders:
@@ -76,6 +161,27 @@ class BetFairOrder:
         )
 
 
+def group_orders_for_placement(
+    betfair_orders: list[BetFairOrder | None],
+) -> list[list[int]]:
+    """
+    Group order positions into placeOrders requests.
+
+    customerStrategyRef is set per request rather than per instruction, so
+    orders share a request only when they have the same market and strategy.
+    None entries are left out.
+    """
+    groups: dict[tuple[str, str], list[int]] = {}
+    for index, order in enumerate(betfair_orders):
+        if order is not None:
+            groups.setdefault((order.market_id, order.strategy), []).append(index)
+    return [
+        indexes[i : i + MAX_PLACE_INSTRUCTIONS]
+        for indexes in groups.values()
+        for i in range(0, len(indexes), MAX_PLACE_INSTRUCTIONS)
+    ]
+
+
 @dataclass
 class BetfairCredentials:
     username: str
@@ -131,236 +237,180 @@ class CurrentOrder:
     size: float  # requested size
 
 
-class BetFairCashOut:
-    def cash_out(self, data: pd.DataFrame) -> list[BetFairOrder | None]:
-        cash_out_orders = []
-        for selection in data["selection_id"].unique():
-            selection_df = data[data["selection_id"] == selection]
-            if list(selection_df["selection_type"].unique()) == ["BACK", "LAY"]:
-                cash_out_orders.extend(
-                    self._handle_back_and_lay_matched_bets(selection_df)
-                )
-            elif list(selection_df["selection_type"].unique()) == ["BACK"]:
-                cash_out_orders.extend(
-                    self._handle_single_matched_back_bets(selection_df)
-                )
-            elif list(selection_df["selection_type"].unique()) == ["LAY"]:
-                cash_out_orders.extend(
-                    self._handle_single_matched_lay_bets(selection_df)
-                )
-            else:
-                raise ValueError("Unidentified bet type")
-        return cash_out_orders
-
-    @staticmethod
-    def _create_average_lay_odds(data: pd.DataFrame) -> pd.DataFrame:
-        data = data.assign(
-            ave_lay_odds=(
-                (
-                    (data["lay_price_1"] * data["lay_price_1_depth"])
-                    + (data["lay_price_2"] * data["lay_price_2_depth"])
-                )
-                / (data["lay_price_1_depth"] + data["lay_price_2_depth"])
-            ).round(2),
+def current_order_from_raw(raw: dict) -> CurrentOrder:
+    """CurrentOrder from a listCurrentOrders or order stream order dict."""
+    price_size = raw.get("priceSize", {})
+    return CurrentOrder(
+        bet_id=raw.get("betId", ""),
+        market_id=raw.get("marketId", ""),
+        selection_id=raw.get("selectionId", 0),
+        side=raw.get("side", "BACK"),
+        execution_status=raw.get("status", "EXECUTABLE"),
+        placed_date=raw.get("placedDate"),
+        matched_date=raw.get("matchedDate"),
+        average_price_matched=raw.get("averagePriceMatched", 0.0),
+        customer_strategy_ref=raw.get("customerStrategyRef", "UI") or "UI",
+        size_matched=raw.get("sizeMatched", 0.0),
+        size_remaining=raw.get("sizeRemaining", 0.0),
+        size_lapsed=raw.get("sizeLapsed", 0.0),
+        size_cancelled=raw.get("sizeCancelled", 0.0),
+        size_voided=raw.get("sizeVoided", 0.0),
+        price=price_size.get("price", 0.0),
+        size=price_size.get("size", 0.0),
+    )
+
+
+# Hedges of this size or less are not placed
+CASH_OUT_MIN_STAKE = 2.0
+
+
+def _average_price(
+    price_1: np.ndarray, depth_1: np.ndarray, price_2: np.ndarray, depth_2: np.ndarray
+) -> np.ndarray:
+    """Depth-weighted average of the best two prices, to 2dp (NaN with no depth)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.round(
+            (price_1 * depth_1 + price_2 * depth_2) / (depth_1 + depth_2), 2
         )
-        return data
 
-    @staticmethod
-    def _create_average_back_odds(data: pd.DataFrame) -> pd.DataFrame:
-        data = data.assign(
-            ave_back_odds=(
-                (
-                    (data["back_price_1"] * data["back_price_1_depth"])
-                    + (data["back_price_2"] * data["back_price_2_depth"])
-                )
-                / (data["back_price_1_depth"] + data["back_price_2_depth"])
-            ).round(2),
-        )
-        return data
 
-    @staticmethod
-    def _create_cash_out_odds(data: pd.DataFrame) -> pd.DataFrame:
-        if "ave_back_odds" in data.columns and "ave_lay_odds" in data.columns:
-            return data.assign(
-                cash_out_odds=np.where(
-                    data["selection_type"] == "BACK",
-                    data["ave_back_odds"],
-                    data["ave_lay_odds"],
-                )
-            )
-        elif "ave_back_odds" not in data.columns and "ave_lay_odds" in data.columns:
-            return data.assign(cash_out_odds=data["ave_lay_odds"])
-        elif "ave_back_odds" in data.columns and "ave_lay_odds" not in data.columns:
-            return data.assign(cash_out_odds=data["ave_back_odds"])
-        else:
-            raise ValueError("No average odds found")
+def _pair_rows(
+    positions: np.ndarray, back_rows: np.ndarray, lay_rows: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """Every (back row, lay row) of the same position, in back row order."""
+    lay_rows = lay_rows[np.argsort(positions[lay_rows], kind="stable")]
+    lay_positions = positions[lay_rows]
+    start = np.searchsorted(lay_positions, positions[back_rows], side="left")
+    counts = np.searchsorted(lay_positions, positions[back_rows], side="right") - start
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(back_rows, counts), lay_rows[np.repeat(start, counts) + offsets]
 
-    @staticmethod
-    def _merge_back_and_lay_data(data: pd.DataFrame) -> pd.DataFrame:
-        return pd.merge(
-            data[data["selection_type"] == "BACK"][
-                [
-                    "market_id",
-                    "selection_id",
-                    "back_price_2",
-                    "average_price_matched",
-                    "size_matched",
-                    "cash_out_odds",
-                ]
-            ],
-            data[data["selection_type"] == "LAY"][
-                [
-                    "market_id",
-                    "selection_id",
-                    "lay_price_2",
-                    "average_price_matched",
-                    "size_matched",
-                    "cash_out_odds",
-                ]
-            ],
-            on=[
-                "market_id",
-                "selection_id",
-            ],
-            how="left",
-            suffixes=["_back", "_lay"],
-        )
 
-    @staticmethod
-    def _create_bet_side(data: pd.DataFrame) -> pd.DataFrame:
-        return data.assign(
-            lay_liability=(
-                (data["average_price_matched_lay"] - 1) * data["size_matched_lay"]
-            )
-            - data["size_matched_back"],
-            back_winnings=(
-                (data["average_price_matched_back"] - 1) * data["size_matched_back"]
-            )
-            - data["size_matched_lay"],
-            risk_diff=lambda x: x["back_winnings"] - x["lay_liability"],
-            cash_out_selection_type=lambda x: np.where(
-                x["risk_diff"] > 0, "LAY", "BACK"
-            ),
-        ).drop(columns=["risk_diff", "lay_liability", "back_winnings"])
+class BetFairCashOut:
+    """
+    Orders that green up matched positions.
+
+    Each row of the frame from fetch_cash_out_data is one side of one
+    runner's matched position in a market, with the runner's current best
+    two prices each side. A position matched on one side is hedged on the
+    other at the second-best price, staked against the depth-weighted
+    average of the best two; one matched on both sides is hedged on the
+    side that evens out its win and lose outcomes. Stakes, prices and sides
+    are computed for every row at once as NumPy arrays, and only orders
+    above CASH_OUT_MIN_STAKE are returned.
+    """
 
-    @staticmethod
-    def _alternate_bet_side(data: pd.DataFrame) -> pd.DataFrame:
-        return data.assign(
-            cash_out_selection_type=np.where(
-                data["selection_type"] == "LAY", "BACK", "LAY"
-            ),
+    def cash_out(self, data: pd.DataFrame) -> list[BetFairOrder]:
+        if data.empty:
+            return []
+        sides = data["selection_type"].to_numpy()
+        is_back = sides == "BACK"
+        if not np.all(is_back | (sides == "LAY")):
+            raise ValueError("Unidentified bet type")
+
+        def column(name: str) -> np.ndarray:
+            return data[name].to_numpy(dtype=float)
+
+        matched_price = column("average_price_matched")
+        matched_size = column("size_matched")
+        back_price_2 = column("back_price_2")
+        lay_price_2 = column("lay_price_2")
+        average_back = _average_price(
+            column("back_price_1"),
+            column("back_price_1_depth"),
+            back_price_2,
+            column("back_price_2_depth"),
+        )
+        average_lay = _average_price(
+            column("lay_price_1"),
+            column("lay_price_1_depth"),
+            lay_price_2,
+            column("lay_price_2_depth"),
         )
 
-    @staticmethod
-    def _get_cash_out_stake_back_and_lay(data: pd.DataFrame) -> pd.DataFrame:
-        return data.assign(
-            cash_out_stake=np.select(
-                [
-                    data["cash_out_selection_type"] == "LAY",
-                    data["cash_out_selection_type"] == "BACK",
-                ],
-                [
+        # A position is one runner in one market
+        positions = (
+            data.groupby(["market_id", "selection_id"], sort=False, dropna=False)
+            .ngroup()
+            .to_numpy()
+        )
+        backed = np.bincount(positions, weights=is_back) > 0
+        laid = np.bincount(positions, weights=~is_back) > 0
+        both_sides = (backed & laid)[positions]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Matched on one side: hedge the whole stake on the other
+            single = np.flatnonzero(~both_sides)
+            single_back = is_back[single]
+            single_stake = np.round(
+                matched_size[single]
+                * matched_price[single]
+                / np.where(single_back, average_lay[single], average_back[single]),
+                2,
+            )
+            single_price = np.where(
+                single_back, lay_price_2[single], back_price_2[single]
+            )
+            single_side = np.where(single_back, "LAY", "BACK")
+
+            # Matched on both sides: hedge the difference on the side that
+            # wins more, from each back row paired with its lay row
+            back, lay = _pair_rows(
+                positions,
+                np.flatnonzero(both_sides & is_back),
+                np.flatnonzero(both_sides & ~is_back),
+            )
+            back_profit = matched_size[back] * (matched_price[back] - 1)
+            lay_loss = matched_size[lay] * (matched_price[lay] - 1)
+            hedge_lay = (back_profit - matched_size[lay]) - (
+                lay_loss - matched_size[back]
+            ) > 0
+            paired_stake = np.where(
+                hedge_lay,
+                np.round(
                     (
-                        (
-                            (
-                                data["size_matched_back"]
-                                * (data["average_price_matched_back"] - 1)
-                                - data["size_matched_lay"]
-                                * (data["average_price_matched_lay"] - 1)
-                            )
-                            + (data["size_matched_back"] - data["size_matched_lay"])
-                        )
-                        / data["cash_out_odds_lay"]
-                    ).round(2),
+                        (back_profit - lay_loss)
+                        + (matched_size[back] - matched_size[lay])
+                    )
+                    / average_lay[lay],
+                    2,
+                ),
+                np.round(
                     (
-                        (
-                            (
-                                data["size_matched_lay"]
-                                * (data["average_price_matched_lay"] - 1)
-                                - data["size_matched_back"]
-                                * (data["average_price_matched_back"] - 1)
-                            )
-                            + (data["size_matched_lay"] - data["size_matched_back"])
-                        )
-                        / data["cash_out_odds_back"]
-                    ).round(2),
-                ],
-                default=np.nan,
-            ),
-        )
+                        (lay_loss - back_profit)
+                        + (matched_size[lay] - matched_size[back])
+                    )
+                    / average_back[back],
+                    2,
+                ),
+            )
+            paired_price = np.where(hedge_lay, lay_price_2[lay], back_price_2[back])
+            paired_side = np.where(hedge_lay, "LAY", "BACK")
 
-    @staticmethod
-    def _get_cash_out_stake(data: pd.DataFrame) -> pd.DataFrame:
-        return data.assign(
-            cash_out_stake=(
-                (data["size_matched"] * data["average_price_matched"])
-                / data["cash_out_odds"]
-            ).round(2),
-        )
+        rows = np.concatenate([single, back])
+        stakes = np.concatenate([single_stake, paired_stake])
+        prices = np.concatenate([single_price, paired_price])
+        hedge_sides = np.concatenate([single_side, paired_side])
 
-    @staticmethod
-    def _get_cash_out_odds(data: pd.DataFrame) -> pd.DataFrame:
-        return data.assign(
-            cash_out_odds=np.select(
-                [
-                    data["cash_out_selection_type"] == "LAY",
-                    data["cash_out_selection_type"] == "BACK",
-                ],
-                [data["lay_price_2"], data["back_price_2"]],
-                default=np.nan,
-            ),
-        )
+        # Runners in the order they first appear, then by row
+        runner_order = pd.factorize(data["selection_id"])[0]
+        order = np.lexsort((rows, runner_order[rows]))
+        order = order[stakes[order] > CASH_OUT_MIN_STAKE]
 
-    @staticmethod
-    def _create_bet_orders(data: pd.DataFrame) -> List[BetFairOrder]:
-        data = data[data["cash_out_stake"] > 2]
+        market_ids = data["market_id"].to_numpy()
+        selection_ids = data["selection_id"].to_numpy()
         return [
             BetFairOrder(
-                size=float(data_dict["cash_out_stake"]),
-                price=float(data_dict["cash_out_odds"]),
-                selection_id=str(data_dict["selection_id"]),
-                market_id=str(data_dict["market_id"]),
-                side=str(data_dict["cash_out_selection_type"]),
+                size=float(stakes[i]),
+                price=float(prices[i]),
+                selection_id=str(selection_ids[rows[i]]),
+                market_id=str(market_ids[rows[i]]),
+                side=str(hedge_sides[i]),
                 strategy="cash_out",
             )
-            for data_dict in data.to_dict("records")
+            for i in order
         ]
 
-    @staticmethod
-    def _handle_back_and_lay_matched_bets(data: pd.DataFrame) -> BetFairOrder:
-        return (
-            data.pipe(BetFairCashOut._create_average_back_odds)
-            .pipe(BetFairCashOut._create_average_lay_odds)
-            .pipe(BetFairCashOut._create_cash_out_odds)
-            .pipe(BetFairCashOut._merge_back_and_lay_data)
-            .pipe(BetFairCashOut._create_bet_side)
-            .pipe(BetFairCashOut._get_cash_out_stake_back_and_lay)
-            .pipe(BetFairCashOut._get_cash_out_odds)
-            .pipe(BetFairCashOut._create_bet_orders)
-        )
-
-    @staticmethod
-    def _handle_single_matched_back_bets(data: pd.DataFrame) -> BetFairOrder:
-        return (
-            data.pipe(BetFairCashOut._create_average_lay_odds)
-            .pipe(BetFairCashOut._create_cash_out_odds)
-            .pipe(BetFairCashOut._alternate_bet_side)
-            .pipe(BetFairCashOut._get_cash_out_stake)
-            .pipe(BetFairCashOut._get_cash_out_odds)
-            .pipe(BetFairCashOut._create_bet_orders)
-        )
-
-    @staticmethod
-    def _handle_single_matched_lay_bets(data: pd.DataFrame) -> BetFairOrder:
-        return (
-            data.pipe(BetFairCashOut._create_average_back_odds)
-            .pipe(BetFairCashOut._create_cash_out_odds)
-            .pipe(BetFairCashOut._alternate_bet_side)
-            .pipe(BetFairCashOut._get_cash_out_stake)
-            .pipe(BetFairCashOut._get_cash_out_odds)
-            .pipe(BetFairCashOut._create_bet_orders)
-        )
-
 
 class BetFairClient:
     """
@@ -368,11 +418,24 @@ class BetFairClient:
     """
 
     def __init__(
-        self, credentials: BetfairCredentials, betfair_cash_out: BetFairCashOut
+        self,
+        credentials: BetfairCredentials,
+        betfair_cash_out: BetFairCashOut,
+        market_book_workers: int = MARKET_BOOK_WORKERS,
+        catalogue_ttl_seconds: float = CATALOGUE_TTL_SECONDS,
+        place_order_workers: int = PLACE_ORDER_WORKERS,
     ):
         self.credentials = credentials
         self.betfair_cash_out = betfair_cash_out
+        self.market_book_workers = market_book_workers
+        self.place_order_workers = place_order_workers
+        self.catalogue_ttl_seconds = catalogue_ttl_seconds
         self.trading_client: betfairlightweight.APIClient | None = None
+        # Market books and orders are read from here while its streams are live
+        self.stream_cache: "StreamCache | None" = None
+        self._catalogue_markets: list | None = None
+        self._catalogue_runners: dict[int, str] = {}
+        self._catalogue_fetched_at: float = 0.0
 
     def login(self):
         if self.trading_client is None or self.trading_client.session_expired:
@@ -396,10 +459,21 @@ class BetFairClient:
             self.trading_client.logout()
             I("Logged out of Betfair")
 
-    def create_market_data(self) -> pd.DataFrame:
+    def create_market_data(self, market_ids: list[str] | None = None) -> pd.DataFrame:
+        """
+        Price data for today's card, or only for market_ids when given.
+
+        Markets come from the cached catalogue either way, so polling a few
+        markets costs no more than their market book requests.
+        """
         self.check_session()
         markets, runners = self._create_markets_and_runners()
-        return self._process_combined_market_data(markets, runners)
+        if market_ids is not None:
+            wanted = set(market_ids)
+            markets = [market for market in markets if market.market_id in wanted]
+        return self._process_combined_market_data(
+            markets, runners, from_catalogue_cache=True
+        )
 
     def _get_single_race_markets(self, market_ids: list[str]):
         self.check_session()
@@ -471,8 +545,24 @@ class BetFairClient:
         )
         return data[data["runner_status"] == "ACTIVE"]
 
-    def _create_markets_and_runners(self):
+    def _create_markets_and_runners(self, force_refresh: bool = False):
+        """
+        Return the day's markets and runner-name map from the catalogue cache.
+
+        The catalogue is only downloaded when the cache is empty, older than
+        catalogue_ttl_seconds, or force_refresh is set.
+        """
         self.check_session()
+        cache_age = monotonic() - self._catalogue_fetched_at
+        if (
+            force_refresh
+            or self._catalogue_markets is None
+            or cache_age >= self.catalogue_ttl_seconds
+        ):
+            self._refresh_catalogue()
+        return self._catalogue_markets, self._catalogue_runners
+
+    def _refresh_catalogue(self) -> None:
         markets = self.trading_client.betting.list_market_catalogue(
             filter=MARKET_FILTER,
             market_projection=MARKET_PROJECTION,
@@ -483,8 +573,23 @@ class BetFairClient:
             for market in markets
             for runner in market.runners
         }
+        D(f"Catalogue refreshed: {len(markets)} markets, {len(runners)} runners")
+        self._catalogue_markets = markets
+        self._catalogue_runners = runners
+        self._catalogue_fetched_at = monotonic()
 
-        return markets, runners
+    def invalidate_catalogue(self) -> None:
+        """Force the next catalogue read to download a fresh copy."""
+        self._catalogue_markets = None
+
+    def get_market_start_times(self) -> dict[str, datetime]:
+        """UK start time of each market in the cached catalogue."""
+        self.check_session()
+        markets, _ = self._create_markets_and_runners()
+        return {
+            market.market_id: make_uk_time_aware(market.market_start_time)
+            for market in markets
+        }
 
     def get_min_and_max_race_times(self) -> tuple[datetime, datetime]:
         self.check_session()
@@ -496,19 +601,71 @@ class BetFairClient:
             max(start_times)
         )
 
-    def _process_combined_market_data(self, markets, runners) -> pd.DataFrame:
-        self.check_session()
-        combined_data = []
+    def _list_market_books(self, market_ids: list[str]) -> dict:
+        """
+        Fetch market books for many markets in weight-limited batches.
 
-        for market in markets:
-            uk_now = get_uk_time_now()
-            if make_uk_time_aware(market.market_start_time) <= uk_now:
-                continue
+        Batches are requested concurrently, so a full card costs a handful of
+        round trips in parallel rather than one sequential call per market.
+        Markets held by a live stream_cache are read from it instead.
 
-            market_book = self.trading_client.betting.list_market_book(
-                market_ids=[market.market_id],
+        Returns:
+            Dict mapping market_id to the list of books returned for it
+        """
+        streamed: dict[str, list] = {}
+        if self.stream_cache is not None and self.stream_cache.markets_live:
+            streamed = self.stream_cache.market_books(market_ids)
+            market_ids = [m for m in market_ids if m not in streamed]
+
+        batches = batch_market_ids(market_ids, PRICE_PROJECTION)
+        if not batches:
+            return streamed
+
+        def fetch_batch(batch: list[str]):
+            return self.trading_client.betting.list_market_book(
+                market_ids=batch,
                 price_projection=PRICE_PROJECTION,
             )
+
+        workers = max(1, min(self.market_book_workers, len(batches)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            batch_books = list(executor.map(fetch_batch, batches))
+
+        D(f"Fetched {len(market_ids)} market books in {len(batches)} requests")
+        books_by_market: dict[str, list] = dict(streamed)
+        for books in batch_books:
+            for book in books:
+                books_by_market.setdefault(book.market_id, []).append(book)
+        return books_by_market
+
+    @staticmethod
+    def _has_unknown_runners(market_books: dict, runners: dict[int, str]) -> bool:
+        return any(
+            runner.selection_id not in runners
+            for books in market_books.values()
+            for book in books
+            for runner in book.runners
+        )
+
+    def _process_combined_market_data(
+        self, markets, runners, from_catalogue_cache: bool = False
+    ) -> pd.DataFrame:
+        self.check_session()
+        combined_data = []
+
+        uk_now = get_uk_time_now()
+        markets = [
+            market
+            for market in markets
+            if make_uk_time_aware(market.market_start_time) > uk_now
+        ]
+        market_books = self._list_market_books([market.market_id for market in markets])
+        if from_catalogue_cache and self._has_unknown_runners(market_books, runners):
+            I("Market book reported unknown runners, refreshing catalogue")
+            _, runners = self._create_markets_and_runners(force_refresh=True)
+
+        for market in markets:
+            market_book = market_books.get(market.market_id, [])
             market_type = market.description.market_type
 
             for book in market_book:
@@ -541,6 +698,9 @@ class BetFairClient:
 
                     combined_data.append(runner_data)
 
+        if not combined_data:
+            return pd.DataFrame(columns=MARKET_DATA_COLUMNS)
+
         data = pd.DataFrame(combined_data)
 
         data["total_matched_event"] = (
@@ -569,44 +729,8 @@ class BetFairClient:
             data["percent_back_win_book"] - data["percent_lay_win_book"]
         )
 
-        return data[
-            [
-                "race_time",
-                "market",
-                "race",
-                "course",
-                "horse",
-                "status",
-                "market_id",
-                "todays_betfair_selection_id",
-                "last_traded_price",
-                "total_matched",
-                "back_price_1",
-                "back_price_1_depth",
-                "back_price_2",
-                "back_price_2_depth",
-                "back_price_3",
-                "back_price_3_depth",
-                "back_price_4",
-                "back_price_4_depth",
-                "back_price_5",
-                "back_price_5_depth",
-                "lay_price_1",
-                "lay_price_1_depth",
-                "lay_price_2",
-                "lay_price_2_depth",
-                "lay_price_3",
-                "lay_price_3_depth",
-                "lay_price_4",
-                "lay_price_4_depth",
-                "lay_price_5",
-                "lay_price_5_depth",
-                "total_matched_event",
-                "percent_back_win_book",
-                "percent_lay_win_book",
-                "market_width",
-            ]
-        ]
+        # Thin markets offer fewer than five levels; missing ones are NaN
+        return data.reindex(columns=MARKET_DATA_COLUMNS)
 
     def place_order(
         self,
@@ -625,28 +749,47 @@ class BetFairClient:
         Returns:
             OrderResult: Contains success status, message, response data, bet_id, and matching info
         """
+        return self._place_order_request([betfair_order], max_retries, retry_delay)[0]
+
+    def _place_order_request(
+        self,
+        betfair_orders: list[BetFairOrder],
+        max_retries: int = 3,
+        retry_delay: float = 1.0,
+    ) -> list[OrderResult]:
+        """
+        Send orders for one market and strategy as a single placeOrders request.
+
+        Network failures retry the whole request with the same backoff as a
+        single order. Returns one OrderResult per order, in the order given.
+        """
+
+        def failed(message: str) -> list[OrderResult]:
+            return [OrderResult(success=False, message=message) for _ in betfair_orders]
 
         for attempt in range(max_retries + 1):
             try:
                 self.check_session()
                 D(
-                    f"Placing order (attempt {attempt + 1}/{max_retries + 1}) - {betfair_order}"
+                    f"Placing {len(betfair_orders)} order(s) "
+                    f"(attempt {attempt + 1}/{max_retries + 1}) - {betfair_orders}"
                 )
 
                 response = self.trading_client.betting.place_orders(
-                    market_id=betfair_order.market_id,
-                    customer_strategy_ref=betfair_order.strategy,
+                    market_id=betfair_orders[0].market_id,
+                    customer_strategy_ref=betfair_orders[0].strategy,
                     instructions=[
                         {
                             "orderType": "LIMIT",
-                            "selectionId": betfair_order.selection_id,
-                            "side": betfair_order.side,
+                            "selectionId": order.selection_id,
+                            "side": order.side,
                             "limitOrder": {
-                                "price": betfair_order.price,
+                                "price": order.price,
                                 "persistenceType": "LAPSE",
-                                "size": betfair_order.size,
+                                "size": order.size,
                             },
                         }
+                        for order in betfair_orders
                     ],
                 )
 
@@ -655,35 +798,14 @@ class BetFairClient:
                     if hasattr(response, "__dict__")
                     else str(response)
                 )
+                instruction_reports = response_dict["_data"]["instructionReports"]
 
-                size_matched = response_dict["_data"]["instructionReports"][0][
-                    "sizeMatched"
+                results = [
+                    self._order_result(order, report)
+                    for order, report in zip(betfair_orders, instruction_reports)
                 ]
-                average_price_matched = response_dict["_data"]["instructionReports"][0][
-                    "averagePriceMatched"
-                ]
-
-                # Log order summary
-                match_status = (
-                    "MATCHED"
-                    if size_matched == betfair_order.size
-                    else (
-                        f"PARTIAL {size_matched}/{betfair_order.size}"
-                        if size_matched > 0
-                        else "UNMATCHED"
-                    )
-                )
-                I(
-                    f"ORDER {betfair_order.side} £{betfair_order.size:.2f} @ {betfair_order.price} "
-                    f"[{betfair_order.strategy}] -> {match_status}"
-                    + (f" @ {average_price_matched}" if size_matched > 0 else "")
-                )
-
-                return OrderResult(
-                    success=True,
-                    message="Order placed successfully",
-                    size_matched=size_matched,
-                    average_price_matched=average_price_matched,
+                return (
+                    results + failed("No instruction report returned")[len(results) :]
                 )
 
             except (
@@ -698,19 +820,50 @@ class BetFairClient:
                     retry_delay *= 1.5  # Exponential backoff
                     continue
                 else:
-                    return OrderResult(
-                        success=False,
-                        message=f"Failed after {max_retries + 1} attempts due to network error: {network_error}",
+                    return failed(
+                        f"Failed after {max_retries + 1} attempts due to network error: {network_error}"
                     )
 
             except Exception as e:
                 error_msg = f"Unexpected error placing order: {e}"
                 I(error_msg)
-                return OrderResult(success=False, message=error_msg)
+                return failed(error_msg)
 
         # This should never be reached, but just in case
+        return failed("Order placement failed for unknown reason")
+
+    @staticmethod
+    def _order_result(betfair_order: BetFairOrder, report: dict) -> OrderResult:
+        """Build the OrderResult for one instruction report of a placeOrders response."""
+        if report.get("status", "SUCCESS") != "SUCCESS":
+            error_msg = f"Order rejected: {report.get('errorCode')}"
+            I(f"ORDER {betfair_order.side} [{betfair_order.strategy}] {error_msg}")
+            return OrderResult(success=False, message=error_msg)
+
+        size_matched = report["sizeMatched"]
+        average_price_matched = report["averagePriceMatched"]
+
+        # Log order summary
+        match_status = (
+            "MATCHED"
+            if size_matched == betfair_order.size
+            else (
+                f"PARTIAL {size_matched}/{betfair_order.size}"
+                if size_matched > 0
+                else "UNMATCHED"
+            )
+        )
+        I(
+            f"ORDER {betfair_order.side} £{betfair_order.size:.2f} @ {betfair_order.price} "
+            f"[{betfair_order.strategy}] -> {match_status}"
+            + (f" @ {average_price_matched}" if size_matched > 0 else "")
+        )
+
         return OrderResult(
-            success=False, message="Order placement failed for unknown reason"
+            success=True,
+            message="Order placed successfully",
+            size_matched=size_matched,
+            average_price_matched=average_price_matched,
         )
 
     def place_order_immediate(
@@ -752,28 +905,97 @@ class BetFairClient:
         # The result already has the matched amount from the place response
         return result
 
-    def place_orders(self, betfair_orders: list[BetFairOrder]) -> list[OrderResult]:
-        self.check_session()
-        orders = []
-        for order in betfair_orders:
-            result = self.place_order(order)
-            orders.append(result)
-        return orders
+    def place_orders(
+        self,
+        betfair_orders: list[BetFairOrder | None],
+        max_retries: int = 3,
+        retry_delay: float = 1.0,
+    ) -> list[OrderResult]:
+        """
+        Place many orders with one placeOrders request per market and strategy.
+
+        Requests are sent concurrently, so a cycle's orders reach the exchange
+        in roughly one round trip instead of one round trip per order. Each
+        request retries network failures like place_order.
+
+        Returns:
+            One OrderResult per order, in the order given. None entries get a
+            failed result without a request.
+        """
+        return self._place_order_groups(betfair_orders, max_retries, retry_delay)
 
     def place_orders_immediate(
-        self, betfair_orders: list[BetFairOrder]
+        self,
+        betfair_orders: list[BetFairOrder | None],
+        max_retries: int = 3,
+        retry_delay: float = 1.0,
     ) -> list[OrderResult]:
         """
         Place multiple orders and immediately cancel any unmatched portions.
 
-        Fill-or-kill style for multiple orders.
+        Fill-or-kill style for multiple orders. Markets are handled
+        concurrently; within a market the requests are placed in turn and
+        the unmatched remainder is cancelled once they have all been sent.
         """
+        return self._place_order_groups(
+            betfair_orders, max_retries, retry_delay, fill_or_kill=True
+        )
+
+    def _place_order_groups(
+        self,
+        betfair_orders: list[BetFairOrder | None],
+        max_retries: int,
+        retry_delay: float,
+        fill_or_kill: bool = False,
+    ) -> list[OrderResult]:
+        results: list[OrderResult] = [
+            OrderResult(success=False, message="No order to place")
+            for _ in betfair_orders
+        ]
+        requests_to_send = group_orders_for_placement(betfair_orders)
+        if not requests_to_send:
+            return results
+
+        if fill_or_kill:
+            # Cancelling is per market, so a market's requests share one task
+            by_market: dict[str, list[list[int]]] = {}
+            for indexes in requests_to_send:
+                market_id = betfair_orders[indexes[0]].market_id
+                by_market.setdefault(market_id, []).append(indexes)
+            tasks = list(by_market.values())
+        else:
+            tasks = [[indexes] for indexes in requests_to_send]
+
+        def run_task(task: list[list[int]]) -> list[tuple[int, OrderResult]]:
+            placed = []
+            for indexes in task:
+                orders = [betfair_orders[i] for i in indexes]
+                placed.extend(
+                    zip(
+                        indexes,
+                        self._place_order_request(orders, max_retries, retry_delay),
+                    )
+                )
+            if fill_or_kill and any(result.success for _, result in placed):
+                market_id = betfair_orders[task[0][0]].market_id
+                try:
+                    self.trading_client.betting.cancel_orders(market_id=market_id)
+                    I(
+                        f"Cancelled unmatched orders for market {market_id} (fill-or-kill)"
+                    )
+                except Exception as e:
+                    I(f"Error cancelling unmatched orders: {e}")
+            return placed
+
         self.check_session()
-        orders = []
-        for order in betfair_orders:
-            result = self.place_order_immediate(order)
-            orders.append(result)
-        return orders
+        workers = max(1, min(self.place_order_workers, len(tasks)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for placed in executor.map(run_task, tasks):
+                for index, result in placed:
+                    results[index] = result
+
+        D(f"Placed {len(betfair_orders)} orders in {len(requests_to_send)} requests")
+        return results
 
     def cancel_orders(self, betfair_cancel_orders: BetFairCancelOrders):
         self.check_session()
@@ -792,9 +1014,13 @@ class BetFairClient:
         self,
         customer_strategy_refs: Optional[list[str]] = [],
         today_only: bool = True,
+        from_stream: bool = True,
     ) -> list[CurrentOrder]:
         """Get current orders from Betfair.
 
+        While the order stream of stream_cache is live the orders are read
+        from it without a request, unless from_stream is False.
+
         Args:
             market_ids: Optional list of market IDs to filter by (client-side filtering).
             date_from: Optional datetime to filter orders from (inclusive).
@@ -803,16 +1029,23 @@ class BetFairClient:
                         Set to False to get all historical orders.
             customer_strategy_refs: Optional list of strategy refs to filter by
                                     (API-level filtering, e.g. ["PLACE_SIM", "WIN_SIM"]).
+            from_stream: Read from a live order stream when one is attached.
 
         Returns:
             List of CurrentOrder dataclasses.
         """
+        today_midnight: datetime = datetime.now().replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        if from_stream and self.stream_cache is not None:
+            if self.stream_cache.orders_live:
+                return self.stream_cache.current_orders(
+                    customer_strategy_refs,
+                    placed_since=today_midnight if today_only else None,
+                )
         self.check_session()
 
         if today_only:
-            today_midnight: datetime = datetime.now().replace(
-                hour=0, minute=0, second=0, microsecond=0
-            )
             last_minute_today: datetime = datetime.now().replace(
                 hour=23, minute=59, second=0, microsecond=0
             )
@@ -828,31 +1061,28 @@ class BetFairClient:
         if not raw_orders:
             return []
 
-        orders = []
-        for raw in raw_orders:
-            price_size = raw.get("priceSize", {})
-            orders.append(
-                CurrentOrder(
-                    bet_id=raw.get("betId", ""),
-                    market_id=raw.get("marketId", ""),
-                    selection_id=raw.get("selectionId", 0),
-                    side=raw.get("side", "BACK"),
-                    execution_status=raw.get("status", "EXECUTABLE"),
-                    placed_date=raw.get("placedDate"),
-                    matched_date=raw.get("matchedDate"),
-                    average_price_matched=raw.get("averagePriceMatched", 0.0),
-                    customer_strategy_ref=raw.get("customerStrategyRef", "UI") or "UI",
-                    size_matched=raw.get("sizeMatched", 0.0),
-                    size_remaining=raw.get("sizeRemaining", 0.0),
-                    size_lapsed=raw.get("sizeLapsed", 0.0),
-                    size_cancelled=raw.get("sizeCancelled", 0.0),
-                    size_voided=raw.get("sizeVoided", 0.0),
-                    price=price_size.get("price", 0.0),
-                    size=price_size.get("size", 0.0),
-                )
-            )
+        return [current_order_from_raw(raw) for raw in raw_orders]
+
+    def wait_for_cancelled_orders(
+        self, market_ids: list[str], timeout: float = ORDER_STREAM_SETTLE_SECONDS
+    ) -> bool:
+        """
+        Wait for the order stream to show no executable orders in market_ids.
 
-        return orders
+        Returns:
+            True once the stream shows them settled, False on timeout or when
+            no order stream is live, in which case read orders over REST.
+        """
+        if self.stream_cache is None or not self.stream_cache.orders_live:
+            return False
+        wanted = set(market_ids)
+        return self.stream_cache.wait_for_orders(
+            lambda orders: not any(
+                o.execution_status == "EXECUTABLE" and o.market_id in wanted
+                for o in orders
+            ),
+            timeout,
+        )
 
     def get_current_orders_with_market_data(self):
         orders: list[CurrentOrder] = self.get_current_orders()
@@ -868,7 +1098,11 @@ class BetFairClient:
 
     def get_matched_orders(self, market_ids: list[str] = None):
         self.cancel_orders(BetFairCancelOrders(market_ids=market_ids))
-        orders = self.get_current_orders(market_ids)
+        orders = [
+            order
+            for order in self.get_current_orders()
+            if market_ids is None or order.market_id in market_ids
+        ]
 
         if not orders:
             return pd.DataFrame()
@@ -1079,87 +1313,6 @@ class BetFairClient:
             ]
         ]
 
-    def cash_out_bets(self, market_ids: list[str]):
-        cashed_out = False
-        while not cashed_out:
-            cash_out_data = self.fetch_cash_out_data(market_ids)
-            if cash_out_data.empty:
-                cashed_out = True
-            else:
-                cash_out_orders = self.betfair_cash_out.cash_out(cash_out_data)
-                self.place_orders(cash_out_orders)
-                sleep(10)
-
-        return self.get_matched_orders(market_ids)
-
-    def cash_out_bets_for_selection(
-        self, market_ids: list[str], selection_ids: list[str]
-    ):
-        """
-        Cash out bets for specific selection IDs within the given markets.
-
-        Args:
-            market_ids: List of market IDs to cash out bets from
-            selection_ids: List of selection IDs to specifically cash out
-
-        Returns:
-            DataFrame of matched orders for the specified selections
-
-        Raises:
-            ValueError: If selection_ids is empty or contains invalid values
-        """
-        if not selection_ids:
-            raise ValueError("selection_ids cannot be empty")
-
-        # Convert selection_ids to strings to match data format
-        selection_ids_str = [str(sid) for sid in selection_ids]
-
-        I(
-            f"Cashing out bets for selections {selection_ids_str} in markets {market_ids}"
-        )
-
-        cashed_out = False
-        while not cashed_out:
-            # Fetch all cash out data for the markets
-            cash_out_data = self.fetch_cash_out_data(market_ids)
-
-            if cash_out_data.empty:
-                cashed_out = True
-                I("No cash out data found")
-            else:
-                # Filter data to only include the specified selection IDs
-                filtered_cash_out_data = cash_out_data[
-                    cash_out_data["selection_id"].astype(str).isin(selection_ids_str)
-                ]
-
-                if filtered_cash_out_data.empty:
-                    cashed_out = True
-                    I(f"No bets found for selection IDs {selection_ids_str}")
-                else:
-                    I(
-                        f"Found {len(filtered_cash_out_data)} bets to cash out for selections {selection_ids_str}"
-                    )
-                    cash_out_orders = self.betfair_cash_out.cash_out(
-                        filtered_cash_out_data
-                    )
-
-                    if cash_out_orders:
-                        I(f"Placing {len(cash_out_orders)} cash out orders")
-                        self.place_orders(cash_out_orders)
-                        sleep(10)
-                    else:
-                        cashed_out = True
-                        I("No cash out orders generated")
-
-        # Return matched orders filtered by the specified selections
-        all_matched_orders = self.get_matched_orders(market_ids)
-        if all_matched_orders.empty:
-            return all_matched_orders
-
-        return all_matched_orders[
-            all_matched_orders["selection_id"].astype(str).isin(selection_ids_str)
-        ]
-
     @staticmethod
     def expand_price_size(data: pd.DataFrame) -> pd.DataFrame:
         price_size_col = "price_size"
@@ -0,0 +1,415 @@
+"""
+Simulated Betfair markets - Ladders, orders and matching for SimulatedExchange.
+
+A SimMarket holds each runner's back and lay ladders as [price, size]
+levels, best first, and renders itself as the MarketCatalogue and
+MarketBook resources the real API returns. Markets come from a synthetic
+card or from a PriceReplay of recorded live_betting.betfair_prices
+snapshots.
+
+SimOrder is one order and its fills. take() matches an order against the
+opposing ladder, consuming the sizes it fills, and walk_prices() moves
+every ladder by a random step. Neither takes a lock: SimulatedExchange
+calls them while holding its own.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+from betfairlightweight.resources import MarketBook, MarketCatalogue
+
+LADDER_DEPTH = 5
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.000Z"
+
+
+@dataclass(frozen=True)
+class MatchingRules:
+    """
+    How orders are matched.
+
+    take_fraction: Share of the offered size at or better than an order's
+        limit that it matches on arrival or when the price comes to it
+    resting_fill_per_second: Share of a resting order's remainder matched
+        each second at its own price, standing in for new flow
+    reject_probability: Chance an instruction is rejected outright
+    """
+
+    take_fraction: float = 1.0
+    resting_fill_per_second: float = 0.0
+    reject_probability: float = 0.0
+
+
+# ============================================================================
+# MARKETS
+# ============================================================================
+
+
+@dataclass
+class SimRunner:
+    selection_id: int
+    name: str
+    # [price, size] levels, best first: back descending, lay ascending
+    back: list[list[float]]
+    lay: list[list[float]]
+    last_price_traded: float | None = None
+    total_matched: float = 0.0
+    status: str = "ACTIVE"
+
+
+@dataclass
+class SimMarket:
+    market_id: str
+    market_type: str
+    market_name: str
+    venue: str
+    start_time: datetime  # naive UTC, as the API returns it
+    runners: dict[int, SimRunner]
+
+    def catalogue(self) -> MarketCatalogue:
+        start = self.start_time.strftime(TIME_FORMAT)
+        return MarketCatalogue(
+            marketId=self.market_id,
+            marketName=self.market_name,
+            marketStartTime=start,
+            totalMatched=sum(r.total_matched for r in self.runners.values()),
+            description={
+                "bettingType": "ODDS",
+                "bspMarket": False,
+                "marketTime": start,
+                "suspendTime": start,
+                "turnInPlayEnabled": True,
+                "marketType": self.market_type,
+            },
+            event={
+                "id": self.venue,
+                "openDate": start,
+                "timezone": "Europe/London",
+                "name": self.venue,
+                "countryCode": "GB",
+                "venue": self.venue,
+            },
+            runners=[
+                {"selectionId": r.selection_id, "runnerName": r.name, "handicap": 0}
+                for r in self.runners.values()
+            ],
+        )
+
+    def book(self, in_play: bool) -> MarketBook:
+        active = [r for r in self.runners.values() if r.status == "ACTIVE"]
+        return MarketBook(
+            marketId=self.market_id,
+            isMarketDataDelayed=False,
+            status="OPEN",
+            betDelay=1 if in_play else 0,
+            bspReconciled=False,
+            complete=True,
+            inplay=in_play,
+            numberOfWinners=1 if self.market_type == "WIN" else 3,
+            numberOfRunners=len(self.runners),
+            numberOfActiveRunners=len(active),
+            totalMatched=sum(r.total_matched for r in self.runners.values()),
+            totalAvailable=0,
+            crossMatching=True,
+            runnersVoidable=False,
+            version=1,
+            runners=[
+                {
+                    "selectionId": r.selection_id,
+                    "status": r.status,
+                    "handicap": 0,
+                    "lastPriceTraded": r.last_price_traded,
+                    "totalMatched": r.total_matched,
+                    "ex": {
+                        "availableToBack": [
+                            {"price": p, "size": s} for p, s in r.back if s > 0
+                        ],
+                        "availableToLay": [
+                            {"price": p, "size": s} for p, s in r.lay if s > 0
+                        ],
+                        "tradedVolume": [],
+                    },
+                }
+                for r in self.runners.values()
+            ],
+        )
+
+
+def _ladder(
+    best: float, tick: float, sizes: np.ndarray, side: str
+) -> list[list[float]]:
+    step = -tick if side == "back" else tick
+    return [
+        [round(max(1.01, best + i * step), 2), round(float(size), 2)]
+        for i, size in enumerate(sizes)
+    ]
+
+
+def synthetic_card(
+    n_races: int = 30,
+    n_runners: int = 10,
+    first_race_in: timedelta = timedelta(minutes=30),
+    race_spacing: timedelta = timedelta(minutes=30),
+    seed: int = 0,
+) -> list[SimMarket]:
+    """WIN and PLACE markets for a card of races with five-deep ladders."""
+    rng = np.random.default_rng(seed)
+    start = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    markets = []
+    for race in range(n_races):
+        race_time = start + first_race_in + race * race_spacing
+        strengths = rng.gamma(2.0, size=n_runners)
+        win_probs = strengths / strengths.sum()
+        place_probs = np.minimum(0.95, win_probs * 3)
+        names = [f"Horse {race}-{i}" for i in range(n_runners)]
+        for offset, (market_type, probs) in enumerate(
+            [("WIN", win_probs), ("PLACE", place_probs)]
+        ):
+            runners = {}
+            for i, prob in enumerate(probs):
+                selection_id = 10_000 * (race + 1) + i
+                price = round(max(1.02, 1 / prob), 2)
+                tick = max(0.01, round(price * 0.01, 2))
+                runners[selection_id] = SimRunner(
+                    selection_id=selection_id,
+                    name=names[i],
+                    back=_ladder(
+                        price, tick, rng.uniform(20, 500, LADDER_DEPTH), "back"
+                    ),
+                    lay=_ladder(
+                        price + tick, tick, rng.uniform(20, 500, LADDER_DEPTH), "lay"
+                    ),
+                    last_price_traded=price,
+                    total_matched=float(rng.uniform(100, 20_000)),
+                )
+            markets.append(
+                SimMarket(
+                    market_id=f"1.{200_000_000 + race * 2 + offset}",
+                    market_type=market_type,
+                    market_name=f"Race {race}",
+                    venue="Kempton",
+                    start_time=race_time,
+                    runners=runners,
+                )
+            )
+    return markets
+
+
+# ============================================================================
+# RECORDED PRICE REPLAY
+# ============================================================================
+
+
+class PriceReplay:
+    """
+    Recorded live_betting.betfair_prices snapshots, applied as time passes.
+
+    created_at is truncated to the minute, so the n-th row of a runner
+    within a minute is taken as the n-th cycle of that minute and the
+    cycles are spread evenly across it. Race and snapshot times are
+    shifted by the same amount so the first snapshot lands on start.
+    """
+
+    SIDES = {"WIN": "win", "PLACE": "place"}
+
+    def __init__(self, prices: pd.DataFrame):
+        prices = prices.copy()
+        for column in ("created_at", "race_time"):
+            prices[column] = self._naive_utc(prices[column])
+        cycle = prices.groupby(
+            ["created_at", "market_id_win", "selection_id"]
+        ).cumcount()
+        cycles_in_minute = cycle.groupby(prices["created_at"]).transform("max") + 1
+        prices["snapshot_at"] = prices["created_at"] + pd.to_timedelta(
+            cycle * 60 / cycles_in_minute, unit="s"
+        )
+        self.prices = prices.sort_values("snapshot_at", kind="stable")
+        self.times = self.prices["snapshot_at"].drop_duplicates().tolist()
+        self._position = 0
+        self._offset = timedelta(0)
+
+    @staticmethod
+    def _naive_utc(times: pd.Series) -> pd.Series:
+        """Times as naive UTC, reading naive input as UK local time."""
+        times = pd.to_datetime(times)
+        if times.dt.tz is None:
+            times = times.dt.tz_localize("Europe/London")
+        return times.dt.tz_convert("UTC").dt.tz_localize(None)
+
+    def markets(self, start: datetime) -> list[SimMarket]:
+        """Empty-laddered markets for every race in the recording."""
+        self._offset = start - self.times[0].to_pydatetime()
+        markets: dict[str, SimMarket] = {}
+        for row in self.prices.drop_duplicates(
+            ["market_id_win", "selection_id"]
+        ).itertuples():
+            race_time = row.race_time.to_pydatetime() + self._offset
+            for market_type, suffix in self.SIDES.items():
+                market_id = str(getattr(row, f"market_id_{suffix}"))
+                market = markets.setdefault(
+                    market_id,
+                    SimMarket(
+                        market_id=market_id,
+                        market_type=market_type,
+                        market_name=f"{race_time:%H:%M} {row.course}",
+                        venue=row.course,
+                        start_time=race_time,
+                        runners={},
+                    ),
+                )
+                market.runners[int(row.selection_id)] = SimRunner(
+                    selection_id=int(row.selection_id),
+                    name=row.horse_name,
+                    back=[],
+                    lay=[],
+                )
+        return list(markets.values())
+
+    def apply_until(self, now: datetime, markets: dict[str, SimMarket]) -> bool:
+        """Apply every snapshot due by now, returning True if any was."""
+        applied = False
+        while (
+            self._position < len(self.times)
+            and self.times[self._position].to_pydatetime() + self._offset <= now
+        ):
+            snapshot = self.prices[
+                self.prices["snapshot_at"] == self.times[self._position]
+            ]
+            for row in snapshot.to_dict("records"):
+                for market_type, suffix in self.SIDES.items():
+                    market = markets.get(str(row[f"market_id_{suffix}"]))
+                    runner = market and market.runners.get(int(row["selection_id"]))
+                    if runner is None:
+                        continue
+                    runner.status = row.get("status") or "ACTIVE"
+                    runner.back = self._levels(row, "back", suffix)
+                    runner.lay = self._levels(row, "lay", suffix)
+                    ltp = row.get(f"betfair_{suffix}_sp")
+                    if ltp is not None and not pd.isna(ltp):
+                        runner.last_price_traded = float(ltp)
+            self._position += 1
+            applied = True
+        return applied
+
+    @staticmethod
+    def _levels(row: dict, side: str, suffix: str) -> list[list[float]]:
+        levels = []
+        for level in range(1, LADDER_DEPTH + 1):
+            price = row.get(f"{side}_price_{level}_{suffix}")
+            if price is None or pd.isna(price):
+                continue
+            size = row.get(f"{side}_price_{level}_depth_{suffix}")
+            levels.append([float(price), 0.0 if pd.isna(size) else float(size)])
+        return levels
+
+
+# ============================================================================
+# ORDERS AND MATCHING
+# ============================================================================
+
+
+@dataclass
+class SimOrder:
+    bet_id: str
+    market_id: str
+    selection_id: int
+    side: str
+    price: float
+    size: float
+    customer_strategy_ref: str | None
+    placed_date: datetime
+    size_matched: float = 0.0
+    matched_value: float = 0.0  # sum of price * size over fills
+    size_cancelled: float = 0.0
+    size_lapsed: float = 0.0
+    matched_date: datetime | None = None
+
+    @property
+    def size_remaining(self) -> float:
+        return round(
+            self.size - self.size_matched - self.size_cancelled - self.size_lapsed, 2
+        )
+
+    @property
+    def status(self) -> str:
+        return "EXECUTABLE" if self.size_remaining > 0 else "EXECUTION_COMPLETE"
+
+    def fill(self, size: float, price: float, now: datetime) -> None:
+        self.size_matched = round(self.size_matched + size, 2)
+        self.matched_value += size * price
+        self.matched_date = now
+
+    def to_raw(self) -> dict:
+        return {
+            "betId": self.bet_id,
+            "marketId": self.market_id,
+            "selectionId": self.selection_id,
+            "handicap": 0,
+            "priceSize": {"price": self.price, "size": self.size},
+            "bspLiability": 0,
+            "side": self.side,
+            "status": self.status,
+            "persistenceType": "LAPSE",
+            "orderType": "LIMIT",
+            "placedDate": self.placed_date.strftime(TIME_FORMAT),
+            "matchedDate": (
+                self.matched_date.strftime(TIME_FORMAT) if self.matched_date else None
+            ),
+            "averagePriceMatched": (
+                round(self.matched_value / self.size_matched, 2)
+                if self.size_matched
+                else 0.0
+            ),
+            "sizeMatched": self.size_matched,
+            "sizeRemaining": self.size_remaining,
+            "sizeLapsed": self.size_lapsed,
+            "sizeCancelled": self.size_cancelled,
+            "sizeVoided": 0.0,
+            "regulatorCode": "GIBRALTAR REGULATOR",
+            "customerStrategyRef": self.customer_strategy_ref,
+        }
+
+
+def take(
+    order: SimOrder, runner: SimRunner, now: datetime, take_fraction: float = 1.0
+) -> None:
+    """
+    Match order against the opposing offers at or better than its limit.
+
+    Each level gives up take_fraction of its size, which is removed from the
+    ladder, and the runner's last traded price and volume follow the fills.
+    """
+    if order.side == "BACK":
+        levels = runner.back
+
+        def crosses(price: float) -> bool:
+            return price >= order.price
+
+    else:
+        levels = runner.lay
+
+        def crosses(price: float) -> bool:
+            return price <= order.price
+
+    for level in levels:
+        if order.size_remaining <= 0 or not crosses(level[0]):
+            break
+        size = round(min(order.size_remaining, level[1] * take_fraction), 2)
+        if size <= 0:
+            continue
+        level[1] = round(level[1] - size, 2)
+        order.fill(size, level[0], now)
+        runner.last_price_traded = level[0]
+        runner.total_matched += size
+
+
+def walk_prices(
+    markets: dict[str, SimMarket], scale: float, rng: np.random.Generator
+) -> None:
+    """Scale each runner's ladder about evens by a lognormal step of scale."""
+    for market in markets.values():
+        for runner in market.runners.values():
+            factor = float(np.exp(rng.normal(0, scale)))
+            for level in runner.back + runner.lay:
+                level[0] = round(max(1.01, 1 + (level[0] - 1) * factor), 2)
@@ -0,0 +1,358 @@
+"""
+Simulated Exchange - Run BetFairClient against an in-memory Betfair.
+
+SimulatedExchange stands in for the betfairlightweight APIClient behind
+BetFairClient.trading_client. It answers listMarketCatalogue,
+listMarketBook, placeOrders, cancelOrders and listCurrentOrders with the
+same resource types as the real API, so the trader's create_market_data,
+get_current_orders, place_order(s), cancel_orders, the CashOutEngine and
+get_min_and_max_race_times run unchanged, including their batching,
+threading and parsing.
+
+Prices come from a synthetic card, optionally random-walking, or from a
+replay of recorded live_betting.betfair_prices snapshots shifted so the
+first snapshot is now. Orders match against the ladder under
+MatchingRules, rest, lapse at the off and can be cancelled. Every call
+sleeps for its LatencyModel delay outside the exchange lock, so concurrent
+requests overlap as they would against the real API.
+
+    exchange = SimulatedExchange(synthetic_card(n_races=30))
+    betfair_client = simulated_client(exchange)
+"""
+
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from time import monotonic, sleep
+from typing import Callable
+
+import numpy as np
+from betfairlightweight.resources import CancelOrders, CurrentOrders, PlaceOrders
+
+from .betfair_client import BetFairCashOut, BetFairClient, BetfairCredentials
+from .betfair_sim_market import (
+    TIME_FORMAT,
+    MatchingRules,
+    PriceReplay,
+    SimMarket,
+    SimOrder,
+    SimRunner,
+    synthetic_card,
+    take,
+    walk_prices,
+)
+
+__all__ = [
+    "LatencyModel",
+    "MatchingRules",
+    "PriceReplay",
+    "SimMarket",
+    "SimOrder",
+    "SimRunner",
+    "SimulatedExchange",
+    "simulated_client",
+    "synthetic_card",
+]
+
+
+@dataclass(frozen=True)
+class LatencyModel:
+    """Seconds each API call takes, varied uniformly by +/- jitter of itself."""
+
+    catalogue: float = 0.0
+    market_book: float = 0.0
+    place_orders: float = 0.0
+    cancel_orders: float = 0.0
+    current_orders: float = 0.0
+    jitter: float = 0.0
+
+    @classmethod
+    def uniform(cls, seconds: float, jitter: float = 0.0) -> "LatencyModel":
+        return cls(seconds, seconds, seconds, seconds, seconds, jitter)
+
+
+# ============================================================================
+# EXCHANGE
+# ============================================================================
+
+
+class SimulatedExchange:
+    """
+    In-memory exchange with the betting endpoints BetFairClient calls.
+
+    Time moves with clock (time.monotonic by default): each call first
+    applies replay snapshots and random-walk steps that are due, matches
+    resting orders against the moved prices, fills them at
+    resting_fill_per_second and lapses unmatched orders in races that are
+    off. calls counts requests per endpoint.
+    """
+
+    def __init__(
+        self,
+        markets: list[SimMarket] | None = None,
+        replay: PriceReplay | None = None,
+        matching: MatchingRules = MatchingRules(),
+        latency: LatencyModel = LatencyModel(),
+        price_walk: float = 0.0,
+        seed: int = 0,
+        clock: Callable[[], float] = monotonic,
+    ):
+        self.matching = matching
+        self.latency = latency
+        self.price_walk = price_walk
+        self.replay = replay
+        self.clock = clock
+        self.session_expired = False
+        self.betting = self
+        self.calls: Counter[str] = Counter()
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._started_at = clock()
+        self._last_advanced = self._started_at
+        self._epoch = datetime.now(timezone.utc).replace(tzinfo=None)
+        if replay is not None:
+            markets = replay.markets(self._epoch)
+        self.markets: dict[str, SimMarket] = {m.market_id: m for m in markets or []}
+        self.orders: dict[str, SimOrder] = {}
+        self._next_bet_id = 1
+        self._prices_moved = False
+        if replay is not None:
+            replay.apply_until(self._epoch, self.markets)
+
+    # --- session, so BetFairClient.check_session is a no-op -----------------
+
+    def login(self, *args, **kwargs) -> None:
+        pass
+
+    def logout(self) -> None:
+        pass
+
+    def now(self) -> datetime:
+        """Current exchange time, naive UTC."""
+        return self._epoch + timedelta(seconds=self.clock() - self._started_at)
+
+    def set_ladder(
+        self,
+        market_id: str,
+        selection_id: int,
+        back: list[list[float]] | None = None,
+        lay: list[list[float]] | None = None,
+    ) -> None:
+        """Replace a runner's offers, as [price, size] levels best first."""
+        with self._lock:
+            runner = self.markets[market_id].runners[selection_id]
+            if back is not None:
+                runner.back = [list(level) for level in back]
+            if lay is not None:
+                runner.lay = [list(level) for level in lay]
+            self._prices_moved = True
+
+    # --- betting endpoints ---------------------------------------------------
+
+    def list_market_catalogue(self, filter=None, market_projection=None, **kwargs):
+        self._request("catalogue")
+        market_ids = (filter or {}).get("marketIds")
+        with self._lock:
+            return [
+                market.catalogue()
+                for market in self.markets.values()
+                if not market_ids or market.market_id in market_ids
+            ]
+
+    def list_market_book(self, market_ids, price_projection=None, **kwargs):
+        self._request("market_book")
+        with self._lock:
+            self._advance()
+            now = self.now()
+            return [
+                self.markets[market_id].book(
+                    in_play=self.markets[market_id].start_time <= now
+                )
+                for market_id in market_ids
+                if market_id in self.markets
+            ]
+
+    def place_orders(
+        self, market_id, instructions, customer_strategy_ref=None, **kwargs
+    ):
+        self._request("place_orders")
+        with self._lock:
+            self._advance()
+            market = self.markets.get(market_id)
+            if market is None:
+                return PlaceOrders(
+                    status="FAILURE",
+                    errorCode="MARKET_NOT_OPEN_FOR_BETTING",
+                    marketId=market_id,
+                    instructionReports=[
+                        self._rejected(i, "MARKET_NOT_OPEN_FOR_BETTING")
+                        for i in instructions
+                    ],
+                )
+            reports = [
+                self._place(market, instruction, customer_strategy_ref)
+                for instruction in instructions
+            ]
+        failed = any(r["status"] != "SUCCESS" for r in reports)
+        return PlaceOrders(
+            status="FAILURE" if failed else "SUCCESS",
+            marketId=market_id,
+            customerRef=customer_strategy_ref,
+            instructionReports=reports,
+        )
+
+    def cancel_orders(self, market_id=None, instructions=None, **kwargs):
+        self._request("cancel_orders")
+        bet_ids = {i["betId"] for i in instructions or []}
+        reports = []
+        with self._lock:
+            self._advance()
+            for order in self.orders.values():
+                if order.status != "EXECUTABLE":
+                    continue
+                if market_id is not None and order.market_id != market_id:
+                    continue
+                if bet_ids and order.bet_id not in bet_ids:
+                    continue
+                cancelled = order.size_remaining
+                order.size_cancelled = round(order.size_cancelled + cancelled, 2)
+                reports.append(
+                    {
+                        "status": "SUCCESS",
+                        "sizeCancelled": cancelled,
+                        "cancelledDate": self.now().strftime(TIME_FORMAT),
+                        "instruction": {"betId": order.bet_id},
+                    }
+                )
+        return CancelOrders(
+            status="SUCCESS", marketId=market_id, instructionReports=reports
+        )
+
+    def list_current_orders(
+        self,
+        customer_strategy_refs=None,
+        market_ids=None,
+        bet_ids=None,
+        date_range=None,
+        **kwargs,
+    ):
+        self._request("current_orders")
+        with self._lock:
+            self._advance()
+            orders = [
+                order.to_raw()
+                for order in self.orders.values()
+                if (
+                    not customer_strategy_refs
+                    or order.customer_strategy_ref in customer_strategy_refs
+                )
+                and (not market_ids or order.market_id in market_ids)
+                and (not bet_ids or order.bet_id in bet_ids)
+            ]
+        return CurrentOrders(currentOrders=orders, moreAvailable=False)
+
+    # --- matching ------------------------------------------------------------
+
+    def _request(self, endpoint: str) -> None:
+        self.calls[endpoint] += 1
+        seconds = getattr(self.latency, endpoint)
+        if seconds > 0:
+            jitter = self.latency.jitter
+            if jitter:
+                seconds *= 1 + self._rng.uniform(-jitter, jitter)
+            sleep(seconds)
+
+    @staticmethod
+    def _rejected(instruction: dict, error_code: str) -> dict:
+        return {
+            "status": "FAILURE",
+            "errorCode": error_code,
+            "instruction": instruction,
+        }
+
+    def _place(
+        self, market: SimMarket, instruction: dict, strategy: str | None
+    ) -> dict:
+        now = self.now()
+        runner = market.runners.get(int(instruction["selectionId"]))
+        if runner is None or runner.status != "ACTIVE":
+            return self._rejected(instruction, "RUNNER_REMOVED")
+        if market.start_time <= now:
+            return self._rejected(instruction, "MARKET_NOT_OPEN_FOR_BETTING")
+        if self._rng.random() < self.matching.reject_probability:
+            return self._rejected(instruction, "ERROR_IN_ORDER")
+
+        limit = instruction["limitOrder"]
+        order = SimOrder(
+            bet_id=str(self._next_bet_id),
+            market_id=market.market_id,
+            selection_id=runner.selection_id,
+            side=instruction["side"],
+            price=float(limit["price"]),
+            size=float(limit["size"]),
+            customer_strategy_ref=strategy,
+            placed_date=now,
+        )
+        self._next_bet_id += 1
+        take(order, runner, now, self.matching.take_fraction)
+        self.orders[order.bet_id] = order
+        raw = order.to_raw()
+        return {
+            "status": "SUCCESS",
+            "instruction": instruction,
+            "betId": order.bet_id,
+            "placedDate": raw["placedDate"],
+            "averagePriceMatched": raw["averagePriceMatched"],
+            "sizeMatched": order.size_matched,
+            "orderStatus": order.status,
+        }
+
+    def _advance(self) -> None:
+        """Bring prices and resting orders up to the current time."""
+        clock = self.clock()
+        elapsed = clock - self._last_advanced
+        if elapsed <= 0:
+            return
+        self._last_advanced = clock
+        now = self.now()
+
+        prices_moved = self._prices_moved
+        self._prices_moved = False
+        if self.replay is not None:
+            prices_moved |= self.replay.apply_until(now, self.markets)
+        elif self.price_walk:
+            walk_prices(self.markets, self.price_walk * np.sqrt(elapsed), self._rng)
+            prices_moved = True
+
+        fill_share = min(1.0, self.matching.resting_fill_per_second * elapsed)
+        for order in self.orders.values():
+            if order.status != "EXECUTABLE":
+                continue
+            market = self.markets[order.market_id]
+            if market.start_time <= now:
+                # LAPSE persistence: unmatched money is lapsed at the off
+                order.size_lapsed = round(order.size_lapsed + order.size_remaining, 2)
+                continue
+            if prices_moved:
+                take(
+                    order,
+                    market.runners[order.selection_id],
+                    now,
+                    self.matching.take_fraction,
+                )
+            if fill_share and order.size_remaining > 0:
+                order.fill(
+                    round(order.size_remaining * fill_share, 2), order.price, now
+                )
+
+
+def simulated_client(exchange: SimulatedExchange, **kwargs) -> BetFairClient:
+    """A BetFairClient whose API calls go to exchange."""
+    client = BetFairClient(
+        BetfairCredentials(username="", password="", app_key="", certs_path=""),
+        BetFairCashOut(),
+        **kwargs,
+    )
+    client.trading_client = exchange
+    return client
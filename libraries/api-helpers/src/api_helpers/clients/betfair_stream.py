@@ -0,0 +1,370 @@
+"""
+Betfair Exchange Stream - Keep market ladders and our orders in memory.
+
+Polling listMarketBook and listCurrentOrders costs a round trip per read and
+prices are only as fresh as the last poll. StreamCache instead holds the
+latest MarketBook of each subscribed market and every order on the account,
+updated by betfairlightweight's streaming listeners within milliseconds of
+Betfair publishing a change. A BetFairClient with a stream_cache reads
+market books and current orders from it while its streams are live and
+falls back to REST otherwise.
+
+BetfairStream runs the live market and order subscriptions on background
+threads, optionally recording every raw message to a file. StreamReplay
+plays such a file through the same listeners, standing in for the live
+stream in tests and offline runs.
+"""
+
+import json
+import threading
+from datetime import datetime
+from time import sleep
+from typing import Callable
+
+import betfairlightweight
+from api_helpers.helpers.logging_config import D, I, W
+from betfairlightweight import StreamListener
+
+from .betfair_client import BetFairClient, CurrentOrder, current_order_from_raw
+
+MARKET_SUBSCRIPTION = "marketSubscription"
+ORDER_SUBSCRIPTION = "orderSubscription"
+CHANGE_MESSAGE_SUBSCRIPTIONS = {"mcm": MARKET_SUBSCRIPTION, "ocm": ORDER_SUBSCRIPTION}
+
+# Full ladder, traded volume and last traded price, plus the market
+# definition for runner status: everything create_market_data reads
+MARKET_DATA_FIELDS = ["EX_ALL_OFFERS", "EX_TRADED_VOL", "EX_LTP", "EX_MARKET_DEF"]
+RECONNECT_SECONDS = 5
+
+
+class StreamCache:
+    """
+    Latest market books and orders, as reported by the streams.
+
+    markets_live and orders_live are set once a subscription has delivered
+    its initial image and cleared when its connection drops, so readers
+    only trust the cache while it is being kept up to date.
+    """
+
+    def __init__(self):
+        self._changed = threading.Condition()
+        self._market_books: dict[str, object] = {}
+        self._orders: dict[str, CurrentOrder] = {}
+        self.markets_live = False
+        self.orders_live = False
+
+    def set_live(self, operation: str, live: bool) -> None:
+        with self._changed:
+            if operation == MARKET_SUBSCRIPTION:
+                self.markets_live = live
+            else:
+                self.orders_live = live
+            self._changed.notify_all()
+
+    def update_market_books(self, market_books: list) -> None:
+        with self._changed:
+            for market_book in market_books:
+                self._market_books[market_book.market_id] = market_book
+
+    def update_orders(self, order_books: list[dict]) -> None:
+        """Apply lightweight order stream output, one dict per market."""
+        with self._changed:
+            for order_book in order_books:
+                for raw in order_book["currentOrders"]:
+                    self._orders[raw["betId"]] = current_order_from_raw(raw)
+            self._changed.notify_all()
+
+    def seed_orders(self, orders: list[CurrentOrder]) -> None:
+        """
+        Add orders read over REST.
+
+        The order stream's initial image only carries executable orders, so
+        orders already complete when it subscribes are seeded from here.
+        """
+        with self._changed:
+            for order in orders:
+                self._orders.setdefault(order.bet_id, order)
+
+    def market_books(self, market_ids: list[str]) -> dict[str, list]:
+        """Books for the market_ids held, shaped like _list_market_books output."""
+        with self._changed:
+            return {
+                market_id: [self._market_books[market_id]]
+                for market_id in market_ids
+                if market_id in self._market_books
+            }
+
+    def current_orders(
+        self,
+        customer_strategy_refs: list[str] | None = None,
+        placed_since: datetime | None = None,
+    ) -> list[CurrentOrder]:
+        """
+        Cached orders, optionally only those placed from placed_since on.
+
+        Complete orders placed before placed_since are dropped from the
+        cache, so it does not grow with every order the account has placed.
+        """
+        with self._changed:
+            if placed_since is not None:
+                self._orders = {
+                    bet_id: order
+                    for bet_id, order in self._orders.items()
+                    if order.execution_status != "EXECUTION_COMPLETE"
+                    or _placed_since(order, placed_since)
+                }
+            orders = list(self._orders.values())
+        if placed_since is not None:
+            orders = [o for o in orders if _placed_since(o, placed_since)]
+        if customer_strategy_refs:
+            refs = set(customer_strategy_refs)
+            orders = [o for o in orders if o.customer_strategy_ref in refs]
+        return orders
+
+    def wait_for_orders(
+        self, predicate: Callable[[list[CurrentOrder]], bool], timeout: float
+    ) -> bool:
+        """Block until predicate holds for the cached orders, or timeout."""
+        with self._changed:
+            return self._changed.wait_for(
+                lambda: self.orders_live and predicate(list(self._orders.values())),
+                timeout,
+            )
+
+
+def _placed_since(order: CurrentOrder, since: datetime) -> bool:
+    """Whether order was placed at or after since (local time); True if unknown."""
+    placed = order.placed_date
+    if isinstance(placed, str):
+        placed = datetime.fromisoformat(placed)
+    if placed is None:
+        return True
+    if placed.tzinfo is not None:
+        placed = placed.astimezone().replace(tzinfo=None)
+    return placed >= since
+
+
+class _CacheSink:
+    """Stands in for a listener's output queue, writing updates to the cache."""
+
+    def __init__(self, update: Callable[[list], None]):
+        self.put = update
+
+
+class CacheListener(StreamListener):
+    """
+    Stream listener feeding a StreamCache, one per subscription.
+
+    Market books are kept as MarketBook resources, the same type
+    listMarketBook returns; orders arrive as dicts and are parsed like
+    listCurrentOrders output. Raw messages are written to record_to when
+    given, producing a file StreamReplay can play back.
+    """
+
+    def __init__(
+        self,
+        cache: StreamCache,
+        operation: str,
+        record_to: "_Recorder | None" = None,
+        max_latency: float | None = 0.5,
+    ):
+        is_market = operation == MARKET_SUBSCRIPTION
+        super().__init__(
+            output_queue=_CacheSink(
+                cache.update_market_books if is_market else cache.update_orders
+            ),
+            max_latency=max_latency,
+            lightweight=not is_market,
+        )
+        self.cache = cache
+        self.operation = operation
+        self.record_to = record_to
+        self._live = False
+
+    def on_data(self, raw_data: str) -> bool | None:
+        if self.record_to is not None:
+            self.record_to.write(raw_data.rstrip("\n") + "\n")
+        return super().on_data(raw_data)
+
+    def _on_change_message(self, data: dict, unique_id: int) -> None:
+        super()._on_change_message(data, unique_id)
+        # The first change message is the subscription's initial image
+        if not self._live:
+            self._live = True
+            self.cache.set_live(self.operation, True)
+
+
+class _Recorder:
+    """One recording file written by both stream threads."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "a")
+        self._lock = threading.Lock()
+
+    def write(self, line: str) -> None:
+        with self._lock:
+            self._file.write(line)
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class BetfairStream:
+    """
+    Live market and order subscriptions feeding a StreamCache.
+
+    start() subscribes to today's catalogue markets and all of the account's
+    orders, each on its own thread, and reconnects after a dropped
+    connection. The cache is attached to betfair_client, which reads from
+    it while the streams are live.
+    """
+
+    def __init__(
+        self,
+        betfair_client: BetFairClient,
+        cache: StreamCache | None = None,
+        record_path: str | None = None,
+        reconnect_seconds: float = RECONNECT_SECONDS,
+    ):
+        self.betfair_client = betfair_client
+        self.cache = cache or StreamCache()
+        self.record_path = record_path
+        self.reconnect_seconds = reconnect_seconds
+        self._stopped = threading.Event()
+        self._streams: dict[str, object] = {}
+        self._threads: list[threading.Thread] = []
+        self._recorder: _Recorder | None = None
+
+    def start(self) -> None:
+        self.betfair_client.check_session()
+        market_ids = list(self.betfair_client.get_market_start_times())
+        self.cache.seed_orders(
+            self.betfair_client.get_current_orders(from_stream=False)
+        )
+        self.betfair_client.stream_cache = self.cache
+        if self.record_path:
+            self._recorder = _Recorder(self.record_path)
+
+        for operation, subscribe in (
+            (
+                MARKET_SUBSCRIPTION,
+                lambda stream: self._subscribe_markets(stream, market_ids),
+            ),
+            (ORDER_SUBSCRIPTION, lambda stream: stream.subscribe_to_orders()),
+        ):
+            thread = threading.Thread(
+                target=self._run,
+                args=(operation, subscribe),
+                name=f"betfair-{operation}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+        I(f"Betfair stream started for {len(market_ids)} markets")
+
+    def stop(self) -> None:
+        self._stopped.set()
+        for stream in list(self._streams.values()):
+            stream.stop()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        if self._recorder is not None:
+            self._recorder.close()
+            self._recorder = None
+
+    @staticmethod
+    def _subscribe_markets(stream, market_ids: list[str]) -> None:
+        stream.subscribe_to_markets(
+            market_filter=betfairlightweight.filters.streaming_market_filter(
+                market_ids=market_ids
+            ),
+            market_data_filter=betfairlightweight.filters.streaming_market_data_filter(
+                fields=MARKET_DATA_FIELDS
+            ),
+        )
+
+    def _run(self, operation: str, subscribe: Callable[[object], None]) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.betfair_client.check_session()
+            except Exception as e:
+                W(f"Betfair login failed, retrying {operation}: {e}")
+                self._stopped.wait(self.reconnect_seconds)
+                continue
+            listener = CacheListener(self.cache, operation, record_to=self._recorder)
+            stream = self.betfair_client.trading_client.streaming.create_stream(
+                listener=listener
+            )
+            self._streams[operation] = stream
+            try:
+                subscribe(stream)
+                stream.start()
+            except Exception as e:
+                W(f"Betfair {operation} dropped: {e}")
+            finally:
+                self.cache.set_live(operation, False)
+            self._stopped.wait(self.reconnect_seconds)
+
+
+class StreamReplay:
+    """
+    Play a recorded stream file into a StreamCache.
+
+    The file holds one raw stream message per line, as written by
+    BetfairStream(record_path=...). Market and order change messages go
+    through CacheListeners exactly as live data does. With speed set, the
+    gaps between publish times are replayed at that multiple of real time;
+    otherwise messages are applied as fast as they can be read.
+    """
+
+    def __init__(
+        self, path: str, cache: StreamCache | None = None, speed: float | None = None
+    ):
+        self.path = path
+        self.cache = cache or StreamCache()
+        self.speed = speed
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Replay on a background thread."""
+        self._thread = threading.Thread(
+            target=self.run, name="betfair-stream-replay", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def run(self) -> int:
+        """Replay the whole file, returning the number of messages applied."""
+        listeners = {
+            operation: CacheListener(self.cache, operation, max_latency=None)
+            for operation in (MARKET_SUBSCRIPTION, ORDER_SUBSCRIPTION)
+        }
+        applied = 0
+        last_publish_time = None
+        with open(self.path) as f:
+            for line in f:
+                if self._stopped.is_set():
+                    break
+                message = json.loads(line)
+                operation = CHANGE_MESSAGE_SUBSCRIPTIONS.get(message.get("op"))
+                if operation is None:
+                    continue
+
+                publish_time = message.get("pt")
+                if self.speed and publish_time and last_publish_time:
+                    sleep(max(0, publish_time - last_publish_time) / 1000 / self.speed)
+                last_publish_time = publish_time or last_publish_time
+
+                listener = listeners[operation]
+                if listener.stream is None:
+                    listener.register_stream(message.get("id", 0), operation)
+                listener.on_data(line)
+                applied += 1
+        D(f"Replayed {applied} stream messages from {self.path}")
+        return applied
@@ -0,0 +1,341 @@
+"""
+Cash-Out Engine - Green up markets in the background, hedging only what is left.
+
+BetFairClient.cash_out_bets used to loop until a market was flat. Every pass
+cancelled the market's orders, read all current orders and a fresh
+catalogue and market book, merged them, placed hedges and slept 10
+seconds, and the trading loop waited for the whole time. CashOutEngine
+instead gives each market its own worker, and submit() returns at once.
+
+A worker cancels the market's unmatched orders and reads what is matched
+into a Position per runner and side. Then it repeats:
+
+1. price the hedges with BetFairCashOut against the latest book (read from
+   the stream cache while it is live)
+2. send them fill-or-kill, so whatever does not match at once is cancelled
+3. add what matched to the positions
+
+The next hedge therefore covers only the unmatched remainder, and it is
+priced as soon as the last one is reported. If nothing matched, the worker
+first waits retry_seconds for the book to move, as it does while an
+exposed runner has no prices to hedge at. Once nothing is left to hedge,
+the matched orders are read again and the worker finishes if they agree.
+It also stops at the off.
+
+Only the runners held when the worker started are hedged: matched bets on
+other runners of the market, placed while it runs, are left alone. The
+trader does not place orders in a market that is being cashed out (each
+fill-or-kill round cancels the market's unmatched orders), see
+CashOutEngine.running().
+
+cash_out_bets() runs an engine to completion, for callers that wait.
+BetFairClient does not build engines itself, so this module can depend on
+betfair_client without a cycle.
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_for_futures
+from dataclasses import dataclass
+from time import sleep
+
+import pandas as pd
+from api_helpers.helpers.logging_config import D, E, I, W
+
+from .betfair_client import (
+    CASH_OUT_MIN_STAKE,
+    BetFairCancelOrders,
+    BetFairClient,
+    CurrentOrder,
+)
+
+CASH_OUT_WORKERS = 8
+
+# Pause before re-pricing after a hedge that matched nothing
+CASH_OUT_RETRY_SECONDS = 1.0
+
+# Book columns BetFairCashOut prices hedges from
+PRICE_COLUMNS = [
+    "market",
+    "status",
+    "back_price_1",
+    "back_price_1_depth",
+    "back_price_2",
+    "back_price_2_depth",
+    "lay_price_1",
+    "lay_price_1_depth",
+    "lay_price_2",
+    "lay_price_2_depth",
+]
+
+
+@dataclass
+class Position:
+    """Matched stake on one side of one runner."""
+
+    size: float = 0.0
+    stake_times_price: float = 0.0
+
+    def add(self, size: float, price: float) -> None:
+        self.size += size
+        self.stake_times_price += size * price
+
+    @property
+    def average_price(self) -> float:
+        """Average matched price, to 2dp as get_matched_orders reports it."""
+        return round(self.stake_times_price / self.size, 2) if self.size else 0.0
+
+
+@dataclass
+class CashOutResult:
+    market_id: str
+    hedges_placed: int = 0
+    size_matched: float = 0.0
+    reason: str = ""
+
+
+def matched_positions(
+    orders: list[CurrentOrder], market_id: str
+) -> dict[tuple[int, str], Position]:
+    """Matched stake per (selection_id, side) across every order in market_id."""
+    positions: dict[tuple[int, str], Position] = {}
+    for order in orders:
+        if order.market_id != market_id or not order.size_matched:
+            continue
+        positions.setdefault((int(order.selection_id), order.side), Position()).add(
+            order.size_matched, order.average_price_matched
+        )
+    return positions
+
+
+def positions_agree(
+    a: dict[tuple[int, str], Position], b: dict[tuple[int, str], Position]
+) -> bool:
+    def summary(positions):
+        return {
+            key: (round(p.size, 2), p.average_price)
+            for key, p in positions.items()
+            if round(p.size, 2)
+        }
+
+    return summary(a) == summary(b)
+
+
+def exposures(positions: dict[tuple[int, str], Position]) -> dict[int, float]:
+    """
+    Stake times price backed less laid, per runner.
+
+    This is the runner's profit if it wins less its profit if it loses, so
+    positive exposure is hedged by laying and negative by backing.
+    """
+    result: dict[int, float] = {}
+    for (selection_id, side), position in positions.items():
+        sign = 1 if side == "BACK" else -1
+        result[selection_id] = (
+            result.get(selection_id, 0.0) + sign * position.stake_times_price
+        )
+    return result
+
+
+def unpriced_runners(
+    positions: dict[tuple[int, str], Position], book: pd.DataFrame
+) -> list[int]:
+    """
+    Runners exposed by more than CASH_OUT_MIN_STAKE whose hedge side has
+    no second price, or no depth, for BetFairCashOut to price from.
+    """
+    prices = book.set_index("selection_id")
+    unpriced = []
+    for selection_id, exposure in exposures(positions).items():
+        if abs(exposure) <= CASH_OUT_MIN_STAKE or selection_id not in prices.index:
+            continue
+        side = "lay" if exposure > 0 else "back"
+        row = prices.loc[selection_id]
+        depth = row[f"{side}_price_1_depth"] + row[f"{side}_price_2_depth"]
+        if pd.isna(row[f"{side}_price_2"]) or pd.isna(depth) or depth <= 0:
+            unpriced.append(selection_id)
+    return unpriced
+
+
+def cash_out_frame(
+    market_id: str,
+    positions: dict[tuple[int, str], Position],
+    book: pd.DataFrame,
+) -> pd.DataFrame:
+    """
+    Positions joined to the book, in the shape fetch_cash_out_data returns.
+
+    Runners missing from the book are left out.
+    """
+    prices = book.set_index("selection_id")[PRICE_COLUMNS]
+    rows = [
+        {
+            "market_id": market_id,
+            "selection_id": selection_id,
+            "selection_type": side,
+            "average_price_matched": position.average_price,
+            "size_matched": round(position.size, 2),
+            **prices.loc[selection_id].to_dict(),
+        }
+        for (selection_id, side), position in positions.items()
+        if position.size > 0 and selection_id in prices.index
+    ]
+    return pd.DataFrame(rows)
+
+
+class CashOutEngine:
+    """
+    Cashes out markets on background workers, one market per worker.
+
+    submit() starts a worker for each market that does not already have
+    one. The result of each market's latest run is kept in results.
+    """
+
+    def __init__(
+        self,
+        betfair_client: BetFairClient,
+        workers: int = CASH_OUT_WORKERS,
+        retry_seconds: float = CASH_OUT_RETRY_SECONDS,
+    ):
+        self.betfair_client = betfair_client
+        self.retry_seconds = retry_seconds
+        self.results: dict[str, CashOutResult] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="cash-out"
+        )
+        self._running: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, market_ids: list[str]) -> list[str]:
+        """
+        Start cashing out market_ids in the background.
+
+        Returns:
+            The markets started, leaving out those already being cashed out
+        """
+        started = []
+        with self._lock:
+            for market_id in dict.fromkeys(market_ids):
+                if market_id in self._running:
+                    continue
+                self._running[market_id] = self._executor.submit(self._run, market_id)
+                started.append(market_id)
+        if started:
+            I(f"Cash out started for {started}")
+        return started
+
+    def running(self) -> list[str]:
+        with self._lock:
+            return list(self._running)
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Wait for the running cash-outs; True if they all finished."""
+        with self._lock:
+            futures = list(self._running.values())
+        _, not_done = wait_for_futures(futures, timeout)
+        return not not_done
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, market_id: str) -> CashOutResult:
+        try:
+            result = self._cash_out_market(market_id)
+            I(
+                f"Cash out {market_id} finished ({result.reason}): "
+                f"{result.hedges_placed} hedges, {result.size_matched:.2f} matched"
+            )
+        except Exception as e:
+            E(f"Cash out {market_id} failed: {e}")
+            result = CashOutResult(market_id, reason=f"failed: {e}")
+        with self._lock:
+            self.results[market_id] = result
+            self._running.pop(market_id, None)
+        return result
+
+    def _cash_out_market(self, market_id: str) -> CashOutResult:
+        client = self.betfair_client
+        result = CashOutResult(market_id)
+        client.cancel_orders(BetFairCancelOrders(market_ids=[market_id]))
+        positions = self._read_positions(market_id)
+        held = {selection_id for selection_id, _ in positions}
+
+        while True:
+            book = self._read_book(market_id)
+            if book.empty:
+                result.reason = "market not found"
+                return result
+            if (book["race_time"] <= pd.Timestamp("now", tz="Europe/London")).any():
+                result.reason = "race started"
+                return result
+
+            hedges = client.betfair_cash_out.cash_out(
+                cash_out_frame(market_id, positions, book)
+            )
+            if not hedges:
+                unpriced = unpriced_runners(positions, book)
+                if unpriced:
+                    D(f"Cash out {market_id}: no prices to hedge {unpriced}")
+                    sleep(self.retry_seconds)
+                    continue
+                confirmed = self._read_positions(market_id, held)
+                if positions_agree(positions, confirmed):
+                    result.reason = "flat"
+                    return result
+                W(f"Cash out {market_id}: positions changed, repricing")
+                positions = confirmed
+                continue
+
+            matched = 0.0
+            for hedge, placed in zip(hedges, client.place_orders_immediate(hedges)):
+                result.hedges_placed += 1
+                if placed.success and placed.size_matched:
+                    positions.setdefault(
+                        (int(hedge.selection_id), hedge.side), Position()
+                    ).add(placed.size_matched, placed.average_price_matched)
+                    matched += placed.size_matched
+            result.size_matched += matched
+            D(f"Cash out {market_id}: {len(hedges)} hedges, {matched:.2f} matched")
+            if not matched:
+                sleep(self.retry_seconds)
+
+    def _read_positions(
+        self, market_id: str, selection_ids: set[int] | None = None
+    ) -> dict[tuple[int, str], Position]:
+        """Matched positions in market_id, only on selection_ids if given."""
+        # Let the order stream report any cancellation before reading it
+        self.betfair_client.wait_for_cancelled_orders([market_id])
+        positions = matched_positions(
+            self.betfair_client.get_current_orders(), market_id
+        )
+        if selection_ids is None:
+            return positions
+        return {
+            key: position
+            for key, position in positions.items()
+            if key[0] in selection_ids
+        }
+
+    def _read_book(self, market_id: str) -> pd.DataFrame:
+        book = self.betfair_client.create_market_data([market_id])
+        if book.empty:
+            return book
+        return book[book["market_id"] == market_id].rename(
+            columns={"todays_betfair_selection_id": "selection_id"}
+        )
+
+
+def cash_out_bets(betfair_client: BetFairClient, market_ids: list[str]) -> pd.DataFrame:
+    """
+    Cash out market_ids and wait until they are flat or off.
+
+    Runs the markets concurrently through a CashOutEngine; the trader uses a
+    long-lived engine instead so that it does not wait.
+
+    Returns:
+        The matched orders in market_ids, as get_matched_orders reports them
+    """
+    engine = CashOutEngine(betfair_client)
+    engine.submit(market_ids)
+    engine.shutdown(wait=True)
+    return betfair_client.get_matched_orders(market_ids)
@@ -0,0 +1,249 @@
+"""
+A persistent, prepared-statement connection for small, hot queries.
+
+PostgresClient's fetch_data and execute_query check a connection out of the
+SQLAlchemy pool, open a transaction, wrap the SQL in sqlalchemy.text and,
+for reads, build a DataFrame: fine for ETL, but most of the cost of a
+query that returns a few hundred rows. PostgresChannel keeps one psycopg2
+connection open in autocommit mode, prepares each named statement on it
+once, and then only sends EXECUTE with the parameter values, returning the
+cursor's tuples (NUMERIC as float) or NumPy columns.
+
+Statements are written with the :name parameters execute_query takes and
+rewritten to $1, $2... when prepared. Every call is timed into a latency
+histogram per statement name, which latency_report() summarises.
+
+A connection that drops is reopened, and its statements prepared again, on
+the next call; the call that found it dropped is retried once, so
+statements sent through the channel should be safe to repeat (reads,
+upserts, and updates setting absolute values).
+"""
+
+import re
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Callable, TYPE_CHECKING
+
+import numpy as np
+import psycopg2
+import psycopg2.extras
+from api_helpers.helpers.logging_config import D, W
+
+if TYPE_CHECKING:
+    from .postgres_client import PsqlConnection
+
+# NUMERIC columns as float rather than Decimal
+NUMERIC_AS_FLOAT = psycopg2.extensions.new_type(
+    psycopg2.extensions.DECIMAL.values,
+    "NUMERIC_AS_FLOAT",
+    lambda value, cursor: float(value) if value is not None else None,
+)
+
+# Upper bounds of the latency buckets in milliseconds, doubling from 0.125ms
+# to about 8s; anything slower lands in a final overflow bucket
+LATENCY_BUCKETS_MS = 0.125 * 2.0 ** np.arange(17)
+
+# :name parameters, skipping ::type casts
+_PARAMETER = re.compile(r"(?<![:\w]):([A-Za-z_]\w*)")
+
+
+@dataclass
+class LatencyHistogram:
+    """Call count per latency bucket for one statement."""
+
+    counts: np.ndarray = field(
+        default_factory=lambda: np.zeros(len(LATENCY_BUCKETS_MS) + 1, dtype=np.int64)
+    )
+    total_seconds: float = 0.0
+
+    @property
+    def count(self) -> int:
+        return int(self.counts.sum())
+
+    def record(self, seconds: float) -> None:
+        self.counts[np.searchsorted(LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+        self.total_seconds += seconds
+
+    def quantile(self, q: float) -> float:
+        """Upper bound in ms of the bucket holding the q quantile (inf if overflowed)."""
+        if not self.count:
+            return 0.0
+        bucket = int(np.searchsorted(np.cumsum(self.counts), q * self.count))
+        return (
+            float(LATENCY_BUCKETS_MS[bucket])
+            if bucket < len(LATENCY_BUCKETS_MS)
+            else np.inf
+        )
+
+    def summary(self) -> str:
+        if not self.count:
+            return "no calls"
+        return (
+            f"{self.count} calls, mean {self.total_seconds / self.count * 1000:.2f}ms, "
+            f"p50 <= {self.quantile(0.5):g}ms, p99 <= {self.quantile(0.99):g}ms"
+        )
+
+
+def positional_parameters(query: str) -> tuple[str, list[str]]:
+    """Rewrite :name parameters to $n, returning the names in $n order."""
+    names: list[str] = []
+
+    def replace(match: re.Match) -> str:
+        name = match.group(1)
+        if name not in names:
+            names.append(name)
+        return f"${names.index(name) + 1}"
+
+    return _PARAMETER.sub(replace, query), names
+
+
+def latency_report(histograms: dict[str, LatencyHistogram]) -> str:
+    """One line per statement, slowest total first."""
+    ranked = sorted(histograms.items(), key=lambda item: -item[1].total_seconds)
+    return "\n".join(f"{name}: {histogram.summary()}" for name, histogram in ranked)
+
+
+class PostgresChannel:
+    """
+    One persistent connection that runs named, prepared statements.
+
+    Not thread safe: PostgresClient.channel() gives each thread its own.
+    histograms may be shared between channels to report across threads.
+    """
+
+    def __init__(
+        self,
+        connection: "PsqlConnection",
+        histograms: dict[str, LatencyHistogram] | None = None,
+    ):
+        self.connection = connection
+        self.histograms = {} if histograms is None else histograms
+        self._conn = None
+        self._prepared: dict[str, list[str]] = {}
+
+    def fetch_rows(
+        self, query: str, name: str, params: dict | None = None
+    ) -> tuple[list[str], list[tuple]]:
+        """
+        Run query as the prepared statement name.
+
+        Returns:
+            Column names and one tuple per row
+        """
+
+        def run(cursor, sql: str, values: list[tuple]):
+            cursor.execute(sql, values[0])
+            return [column.name for column in cursor.description], cursor.fetchall()
+
+        return self._run(query, name, [params or {}], run)
+
+    def fetch_arrays(
+        self, query: str, name: str, params: dict | None = None
+    ) -> dict[str, np.ndarray]:
+        """Run query as the prepared statement name, returning one array per column."""
+        columns, rows = self.fetch_rows(query, name, params)
+        if not rows:
+            return {column: np.empty(0, dtype=object) for column in columns}
+        return {column: np.array(values) for column, values in zip(columns, zip(*rows))}
+
+    def execute(self, query: str, name: str, params: dict | None = None) -> int:
+        """Run a write as the prepared statement name, returning the rowcount."""
+
+        def run(cursor, sql: str, values: list[tuple]) -> int:
+            cursor.execute(sql, values[0])
+            return cursor.rowcount
+
+        return self._run(query, name, [params or {}], run)
+
+    def execute_batch(
+        self, query: str, name: str, params_list: list[dict], page_size: int = 100
+    ) -> int:
+        """
+        Run the prepared statement name once per params, in one transaction.
+
+        The EXECUTEs are sent page_size to a round trip; if any fails the
+        whole batch is rolled back.
+
+        Returns:
+            The number of statements run
+        """
+        if not params_list:
+            return 0
+
+        def run(cursor, sql: str, values: list[tuple]) -> int:
+            cursor.execute("BEGIN")
+            try:
+                psycopg2.extras.execute_batch(cursor, sql, values, page_size=page_size)
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+            return len(values)
+
+        return self._run(query, name, params_list, run)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except psycopg2.Error:
+                pass
+        self._conn = None
+        self._prepared = {}
+
+    def _connect(self):
+        if self._conn is None or self._conn.closed:
+            kwargs = {
+                "user": self.connection.user,
+                "password": self.connection.password,
+                "host": self.connection.host,
+                "port": self.connection.port,
+                "dbname": self.connection.db,
+            }
+            if self.connection.sslmode:
+                kwargs["sslmode"] = self.connection.sslmode
+            conn = psycopg2.connect(**kwargs)
+            conn.autocommit = True
+            psycopg2.extensions.register_type(NUMERIC_AS_FLOAT, conn)
+            self._conn = conn
+            self._prepared = {}
+        return self._conn
+
+    def _prepare(self, cursor, query: str, name: str) -> list[str]:
+        names = self._prepared.get(name)
+        if names is None:
+            sql, names = positional_parameters(query)
+            D(f"Preparing {name}: {sql}")
+            cursor.execute(f"PREPARE {name} AS {sql}")
+            self._prepared[name] = names
+        return names
+
+    def _run(
+        self,
+        query: str,
+        name: str,
+        params_list: list[dict],
+        run: Callable[..., object],
+    ):
+        for attempt in range(2):
+            conn = self._connect()
+            try:
+                with conn.cursor() as cursor:
+                    names = self._prepare(cursor, query, name)
+                    if names:
+                        sql = f"EXECUTE {name} ({', '.join(['%s'] * len(names))})"
+                        values = [tuple(p[n] for n in names) for p in params_list]
+                    else:
+                        sql = f"EXECUTE {name}"
+                        values = [None] * len(params_list)
+                    start = perf_counter()
+                    result = run(cursor, sql, values)
+                    self.histograms.setdefault(name, LatencyHistogram()).record(
+                        perf_counter() - start
+                    )
+                    return result
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                self.close()
+                if attempt:
+                    raise
+                W(f"Postgres channel connection lost, reconnecting: {e}")
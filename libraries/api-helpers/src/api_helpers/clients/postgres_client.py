@@ -1,12 +1,18 @@
+import threading
 from dataclasses import dataclass
 from datetime import datetime
 from typing import List
 
+import numpy as np
 import pandas as pd
+import psycopg2
 import sqlalchemy
-from api_helpers.helpers.logging_config import D, E, I
+from api_helpers.helpers.logging_config import D, E, I, W
 from api_helpers.interfaces.storage_client_interface import IStorageClient
 
+from .postgres_channel import LatencyHistogram, PostgresChannel, latency_report
+from .postgres_copy import copy_dataframe, quote_identifier
+
 
 @dataclass
 class PsqlConnection:
@@ -28,8 +34,10 @@ class PostgresClient(IStorageClient):
         pool_size: int = 5,
         max_overflow: int = 10,
         pool_recycle: int = 1800,
+        use_copy: bool = True,
     ):
         self.connection = connection
+        self.use_copy = use_copy
         for i in [
             ("user", self.connection.user),
             ("password", self.connection.password),
@@ -51,10 +59,45 @@ class PostgresClient(IStorageClient):
             pool_recycle=pool_recycle,
             connect_args=connect_args,
         )
+        # One prepared-statement channel per thread, timed into shared histograms
+        self._channels = threading.local()
+        self.statement_latency: dict[str, LatencyHistogram] = {}
 
     def storage_connection(self) -> sqlalchemy.engine.Engine:
         return self.engine
 
+    def _bulk_load(
+        self,
+        conn: sqlalchemy.engine.Connection,
+        data: pd.DataFrame,
+        table: str,
+        schema: str | None = None,
+    ) -> None:
+        """
+        Append data to a table with COPY, falling back to to_sql.
+
+        COPY runs inside a savepoint, so a failure (a missing table, or a
+        value COPY cannot parse) leaves the transaction usable for to_sql,
+        which also creates the table when it does not exist yet.
+        """
+        target = f"{schema}.{table}" if schema else table
+        if self.use_copy:
+            try:
+                with conn.begin_nested():
+                    copy_dataframe(conn, data, table, schema)
+                return
+            except psycopg2.errors.UndefinedTable:
+                D(f"{target} does not exist, creating it with to_sql")
+            except psycopg2.Error as e:
+                W(f"COPY into {target} failed, falling back to to_sql: {e}")
+        data.to_sql(
+            name=table,
+            con=conn,
+            schema=schema,
+            if_exists="append",
+            index=False,
+        )
+
     def store_data(
         self,
         data: pd.DataFrame,
@@ -76,13 +119,7 @@ class PostgresClient(IStorageClient):
                     created_at=datetime.now().replace(microsecond=0, second=0)
                 )
             D(f"Storing {len(data)} records in {schema}.{table}")
-            data.to_sql(
-                name=table,
-                con=conn,
-                schema=schema,
-                if_exists="append",
-                index=False,
-            )
+            self._bulk_load(conn, data, table, schema)
 
     def fetch_data(
         self,
@@ -100,6 +137,51 @@ class PostgresClient(IStorageClient):
 
         return df
 
+    def channel(self) -> PostgresChannel:
+        """This thread's persistent connection for prepared statements."""
+        channel = getattr(self._channels, "channel", None)
+        if channel is None:
+            channel = PostgresChannel(self.connection, self.statement_latency)
+            self._channels.channel = channel
+        return channel
+
+    def fetch_rows(
+        self, query: str, name: str, params: dict | None = None
+    ) -> tuple[list[str], list[tuple]]:
+        """
+        Run query as the prepared statement name and return its raw rows.
+
+        The statement is prepared once on this thread's channel and executed
+        by name after that, and rows come back as the driver's tuples, with
+        NUMERIC as float, skipping pandas for small, hot queries.
+
+        Returns:
+            Column names and one tuple per row
+        """
+        return self.channel().fetch_rows(query, name, params)
+
+    def fetch_arrays(
+        self, query: str, name: str, params: dict | None = None
+    ) -> dict[str, np.ndarray]:
+        """As fetch_rows, returning one NumPy array per column."""
+        return self.channel().fetch_arrays(query, name, params)
+
+    def execute_prepared(
+        self, query: str, name: str, params: dict | None = None
+    ) -> int:
+        """As execute_query, through the prepared statement name."""
+        return self.channel().execute(query, name, params)
+
+    def execute_prepared_batch(
+        self, query: str, name: str, params_list: list[dict]
+    ) -> int:
+        """Run the prepared statement name for each params in one transaction."""
+        return self.channel().execute_batch(query, name, params_list)
+
+    def latency_report(self) -> str:
+        """Latency per prepared statement, across this client's channels."""
+        return latency_report(self.statement_latency)
+
     def execute_query(self, query: str, params=None) -> int:
 
         with self.storage_connection().begin() as conn:
@@ -111,6 +193,29 @@ class PostgresClient(IStorageClient):
 
         return affected_rows
 
+    def _stage_temp_table(
+        self,
+        conn: sqlalchemy.engine.Connection,
+        data: pd.DataFrame,
+        temp_table_name: str,
+        like: str | None = None,
+    ) -> None:
+        """Create a TEMP table dropped on commit and load data into it."""
+        if like:
+            columns_sql = f"LIKE {like}"
+        else:
+            columns_sql = ", ".join(
+                f"{quote_identifier(str(column))} {_temp_column_type(values)}"
+                for column, values in data.items()
+            )
+        conn.execute(
+            sqlalchemy.text(
+                f"CREATE TEMP TABLE {temp_table_name} ({columns_sql}) ON COMMIT DROP"
+            )
+        )
+        self._bulk_load(conn, data, temp_table_name)
+        I(f"Data loaded to temp table {temp_table_name}")
+
     def upsert_data(
         self,
         data: pd.DataFrame,
@@ -119,28 +224,48 @@ class PostgresClient(IStorageClient):
         unique_columns: List[str],
         use_base_table: bool = False,
         upsert_procedure: str | None = None,
+        generate_upsert: bool = False,
     ):
+        """
+        Stage data in a session TEMP table and apply it in one statement.
+
+        The staging table keeps its historical name, {schema}_{table_name}_tmp_load,
+        so existing upsert_procedure SQL can select from it, but it is now a
+        temporary table dropped on commit: it is not WAL-logged and concurrent
+        upserts to the same table each see their own copy. Without an
+        upsert_procedure, {schema}.upsert_{table_name}() is called, or with
+        generate_upsert an INSERT ... ON CONFLICT on unique_columns is run
+        instead, which needs a unique index or constraint on those columns.
+        """
         data = data.drop_duplicates(subset=unique_columns).reset_index(drop=True)
 
         temp_table_name = f"{schema}_{table_name}_tmp_load"
 
         with self.storage_connection().begin() as conn:
-            if use_base_table:
+            self._stage_temp_table(
+                conn,
+                data,
+                temp_table_name,
+                like=f"{schema}.{table_name}" if use_base_table else None,
+            )
+            if upsert_procedure:
+                conn.execute(sqlalchemy.text(upsert_procedure))
+                I(f"Upsert procedure {upsert_procedure} called")
+            elif generate_upsert:
                 conn.execute(
                     sqlalchemy.text(
-                        f"CREATE TABLE {temp_table_name} (LIKE {schema}.{table_name});"
+                        upsert_statement(
+                            f"{schema}.{table_name}",
+                            temp_table_name,
+                            [str(column) for column in data.columns],
+                            unique_columns,
+                        )
                     )
                 )
-            data.to_sql(temp_table_name, conn, if_exists="append", index=False)
-            I(f"Data loaded to temp table {temp_table_name}")
-            if upsert_procedure:
-                conn.execute(sqlalchemy.text(upsert_procedure))
-                I(f"Upsert procedure {upsert_procedure} called")
+                I(f"Generated upsert into {schema}.{table_name} on {unique_columns}")
             else:
                 conn.execute(sqlalchemy.text(f"CALL {schema}.upsert_{table_name}();"))
                 I(f"Upsert procedure {schema}.upsert_{table_name} called")
-            conn.execute(sqlalchemy.text(f"DROP TABLE {temp_table_name};"))
-            I(f"Temp table {temp_table_name} dropped")
 
         I(f"Upsert completed for {len(data)} records to {schema}.{table_name}")
 
@@ -152,6 +277,15 @@ class PostgresClient(IStorageClient):
         unique_columns: List[str] | str,
         created_at: bool = False,
     ) -> None:
+        """
+        Keep one row per key, replacing it only with a newer created_at.
+
+        Rows are staged in a TEMP table and applied with a single
+        INSERT ... ON CONFLICT, so the cost depends on the batch rather than
+        the table. This needs the unique index that migrate_to_latest_by_key
+        creates, and raises ValueError without it. Rows with a NULL key,
+        which a unique index never matches, are dropped with a warning.
+        """
         if data.empty:
             I(f"No data to store in {schema}.{table}")
             return
@@ -159,46 +293,120 @@ class PostgresClient(IStorageClient):
         if isinstance(unique_columns, str):
             unique_columns = [unique_columns]
 
-        unique_cols_str = ", ".join(unique_columns)
         if created_at:
             D(f"Adding created_at column to {schema}.{table}")
             data = data.assign(
                 created_at=datetime.now().replace(microsecond=0, second=0)
             )
+        null_keys = data[unique_columns].isna().any(axis=1)
+        if null_keys.any():
+            W(
+                f"Dropping {null_keys.sum()} rows with no {unique_columns} for {schema}.{table}"
+            )
+            data = data[~null_keys]
+            if data.empty:
+                return
+        if "created_at" in data.columns:
+            data = data.sort_values("created_at", kind="stable")
+        data = data.drop_duplicates(subset=unique_columns, keep="last")
+
+        statement = sqlalchemy.text(
+            upsert_statement(
+                f"{schema}.{table}",
+                f"{schema}_{table}_tmp_load",
+                [str(column) for column in data.columns],
+                unique_columns,
+                update_where=(
+                    "t.created_at IS NULL OR EXCLUDED.created_at >= t.created_at"
+                    if "created_at" in data.columns
+                    else None
+                ),
+            )
+        )
 
         with self.storage_connection().begin() as conn:
             D(f"Storing {len(data)} records in {schema}.{table}")
-            data.to_sql(
-                name=table,
-                con=conn,
-                schema=schema,
-                if_exists="append",
-                index=False,
+            self._stage_temp_table(
+                conn, data, f"{schema}_{table}_tmp_load", like=f"{schema}.{table}"
             )
+            try:
+                result = conn.execute(statement)
+            except sqlalchemy.exc.ProgrammingError as e:
+                if not isinstance(e.orig, psycopg2.errors.InvalidColumnReference):
+                    raise
+                raise ValueError(
+                    f"{schema}.{table} has no unique index on {unique_columns}; "
+                    "run migrate_to_latest_by_key on it once first"
+                ) from e
+
+        I(f"Stored {result.rowcount} latest records in {schema}.{table}")
+
+    def migrate_to_latest_by_key(
+        self,
+        table: str,
+        schema: str,
+        unique_columns: List[str] | str,
+    ) -> None:
+        """
+        One-off migration of a table to store_latest_data's keyed storage.
 
+        Deletes rows with a NULL key and makes the key columns NOT NULL,
+        deletes all but the newest row per key, then adds the unique index
+        that INSERT ... ON CONFLICT needs. Run it once per table, outside
+        the loads that write to it.
+        """
+        if isinstance(unique_columns, str):
+            unique_columns = [unique_columns]
+        unique_cols_str = ", ".join(quote_identifier(c) for c in unique_columns)
         with self.storage_connection().begin() as conn:
-            cleanup_query = f"""
-            DELETE FROM {schema}.{table} 
-            WHERE ctid NOT IN (
-                SELECT DISTINCT ON ({unique_cols_str}) ctid
-                FROM {schema}.{table}
-                ORDER BY {unique_cols_str}, created_at DESC
+            conn.execute(
+                sqlalchemy.text(
+                    f"LOCK TABLE {schema}.{table} IN SHARE ROW EXCLUSIVE MODE"
+                )
             )
-            """
-
+            self._migrate_null_keys(conn, table, schema, unique_columns)
+            cleanup_query = f"""
+                DELETE FROM {schema}.{table}
+                WHERE ctid NOT IN (
+                    SELECT DISTINCT ON ({unique_cols_str}) ctid
+                    FROM {schema}.{table}
+                    ORDER BY {unique_cols_str}, created_at DESC NULLS LAST
+                )
+                """
             result = conn.execute(sqlalchemy.text(cleanup_query))
-            deleted_rows = result.rowcount
-
-            I(
-                f"Cleanup completed. Deleted {deleted_rows} older records from {schema}.{table} based on columns: {unique_cols_str}"
+            I(f"Deleted {result.rowcount} older records from {schema}.{table}")
+            conn.execute(
+                sqlalchemy.text(
+                    f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_latest_key "
+                    f"ON {schema}.{table} ({unique_cols_str})"
+                )
             )
+            I(f"Unique index {table}_latest_key created on {schema}.{table}")
 
-            # Log final count
-            count_query = f"SELECT COUNT(*) as total FROM {schema}.{table}"
-            count_result = conn.execute(sqlalchemy.text(count_query))
-            total_records = count_result.fetchone()[0]
-
-            I(f"Final record count in {schema}.{table}: {total_records}")
+    def _migrate_null_keys(
+        self,
+        conn: sqlalchemy.engine.Connection,
+        table: str,
+        schema: str,
+        unique_columns: List[str],
+    ) -> None:
+        """A unique index lets NULL keys repeat, so remove them and forbid them."""
+        result = conn.execute(
+            sqlalchemy.text(
+                f"DELETE FROM {schema}.{table} WHERE "
+                + " OR ".join(f"{quote_identifier(c)} IS NULL" for c in unique_columns)
+            )
+        )
+        I(f"Deleted {result.rowcount} records with no key from {schema}.{table}")
+        conn.execute(
+            sqlalchemy.text(
+                f"ALTER TABLE {schema}.{table} "
+                + ", ".join(
+                    f"ALTER COLUMN {quote_identifier(c)} SET NOT NULL"
+                    for c in unique_columns
+                )
+            )
+        )
 
     def fetch_latest_data(
         self,
@@ -241,3 +449,59 @@ class PostgresClient(IStorageClient):
         except Exception as e:
             E(f"Error fetching latest data from {schema}.{table}: {str(e)}")
             raise
+
+
+def upsert_statement(
+    target: str,
+    source: str,
+    columns: list[str],
+    unique_columns: list[str],
+    update_where: str | None = None,
+) -> str:
+    """
+    INSERT ... ON CONFLICT copying columns from source into target.
+
+    The target is aliased as t, so update_where can compare the existing
+    row (t) with the incoming one (EXCLUDED).
+    """
+    column_list = ", ".join(quote_identifier(c) for c in columns)
+    conflict_list = ", ".join(quote_identifier(c) for c in unique_columns)
+    updates = ", ".join(
+        f"{quote_identifier(c)} = EXCLUDED.{quote_identifier(c)}"
+        for c in columns
+        if c not in unique_columns
+    )
+    action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+    if updates and update_where:
+        action = f"{action} WHERE {update_where}"
+    return (
+        f"INSERT INTO {target} AS t ({column_list}) "
+        f"SELECT {column_list} FROM {source} "
+        f"ON CONFLICT ({conflict_list}) {action}"
+    )
+
+
+def _temp_column_type(values: pd.Series) -> str:
+    """Postgres type for a staging column, following to_sql's defaults."""
+    dtype = values.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return "boolean"
+    if pd.api.types.is_integer_dtype(dtype):
+        return "bigint"
+    if pd.api.types.is_float_dtype(dtype):
+        return "double precision"
+    if isinstance(dtype, pd.DatetimeTZDtype):
+        return "timestamp with time zone"
+    if pd.api.types.is_datetime64_dtype(dtype):
+        return "timestamp"
+    if pd.api.types.is_timedelta64_dtype(dtype):
+        return "interval"
+    inferred = pd.api.types.infer_dtype(values, skipna=True)
+    return {
+        "date": "date",
+        "datetime": "timestamp",
+        "boolean": "boolean",
+        "integer": "bigint",
+        "floating": "double precision",
+        "decimal": "numeric",
+    }.get(inferred, "text")
@@ -0,0 +1,363 @@
+"""
+Daily range partitions for append-only snapshot tables.
+
+live_betting.betfair_prices gets a row per runner on every price poll. As
+one heap it had to be truncated each morning, because the day's queries
+filter on race_date but still walk an ever larger table and btree index,
+and DELETE-based retention would leave the vacuum to clear up. Partitioned
+BY RANGE on the date with one partition per day:
+
+- queries filtering on the date (v_latest_betfair_prices, backtests over a
+  date range) only scan the matching partitions
+- retention detaches and drops whole days, a catalogue change with no
+  dead tuples, optionally copying the day to Parquet first
+- a BRIN index on created_at, which rises with insertion order, covers
+  time-range scans for a few pages per partition
+
+Partitions are created ahead of time by ensure_partitions, and the trader's
+price history writer calls it for any new day before writing that day's
+rows (there is no default partition: a row for a day without one fails
+rather than landing somewhere retention never looks).
+
+ensure_partitions raises on a plain table. Converting one copies every row
+and recreates the views and triggers that depend on it, so it is a one-off
+run by hand (python -m racing_etl.main --partition-betfair-prices), in one
+transaction; grants on the table and its views are carried over, comments
+are not.
+
+DDL runs on a raw DBAPI cursor without parameters, so view definitions
+holding ':' or '%' are sent as they are.
+"""
+
+import re
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Callable
+
+import pandas as pd
+from api_helpers.helpers.logging_config import D, I, W
+
+from .postgres_copy import quote_identifier
+
+
+@dataclass(frozen=True)
+class PartitionedTable:
+    """A table partitioned by RANGE on a date column, one partition per day."""
+
+    schema: str
+    table: str
+    column: str
+    # CREATE INDEX statements run on the parent, which cascade to partitions
+    indexes: tuple[str, ...] = ()
+
+    @property
+    def qualified_name(self) -> str:
+        return f"{quote_identifier(self.schema)}.{quote_identifier(self.table)}"
+
+    def partition_name(self, day: date) -> str:
+        return f"{self.table}_{day:%Y%m%d}"
+
+    def partition_day(self, name: str) -> date | None:
+        match = re.fullmatch(rf"{re.escape(self.table)}_(\d{{8}})", name)
+        if match is None:
+            return None
+        digits = match.group(1)
+        return date(int(digits[:4]), int(digits[4:6]), int(digits[6:]))
+
+    def qualified_partition(self, day: date) -> str:
+        return (
+            f"{quote_identifier(self.schema)}."
+            f"{quote_identifier(self.partition_name(day))}"
+        )
+
+
+RELKIND_QUERY = """
+    SELECT c.relkind
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = %s AND c.relname = %s
+"""
+
+PARTITIONS_QUERY = """
+    SELECT child.relname
+    FROM pg_inherits i
+    JOIN pg_class parent ON parent.oid = i.inhparent
+    JOIN pg_class child ON child.oid = i.inhrelid
+    JOIN pg_namespace n ON n.oid = parent.relnamespace
+    WHERE n.nspname = %s AND parent.relname = %s
+"""
+
+# Views over the table, directly or through other views, deepest last so
+# they can be recreated in order
+DEPENDENT_VIEWS_QUERY = """
+    WITH RECURSIVE dependents (oid, depth) AS (
+        SELECT r.ev_class, 1
+        FROM pg_depend d
+        JOIN pg_rewrite r ON r.oid = d.objid
+        WHERE d.refobjid = %s::regclass AND r.ev_class <> d.refobjid
+        UNION ALL
+        SELECT r.ev_class, dependents.depth + 1
+        FROM dependents
+        JOIN pg_depend d ON d.refobjid = dependents.oid
+        JOIN pg_rewrite r ON r.oid = d.objid
+        WHERE r.ev_class <> d.refobjid
+    )
+    SELECT dependents.oid::regclass::text,
+           c.relkind,
+           pg_get_viewdef(dependents.oid),
+           max(depth) AS depth
+    FROM dependents
+    JOIN pg_class c ON c.oid = dependents.oid
+    GROUP BY dependents.oid, c.relkind
+    ORDER BY depth
+"""
+
+# GRANT statements recreating the privileges others hold on a relation
+GRANTS_QUERY = """
+    SELECT format(
+        'GRANT %%s ON %%s TO %%s%%s',
+        a.privilege_type,
+        c.oid::regclass,
+        CASE WHEN a.grantee = 0 THEN 'PUBLIC'
+             ELSE quote_ident(pg_get_userbyid(a.grantee)) END,
+        CASE WHEN a.is_grantable THEN ' WITH GRANT OPTION' ELSE '' END
+    )
+    FROM pg_class c, aclexplode(c.relacl) a
+    WHERE c.oid = %s::regclass AND a.grantee <> c.relowner
+"""
+
+TRIGGERS_QUERY = """
+    SELECT pg_get_triggerdef(oid)
+    FROM pg_trigger
+    WHERE tgrelid = %s::regclass AND NOT tgisinternal
+"""
+
+
+def _fetch(postgres_client, query: str, params: tuple | None = None) -> list[tuple]:
+    conn = postgres_client.storage_connection().raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+        conn.commit()
+        return rows
+    finally:
+        conn.close()
+
+
+def _execute(postgres_client, statements: list[str]) -> None:
+    """Run statements in one transaction."""
+    if not statements:
+        return
+    conn = postgres_client.storage_connection().raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            for statement in statements:
+                D(f"Executing: {statement}")
+                cursor.execute(statement)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def is_partitioned(postgres_client, spec: PartitionedTable) -> bool:
+    rows = _fetch(postgres_client, RELKIND_QUERY, (spec.schema, spec.table))
+    return bool(rows) and rows[0][0] == "p"
+
+
+def partition_days(postgres_client, spec: PartitionedTable) -> list[date]:
+    """Days with a partition, oldest first."""
+    rows = _fetch(postgres_client, PARTITIONS_QUERY, (spec.schema, spec.table))
+    days = (spec.partition_day(name) for (name,) in rows)
+    return sorted(day for day in days if day is not None)
+
+
+def create_partition_statement(spec: PartitionedTable, day: date) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS {spec.qualified_partition(day)} "
+        f"PARTITION OF {spec.qualified_name} "
+        f"FOR VALUES FROM ('{day.isoformat()}') "
+        f"TO ('{(day + timedelta(days=1)).isoformat()}')"
+    )
+
+
+def convert_statements(
+    spec: PartitionedTable,
+    days: list[date],
+    views: list[tuple[str, str, str]],
+    triggers: list[str],
+    grants: list[str] | None = None,
+) -> list[str]:
+    """
+    Statements that swap a plain table for a partitioned one holding its rows.
+
+    Args:
+        spec: The table to convert
+        days: Distinct values of the partition column in the current rows
+        views: (name, relkind, definition) of the dependent views, in
+            dependency order
+        triggers: CREATE TRIGGER statements of the table's triggers
+        grants: GRANT statements for the table and the views
+    """
+    old_table = f"{spec.table}_unpartitioned"
+    old_name = f"{quote_identifier(spec.schema)}.{quote_identifier(old_table)}"
+    statements = [
+        f"ALTER TABLE {spec.qualified_name} RENAME TO {quote_identifier(old_table)}",
+        f"CREATE TABLE {spec.qualified_name} "
+        f"(LIKE {old_name} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        f"PARTITION BY RANGE ({quote_identifier(spec.column)})",
+        *(create_partition_statement(spec, day) for day in days),
+        f"INSERT INTO {spec.qualified_name} SELECT * FROM {old_name}",
+        # Takes the dependent views with it, and frees the index names
+        f"DROP TABLE {old_name} CASCADE",
+        *spec.indexes,
+    ]
+    for name, relkind, definition in views:
+        kind = "MATERIALIZED VIEW" if relkind == "m" else "VIEW"
+        statements.append(f"CREATE {kind} {name} AS {definition.rstrip().rstrip(';')}")
+    statements.extend(triggers)
+    statements.extend(grants or [])
+    return statements
+
+
+def convert_to_partitioned(postgres_client, spec: PartitionedTable) -> None:
+    """
+    Replace a plain table with a daily-partitioned one, keeping its rows.
+
+    A one-off migration; a table already partitioned is left as it is.
+    """
+    if is_partitioned(postgres_client, spec):
+        I(f"{spec.qualified_name} is already partitioned")
+        return
+    W(f"Converting {spec.qualified_name} to daily partitions on {spec.column}")
+    days = [
+        day
+        for (day,) in _fetch(
+            postgres_client,
+            f"SELECT DISTINCT {quote_identifier(spec.column)} "
+            f"FROM {spec.qualified_name} "
+            f"WHERE {quote_identifier(spec.column)} IS NOT NULL",
+        )
+    ]
+    nulls = _fetch(
+        postgres_client,
+        f"SELECT count(*) FROM {spec.qualified_name} "
+        f"WHERE {quote_identifier(spec.column)} IS NULL",
+    )[0][0]
+    if nulls:
+        raise ValueError(
+            f"{spec.qualified_name} has {nulls} rows with no {spec.column}, "
+            "which no daily partition can hold"
+        )
+    views = [
+        (name, relkind, definition)
+        for name, relkind, definition, _ in _fetch(
+            postgres_client, DEPENDENT_VIEWS_QUERY, (spec.qualified_name,)
+        )
+    ]
+    triggers = [
+        definition
+        for (definition,) in _fetch(
+            postgres_client, TRIGGERS_QUERY, (spec.qualified_name,)
+        )
+    ]
+    grants = [
+        grant
+        for name in [spec.qualified_name] + [name for name, _, _ in views]
+        for (grant,) in _fetch(postgres_client, GRANTS_QUERY, (name,))
+    ]
+    _execute(postgres_client, convert_statements(spec, days, views, triggers, grants))
+    I(
+        f"{spec.qualified_name} partitioned: {len(days)} days, "
+        f"{len(views)} views and {len(triggers)} triggers recreated"
+    )
+
+
+def ensure_partitions(
+    postgres_client,
+    spec: PartitionedTable,
+    first_day: date,
+    days_ahead: int = 2,
+) -> None:
+    """
+    Create the partitions for first_day and the days_ahead days after it.
+
+    The indexes in spec are (re)created on the parent, where they also
+    cover partitions created before them. Raises ValueError on a plain
+    table rather than converting it; see convert_to_partitioned.
+    """
+    if not is_partitioned(postgres_client, spec):
+        raise ValueError(
+            f"{spec.qualified_name} is not partitioned; run"
+            " convert_to_partitioned on it once first"
+        )
+    days = [first_day + timedelta(days=i) for i in range(days_ahead + 1)]
+    _execute(
+        postgres_client,
+        [create_partition_statement(spec, day) for day in days] + list(spec.indexes),
+    )
+    D(f"Partitions of {spec.qualified_name} ready to {days[-1]}")
+
+
+def drop_partitions_before(
+    postgres_client,
+    spec: PartitionedTable,
+    cutoff: date,
+    archive: Callable[[date, pd.DataFrame], None] | None = None,
+) -> list[date]:
+    """
+    Detach and drop the partitions for days before cutoff.
+
+    Args:
+        postgres_client: PostgresClient
+        spec: The partitioned table
+        cutoff: First day to keep
+        archive: Called with each day's rows before it is dropped; an
+            exception leaves that partition, and later ones, in place
+
+    Returns:
+        The days dropped
+    """
+    dropped = []
+    for day in partition_days(postgres_client, spec):
+        if day >= cutoff:
+            break
+        partition = spec.qualified_partition(day)
+        if archive is not None:
+            archive(day, postgres_client.fetch_data(f"SELECT * FROM {partition}"))
+        _execute(
+            postgres_client,
+            [
+                f"ALTER TABLE {spec.qualified_name} DETACH PARTITION {partition}",
+                f"DROP TABLE {partition}",
+            ],
+        )
+        I(f"Dropped {partition}")
+        dropped.append(day)
+    return dropped
+
+
+# ============================================================================
+# live_betting.betfair_prices
+# ============================================================================
+
+BETFAIR_PRICES = PartitionedTable(
+    schema="live_betting",
+    table="betfair_prices",
+    column="race_date",
+    indexes=(
+        "CREATE INDEX IF NOT EXISTS idx_betfair_prices_selection_created "
+        "ON live_betting.betfair_prices "
+        "USING btree (selection_id, market_id_win, created_at DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_betfair_prices_created_brin "
+        "ON live_betting.betfair_prices USING brin (created_at)",
+    ),
+)
+
+
+def betfair_prices_archive_path(day: date) -> str:
+    """S3 object path of an archived betfair_prices day."""
+    return f"archive/live_betting/betfair_prices/race_date={day.isoformat()}.parquet"
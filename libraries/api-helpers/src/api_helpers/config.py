@@ -58,6 +58,28 @@ class Config(BaseSettings):
 
     stake_size: float = 50.0
 
+    price_history_delta: bool = True
+    price_history_keep_alive_seconds: int = 300
+
+    # (max minutes to the off, seconds between polls), nearest first;
+    # races further out are polled every price_poll_default_seconds
+    price_poll_adaptive: bool = True
+    price_poll_tiers: list[tuple[float, float]] = [(2, 1), (10, 5)]
+    price_poll_default_seconds: float = 60
+
+    # Read prices and orders from the Exchange Stream API, falling back to
+    # REST while it is down; raw messages are appended to the record path.
+    # Off until the stream has been run against the live exchange
+    betfair_stream: bool = False
+    betfair_stream_record_path: str | None = None
+
+    # betfair_prices is partitioned by race_date: partitions are created this
+    # many days ahead and kept for the retention period, older days are
+    # copied to S3 as Parquet first if betfair_prices_archive is set
+    betfair_prices_partitions_ahead: int = 2
+    betfair_prices_retention_days: int = 28
+    betfair_prices_archive: bool = False
+
     db: DB = DB()
 
 
@@ -1,63 +1,414 @@
+from collections import OrderedDict
+from math import comb
+from time import perf_counter
+
 import numpy as np
 import pandas as pd
-from numba import njit
+from numba import njit, prange
 
+# Above this many transitions (placed-runner sets times runners) the exact
+# engine hands over to Monte Carlo: 20 runners and 4 places is about 27,000.
+EXACT_MAX_TRANSITIONS = 2_000_000
+
+# Uniform draws for the card Monte Carlo kernel: independent, antithetic
+# pairs (u, 1 - u), or each pick's draws stratified into n_sims strata
+VARIANCE_REDUCTION = {"none": 0, "antithetic": 1, "stratified": 2}
+
+# Betfair price ladder: (from price, increment) up to 1000
+BETFAIR_TICK_BANDS = np.array(
+    [
+        (1.01, 0.01),
+        (2.0, 0.02),
+        (3.0, 0.05),
+        (4.0, 0.1),
+        (6.0, 0.2),
+        (10.0, 0.5),
+        (20.0, 1.0),
+        (30.0, 2.0),
+        (50.0, 5.0),
+        (100.0, 10.0),
+    ]
+)
+
+
+@njit("int64(float64[::1], int64, float64)", cache=True)
+def _pick(ps, n_remaining, u):
+    """Index of the runner whose cumulative share of ps first reaches u."""
+    total = 0.0
+    for j in range(n_remaining):
+        total += ps[j]
+    cumulative = 0.0
+    for j in range(n_remaining):
+        cumulative += ps[j]
+        if u * total <= cumulative:
+            return j
+    return n_remaining - 1
 
-@njit(cache=True)
-def _simulate_loop(base_probs, n_sims, n_places):
-    """JIT-compiled inner loop - no seed setting per call."""
-    n_horses = len(base_probs)
-    win_counts = np.zeros(n_horses, dtype=np.int32)
-    place_counts = np.zeros(n_horses, dtype=np.int32)
 
-    # Pre-allocate arrays once (reuse in loop)
+@njit("void(float64[:], int64, int64, int64, float64[:], float64[:])", cache=True)
+def _simulate_race(base_probs, n_sims, n_places, variance_reduction, win, place):
+    """One race's Monte Carlo into win and place, seeded by the caller."""
+    n_horses = len(base_probs)
+    K = min(n_places, n_horses)
     ps = np.empty(n_horses, dtype=np.float64)
-    indices = np.empty(n_horses, dtype=np.int32)
-    cumsum_buf = np.empty(n_horses, dtype=np.float64)
+    indices = np.empty(n_horses, dtype=np.int64)
+    draws = np.empty(K, dtype=np.float64)
+    if variance_reduction == 2:
+        # Latin hypercube: each pick's draws cover every stratum once
+        strata = np.empty((K, n_sims), dtype=np.int64)
+        for i in range(K):
+            strata[i] = np.random.permutation(n_sims)
+
+    for sim in range(n_sims):
+        if variance_reduction == 1 and sim % 2 == 1:
+            for i in range(K):
+                draws[i] = 1.0 - draws[i]
+        else:
+            for i in range(K):
+                draws[i] = np.random.rand()
+            if variance_reduction == 2:
+                for i in range(K):
+                    draws[i] = (strata[i, sim] + draws[i]) / n_sims
 
-    for _ in range(n_sims):
-        # Reset to full field
         ps[:] = base_probs
-        for idx in range(n_horses):
-            indices[idx] = idx
+        for j in range(n_horses):
+            indices[j] = j
         n_remaining = n_horses
-
-        K = min(n_places, n_horses)
         for i in range(K):
-            # Normalize in-place
-            ps_sum = 0.0
-            for j in range(n_remaining):
-                ps_sum += ps[j]
-            if ps_sum > 0:
-                for j in range(n_remaining):
-                    ps[j] /= ps_sum
-
-            # Cumsum and sample
-            cumsum_buf[0] = ps[0]
-            for j in range(1, n_remaining):
-                cumsum_buf[j] = cumsum_buf[j - 1] + ps[j]
-
-            rand_val = np.random.rand()
-            idx = 0
-            for j in range(n_remaining):
-                if rand_val <= cumsum_buf[j]:
-                    idx = j
-                    break
-
-            horse_idx = indices[idx]
-
-            # Record win/place
+            idx = _pick(ps, n_remaining, draws[i])
+            horse = indices[idx]
             if i == 0:
-                win_counts[horse_idx] += 1
-            place_counts[horse_idx] += 1
-
-            # Remove selected horse (shift arrays left)
+                win[horse] += 1.0
+            place[horse] += 1.0
             for j in range(idx, n_remaining - 1):
                 indices[j] = indices[j + 1]
                 ps[j] = ps[j + 1]
             n_remaining -= 1
 
-    return win_counts, place_counts
+    for j in range(n_horses):
+        win[j] /= n_sims
+        place[j] /= n_sims
+
+
+@njit(
+    "Tuple((float64[::1], float64[::1]))(float64[:], int64, int64[:, ::1])",
+    cache=True,
+)
+def _exact_place_probs(base_probs, n_places, binom):
+    """
+    Exact Harville place probabilities by dynamic programming.
+
+    Level k holds the probability that the first k finishers are a given
+    set of runners, in any order, indexed by the set's combinadic rank.
+    Each set passes its probability on to every runner still standing in
+    proportion to that runner's share of the remaining probability.
+    """
+    n_horses = len(base_probs)
+    K = min(n_places, n_horses)
+    win_probs = np.zeros(n_horses, dtype=np.float64)
+    place_probs = np.zeros(n_horses, dtype=np.float64)
+    members = np.empty(K, dtype=np.int64)
+
+    probs = np.ones(1, dtype=np.float64)
+    masks = np.zeros(1, dtype=np.int64)
+    for k in range(K):
+        next_probs = np.zeros(binom[n_horses, k + 1], dtype=np.float64)
+        next_masks = np.zeros(binom[n_horses, k + 1], dtype=np.int64)
+        for s in range(len(probs)):
+            prob = probs[s]
+            if prob == 0.0:
+                continue
+            mask = masks[s]
+            remaining = 1.0
+            m = 0
+            for j in range(n_horses):
+                if mask >> j & 1:
+                    remaining -= base_probs[j]
+                    members[m] = j
+                    m += 1
+            if remaining <= 0.0:
+                continue
+
+            for j in range(n_horses):
+                if mask >> j & 1:
+                    continue
+                reach = prob * base_probs[j] / remaining
+                if k == 0:
+                    win_probs[j] += reach
+                place_probs[j] += reach
+                if k + 1 == K:
+                    continue
+
+                # Rank of the set with j added: sum of C(element, position)
+                rank = 0
+                position = 1
+                added = False
+                for i in range(m):
+                    if not added and j < members[i]:
+                        rank += binom[j, position]
+                        position += 1
+                        added = True
+                    rank += binom[members[i], position]
+                    position += 1
+                if not added:
+                    rank += binom[j, position]
+                next_probs[rank] += reach
+                next_masks[rank] = mask | (1 << j)
+        probs = next_probs
+        masks = next_masks
+
+    return win_probs, place_probs
+
+
+@njit(
+    "Tuple((float64[::1], float64[::1]))"
+    "(int64[::1], float64[::1], int64[::1], int64[::1], int64, int64[::1], int64)",
+    parallel=True,
+    cache=True,
+)
+def _simulate_card(
+    offsets, base_probs, n_places, races, n_sims, seeds, variance_reduction
+):
+    """Monte Carlo for the given races of a ragged card, one race per thread."""
+    win = np.zeros(len(base_probs), dtype=np.float64)
+    place = np.zeros(len(base_probs), dtype=np.float64)
+    for r in prange(len(races)):
+        race = races[r]
+        start, end = offsets[race], offsets[race + 1]
+        # Each thread has its own generator, so seeding per race keeps a
+        # race's draws the same whichever thread runs it
+        np.random.seed(seeds[race])
+        _simulate_race(
+            base_probs[start:end],
+            n_sims,
+            n_places[race],
+            variance_reduction,
+            win[start:end],
+            place[start:end],
+        )
+    return win, place
+
+
+@njit(
+    "Tuple((float64[::1], float64[::1]))"
+    "(int64[::1], float64[::1], int64[::1], int64[::1], int64[:, ::1])",
+    parallel=True,
+    cache=True,
+)
+def _exact_card(offsets, base_probs, n_places, races, binom):
+    """Exact probabilities for the given races of a ragged card."""
+    win = np.zeros(len(base_probs), dtype=np.float64)
+    place = np.zeros(len(base_probs), dtype=np.float64)
+    for r in prange(len(races)):
+        race = races[r]
+        start, end = offsets[race], offsets[race + 1]
+        race_win, race_place = _exact_place_probs(
+            base_probs[start:end], n_places[race], binom
+        )
+        win[start:end] = race_win
+        place[start:end] = race_place
+    return win, place
+
+
+def exact_transitions(n_horses: int, n_places: int) -> int:
+    """Work for the exact engine: sets of placed runners times field size."""
+    return n_horses * sum(comb(n_horses, k) for k in range(min(n_places, n_horses)))
+
+
+def _binomial_table(n: int, k: int) -> np.ndarray:
+    return np.array(
+        [[comb(i, j) for j in range(k + 1)] for i in range(n + 1)], dtype=np.int64
+    )
+
+
+def to_betfair_ticks(prices: np.ndarray) -> np.ndarray:
+    """Round prices to the nearest step on the Betfair price ladder."""
+    prices = np.clip(np.asarray(prices, dtype=np.float64), 1.01, 1000.0)
+    band = np.searchsorted(BETFAIR_TICK_BANDS[:, 0], prices, side="right") - 1
+    start, step = BETFAIR_TICK_BANDS[band, 0], BETFAIR_TICK_BANDS[band, 1]
+    return np.round(start + np.round((prices - start) / step) * step, 2)
+
+
+class PlaceProbabilityCache:
+    """
+    Bounded LRU cache of win and place probabilities by market shape.
+
+    Keyed by n_places, the simulation settings and the field's sorted,
+    tick-rounded win prices, so a race whose prices have not moved a tick
+    since the last cycle, or any other race with the same prices computed
+    the same way, is a lookup. Probabilities are stored
+    in sorted-price order and mapped back onto the runners by each caller.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple, tuple[np.ndarray, np.ndarray]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple) -> tuple[np.ndarray, np.ndarray] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: tuple, value: tuple[np.ndarray, np.ndarray]) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+place_probability_cache = PlaceProbabilityCache()
+
+
+def _card_probs(
+    offsets: np.ndarray,
+    prices: np.ndarray,
+    n_places: np.ndarray,
+    n_sims: int,
+    seed: int,
+    variance_reduction: str,
+    max_exact_transitions: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    sizes = np.diff(offsets)
+    base_probs = 1.0 / prices
+    base_probs /= np.repeat(np.add.reduceat(base_probs, offsets[:-1]), sizes)
+
+    exact = np.array(
+        [
+            size < 63 and exact_transitions(size, places) <= max_exact_transitions
+            for size, places in zip(sizes.tolist(), n_places.tolist())
+        ],
+        dtype=bool,
+    )
+    win = np.zeros(len(prices))
+    place = np.zeros(len(prices))
+    if exact.any():
+        binom = _binomial_table(int(sizes[exact].max()), int(n_places[exact].max()))
+        win, place = _exact_card(
+            offsets, base_probs, n_places, np.flatnonzero(exact), binom
+        )
+    if not exact.all():
+        seeds = np.random.SeedSequence(seed).generate_state(len(sizes))
+        mc_win, mc_place = _simulate_card(
+            offsets,
+            base_probs,
+            n_places,
+            np.flatnonzero(~exact),
+            n_sims,
+            seeds.astype(np.int64),
+            VARIANCE_REDUCTION[variance_reduction],
+        )
+        simulated = np.repeat(~exact, sizes)
+        win[simulated], place[simulated] = mc_win[simulated], mc_place[simulated]
+    return win, place
+
+
+def card_place_probabilities(
+    offsets: np.ndarray,
+    prices: np.ndarray,
+    n_places: np.ndarray,
+    n_sims: int = 10000,
+    seed: int = 42,
+    variance_reduction: str = "none",
+    max_exact_transitions: int = EXACT_MAX_TRANSITIONS,
+    cache: PlaceProbabilityCache | None = place_probability_cache,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Win and place probabilities for a whole card in one call.
+
+    prices holds every race's runners back to back, race r being
+    prices[offsets[r]:offsets[r + 1]] with n_places[r] places. Races are
+    spread across cores, exactly or by Monte Carlo as in
+    simulate_place_counts, each Monte Carlo race with its own random
+    stream from seed so results do not depend on threading. With a cache,
+    only races missing from it are computed, on tick-rounded prices.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    prices = np.asarray(prices, dtype=np.float64)
+    n_places = np.asarray(n_places, dtype=np.int64)
+    if cache is None:
+        return _card_probs(
+            offsets,
+            prices,
+            n_places,
+            n_sims,
+            seed,
+            variance_reduction,
+            max_exact_transitions,
+        )
+
+    # Every setting that changes the result is part of the key, so callers
+    # sharing the module cache with different settings do not collide
+    settings = (n_sims, seed, variance_reduction, max_exact_transitions)
+    ticks = to_betfair_ticks(prices)
+    win, place = np.empty(len(prices)), np.empty(len(prices))
+    orders, keys, missing = [], [], []
+    for race, (start, end) in enumerate(zip(offsets[:-1], offsets[1:])):
+        order = start + np.argsort(ticks[start:end], kind="stable")
+        key = (int(n_places[race]), settings, tuple(ticks[order].tolist()))
+        entry = cache.get(key)
+        if entry is None:
+            missing.append(race)
+        else:
+            win[order], place[order] = entry
+        orders.append(order)
+        keys.append(key)
+
+    if missing:
+        sorted_rows = np.concatenate([orders[race] for race in missing])
+        sizes = np.array([len(orders[race]) for race in missing])
+        missing_win, missing_place = _card_probs(
+            np.concatenate([[0], np.cumsum(sizes)]),
+            ticks[sorted_rows],
+            n_places[missing],
+            n_sims,
+            seed,
+            variance_reduction,
+            max_exact_transitions,
+        )
+        win[sorted_rows], place[sorted_rows] = missing_win, missing_place
+        for race, start, end in zip(
+            missing, np.cumsum(sizes) - sizes, np.cumsum(sizes)
+        ):
+            cache.put(keys[race], (missing_win[start:end], missing_place[start:end]))
+    return win, place
+
+
+def place_probabilities(
+    prices: np.ndarray,
+    n_places: int,
+    n_sims: int = 10000,
+    seed: int = 42,
+    max_exact_transitions: int = EXACT_MAX_TRANSITIONS,
+    cache: PlaceProbabilityCache | None = place_probability_cache,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Win and top-n_places probabilities for one race, in the given order.
+
+    A card of one race; see card_place_probabilities.
+    """
+    return card_place_probabilities(
+        [0, len(prices)],
+        prices,
+        [n_places],
+        n_sims=n_sims,
+        seed=seed,
+        max_exact_transitions=max_exact_transitions,
+        cache=cache,
+    )
 
 
 def simulate_place_counts(
@@ -67,32 +418,38 @@ def simulate_place_counts(
     n_places: int = 3,
     n_sims: int = 10000,
     seed: int = 42,
+    max_exact_transitions: int = EXACT_MAX_TRANSITIONS,
+    cache: PlaceProbabilityCache | None = place_probability_cache,
 ):
-    """Optimized - assumes unique horses in df."""
-    horses = data[horse_col].values
-    prices = data[price_col].values
+    """
+    Win and top-n_places probabilities under the Harville model.
 
-    # Compute implied probabilities
-    base_probs = 1.0 / prices
-    base_probs = base_probs / base_probs.sum()
-
-    np.random.seed(seed)
-    win_counts, place_counts = _simulate_loop(base_probs, n_sims, n_places)
-
-    out = (
-        pd.DataFrame(
-            {
-                "horse": horses,
-                "win_prob": win_counts / n_sims,
-                "sim_place_prob": place_counts / n_sims,
-            }
-        )
-        .sort_values(["sim_place_prob", "win_prob"], ascending=False)
-        .reset_index(drop=True)
+    Computed exactly while the field is small enough that
+    exact_transitions() is within max_exact_transitions, otherwise from
+    n_sims Monte Carlo races, and looked up in cache when given (see
+    place_probabilities). Assumes unique horses in data.
+    """
+    horses = data[horse_col].values
+    win_probs, place_probs = place_probabilities(
+        data[price_col].values,
+        n_places,
+        n_sims=n_sims,
+        seed=seed,
+        max_exact_transitions=max_exact_transitions,
+        cache=cache,
     )
 
-    out["sim_place_price"] = 1 / out["sim_place_prob"]
-    return out
+    # Most likely to place first, then to win; a cache hit leaves this
+    # frame as the remaining cost, so it is built once, already sorted
+    order = np.lexsort((-win_probs, -place_probs))
+    return pd.DataFrame(
+        {
+            "horse": horses[order],
+            "win_prob": win_probs[order],
+            "sim_place_prob": place_probs[order],
+            "sim_place_price": 1 / place_probs[order],
+        }
+    )
 
 
 def simulate_place_prices(data: pd.DataFrame) -> pd.DataFrame:
@@ -121,7 +478,7 @@ def simulate_place_prices(data: pd.DataFrame) -> pd.DataFrame:
         n_places=calculate_num_places(len(df_work), race_class),
         n_sims=10000,
         seed=7,
-    )
+    ).rename(columns={"sim_place_price": "sim_place_sp"})
 
     # Calculate probabilities and differences
     sim_results["sim_proba"] = (1 / sim_results["sim_place_sp"]).round(4)
@@ -157,3 +514,23 @@ def calculate_num_places(number_of_runners: int, race_class: str) -> int:
     if number_of_runners < 16:
         return 3
     return 4
+
+
+def warm_up() -> float:
+    """
+    Load the simulation kernels and run each path once.
+
+    The kernels are compiled by signature at import (or loaded from numba's
+    on-disk cache); this also starts the thread pool and the pandas paths,
+    so the first real race is not slowed. Returns the seconds taken.
+    """
+    start = perf_counter()
+    race = pd.DataFrame(
+        {"horse_name": ["a", "b", "c", "d"], "betfair_win_sp": [2.0, 4.0, 6.0, 9.0]}
+    )
+    simulate_place_counts(race, n_places=2, cache=None)
+    simulate_place_counts(
+        race, n_places=2, n_sims=100, max_exact_transitions=0, cache=None
+    )
+    card_place_probabilities([0, 4, 8], np.tile(race["betfair_win_sp"], 2), [2, 2])
+    return perf_counter() - start
@@ -86,6 +86,7 @@ class IStorageClient(Protocol):
         unique_columns: list[str],
         use_base_table: bool = False,
         upsert_procedure: str | None = None,
+        generate_upsert: bool = False,
     ) -> None:
         """
         Upsert data into the specified table and schema.
@@ -95,8 +96,11 @@ class IStorageClient(Protocol):
             schema (str): The schema name.
             table_name (str): The name of the table to upsert the data into.
             unique_columns (List[str]): List of column names that define the uniqueness of a row.
-            use_base_table (bool, optional): Whether to use the base table to create a temp table. Defaults to False.
-            upsert_procedure (str | None, optional): The upsert procedure to call. Defaults to None.
+            use_base_table (bool, optional): Whether to create the temp table LIKE the base table. Defaults to False.
+            upsert_procedure (str | None, optional): SQL applying the temp table to the base table. Defaults to None,
+                which calls the {schema}.upsert_{table_name}() procedure.
+            generate_upsert (bool, optional): Without an upsert_procedure, apply the temp table with a generated
+                INSERT ... ON CONFLICT on unique_columns instead of the procedure. Defaults to False.
         Returns:
             None
 
@@ -116,8 +120,9 @@ class IStorageClient(Protocol):
         """
         Store data in the specified table, keeping only the latest records based on unique columns.
 
-        This method appends the data to the table and then removes older records,
-        keeping only the most recent record for each unique combination of the specified columns.
+        Each unique combination of the specified columns keeps a single row, which
+        is only replaced by a record with a newer (or equal) created_at. Records
+        with a missing key are not stored.
 
         Args:
             data (pd.DataFrame): The data to be stored.
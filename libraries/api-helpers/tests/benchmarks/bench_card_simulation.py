@@ -0,0 +1,119 @@
+"""
+Benchmark pricing a whole card in one batched call against race by race.
+
+Builds a card of --races races of 5-16 runners and times:
+  - race by race: simulate_place_counts per race, Monte Carlo, as the
+    trader priced imminent races before the card kernel
+  - the card Monte Carlo kernel with each variance reduction option
+  - the card exact kernel
+
+then reports each Monte Carlo option's place probability error against
+the exact answer over --repeats seeds, and the draws it needs to match the
+plain simulation's standard error at --sims.
+
+Usage:
+    python -m tests.benchmarks.bench_card_simulation --races 60 --sims 10000
+"""
+
+import argparse
+from time import perf_counter
+
+import numba
+import numpy as np
+import pandas as pd
+from api_helpers.helpers.simulation import (
+    VARIANCE_REDUCTION,
+    card_place_probabilities,
+    simulate_place_counts,
+    to_betfair_ticks,
+)
+
+
+def make_card(n_races: int, rng) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    sizes = rng.integers(5, 17, n_races)
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    prices = to_betfair_ticks(rng.lognormal(2.2, 0.8, offsets[-1]) + 1)
+    n_places = np.select([sizes < 8, sizes < 16], [2, 3], 4)
+    return offsets, prices, n_places
+
+
+def race_by_race(offsets, prices, n_places, n_sims: int) -> None:
+    for race, (start, end) in enumerate(zip(offsets[:-1], offsets[1:])):
+        simulate_place_counts(
+            pd.DataFrame(
+                {
+                    "horse_name": np.arange(end - start),
+                    "betfair_win_sp": prices[start:end],
+                }
+            ),
+            n_places=int(n_places[race]),
+            n_sims=n_sims,
+            seed=7,
+            max_exact_transitions=0,
+            cache=None,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--races", type=int, default=60)
+    parser.add_argument("--sims", type=int, default=10000)
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    offsets, prices, n_places = make_card(args.races, rng)
+    card = (offsets, prices, n_places)
+    monte_carlo = {"max_exact_transitions": 0, "cache": None}
+
+    # Compile every kernel outside the timings
+    race_by_race(offsets[:2], prices, n_places, 1000)
+    for option in VARIANCE_REDUCTION:
+        card_place_probabilities(
+            *card, n_sims=10, variance_reduction=option, **monte_carlo
+        )
+    _, exact = card_place_probabilities(*card, cache=None)
+
+    print(
+        f"{args.races} races, {offsets[-1]} runners, {args.sims:,} draws, "
+        f"{numba.get_num_threads()} threads\n"
+    )
+    timings = []
+    start = perf_counter()
+    race_by_race(offsets, prices, n_places, args.sims)
+    timings.append(("race by race", perf_counter() - start))
+    for option in VARIANCE_REDUCTION:
+        start = perf_counter()
+        card_place_probabilities(
+            *card, n_sims=args.sims, variance_reduction=option, **monte_carlo
+        )
+        timings.append((f"card {option}", perf_counter() - start))
+    start = perf_counter()
+    card_place_probabilities(*card, cache=None)
+    timings.append(("card exact", perf_counter() - start))
+    for label, seconds in timings:
+        print(f"{label:<20}{seconds * 1000:>10.1f} ms")
+
+    print(f"\n{'option':<20}{'rmse':>10}{'draws for same error':>24}")
+    baseline = None
+    for option in VARIANCE_REDUCTION:
+        errors = np.concatenate(
+            [
+                card_place_probabilities(
+                    *card,
+                    n_sims=args.sims,
+                    seed=seed,
+                    variance_reduction=option,
+                    **monte_carlo,
+                )[1]
+                - exact
+                for seed in range(args.repeats)
+            ]
+        )
+        rmse = np.sqrt(np.mean(errors**2))
+        baseline = baseline or rmse
+        print(f"{option:<20}{rmse:>10.5f}{args.sims * (rmse / baseline) ** 2:>24,.0f}")
+
+
+if __name__ == "__main__":
+    main()
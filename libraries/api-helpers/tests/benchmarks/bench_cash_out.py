@@ -0,0 +1,83 @@
+"""
+Benchmark BetFairCashOut's NumPy kernel against the pandas calculation.
+
+Builds a frame of matched positions across a card, a back and a lay row for
+every third runner and one side for the rest, and times both cash_out
+implementations over it.
+
+Usage:
+    python -m tests.benchmarks.bench_cash_out --markets 1 10 60 --repeats 20
+"""
+
+import argparse
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+from api_helpers.clients.betfair_client import BetFairCashOut
+
+from ..fixtures.cash_out_reference import PandasCashOut
+
+RUNNERS_PER_MARKET = 12
+
+
+def make_positions(n_markets: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    rows = []
+    for market in range(n_markets):
+        for runner in range(RUNNERS_PER_MARKET):
+            sides = (
+                ["BACK", "LAY"] if runner % 3 == 0 else [rng.choice(["BACK", "LAY"])]
+            )
+            rows.extend((f"1.{market}", 1000 * market + runner, side) for side in sides)
+    n_rows = len(rows)
+    market_ids, selection_ids, sides = zip(*rows)
+    price = rng.uniform(2.0, 15.0, n_rows).round(2)
+    return pd.DataFrame(
+        {
+            "market_id": market_ids,
+            "selection_id": selection_ids,
+            "selection_type": sides,
+            "average_price_matched": price,
+            "size_matched": rng.uniform(2.0, 50.0, n_rows).round(2),
+            "market": "WIN",
+            "status": "ACTIVE",
+            "back_price_1": (price - 0.1).round(2),
+            "back_price_1_depth": rng.integers(1, 200, n_rows),
+            "back_price_2": (price - 0.2).round(2),
+            "back_price_2_depth": rng.integers(1, 200, n_rows),
+            "lay_price_1": (price + 0.1).round(2),
+            "lay_price_1_depth": rng.integers(1, 200, n_rows),
+            "lay_price_2": (price + 0.2).round(2),
+            "lay_price_2_depth": rng.integers(1, 200, n_rows),
+        }
+    )
+
+
+def time_cash_out(cash_out, data: pd.DataFrame, repeats: int) -> float:
+    start = perf_counter()
+    for _ in range(repeats):
+        cash_out.cash_out(data)
+    return (perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--markets", type=int, nargs="+", default=[1, 10, 60])
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'markets':>8}{'rows':>8}{'pandas ms':>12}{'numpy ms':>12}{'speedup':>10}")
+    for n_markets in args.markets:
+        data = make_positions(n_markets)
+        assert BetFairCashOut().cash_out(data) == PandasCashOut().cash_out(data)
+        pandas_time = time_cash_out(PandasCashOut(), data, args.repeats)
+        numpy_time = time_cash_out(BetFairCashOut(), data, args.repeats)
+        print(
+            f"{n_markets:>8}{len(data):>8}{pandas_time * 1000:>12.2f}"
+            f"{numpy_time * 1000:>12.2f}{pandas_time / numpy_time:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Measure the simulation engine's cold-start latency in fresh processes.
+
+Each run starts a new interpreter that imports api_helpers.helpers.simulation,
+optionally calls warm_up(), then times the first simulate_place_counts call
+on a 12-runner race, which is what the first API request or trader cycle
+after a restart pays. Runs with an empty numba cache (a fresh deploy) and
+with the cache filled by the previous run (a restart).
+
+Usage:
+    python -m tests.benchmarks.bench_cold_start --repeats 3
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+PROBE = """
+import json
+from time import perf_counter
+
+start = perf_counter()
+from api_helpers.helpers import simulation
+imported = perf_counter()
+warm = simulation.warm_up() if {warm} else 0.0
+
+import numpy as np
+import pandas as pd
+
+race = pd.DataFrame(
+    {{"horse_name": np.arange(12), "betfair_win_sp": np.linspace(2.5, 40, 12)}}
+)
+first = perf_counter()
+simulation.simulate_place_counts(race, n_places=3, cache=None)
+after_first = perf_counter()
+simulation.simulate_place_counts(race, n_places=3, cache=None)
+second = perf_counter() - after_first
+print(json.dumps([imported - start, warm, after_first - first, second]))
+"""
+
+
+def probe(cache_dir: str, warm: bool) -> list[float]:
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(warm=warm)],
+        env={**os.environ, "NUMBA_CACHE_DIR": cache_dir},
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'run':<24}{'import s':>10}{'warm_up s':>11}"
+        f"{'first call ms':>15}{'next call ms':>14}"
+    )
+    for _ in range(args.repeats):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            for label, warm in (
+                ("empty cache", False),
+                ("filled cache", False),
+                ("filled cache, warm_up", True),
+            ):
+                imported, warmed, first, second = probe(cache_dir, warm)
+                print(
+                    f"{label:<24}{imported:>10.2f}{warmed:>11.3f}"
+                    f"{first * 1000:>15.2f}{second * 1000:>14.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
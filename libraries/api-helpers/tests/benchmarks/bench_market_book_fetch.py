@@ -0,0 +1,80 @@
+"""
+Benchmark batched market book fetching against the per-market baseline.
+
+Runs BetFairClient._process_combined_market_data against a fake trading
+client that sleeps for a configurable latency on every API call, so the
+effect of batching and concurrency can be measured without a network.
+
+Usage:
+    python -m tests.benchmarks.bench_market_book_fetch --latency 0.08 --races 50
+"""
+
+import argparse
+from time import perf_counter
+from unittest.mock import patch
+
+from api_helpers.clients import betfair_client
+from api_helpers.clients.betfair_client import (
+    PRICE_PROJECTION,
+    BetFairCashOut,
+    BetFairClient,
+    BetfairCredentials,
+    price_projection_weight,
+)
+
+from ..fixtures.fake_trading_client import FakeTradingClient, make_card
+
+
+def run_once(markets, latency: float, workers: int) -> tuple[float, int, object]:
+    client = BetFairClient(
+        BetfairCredentials(username="", password="", app_key="", certs_path=""),
+        BetFairCashOut(),
+        market_book_workers=workers,
+    )
+    client.trading_client = FakeTradingClient(markets=markets, latency=latency)
+    runners = {r.selection_id: r.runner_name for m in markets for r in m.runners}
+
+    start = perf_counter()
+    data = client._process_combined_market_data(markets, runners)
+    elapsed = perf_counter() - start
+    return elapsed, len(client.trading_client.betting.calls), data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.08, help="Seconds per call")
+    parser.add_argument("--races", type=int, default=50)
+    parser.add_argument("--runners", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    markets = make_card(n_races=args.races, n_runners=args.runners)
+    print(
+        f"{len(markets)} markets, {args.runners} runners each, "
+        f"{args.latency * 1000:.0f}ms per call"
+    )
+
+    # One market per request, one request at a time: the pre-batching behaviour
+    with patch.object(
+        betfair_client,
+        "MAX_REQUEST_WEIGHT",
+        price_projection_weight(PRICE_PROJECTION),
+    ):
+        baseline_time, baseline_calls, baseline_data = run_once(
+            markets, args.latency, workers=1
+        )
+    batched_time, batched_calls, batched_data = run_once(
+        markets, args.latency, workers=args.workers
+    )
+
+    if not batched_data.equals(baseline_data):
+        raise AssertionError("Batched fetch returned a different DataFrame")
+
+    print(f"{'mode':<12}{'requests':>10}{'seconds':>10}")
+    print(f"{'per-market':<12}{baseline_calls:>10}{baseline_time:>10.3f}")
+    print(f"{'batched':<12}{batched_calls:>10}{batched_time:>10.3f}")
+    print(f"speedup: {baseline_time / batched_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
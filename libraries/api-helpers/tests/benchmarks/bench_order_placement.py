@@ -0,0 +1,101 @@
+"""
+Benchmark batched, concurrent order placement against one order at a time.
+
+Places a cycle's worth of orders through BetFairClient.place_orders using a
+fake trading client that sleeps for a configurable latency on every API
+call. The baseline calls place_order for each order in turn, which is what
+place_orders and the trader's executor did before batching.
+
+Usage:
+    python -m tests.benchmarks.bench_order_placement --latency 0.08 --markets 20
+"""
+
+import argparse
+from time import perf_counter
+
+from api_helpers.clients.betfair_client import (
+    BetFairCashOut,
+    BetFairClient,
+    BetfairCredentials,
+    BetFairOrder,
+)
+
+from ..fixtures.fake_trading_client import FakeTradingClient
+
+
+def make_orders(
+    n_markets: int, orders_per_market: int, strategies_per_market: int
+) -> list[BetFairOrder]:
+    return [
+        BetFairOrder(
+            size=2.0,
+            price=3.5,
+            selection_id=str(1000 * market + i),
+            market_id=f"1.{200_000_000 + market}",
+            side="BACK",
+            strategy=f"strategy-{market}-{i % strategies_per_market}",
+        )
+        for market in range(n_markets)
+        for i in range(orders_per_market)
+    ]
+
+
+def make_client(latency: float, workers: int) -> BetFairClient:
+    client = BetFairClient(
+        BetfairCredentials(username="", password="", app_key="", certs_path=""),
+        BetFairCashOut(),
+        place_order_workers=workers,
+    )
+    client.trading_client = FakeTradingClient(markets=[], latency=latency)
+    return client
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.08, help="Seconds per call")
+    parser.add_argument("--markets", type=int, default=20)
+    parser.add_argument("--orders-per-market", type=int, default=3)
+    parser.add_argument(
+        "--strategies-per-market",
+        type=int,
+        default=3,
+        help="Distinct customer strategy refs per market, each needs its own request",
+    )
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    orders = make_orders(
+        args.markets, args.orders_per_market, args.strategies_per_market
+    )
+    print(
+        f"{len(orders)} orders over {args.markets} markets, "
+        f"{args.latency * 1000:.0f}ms per call"
+    )
+
+    serial = make_client(args.latency, workers=1)
+    start = perf_counter()
+    serial_results = [serial.place_order(order) for order in orders]
+    serial_time = perf_counter() - start
+
+    batched = make_client(args.latency, workers=args.workers)
+    start = perf_counter()
+    batched_results = batched.place_orders(orders)
+    batched_time = perf_counter() - start
+
+    if batched_results != serial_results:
+        raise AssertionError("Batched placement returned different results")
+
+    print(f"{'mode':<12}{'requests':>10}{'seconds':>10}")
+    print(
+        f"{'serial':<12}{len(serial.trading_client.betting.calls):>10}"
+        f"{serial_time:>10.3f}"
+    )
+    print(
+        f"{'batched':<12}{len(batched.trading_client.betting.calls):>10}"
+        f"{batched_time:>10.3f}"
+    )
+    print(f"speedup: {serial_time / batched_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Benchmark exact place probabilities against the Monte Carlo kernel.
+
+For each field size, times the two numba kernels on their own and
+simulate_place_counts end to end (exactly, and with n_sims Monte Carlo
+races), and reports the largest place probability error
+of the simulation against the exact answer, over a set of random fields.
+
+Then replays --cycles price cycles of a card whose prices move a tick at a
+time, as the trader sees them, with and without the place probability
+cache, and reports the hit rate.
+
+Usage:
+    python -m tests.benchmarks.bench_place_probabilities --races 200
+"""
+
+import argparse
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+from api_helpers.helpers.simulation import (
+    _binomial_table,
+    _exact_place_probs,
+    _simulate_race,
+    exact_transitions,
+    PlaceProbabilityCache,
+    simulate_place_counts,
+    to_betfair_ticks,
+)
+
+FIELDS = [(5, 2), (8, 3), (12, 3), (16, 4), (20, 4), (24, 4)]
+
+
+def make_races(n_runners: int, n_races: int, rng) -> list[pd.DataFrame]:
+    return [
+        pd.DataFrame(
+            {
+                "horse_name": np.arange(n_runners),
+                "betfair_win_sp": np.round(rng.lognormal(2.2, 0.8, n_runners) + 1, 2),
+            }
+        )
+        for _ in range(n_races)
+    ]
+
+
+def timed(races: list[pd.DataFrame], **kwargs) -> tuple[float, list[pd.DataFrame]]:
+    start = perf_counter()
+    out = [
+        simulate_place_counts(race, cache=None, **kwargs).set_index("horse")
+        for race in races
+    ]
+    return (perf_counter() - start) / len(races), out
+
+
+def kernel_seconds(
+    races: list[pd.DataFrame], n_places: int, n_sims: int
+) -> tuple[float, float]:
+    probs = []
+    for race in races:
+        p = 1.0 / race["betfair_win_sp"].to_numpy()
+        probs.append(p / p.sum())
+    binom = _binomial_table(len(probs[0]), n_places)
+
+    start = perf_counter()
+    for p in probs:
+        _exact_place_probs(p, n_places, binom)
+    exact = perf_counter() - start
+
+    start = perf_counter()
+    for p in probs:
+        _simulate_race(p, n_sims, n_places, 0, np.zeros(len(p)), np.zeros(len(p)))
+    return exact / len(races), (perf_counter() - start) / len(races)
+
+
+def card_cycles(
+    n_races: int, n_cycles: int, move_probability: float, rng
+) -> list[list[pd.DataFrame]]:
+    """Each cycle's races, each runner moving a tick with move_probability."""
+    races = make_races(12, n_races, rng)
+    cycles = []
+    for _ in range(n_cycles):
+        cycle = []
+        for race in races:
+            prices = race["betfair_win_sp"].to_numpy()
+            moves = rng.choice(
+                [-1, 0, 1],
+                len(prices),
+                p=[move_probability / 2, 1 - move_probability, move_probability / 2],
+            )
+            race["betfair_win_sp"] = to_betfair_ticks(prices * (1 + 0.011 * moves))
+            cycle.append(race.copy())
+        cycles.append(cycle)
+    return cycles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--races", type=int, default=200)
+    parser.add_argument("--sims", type=int, default=10000)
+    parser.add_argument("--cycles", type=int, default=120)
+    parser.add_argument("--card", type=int, default=30, help="Races on the card")
+    parser.add_argument("--move-probability", type=float, default=0.05)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    # Compile both kernels outside the timings
+    warm = make_races(4, 1, rng)
+    simulate_place_counts(warm[0], n_places=2)
+    simulate_place_counts(warm[0], n_places=2, max_exact_transitions=0)
+    kernel_seconds(warm, 2, 10)
+
+    print(
+        f"{'runners':>8}{'places':>7}{'transitions':>13}"
+        f"{'exact us':>10}{'mc us':>9}{'exact ms':>10}{'mc ms':>9}"
+        f"{'mc max err':>12}{'mc mean err':>13}"
+    )
+    for n_runners, n_places in FIELDS:
+        races = make_races(n_runners, args.races, rng)
+        exact_kernel, mc_kernel = kernel_seconds(races, n_places, args.sims)
+        exact_s, exact = timed(races, n_places=n_places)
+        mc_s, mc = timed(
+            races, n_places=n_places, n_sims=args.sims, max_exact_transitions=0
+        )
+        errors = np.concatenate(
+            [
+                (m["sim_place_prob"] - e.loc[m.index, "sim_place_prob"]).abs()
+                for e, m in zip(exact, mc)
+            ]
+        )
+        print(
+            f"{n_runners:>8}{n_places:>7}{exact_transitions(n_runners, n_places):>13,}"
+            f"{exact_kernel * 1e6:>10.1f}{mc_kernel * 1e6:>9.1f}"
+            f"{exact_s * 1000:>10.3f}{mc_s * 1000:>9.3f}"
+            f"{errors.max():>12.4f}{errors.mean():>13.4f}"
+        )
+
+    cycles = card_cycles(args.card, args.cycles, args.move_probability, rng)
+    cache = PlaceProbabilityCache()
+    print(f"\n{args.cycles} cycles of {args.card} races, 12 runners, 3 places")
+    for label, kwargs in (
+        ("uncached", {"cache": None}),
+        ("cached", {"cache": cache}),
+        ("uncached mc", {"cache": None, "max_exact_transitions": 0}),
+        ("cached mc", {"cache": PlaceProbabilityCache(), "max_exact_transitions": 0}),
+    ):
+        start = perf_counter()
+        for cycle in cycles:
+            for race in cycle:
+                simulate_place_counts(race, n_places=3, **kwargs)
+        seconds = perf_counter() - start
+        print(f"{label:<12}{seconds / args.cycles * 1000:>9.1f} ms per cycle")
+    print(
+        f"cache: {cache.hits:,} hits, {cache.misses:,} misses "
+        f"({cache.hits / (cache.hits + cache.misses):.0%})"
+    )
+
+
+if __name__ == "__main__":
+    main()
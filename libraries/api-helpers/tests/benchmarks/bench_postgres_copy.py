@@ -0,0 +1,89 @@
+"""
+Benchmark COPY against to_sql for PostgresClient.store_data.
+
+Needs a Postgres server, configured through the usual DB_* settings. Each
+size is written to a scratch table shaped like live_betting.betfair_prices
+(text, integer, numeric, nullable and timestamp columns) once per path.
+
+Usage:
+    python -m tests.benchmarks.bench_postgres_copy --sizes 1000 100000 1000000
+"""
+
+import argparse
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+from api_helpers.clients import get_postgres_client
+
+SCHEMA = "public"
+TABLE = "bench_bulk_load"
+
+
+def make_frame(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    prices = rng.uniform(1.01, 50, n_rows).round(2)
+    prices[rng.random(n_rows) < 0.1] = np.nan
+    return pd.DataFrame(
+        {
+            "horse_name": [f"Horse {i}" for i in range(n_rows)],
+            "market_id_win": [f"1.{i % 500:09d}" for i in range(n_rows)],
+            "selection_id": pd.array(
+                np.where(rng.random(n_rows) < 0.01, None, np.arange(n_rows)),
+                dtype="Int64",
+            ),
+            "back_price_1_win": prices,
+            "back_price_1_depth_win": rng.uniform(0, 5000, n_rows).round(2),
+            "race_time": pd.Timestamp("2026-06-06 14:00")
+            + pd.to_timedelta(rng.integers(0, 480, n_rows), unit="min"),
+            "created_at": pd.Timestamp("2026-06-06 12:00", tz="UTC")
+            + pd.to_timedelta(np.arange(n_rows), unit="s"),
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000]
+    )
+    args = parser.parse_args()
+
+    client = get_postgres_client()
+    client.execute_query(f"DROP TABLE IF EXISTS {SCHEMA}.{TABLE}")
+    client.execute_query(
+        f"""
+        CREATE TABLE {SCHEMA}.{TABLE} (
+            horse_name varchar(255),
+            market_id_win varchar(32),
+            selection_id integer,
+            back_price_1_win numeric(8,2),
+            back_price_1_depth_win numeric(15,2),
+            race_time timestamp without time zone,
+            created_at timestamp with time zone
+        )
+        """
+    )
+
+    print(f"{'rows':>10}{'to_sql rows/s':>16}{'COPY rows/s':>16}{'speedup':>10}")
+    try:
+        for n_rows in args.sizes:
+            data = make_frame(n_rows)
+            timings = {}
+            for use_copy in (False, True):
+                client.use_copy = use_copy
+                client.execute_query(f"TRUNCATE {SCHEMA}.{TABLE}")
+                start = perf_counter()
+                client.store_data(data, table=TABLE, schema=SCHEMA)
+                timings[use_copy] = perf_counter() - start
+            print(
+                f"{n_rows:>10}{n_rows / timings[False]:>16,.0f}"
+                f"{n_rows / timings[True]:>16,.0f}"
+                f"{timings[False] / timings[True]:>9.1f}x"
+            )
+    finally:
+        client.execute_query(f"DROP TABLE IF EXISTS {SCHEMA}.{TABLE}")
+
+
+if __name__ == "__main__":
+    main()
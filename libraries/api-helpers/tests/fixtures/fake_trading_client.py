@@ -0,0 +1,138 @@
+"""
+Fake betfairlightweight trading client for offline tests and benchmarks.
+
+Serves a synthetic race card from memory and optionally sleeps on every
+call to stand in for the round trip to the Betfair API.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from time import sleep
+from types import SimpleNamespace
+
+
+def make_runner_book(selection_id: int, price: float) -> SimpleNamespace:
+    """Create an ACTIVE runner book with a two-sided ladder around price."""
+    return SimpleNamespace(
+        selection_id=selection_id,
+        status="ACTIVE",
+        last_price_traded=price,
+        total_matched=1000.0,
+        ex=SimpleNamespace(
+            available_to_back=[
+                SimpleNamespace(price=round(price - 0.1 * i, 2), size=50.0 + i)
+                for i in range(5)
+            ],
+            available_to_lay=[
+                SimpleNamespace(price=round(price + 0.1 * (i + 1), 2), size=40.0 + i)
+                for i in range(5)
+            ],
+        ),
+    )
+
+
+def make_card(
+    n_races: int = 30,
+    n_runners: int = 10,
+    first_race_in: timedelta = timedelta(minutes=30),
+) -> list[SimpleNamespace]:
+    """Create WIN and PLACE catalogue entries for a card of races."""
+    start = datetime.now(timezone.utc).replace(tzinfo=None) + first_race_in
+    markets = []
+    for race in range(n_races):
+        race_time = start + timedelta(minutes=30 * race)
+        runners = [
+            SimpleNamespace(
+                selection_id=10_000 * (race + 1) + runner,
+                runner_name=f"Horse {race}-{runner}",
+            )
+            for runner in range(n_runners)
+        ]
+        for offset, market_type in enumerate(["WIN", "PLACE"]):
+            markets.append(
+                SimpleNamespace(
+                    market_id=f"1.{200_000_000 + race * 2 + offset}",
+                    market_start_time=race_time,
+                    market_name=f"Race {race}",
+                    description=SimpleNamespace(market_type=market_type),
+                    event=SimpleNamespace(venue="Kempton"),
+                    runners=runners,
+                )
+            )
+    return markets
+
+
+@dataclass
+class FakeBetting:
+    markets: list[SimpleNamespace]
+    latency: float = 0.0
+    calls: list[tuple[str, int]] = field(default_factory=list)
+    placed: list[tuple[str, str, list[dict]]] = field(default_factory=list)
+    _lock: Lock = field(default_factory=Lock)
+
+    def _record(self, endpoint: str, n_markets: int) -> None:
+        with self._lock:
+            self.calls.append((endpoint, n_markets))
+        if self.latency:
+            sleep(self.latency)
+
+    def list_market_catalogue(self, filter=None, market_projection=None, **kwargs):
+        self._record("list_market_catalogue", len(self.markets))
+        market_ids = (filter or {}).get("marketIds")
+        if market_ids:
+            return [m for m in self.markets if m.market_id in market_ids]
+        return list(self.markets)
+
+    def list_market_book(self, market_ids, price_projection=None, **kwargs):
+        self._record("list_market_book", len(market_ids))
+        by_id = {m.market_id: m for m in self.markets}
+        return [
+            SimpleNamespace(
+                market_id=market_id,
+                runners=[
+                    make_runner_book(r.selection_id, 2.0 + i)
+                    for i, r in enumerate(by_id[market_id].runners)
+                ],
+            )
+            for market_id in market_ids
+            if market_id in by_id
+        ]
+
+    def place_orders(
+        self, market_id, instructions, customer_strategy_ref=None, **kwargs
+    ):
+        self._record("place_orders", len(instructions))
+        with self._lock:
+            self.placed.append((market_id, customer_strategy_ref, instructions))
+        return SimpleNamespace(
+            _data={
+                "status": "SUCCESS",
+                "marketId": market_id,
+                "instructionReports": [
+                    {
+                        "status": "SUCCESS",
+                        "instruction": instruction,
+                        "sizeMatched": 0.0,
+                        "averagePriceMatched": 0.0,
+                    }
+                    for instruction in instructions
+                ],
+            }
+        )
+
+    def cancel_orders(self, market_id=None, instructions=None, **kwargs):
+        self._record("cancel_orders", 1 if market_id else 0)
+        return SimpleNamespace(_data={"status": "SUCCESS", "marketId": market_id})
+
+
+@dataclass
+class FakeTradingClient:
+    """Drop-in for BetFairClient.trading_client with configurable latency."""
+
+    markets: list[SimpleNamespace]
+    latency: float = 0.0
+    session_expired: bool = False
+
+    def __post_init__(self):
+        self.betting = FakeBetting(markets=self.markets, latency=self.latency)
@@ -0,0 +1,145 @@
+"""Raw Betfair stream messages for replaying through StreamReplay."""
+
+import json
+from types import SimpleNamespace
+
+PUBLISH_TIME = 1_780_000_000_000
+
+
+def market_definition(market: SimpleNamespace, removed: set[int] = frozenset()):
+    return {
+        "betDelay": 0,
+        "bettingType": "ODDS",
+        "bspMarket": False,
+        "bspReconciled": False,
+        "complete": True,
+        "crossMatching": True,
+        "discountAllowed": True,
+        "eventId": "1",
+        "eventTypeId": "7",
+        "inPlay": False,
+        "marketBaseRate": 5,
+        "marketTime": market.market_start_time.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        "marketType": market.description.market_type,
+        "numberOfActiveRunners": len(market.runners) - len(removed),
+        "numberOfWinners": 1,
+        "openDate": market.market_start_time.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        "persistenceEnabled": True,
+        "regulators": ["MR_INT"],
+        "runnersVoidable": False,
+        "status": "OPEN",
+        "timezone": "Europe/London",
+        "turnInPlayEnabled": True,
+        "version": 1,
+        "runners": [
+            {
+                "id": runner.selection_id,
+                "sortPriority": i + 1,
+                "status": "REMOVED" if runner.selection_id in removed else "ACTIVE",
+            }
+            for i, runner in enumerate(market.runners)
+        ],
+    }
+
+
+def market_image(markets: list[SimpleNamespace], clk: int = 1) -> dict:
+    """Initial image with each runner's ladder five deep from 5.0 back / 5.2 lay."""
+    return {
+        "op": "mcm",
+        "id": 1,
+        "clk": str(clk),
+        "pt": PUBLISH_TIME,
+        "ct": "SUB_IMAGE",
+        "mc": [
+            {
+                "id": market.market_id,
+                "img": True,
+                "marketDefinition": market_definition(market),
+                "rc": [
+                    {
+                        "id": runner.selection_id,
+                        "atb": [[5.0, 100], [4.9, 50], [4.8, 40], [4.7, 30], [4.6, 20]],
+                        "atl": [[5.2, 80], [5.3, 60], [5.4, 40], [5.5, 30], [5.6, 20]],
+                        "ltp": 5.1,
+                        "tv": 1000,
+                    }
+                    for runner in market.runners
+                ],
+            }
+            for market in markets
+        ],
+    }
+
+
+def ladder_update(market_id: str, selection_id: int, clk: int, **changes) -> dict:
+    """Delta for one runner, e.g. atb=[[5.0, 0], [5.1, 30]] to move the best back."""
+    return {
+        "op": "mcm",
+        "id": 1,
+        "clk": str(clk),
+        "pt": PUBLISH_TIME + 1000 * clk,
+        "mc": [{"id": market_id, "rc": [{"id": selection_id, **changes}]}],
+    }
+
+
+def order_change(
+    market_id: str,
+    selection_id: int,
+    bet_id: str,
+    strategy: str,
+    status: str = "E",
+    size: float = 10.0,
+    size_matched: float = 0.0,
+    size_cancelled: float = 0.0,
+    clk: int = 1,
+    image: bool = False,
+) -> dict:
+    """Order stream change for one order, status "E" executable or "EC" complete."""
+    message = {
+        "op": "ocm",
+        "id": 2,
+        "clk": str(clk),
+        "pt": PUBLISH_TIME + 1000 * clk,
+        "oc": [
+            {
+                "id": market_id,
+                "orc": [
+                    {
+                        "id": selection_id,
+                        "uo": [
+                            {
+                                "id": bet_id,
+                                "p": 5.0,
+                                "s": size,
+                                "side": "B",
+                                "status": status,
+                                "pt": "L",
+                                "ot": "L",
+                                "pd": PUBLISH_TIME,
+                                "sm": size_matched,
+                                "sr": size - size_matched - size_cancelled,
+                                "sl": 0,
+                                "sc": size_cancelled,
+                                "sv": 0,
+                                "avp": 5.0 if size_matched else 0,
+                                "rfs": strategy,
+                                "rfo": bet_id,
+                                "rc": "REG_GGC",
+                                "rac": "",
+                            }
+                        ],
+                    }
+                ],
+            }
+        ],
+    }
+    if image:
+        message["ct"] = "SUB_IMAGE"
+    return message
+
+
+def write_messages(path, messages: list[dict]) -> str:
+    with open(path, "w") as f:
+        for message in messages:
+            f.write(json.dumps(message) + "\n")
+    return str(path)
@@ -1,6 +1,10 @@
+import numpy as np
 import pandas as pd
+import pytest
 from api_helpers.clients.betfair_client import BetFairCashOut, BetFairOrder
 
+from .fixtures.cash_out_reference import PandasCashOut
+
 
 def test_handles_single_matched_lay_bet():
     cash_out_data = pd.DataFrame(
@@ -164,3 +168,96 @@ def test_handles_multiple_partially_matched_back_and_lay_bets():
             strategy="cash_out",
         ),
     ]
+
+
+def random_positions(rng: np.random.Generator) -> pd.DataFrame:
+    """
+    Matched positions across a few markets, in the shape PandasCashOut takes.
+
+    Each runner is in one market, and a runner matched on both sides has
+    its first row on the back side, since PandasCashOut grouped by runner
+    and only recognised the sides in that order.
+    """
+    n_rows = int(rng.integers(1, 25))
+    market = rng.integers(0, 3, n_rows)
+    selection = 100 * market + rng.integers(0, 6, n_rows)
+    sides = rng.choice(["BACK", "LAY"], n_rows)
+    first_rows = pd.Series(selection).drop_duplicates().index
+    for row in first_rows:
+        if len(set(sides[selection == selection[row]])) == 2:
+            sides[row] = "BACK"
+
+    def prices() -> np.ndarray:
+        return np.round(rng.uniform(1.5, 20.0, n_rows), 2)
+
+    def depths() -> np.ndarray:
+        # Includes empty levels, whose averages divide by zero
+        return rng.integers(0, 40, n_rows)
+
+    return pd.DataFrame(
+        {
+            "market_id": [f"1.{m}" for m in market],
+            "selection_id": selection,
+            "selection_type": sides,
+            "average_price_matched": prices(),
+            "size_matched": np.round(rng.uniform(0.5, 60.0, n_rows), 2),
+            "market": "WIN",
+            "status": "ACTIVE",
+            "back_price_1": prices(),
+            "back_price_1_depth": depths(),
+            "back_price_2": prices(),
+            "back_price_2_depth": depths(),
+            "lay_price_1": prices(),
+            "lay_price_1_depth": depths(),
+            "lay_price_2": prices(),
+            "lay_price_2_depth": depths(),
+        }
+    )
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_matches_the_pandas_implementation(seed):
+    data = random_positions(np.random.default_rng(seed))
+
+    assert BetFairCashOut().cash_out(data) == PandasCashOut().cash_out(data)
+
+
+def test_lay_side_listed_first_is_still_hedged():
+    # PandasCashOut raised "Unidentified bet type" when a runner's lay row
+    # came before its back row
+    data = random_positions(np.random.default_rng(0))
+    both = data.groupby("selection_id")["selection_type"].transform("nunique") == 2
+    reordered = pd.concat([data[both].iloc[::-1], data[~both]])
+
+    assert sorted(BetFairCashOut().cash_out(reordered), key=repr) == sorted(
+        BetFairCashOut().cash_out(data), key=repr
+    )
+
+
+def test_same_runner_in_win_and_place_markets_is_hedged_per_market():
+    # Betfair uses one selection id for a horse in its WIN and PLACE markets;
+    # PandasCashOut paired the back and lay across them and hedged neither
+    data = pd.DataFrame(
+        {
+            "market_id": ["1.win", "1.place"],
+            "selection_id": [1, 1],
+            "selection_type": ["BACK", "LAY"],
+            "average_price_matched": [3.4, 1.8],
+            "size_matched": [10.0, 10.0],
+            "market": ["WIN", "PLACE"],
+            "status": ["ACTIVE", "ACTIVE"],
+            "back_price_1": [3.25, 1.75],
+            "back_price_1_depth": [10, 10],
+            "back_price_2": [3.2, 1.74],
+            "back_price_2_depth": [10, 10],
+            "lay_price_1": [3.35, 1.8],
+            "lay_price_1_depth": [10, 10],
+            "lay_price_2": [3.3, 1.82],
+            "lay_price_2_depth": [10, 10],
+        }
+    )
+
+    assert PandasCashOut().cash_out(data) == []
+    assert [
+        (order.market_id, order.side) for order in BetFairCashOut().cash_out(data)
+    ] == [("1.win", "LAY"), ("1.place", "BACK")]
@@ -0,0 +1,231 @@
+from types import SimpleNamespace
+
+import requests
+from api_helpers.clients import betfair_client
+from api_helpers.clients.betfair_client import (
+    MAX_REQUEST_WEIGHT,
+    PRICE_PROJECTION,
+    BetFairCashOut,
+    BetFairClient,
+    BetfairCredentials,
+    BetFairOrder,
+    batch_market_ids,
+    group_orders_for_placement,
+    price_projection_weight,
+)
+
+from .fixtures.fake_trading_client import FakeTradingClient, make_card
+
+
+def make_client(markets, market_book_workers: int = 8) -> BetFairClient:
+    client = BetFairClient(
+        BetfairCredentials(username="", password="", app_key="", certs_path=""),
+        BetFairCashOut(),
+        market_book_workers=market_book_workers,
+    )
+    client.trading_client = FakeTradingClient(markets=markets)
+    return client
+
+
+def test_batches_respect_request_weight():
+    market_ids = [f"1.{i}" for i in range(60)]
+    batches = batch_market_ids(market_ids, PRICE_PROJECTION)
+
+    weight = price_projection_weight(PRICE_PROJECTION)
+    assert weight == 17
+    assert all(len(batch) * weight <= MAX_REQUEST_WEIGHT for batch in batches)
+    assert [m for batch in batches for m in batch] == market_ids
+
+
+def market_book_calls(client: BetFairClient) -> list[int]:
+    return [
+        n_markets
+        for endpoint, n_markets in client.trading_client.betting.calls
+        if endpoint == "list_market_book"
+    ]
+
+
+def test_batched_fetch_matches_per_market_fetch(monkeypatch):
+    markets = make_card(n_races=12, n_runners=8)
+    batched = make_client(markets)
+    batched_data = batched.create_market_data()
+
+    # One market per request, one request at a time: the pre-batching behaviour
+    monkeypatch.setattr(
+        betfair_client,
+        "MAX_REQUEST_WEIGHT",
+        price_projection_weight(PRICE_PROJECTION),
+    )
+    per_market = make_client(markets, market_book_workers=1)
+    per_market_data = per_market.create_market_data()
+
+    assert batched_data.equals(per_market_data)
+    assert sorted(market_book_calls(batched)) == [2, 11, 11]
+    assert market_book_calls(per_market) == [1] * 24
+
+
+def test_started_markets_are_not_fetched():
+    markets = make_card(n_races=2, n_runners=6)
+    for market in markets[:2]:
+        market.market_start_time = market.market_start_time.replace(year=2000)
+    client = make_client(markets)
+
+    data = client.create_market_data()
+
+    assert set(data["market_id"]) == {m.market_id for m in markets[2:]}
+
+
+def test_market_data_for_selected_markets():
+    markets = make_card(n_races=3, n_runners=6)
+    client = make_client(markets)
+    wanted = [m.market_id for m in markets[2:4]]
+
+    data = client.create_market_data(wanted)
+
+    assert set(data["market_id"]) == set(wanted)
+    assert market_book_calls(client) == [2]
+    assert set(client.get_market_start_times()) == {m.market_id for m in markets}
+
+
+def catalogue_calls(client: BetFairClient) -> int:
+    return sum(
+        1
+        for endpoint, _ in client.trading_client.betting.calls
+        if endpoint == "list_market_catalogue"
+    )
+
+
+def test_catalogue_is_cached_between_cycles():
+    client = make_client(make_card(n_races=3, n_runners=6))
+
+    client.create_market_data()
+    client.create_market_data()
+    client.get_min_and_max_race_times()
+
+    assert catalogue_calls(client) == 1
+
+
+def test_catalogue_refreshes_after_ttl():
+    client = make_client(make_card(n_races=3, n_runners=6))
+    client.catalogue_ttl_seconds = 0
+
+    client.create_market_data()
+    client.create_market_data()
+
+    assert catalogue_calls(client) == 2
+
+
+def test_unknown_runner_triggers_catalogue_refresh():
+    markets = make_card(n_races=2, n_runners=6)
+    client = make_client(markets)
+    client.create_market_data()
+
+    # A late supplementary runner appears in the books but not the cached catalogue
+    markets[0].runners.append(SimpleNamespace(selection_id=999, runner_name="Late"))
+    data = client.create_market_data()
+
+    assert catalogue_calls(client) == 2
+    assert "Late" in set(data["horse"])
+
+
+def make_order(market_id: str, strategy: str, selection_id: str = "1") -> BetFairOrder:
+    return BetFairOrder(
+        size=2.0,
+        price=3.5,
+        selection_id=selection_id,
+        market_id=market_id,
+        side="BACK",
+        strategy=strategy,
+    )
+
+
+def test_orders_grouped_by_market_and_strategy(monkeypatch):
+    monkeypatch.setattr(betfair_client, "MAX_PLACE_INSTRUCTIONS", 2)
+    orders = [
+        make_order("1.1", "a"),
+        make_order("1.2", "a"),
+        None,
+        make_order("1.1", "a"),
+        make_order("1.1", "b"),
+        make_order("1.1", "a"),
+    ]
+
+    assert group_orders_for_placement(orders) == [[0, 3], [5], [1], [4]]
+
+
+def test_place_orders_sends_one_request_per_group():
+    client = make_client([])
+    orders = [
+        make_order("1.1", "a", "11"),
+        make_order("1.2", "b", "21"),
+        make_order("1.1", "a", "12"),
+        None,
+    ]
+
+    results = client.place_orders(orders)
+
+    placed = sorted(client.trading_client.betting.placed)
+    assert [(m, ref, len(i)) for m, ref, i in placed] == [
+        ("1.1", "a", 2),
+        ("1.2", "b", 1),
+    ]
+    assert [i["selectionId"] for i in placed[0][2]] == ["11", "12"]
+    assert [r.success for r in results] == [True, True, True, False]
+
+
+def test_rejected_instruction_fails_only_that_order(monkeypatch):
+    client = make_client([])
+    betting = client.trading_client.betting
+    place = betting.place_orders
+
+    def reject_second(**kwargs):
+        response = place(**kwargs)
+        response._data["instructionReports"][1] = {
+            "status": "FAILURE",
+            "errorCode": "INVALID_ODDS",
+        }
+        return response
+
+    monkeypatch.setattr(betting, "place_orders", reject_second)
+
+    results = client.place_orders([make_order("1.1", "a"), make_order("1.1", "a")])
+
+    assert [r.success for r in results] == [True, False]
+    assert "INVALID_ODDS" in results[1].message
+
+
+def test_network_errors_retry_the_request(monkeypatch):
+    client = make_client([])
+    betting = client.trading_client.betting
+    place = betting.place_orders
+    failures = [requests.exceptions.ConnectionError("reset")]
+
+    def flaky(**kwargs):
+        if failures:
+            raise failures.pop()
+        return place(**kwargs)
+
+    monkeypatch.setattr(betting, "place_orders", flaky)
+
+    results = client.place_orders(
+        [make_order("1.1", "a"), make_order("1.1", "a")], retry_delay=0
+    )
+
+    assert all(results)
+    assert len(betting.placed) == 1
+
+
+def test_fill_or_kill_cancels_each_market_once():
+    client = make_client([])
+    orders = [
+        make_order("1.1", "a"),
+        make_order("1.1", "b"),
+        make_order("1.2", "a"),
+    ]
+
+    results = client.place_orders_immediate(orders)
+
+    calls = client.trading_client.betting.calls
+    assert all(results)
+    assert sum(1 for endpoint, _ in calls if endpoint == "place_orders") == 3
+    assert sum(1 for endpoint, _ in calls if endpoint == "cancel_orders") == 2
@@ -0,0 +1,196 @@
+from datetime import timedelta
+from time import monotonic
+
+import pandas as pd
+import pytest
+from api_helpers.clients.betfair_client import BetFairOrder
+from api_helpers.clients.betfair_simulator import (
+    LatencyModel,
+    MatchingRules,
+    PriceReplay,
+    SimulatedExchange,
+    simulated_client,
+    synthetic_card,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.seconds = 0.0
+
+    def __call__(self) -> float:
+        return self.seconds
+
+
+def make_exchange(**kwargs):
+    markets = synthetic_card(n_races=2, n_runners=4, seed=1)
+    exchange = SimulatedExchange(markets, **kwargs)
+    return exchange, simulated_client(exchange)
+
+
+def first_runner(exchange: SimulatedExchange):
+    market = next(iter(exchange.markets.values()))
+    return market, next(iter(market.runners.values()))
+
+
+def back_order(market, runner, price: float, size: float) -> BetFairOrder:
+    return BetFairOrder(
+        size=size,
+        price=price,
+        selection_id=str(runner.selection_id),
+        market_id=market.market_id,
+        side="BACK",
+        strategy="sel-1",
+    )
+
+
+def test_market_data_comes_through_the_real_client():
+    exchange, client = make_exchange()
+
+    data = client.create_market_data()
+
+    market, runner = first_runner(exchange)
+    row = data[data["todays_betfair_selection_id"] == runner.selection_id].iloc[0]
+    assert len(data) == 2 * 2 * 4
+    assert row["back_price_1"] == runner.back[0][0]
+    assert row["lay_price_1"] == runner.lay[0][0]
+    assert exchange.calls == {"catalogue": 1, "market_book": 1}
+
+
+def test_min_and_max_race_times():
+    exchange, client = make_exchange()
+
+    first, last = client.get_min_and_max_race_times()
+
+    start_times = sorted(m.start_time for m in exchange.markets.values())
+    assert last - first == start_times[-1] - start_times[0]
+
+
+def test_order_takes_the_ladder_and_rests_the_remainder():
+    exchange, client = make_exchange(matching=MatchingRules(take_fraction=0.5))
+    market, runner = first_runner(exchange)
+    best_price, best_size = runner.back[0]
+
+    result = client.place_order(back_order(market, runner, best_price, 1000))
+
+    assert result.success
+    assert result.size_matched == pytest.approx(round(best_size * 0.5, 2))
+    assert runner.back[0][1] == pytest.approx(best_size - result.size_matched, abs=0.01)
+    [order] = client.get_current_orders(["sel-1"])
+    assert order.execution_status == "EXECUTABLE"
+    assert order.size_remaining == pytest.approx(1000 - result.size_matched)
+
+
+def test_cancel_leaves_the_matched_part():
+    exchange, client = make_exchange()
+    market, runner = first_runner(exchange)
+    result = client.place_order(back_order(market, runner, runner.back[0][0], 1000))
+    [placed] = client.get_current_orders(["sel-1"])
+
+    client.trading_client.betting.cancel_orders(
+        market_id=market.market_id, instructions=[{"betId": placed.bet_id}]
+    )
+
+    [order] = client.get_current_orders(["sel-1"])
+    assert order.execution_status == "EXECUTION_COMPLETE"
+    assert order.size_matched == pytest.approx(result.size_matched)
+    assert order.size_cancelled == pytest.approx(1000 - result.size_matched)
+
+
+def test_resting_order_fills_when_the_price_comes_to_it():
+    clock = FakeClock()
+    exchange, client = make_exchange(clock=clock)
+    market, runner = first_runner(exchange)
+    price = round(runner.back[0][0] + 1, 2)
+    client.place_order(back_order(market, runner, price, 10))
+
+    exchange.set_ladder(
+        market.market_id, runner.selection_id, back=[[price, 50.0]] + runner.back
+    )
+    clock.seconds += 1
+
+    [order] = client.get_current_orders(["sel-1"])
+    assert order.size_matched == 10
+    assert order.average_price_matched == price
+
+
+def test_resting_fill_rate_matches_over_time():
+    clock = FakeClock()
+    exchange, client = make_exchange(
+        clock=clock, matching=MatchingRules(resting_fill_per_second=0.1)
+    )
+    market, runner = first_runner(exchange)
+    client.place_order(back_order(market, runner, runner.back[0][0] + 1, 10))
+
+    clock.seconds += 5
+
+    [order] = client.get_current_orders(["sel-1"])
+    assert order.size_matched == pytest.approx(5)
+
+
+def test_unmatched_orders_lapse_at_the_off():
+    clock = FakeClock()
+    exchange, client = make_exchange(clock=clock)
+    market, runner = first_runner(exchange)
+    client.place_order(back_order(market, runner, runner.back[0][0] + 1, 10))
+
+    clock.seconds += (market.start_time - exchange.now()).total_seconds() + 1
+
+    [order] = client.get_current_orders(["sel-1"])
+    assert order.execution_status == "EXECUTION_COMPLETE"
+    assert order.size_lapsed == 10
+    assert not client.place_order(back_order(market, runner, 2.0, 2)).success
+
+
+def test_latency_is_injected_per_call():
+    exchange, client = make_exchange(latency=LatencyModel.uniform(0.05))
+
+    started = monotonic()
+    client.create_market_data()
+
+    assert monotonic() - started >= 0.1
+
+
+def recorded_prices() -> pd.DataFrame:
+    rows = []
+    for minute, back in enumerate([4.0, 4.2]):
+        for selection_id, name in [(11, "Alpha"), (12, "Beta")]:
+            row = {
+                "race_time": "2026-06-06 14:30:00",
+                "race_date": "2026-06-06",
+                "horse_name": name,
+                "course": "Ascot",
+                "status": "ACTIVE",
+                "market_id_win": "1.1",
+                "market_id_place": "1.2",
+                "selection_id": selection_id,
+                "betfair_win_sp": back + 0.1,
+                "betfair_place_sp": 1.5,
+                "created_at": pd.Timestamp("2026-06-06 14:00")
+                + timedelta(minutes=minute),
+            }
+            for suffix, price in [("win", back), ("place", 1.5)]:
+                for level in (1, 2):
+                    row[f"back_price_{level}_{suffix}"] = price - 0.1 * (level - 1)
+                    row[f"back_price_{level}_depth_{suffix}"] = 100
+                    row[f"lay_price_{level}_{suffix}"] = price + 0.1 * level
+                    row[f"lay_price_{level}_depth_{suffix}"] = 100
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def test_replay_applies_recorded_snapshots_as_time_passes():
+    clock = FakeClock()
+    exchange = SimulatedExchange(replay=PriceReplay(recorded_prices()), clock=clock)
+    client = simulated_client(exchange)
+
+    before = client.create_market_data(["1.1"])
+    clock.seconds += 61
+    after = client.create_market_data(["1.1"])
+
+    assert set(before["back_price_1"]) == {4.0}
+    assert set(after["back_price_1"]) == {4.2}
+    # Race is 30 minutes after the first snapshot, as recorded
+    assert exchange.markets["1.1"].start_time - exchange.now() == pytest.approx(
+        timedelta(minutes=30) - timedelta(seconds=61), abs=timedelta(seconds=1)
+    )
@@ -0,0 +1,224 @@
+import json
+import threading
+from datetime import datetime, timedelta
+
+from api_helpers.clients.betfair_client import CurrentOrder
+from api_helpers.clients.betfair_stream import (
+    MARKET_SUBSCRIPTION,
+    ORDER_SUBSCRIPTION,
+    CacheListener,
+    StreamCache,
+    StreamReplay,
+    _Recorder,
+)
+
+from .fixtures.fake_trading_client import make_card
+from .fixtures.stream_messages import (
+    ladder_update,
+    market_image,
+    order_change,
+    write_messages,
+)
+from .test_betfair_client import make_client, market_book_calls
+
+
+def replay(
+    tmp_path,
+    messages: list[dict],
+    cache: StreamCache | None = None,
+    name: str = "stream.jsonl",
+):
+    path = write_messages(tmp_path / name, messages)
+    player = StreamReplay(path, cache)
+    player.run()
+    return player.cache
+
+
+def test_replay_applies_ladder_deltas(tmp_path):
+    markets = make_card(n_races=1, n_runners=3)
+    selection_id = markets[0].runners[0].selection_id
+    cache = replay(
+        tmp_path,
+        [
+            market_image(markets),
+            ladder_update(
+                markets[0].market_id, selection_id, clk=2, atb=[[5.0, 0], [5.1, 30]]
+            ),
+        ],
+    )
+
+    book = cache.market_books([markets[0].market_id])[markets[0].market_id][0]
+    runner = next(r for r in book.runners if r.selection_id == selection_id)
+    assert cache.markets_live
+    assert [(p.price, p.size) for p in runner.ex.available_to_back] == [
+        (5.1, 30),
+        (4.9, 50),
+        (4.8, 40),
+        (4.7, 30),
+        (4.6, 20),
+    ]
+
+
+def test_market_data_reads_streamed_markets_without_requests(tmp_path):
+    markets = make_card(n_races=3, n_runners=4)
+    client = make_client(markets)
+    client.stream_cache = replay(tmp_path, [market_image(markets)])
+
+    data = client.create_market_data()
+
+    assert market_book_calls(client) == []
+    assert len(data) == 3 * 2 * 4
+    assert set(data["back_price_1"]) == {5.0}
+    assert set(data["lay_price_1"]) == {5.2}
+
+
+def test_markets_missing_from_the_stream_use_rest(tmp_path):
+    markets = make_card(n_races=3, n_runners=4)
+    client = make_client(markets)
+    client.stream_cache = replay(tmp_path, [market_image(markets[:2])])
+
+    data = client.create_market_data()
+
+    assert market_book_calls(client) == [4]
+    assert set(data["market_id"]) == {m.market_id for m in markets}
+
+
+def test_stale_stream_is_not_read(tmp_path):
+    markets = make_card(n_races=2, n_runners=4)
+    client = make_client(markets)
+    client.stream_cache = replay(tmp_path, [market_image(markets)])
+    client.stream_cache.set_live(MARKET_SUBSCRIPTION, False)
+
+    client.create_market_data()
+
+    assert market_book_calls(client) == [4]
+
+
+def make_seeded_order(
+    bet_id: str,
+    strategy: str,
+    placed_date: datetime = datetime(2026, 6, 6, 12),
+    execution_status: str = "EXECUTION_COMPLETE",
+) -> CurrentOrder:
+    return CurrentOrder(
+        bet_id=bet_id,
+        market_id="1.1",
+        selection_id=1,
+        side="BACK",
+        execution_status=execution_status,
+        placed_date=placed_date,
+        matched_date=datetime(2026, 6, 6, 12),
+        average_price_matched=4.0,
+        customer_strategy_ref=strategy,
+        size_matched=5.0,
+        size_remaining=0.0,
+        size_lapsed=0.0,
+        size_cancelled=0.0,
+        size_voided=0.0,
+        price=4.0,
+        size=5.0,
+    )
+
+
+def test_orders_come_from_the_stream_and_seed(tmp_path):
+    cache = StreamCache()
+    cache.seed_orders([make_seeded_order("old", "sel-1")])
+    replay(
+        tmp_path,
+        [
+            order_change("1.2", 7, "b1", "sel-1", image=True),
+            order_change("1.2", 8, "b2", "sel-2", clk=2),
+            order_change("1.2", 7, "b1", "sel-1", "EC", size_matched=4, clk=3),
+        ],
+        cache,
+    )
+    client = make_client(make_card(n_races=1))
+    client.stream_cache = cache
+
+    orders = {
+        o.bet_id: o for o in client.get_current_orders(["sel-1"], today_only=False)
+    }
+
+    assert set(orders) == {"old", "b1"}
+    assert orders["b1"].execution_status == "EXECUTION_COMPLETE"
+    assert orders["b1"].size_matched == 4
+    # No listCurrentOrders request was needed
+    assert client.trading_client.betting.calls == []
+
+
+def test_stream_orders_are_limited_to_today_and_old_ones_pruned():
+    now = datetime.now()
+    cache = StreamCache()
+    cache.seed_orders(
+        [
+            make_seeded_order("yesterday", "sel-1", now - timedelta(days=1)),
+            make_seeded_order(
+                "resting", "sel-1", now - timedelta(days=1), "EXECUTABLE"
+            ),
+            make_seeded_order("today", "sel-1", now),
+        ]
+    )
+    cache.set_live(ORDER_SUBSCRIPTION, True)
+    client = make_client(make_card(n_races=1))
+    client.stream_cache = cache
+
+    assert [o.bet_id for o in client.get_current_orders()] == ["today"]
+    # Complete orders from before today are gone, executable ones are kept
+    assert {o.bet_id for o in client.get_current_orders(today_only=False)} == {
+        "resting",
+        "today",
+    }
+
+
+def test_wait_for_cancelled_orders_returns_once_the_stream_reports(tmp_path):
+    cache = replay(tmp_path, [order_change("1.2", 7, "b1", "sel-1", image=True)])
+    client = make_client(make_card(n_races=1))
+    client.stream_cache = cache
+
+    cancelled = order_change("1.2", 7, "b1", "sel-1", "EC", size_cancelled=10, clk=2)
+    timer = threading.Timer(
+        0.05, lambda: replay(tmp_path, [cancelled], cache, name="cancel.jsonl")
+    )
+    timer.start()
+
+    assert not client.wait_for_cancelled_orders(["1.2"], timeout=0)
+    assert client.wait_for_cancelled_orders(["1.2"], timeout=2)
+    timer.join()
+
+
+def test_wait_for_cancelled_orders_without_a_stream():
+    client = make_client(make_card(n_races=1))
+
+    assert client.wait_for_cancelled_orders(["1.2"]) is False
+
+
+def ladders(cache: StreamCache, market_ids: list[str]) -> dict:
+    return {
+        market_id: [
+            (r.selection_id, r.last_price_traded, r.ex.available_to_back[0].price)
+            for r in books[0].runners
+        ]
+        for market_id, books in cache.market_books(market_ids).items()
+    }
+
+
+def test_recorded_messages_replay_to_the_same_cache(tmp_path):
+    markets = make_card(n_races=2, n_runners=3)
+    path = str(tmp_path / "recorded.jsonl")
+    recorder = _Recorder(path)
+    live = StreamCache()
+    listener = CacheListener(live, MARKET_SUBSCRIPTION, record_to=recorder)
+    listener.register_stream(1, MARKET_SUBSCRIPTION)
+    for message in [
+        market_image(markets),
+        ladder_update(markets[1].market_id, 10_001, clk=2, ltp=6.0),
+    ]:
+        listener.on_data(json.dumps(message))
+    recorder.close()
+
+    replayed = StreamReplay(path)
+    replayed.run()
+
+    market_ids = [m.market_id for m in markets]
+    assert ladders(replayed.cache, market_ids) == ladders(live, market_ids)
+    assert len(ladders(live, market_ids)) == 4
@@ -0,0 +1,235 @@
+import pandas as pd
+import pytest
+from api_helpers.clients.betfair_client import BetFairOrder, CurrentOrder
+from api_helpers.clients.betfair_simulator import (
+    SimulatedExchange,
+    simulated_client,
+    synthetic_card,
+)
+from api_helpers.clients.cash_out_engine import (
+    CashOutEngine,
+    Position,
+    cash_out_bets,
+    cash_out_frame,
+    exposures,
+    matched_positions,
+    unpriced_runners,
+)
+
+
+def make_exchange(**kwargs):
+    exchange = SimulatedExchange(
+        synthetic_card(n_races=2, n_runners=4, seed=1), **kwargs
+    )
+    return exchange, simulated_client(exchange)
+
+
+def back_a_runner(exchange, client, market_index: int = 0, size: float = 40.0):
+    market = list(exchange.markets.values())[market_index]
+    runner = next(iter(market.runners.values()))
+    result = client.place_order(
+        BetFairOrder(
+            size=size,
+            price=runner.back[0][0],
+            selection_id=str(runner.selection_id),
+            market_id=market.market_id,
+            side="BACK",
+            strategy="sel-1",
+        )
+    )
+    assert result.size_matched == size
+    return market.market_id
+
+
+def green_book(client, market_id: str) -> tuple[float, float]:
+    """Profit on the runner if it wins and if it loses."""
+    [(back, lay)] = [
+        (
+            positions.get((selection_id, "BACK"), Position()),
+            positions.get((selection_id, "LAY"), Position()),
+        )
+        for positions in [matched_positions(client.get_current_orders(), market_id)]
+        for selection_id in {key[0] for key in positions}
+    ]
+    win = back.stake_times_price - back.size - (lay.stake_times_price - lay.size)
+    lose = lay.size - back.size
+    return win, lose
+
+
+def order(market_id, selection_id, side, size, price):
+    return CurrentOrder(
+        bet_id=f"{selection_id}-{side}-{size}",
+        market_id=market_id,
+        selection_id=selection_id,
+        side=side,
+        execution_status="EXECUTION_COMPLETE",
+        placed_date=None,
+        matched_date=None,
+        average_price_matched=price,
+        customer_strategy_ref="sel-1",
+        size_matched=size,
+        size_remaining=0.0,
+        size_lapsed=0.0,
+        size_cancelled=0.0,
+        size_voided=0.0,
+        price=price,
+        size=size,
+    )
+
+
+def test_positions_are_summed_per_runner_and_side():
+    positions = matched_positions(
+        [
+            order("1.1", 7, "BACK", 10.0, 4.0),
+            order("1.1", 7, "BACK", 30.0, 5.0),
+            order("1.1", 7, "LAY", 5.0, 4.4),
+            order("1.2", 7, "BACK", 99.0, 2.0),
+        ],
+        "1.1",
+    )
+
+    assert positions[(7, "BACK")].size == 40.0
+    assert positions[(7, "BACK")].average_price == 4.75
+    assert positions[(7, "LAY")].size == 5.0
+    assert len(positions) == 2
+
+
+def test_exposure_is_hedged_on_the_side_with_prices():
+    positions = {(7, "BACK"): Position(), (8, "LAY"): Position()}
+    positions[(7, "BACK")].add(10.0, 4.0)
+    positions[(8, "LAY")].add(10.0, 3.0)
+    book = pd.DataFrame(
+        {
+            "selection_id": [7, 8],
+            "back_price_1": [3.9, 2.9],
+            "back_price_1_depth": [10.0, 10.0],
+            "back_price_2": [3.8, None],
+            "back_price_2_depth": [10.0, None],
+            "lay_price_1": [None, 3.1],
+            "lay_price_1_depth": [None, 10.0],
+            "lay_price_2": [None, 3.2],
+            "lay_price_2_depth": [None, 10.0],
+        }
+    )
+
+    assert exposures(positions) == {7: 40.0, 8: -30.0}
+    # 7 is hedged by laying and 8 by backing, and neither side is priced
+    assert unpriced_runners(positions, book) == [7, 8]
+
+
+def test_frame_takes_prices_from_the_book():
+    book = pd.DataFrame(
+        {
+            "selection_id": [7, 8],
+            "market": "WIN",
+            "status": "ACTIVE",
+            "back_price_1": [4.0, 9.0],
+            "back_price_1_depth": [10.0, 10.0],
+            "back_price_2": [3.9, 8.8],
+            "back_price_2_depth": [10.0, 10.0],
+            "lay_price_1": [4.1, 9.2],
+            "lay_price_1_depth": [10.0, 10.0],
+            "lay_price_2": [4.2, 9.4],
+            "lay_price_2_depth": [10.0, 10.0],
+        }
+    )
+    positions = {(7, "BACK"): Position(), (9, "LAY"): Position()}
+    positions[(7, "BACK")].add(10.0, 4.5)
+    positions[(9, "LAY")].add(10.0, 3.0)
+
+    frame = cash_out_frame("1.1", positions, book)
+
+    # Runner 9 is not in the book
+    assert frame[["selection_id", "selection_type", "lay_price_2"]].values.tolist() == [
+        [7, "BACK", 4.2]
+    ]
+
+
+def test_market_is_hedged_in_the_background():
+    exchange, client = make_exchange()
+    market_id = back_a_runner(exchange, client)
+    engine = CashOutEngine(client, retry_seconds=0.01)
+
+    assert engine.submit([market_id, market_id]) == [market_id]
+    assert engine.wait(timeout=5)
+
+    result = engine.results[market_id]
+    assert result.reason == "flat"
+    assert result.hedges_placed == 1
+    win, lose = green_book(client, market_id)
+    assert win == pytest.approx(lose, abs=2.0)
+    assert lose > -40.0
+
+
+def test_partial_fills_are_rehedged_for_the_remainder_only():
+    exchange, client = make_exchange()
+    market_id = back_a_runner(exchange, client)
+    # Too little on offer for one hedge to match in full
+    for level in next(iter(exchange.markets[market_id].runners.values())).lay:
+        level[1] = 12.0
+    engine = CashOutEngine(client, retry_seconds=0.01)
+
+    engine.submit([market_id])
+    assert engine.wait(timeout=5)
+
+    result = engine.results[market_id]
+    assert result.reason == "flat"
+    assert result.hedges_placed > 1
+    # Every hedge was fill-or-kill
+    assert not [
+        o for o in client.get_current_orders() if o.execution_status == "EXECUTABLE"
+    ]
+    win, lose = green_book(client, market_id)
+    assert win == pytest.approx(lose, abs=2.0)
+
+
+def test_markets_are_cashed_out_concurrently():
+    exchange, client = make_exchange()
+    markets = [back_a_runner(exchange, client, i) for i in range(3)]
+    engine = CashOutEngine(client, retry_seconds=0.01)
+
+    assert engine.submit(markets) == markets
+    assert engine.wait(timeout=5)
+
+    assert {engine.results[m].reason for m in markets} == {"flat"}
+    assert engine.running() == []
+
+
+def test_bets_placed_during_a_cash_out_are_not_hedged():
+    exchange, client = make_exchange()
+    market_id = back_a_runner(exchange, client)
+    other = list(exchange.markets[market_id].runners.values())[1]
+
+    class BetDuringCashOut(CashOutEngine):
+        def _read_positions(self, market_id, selection_ids=None):
+            positions = super()._read_positions(market_id, selection_ids)
+            if selection_ids is None:
+                client.place_order(
+                    BetFairOrder(
+                        size=10.0,
+                        price=other.back[0][0],
+                        selection_id=str(other.selection_id),
+                        market_id=market_id,
+                        side="BACK",
+                        strategy="sel-2",
+                    )
+                )
+            return positions
+
+    engine = BetDuringCashOut(client, retry_seconds=0.01)
+    engine.submit([market_id])
+    assert engine.wait(timeout=5)
+
+    assert engine.results[market_id].reason == "flat"
+    positions = matched_positions(client.get_current_orders(), market_id)
+    assert positions[(other.selection_id, "BACK")].size == 10.0
+    assert (other.selection_id, "LAY") not in positions
+
+
+def test_blocking_cash_out_bets_uses_the_engine():
+    exchange, client = make_exchange()
+    market_id = back_a_runner(exchange, client)
+
+    matched = cash_out_bets(client, [market_id])
+
+    assert set(matched["selection_type"]) == {"BACK", "LAY"}
@@ -0,0 +1,164 @@
+from collections import namedtuple
+from unittest.mock import MagicMock
+
+import numpy as np
+import psycopg2
+import pytest
+from api_helpers.clients.postgres_channel import (
+    LatencyHistogram,
+    positional_parameters,
+)
+from api_helpers.clients.postgres_client import PostgresClient, PsqlConnection
+
+Column = namedtuple("Column", "name")
+
+
+@pytest.fixture
+def channel_client(monkeypatch):
+    client = PostgresClient(
+        PsqlConnection(user="u", password="p", host="localhost", port=5432, db="d")
+    )
+    executed = []
+    connections = []
+    failures = []
+
+    def execute(sql, values=None):
+        if failures:
+            raise failures.pop()
+        executed.append((sql, values) if values is not None else sql)
+
+    def connect(**kwargs):
+        cursor = MagicMock()
+        cursor.execute.side_effect = execute
+        cursor.description = [Column("unique_id"), Column("requested_odds")]
+        cursor.fetchall.return_value = [("a", 3.5), ("b", 4.0)]
+        cursor.rowcount = 1
+        conn = MagicMock(closed=False)
+        conn.cursor.return_value.__enter__.return_value = cursor
+        connections.append(conn)
+        return conn
+
+    monkeypatch.setattr(
+        "api_helpers.clients.postgres_channel.psycopg2.connect", connect
+    )
+    monkeypatch.setattr(
+        "api_helpers.clients.postgres_channel.psycopg2.extensions.register_type",
+        MagicMock(),
+    )
+    monkeypatch.setattr(
+        "api_helpers.clients.postgres_channel.psycopg2.extras.execute_batch",
+        lambda cursor, sql, values, page_size: executed.append((sql, values)),
+    )
+    return client, executed, connections, failures
+
+
+def test_rows_come_back_as_tuples_with_column_names(channel_client):
+    client, _, _, _ = channel_client
+
+    columns, rows = client.fetch_rows("SELECT 1", "reference")
+
+    assert columns == ["unique_id", "requested_odds"]
+    assert rows == [("a", 3.5), ("b", 4.0)]
+
+
+def test_arrays_per_column(channel_client):
+    client, _, _, _ = channel_client
+
+    arrays = client.fetch_arrays("SELECT 1", "reference")
+
+    assert arrays["unique_id"].tolist() == ["a", "b"]
+    np.testing.assert_array_equal(arrays["requested_odds"], [3.5, 4.0])
+
+
+def test_statement_is_prepared_once_on_one_connection(channel_client):
+    client, executed, connections, _ = channel_client
+
+    client.fetch_rows("SELECT 1", "reference")
+    client.fetch_rows("SELECT 1", "reference")
+
+    assert len(connections) == 1
+    assert connections[0].autocommit is True
+    assert executed == [
+        "PREPARE reference AS SELECT 1",
+        "EXECUTE reference",
+        "EXECUTE reference",
+    ]
+
+
+def test_named_parameters_are_sent_positionally(channel_client):
+    client, executed, _, _ = channel_client
+    query = "UPDATE t SET reason = :reason, at = now()::date WHERE id = :id"
+
+    client.execute_prepared(query, "invalidate", {"id": "x1", "reason": "void"})
+
+    assert executed == [
+        "PREPARE invalidate AS UPDATE t SET reason = $1, at = now()::date WHERE id = $2",
+        ("EXECUTE invalidate (%s, %s)", ("void", "x1")),
+    ]
+
+
+def test_batch_runs_in_one_transaction(channel_client):
+    client, executed, _, _ = channel_client
+
+    count = client.execute_prepared_batch(
+        "INSERT INTO t VALUES (:id)", "insert", [{"id": 1}, {"id": 2}]
+    )
+
+    assert count == 2
+    assert executed[1:] == [
+        "BEGIN",
+        ("EXECUTE insert (%s)", [(1,), (2,)]),
+        "COMMIT",
+    ]
+
+
+def test_dropped_connection_reconnects_and_prepares_again(channel_client):
+    client, executed, connections, failures = channel_client
+    client.fetch_rows("SELECT 1", "reference")
+
+    failures.append(psycopg2.OperationalError("server closed the connection"))
+    client.fetch_rows("SELECT 1", "reference")
+
+    assert len(connections) == 2
+    assert executed[-2:] == ["PREPARE reference AS SELECT 1", "EXECUTE reference"]
+
+
+def test_threads_get_their_own_channel(channel_client):
+    from concurrent.futures import ThreadPoolExecutor
+
+    client, _, _, _ = channel_client
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        other = pool.submit(client.channel).result()
+
+    assert other is not client.channel()
+    assert other.histograms is client.statement_latency
+
+
+def test_latency_is_recorded_per_statement(channel_client):
+    client, _, _, _ = channel_client
+
+    client.fetch_rows("SELECT 1", "reference")
+    client.fetch_rows("SELECT 1", "reference")
+    client.execute_prepared("SELECT 2", "other")
+
+    assert client.statement_latency["reference"].count == 2
+    assert client.statement_latency["other"].count == 1
+    assert "reference: 2 calls" in client.latency_report()
+
+
+def test_positional_parameters_reuse_repeated_names():
+    sql, names = positional_parameters("SELECT :a, :b, :a, x::text, '13:00'")
+
+    assert sql == "SELECT $1, $2, $1, x::text, '13:00'"
+    assert names == ["a", "b"]
+
+
+def test_histogram_quantiles_are_bucket_upper_bounds():
+    histogram = LatencyHistogram()
+    for seconds in [0.0002] * 98 + [0.003, 20.0]:
+        histogram.record(seconds)
+
+    assert histogram.quantile(0.5) == 0.25
+    assert histogram.quantile(0.99) == 4.0
+    assert histogram.quantile(1.0) == np.inf
@@ -0,0 +1,155 @@
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+import pandas as pd
+import psycopg2
+from api_helpers.clients import postgres_copy
+from api_helpers.clients.postgres_client import PostgresClient, PsqlConnection
+from api_helpers.clients.postgres_copy import (
+    copy_dataframe,
+    copy_statement,
+    prepare_for_copy,
+    to_csv_buffer,
+)
+
+
+def render(data: pd.DataFrame, timezone: str | None = None) -> list[str]:
+    return to_csv_buffer(prepare_for_copy(data, timezone)).read().splitlines()
+
+
+def make_connection(timezone: str = "Europe/London"):
+    copied = []
+    cursor = MagicMock()
+    cursor.copy_expert.side_effect = lambda sql, buffer: copied.append(
+        (sql, buffer.read())
+    )
+    conn = MagicMock()
+    conn.connection.cursor.return_value = cursor
+    conn.exec_driver_sql.return_value.scalar.return_value = timezone
+    return conn, copied
+
+
+class TestCsvRendering:
+    def test_nulls_use_marker_distinct_from_empty_strings(self):
+        # With NULL '\N' an unquoted empty field is read as an empty string
+        data = pd.DataFrame({"name": ["a", "", None], "price": [1.5, None, 2.25]})
+        assert render(data) == ["a,1.5", ",\\N", "\\N,2.25"]
+
+    def test_nullable_integers(self):
+        data = pd.DataFrame({"selection_id": pd.array([1, None], dtype="Int64")})
+        assert render(data) == ["1", "\\N"]
+
+    def test_whole_number_floats_load_into_integer_columns(self):
+        data = pd.DataFrame({"runners": [8.0, None], "price": [3.0, 3.5]})
+        assert render(data) == ["8,3.0", "\\N,3.5"]
+
+    def test_whole_floats_outside_int64_stay_floats(self):
+        data = pd.DataFrame({"big": [1e19, 2.0], "inf": [float("inf"), 1.0]})
+        assert render(data) == ["1e+19,inf", "2.0,1.0"]
+
+    def test_tz_aware_timestamps_shift_to_session_time_zone(self):
+        data = pd.DataFrame(
+            {
+                "created_at": pd.to_datetime(["2026-06-06 13:00", None]).tz_localize(
+                    "UTC"
+                )
+            }
+        )
+        assert render(data, "Europe/London") == ["2026-06-06T14:00:00+01:00", "\\N"]
+
+    def test_offsets_follow_daylight_saving_and_keep_microseconds(self):
+        data = pd.DataFrame(
+            {
+                "created_at": pd.to_datetime(
+                    ["2026-01-06 13:00:00.25", "2026-06-06 13:00:00.00"], utc=True
+                )
+            }
+        )
+        assert render(data, "Europe/London") == [
+            "2026-01-06T13:00:00.250000+00:00",
+            "2026-06-06T14:00:00.000000+01:00",
+        ]
+
+    def test_naive_timestamps_dates_bools_and_decimals(self):
+        data = pd.DataFrame(
+            {
+                "race_time": pd.to_datetime(["2026-06-06 14:30"]),
+                "race_date": [pd.Timestamp("2026-06-06").date()],
+                "valid": [True],
+                "stake": [Decimal("10.50")],
+            }
+        )
+        assert render(data) == ["2026-06-06T14:30:00,2026-06-06,True,10.50"]
+
+    def test_quoting_of_delimiters_and_quotes(self):
+        data = pd.DataFrame({"horse_name": ['Say "When", Please']})
+        assert render(data) == ['"Say ""When"", Please"']
+
+
+class TestCopyDataframe:
+    def test_statement_quotes_identifiers(self):
+        assert copy_statement(["a", "b"], "prices", "live_betting") == (
+            'COPY "live_betting"."prices" ("a", "b") FROM STDIN '
+            "WITH (FORMAT csv, NULL '\\N')"
+        )
+        assert copy_statement(["a"], "tmp").startswith('COPY "tmp" ("a")')
+
+    def test_large_frames_are_copied_in_chunks(self, monkeypatch):
+        monkeypatch.setattr(postgres_copy, "COPY_CHUNK_ROWS", 2)
+        conn, copied = make_connection()
+
+        rows = copy_dataframe(conn, pd.DataFrame({"a": [1, 2, 3]}), "t", "s")
+
+        assert rows == 3
+        assert [body for _, body in copied] == ["1\n2\n", "3\n"]
+        conn.exec_driver_sql.assert_not_called()
+
+    def test_session_time_zone_only_read_for_tz_aware_frames(self):
+        conn, copied = make_connection("Europe/London")
+        data = pd.DataFrame({"t": pd.to_datetime(["2026-01-06 13:00"], utc=True)})
+
+        copy_dataframe(conn, data, "t")
+
+        conn.exec_driver_sql.assert_called_once_with("SHOW TimeZone")
+        assert copied[0][1] == "2026-01-06T13:00:00+00:00\n"
+
+
+class TestBulkLoadFallback:
+    def make_client(self, **kwargs) -> PostgresClient:
+        connection = PsqlConnection(
+            user="u", password="p", host="localhost", port=5432, db="d"
+        )
+        return PostgresClient(connection, **kwargs)
+
+    def test_copy_is_the_default_path(self, monkeypatch):
+        copy = MagicMock()
+        monkeypatch.setattr("api_helpers.clients.postgres_client.copy_dataframe", copy)
+        data = MagicMock()
+
+        self.make_client()._bulk_load(MagicMock(), data, "t", "s")
+
+        copy.assert_called_once()
+        data.to_sql.assert_not_called()
+
+    def test_falls_back_to_to_sql_when_copy_fails(self, monkeypatch):
+        monkeypatch.setattr(
+            "api_helpers.clients.postgres_client.copy_dataframe",
+            MagicMock(side_effect=psycopg2.errors.UndefinedTable()),
+        )
+        conn, data = MagicMock(), MagicMock()
+
+        self.make_client()._bulk_load(conn, data, "t", "s")
+
+        data.to_sql.assert_called_once_with(
+            name="t", con=conn, schema="s", if_exists="append", index=False
+        )
+
+    def test_copy_can_be_disabled(self, monkeypatch):
+        copy = MagicMock()
+        monkeypatch.setattr("api_helpers.clients.postgres_client.copy_dataframe", copy)
+        data = MagicMock()
+
+        self.make_client(use_copy=False)._bulk_load(MagicMock(), data, "t", "s")
+
+        copy.assert_not_called()
+        data.to_sql.assert_called_once()
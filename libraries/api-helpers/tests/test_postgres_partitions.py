@@ -0,0 +1,190 @@
+from datetime import date
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+from api_helpers.clients.postgres_partitions import (
+    BETFAIR_PRICES,
+    DEPENDENT_VIEWS_QUERY,
+    GRANTS_QUERY,
+    PARTITIONS_QUERY,
+    RELKIND_QUERY,
+    TRIGGERS_QUERY,
+    convert_statements,
+    convert_to_partitioned,
+    create_partition_statement,
+    drop_partitions_before,
+    ensure_partitions,
+)
+
+
+@pytest.fixture
+def database():
+    """A client whose raw connections answer catalogue queries from results."""
+    results = {}
+    executed = []
+
+    def connect():
+        cursor = MagicMock()
+        cursor.execute.side_effect = lambda sql, params=None: executed.append(sql)
+        cursor.fetchall.side_effect = lambda: results.get(executed[-1].strip(), [])
+        conn = MagicMock()
+        conn.cursor.return_value.__enter__.return_value = cursor
+        return conn
+
+    client = MagicMock()
+    client.storage_connection.return_value.raw_connection.side_effect = connect
+    return client, results, executed
+
+
+def test_partition_names_round_trip():
+    day = date(2026, 10, 17)
+
+    assert BETFAIR_PRICES.partition_name(day) == "betfair_prices_20261017"
+    assert BETFAIR_PRICES.partition_day("betfair_prices_20261017") == day
+    assert BETFAIR_PRICES.partition_day("betfair_prices_unpartitioned") is None
+
+
+def test_partition_covers_one_day():
+    assert create_partition_statement(BETFAIR_PRICES, date(2026, 12, 31)) == (
+        'CREATE TABLE IF NOT EXISTS "live_betting"."betfair_prices_20261231" '
+        'PARTITION OF "live_betting"."betfair_prices" '
+        "FOR VALUES FROM ('2026-12-31') TO ('2027-01-01')"
+    )
+
+
+def test_existing_partitioned_table_only_gets_new_partitions(database):
+    client, results, executed = database
+    results[RELKIND_QUERY.strip()] = [("p",)]
+
+    ensure_partitions(client, BETFAIR_PRICES, date(2026, 10, 17), days_ahead=2)
+
+    created = [sql for sql in executed if sql.startswith("CREATE TABLE")]
+    assert [sql.split('"')[3] for sql in created] == [
+        "betfair_prices_20261017",
+        "betfair_prices_20261018",
+        "betfair_prices_20261019",
+    ]
+    assert executed[-2:] == list(BETFAIR_PRICES.indexes)
+    assert "USING brin (created_at)" in BETFAIR_PRICES.indexes[1]
+    assert not any("RENAME" in sql for sql in executed)
+
+
+def test_plain_table_is_not_converted_implicitly(database):
+    client, results, executed = database
+    results[RELKIND_QUERY.strip()] = [("r",)]
+
+    with pytest.raises(ValueError, match="convert_to_partitioned"):
+        ensure_partitions(client, BETFAIR_PRICES, date(2026, 10, 17))
+
+    assert executed == [RELKIND_QUERY]
+
+
+def test_plain_table_is_converted_with_its_views_triggers_and_grants(database):
+    client, results, executed = database
+    results[RELKIND_QUERY.strip()] = [("r",)]
+    results[
+        'SELECT count(*) FROM "live_betting"."betfair_prices" WHERE "race_date" IS NULL'
+    ] = [(0,)]
+    results[
+        'SELECT DISTINCT "race_date" FROM "live_betting"."betfair_prices" WHERE "race_date" IS NOT NULL'
+    ] = [(date(2026, 10, 16),)]
+    results[DEPENDENT_VIEWS_QUERY.strip()] = [
+        ("live_betting.v_latest_betfair_prices", "v", " SELECT 1;", 1),
+        ("live_betting.v_selection_state", "v", " SELECT 2;", 2),
+    ]
+    results[TRIGGERS_QUERY.strip()] = [("CREATE TRIGGER t AFTER INSERT ...",)]
+    results[GRANTS_QUERY.strip()] = [("GRANT SELECT ON v TO reader",)]
+
+    convert_to_partitioned(client, BETFAIR_PRICES)
+
+    assert any(sql.startswith("ALTER TABLE") and "RENAME" in sql for sql in executed)
+    assert "CREATE VIEW live_betting.v_selection_state AS  SELECT 2" in executed
+    assert "CREATE TRIGGER t AFTER INSERT ..." in executed
+    # Asked for the table and each view, and run after the views exist
+    assert executed.count("GRANT SELECT ON v TO reader") == 3
+    assert executed[-1] == "GRANT SELECT ON v TO reader"
+
+
+def test_partitioned_table_is_left_as_it_is(database):
+    client, results, executed = database
+    results[RELKIND_QUERY.strip()] = [("p",)]
+
+    convert_to_partitioned(client, BETFAIR_PRICES)
+
+    assert executed == [RELKIND_QUERY]
+
+
+def test_conversion_order():
+    statements = convert_statements(
+        BETFAIR_PRICES,
+        [date(2026, 10, 16)],
+        [("live_betting.v", "v", "SELECT 1;")],
+        ["CREATE TRIGGER t"],
+    )
+
+    kinds = [statement.split(" ")[0] for statement in statements]
+    assert kinds == [
+        "ALTER",  # rename the plain table
+        "CREATE",  # partitioned parent
+        "CREATE",  # partition for the existing day
+        "INSERT",
+        "DROP",
+        "CREATE",  # btree index
+        "CREATE",  # BRIN index
+        "CREATE",  # view
+        "CREATE",  # trigger
+    ]
+    assert 'PARTITION BY RANGE ("race_date")' in statements[1]
+
+
+def test_rows_without_a_date_stop_the_conversion(database):
+    client, results, executed = database
+    results[RELKIND_QUERY.strip()] = [("r",)]
+    results[
+        'SELECT count(*) FROM "live_betting"."betfair_prices" WHERE "race_date" IS NULL'
+    ] = [(3,)]
+
+    with pytest.raises(ValueError, match="3 rows"):
+        convert_to_partitioned(client, BETFAIR_PRICES)
+
+    assert not any("RENAME" in sql for sql in executed)
+
+
+def test_old_partitions_are_archived_then_dropped(database):
+    client, results, executed = database
+    results[PARTITIONS_QUERY.strip()] = [
+        ("betfair_prices_20261018",),
+        ("betfair_prices_20260901",),
+        ("betfair_prices_20260902",),
+    ]
+    client.fetch_data.return_value = pd.DataFrame({"selection_id": [1]})
+    archived = []
+
+    dropped = drop_partitions_before(
+        client,
+        BETFAIR_PRICES,
+        date(2026, 9, 2),
+        archive=lambda day, data: archived.append((day, len(data))),
+    )
+
+    assert dropped == [date(2026, 9, 1)]
+    assert archived == [(date(2026, 9, 1), 1)]
+    assert executed[-2:] == [
+        'ALTER TABLE "live_betting"."betfair_prices" '
+        'DETACH PARTITION "live_betting"."betfair_prices_20260901"',
+        'DROP TABLE "live_betting"."betfair_prices_20260901"',
+    ]
+
+
+def test_failed_archive_keeps_the_partition(database):
+    client, results, executed = database
+    results[PARTITIONS_QUERY.strip()] = [("betfair_prices_20260901",)]
+
+    def archive(day, data):
+        raise OSError("bucket unavailable")
+
+    with pytest.raises(OSError):
+        drop_partitions_before(client, BETFAIR_PRICES, date(2026, 10, 1), archive)
+
+    assert not any(sql.startswith("DROP") for sql in executed)
@@ -0,0 +1,222 @@
+from decimal import Decimal
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pandas as pd
+import psycopg2
+import pytest
+import sqlalchemy
+from api_helpers.clients.postgres_client import (
+    PostgresClient,
+    PsqlConnection,
+    _temp_column_type,
+    upsert_statement,
+)
+
+
+@pytest.fixture
+def upsert_client(monkeypatch):
+    client = PostgresClient(
+        PsqlConnection(user="u", password="p", host="localhost", port=5432, db="d")
+    )
+    conn = MagicMock()
+    engine = MagicMock()
+    engine.begin.return_value.__enter__.return_value = conn
+    monkeypatch.setattr(client, "storage_connection", lambda: engine)
+    copied = []
+    monkeypatch.setattr(
+        "api_helpers.clients.postgres_client.copy_dataframe",
+        lambda conn, data, table, schema=None: copied.append((table, schema, data)),
+    )
+    return client, conn, copied
+
+
+def executed_sql(conn: MagicMock) -> list[str]:
+    return [" ".join(str(c.args[0]).split()) for c in conn.execute.call_args_list]
+
+
+class TestUpsertStatement:
+    def test_updates_non_key_columns(self):
+        assert upsert_statement(
+            "public.results_data", "tmp", ["unique_id", "horse_name"], ["unique_id"]
+        ) == (
+            'INSERT INTO public.results_data AS t ("unique_id", "horse_name") '
+            'SELECT "unique_id", "horse_name" FROM tmp '
+            'ON CONFLICT ("unique_id") DO UPDATE SET "horse_name" = EXCLUDED."horse_name"'
+        )
+
+    def test_key_only_rows_do_nothing(self):
+        statement = upsert_statement(
+            "entities.todays_betfair_horse_ids",
+            "tmp",
+            ["horse_id", "bf_horse_id"],
+            ["horse_id", "bf_horse_id"],
+        )
+        assert statement.endswith('ON CONFLICT ("horse_id", "bf_horse_id") DO NOTHING')
+
+
+class TestTempColumnType:
+    @pytest.mark.parametrize(
+        "values, expected",
+        [
+            (pd.Series([1, 2]), "bigint"),
+            (pd.Series([1, None], dtype="Int64"), "bigint"),
+            (pd.Series([1.5]), "double precision"),
+            (pd.Series([True]), "boolean"),
+            (pd.Series(["a", None]), "text"),
+            (pd.Series(pd.to_datetime(["2026-06-06"])), "timestamp"),
+            (
+                pd.Series(pd.to_datetime(["2026-06-06"], utc=True)),
+                "timestamp with time zone",
+            ),
+            (pd.Series([pd.Timestamp("2026-06-06").date(), None]), "date"),
+            (pd.Series([Decimal("1.5")]), "numeric"),
+        ],
+    )
+    def test_matches_to_sql_defaults(self, values, expected):
+        assert _temp_column_type(values) == expected
+
+
+class TestUpsertData:
+    def test_stages_in_temp_table_dropped_on_commit(self, upsert_client):
+        client, conn, copied = upsert_client
+        data = pd.DataFrame({"rp_id": ["1", "1", "2"], "name": ["a", "a", "b"]})
+
+        client.upsert_data(
+            data,
+            schema="entities",
+            table_name="owner",
+            unique_columns=["rp_id"],
+            upsert_procedure="INSERT INTO entities.owner SELECT * FROM entities_owner_tmp_load",
+        )
+
+        create, procedure = executed_sql(conn)
+        assert create == (
+            'CREATE TEMP TABLE entities_owner_tmp_load ("rp_id" text, "name" text) '
+            "ON COMMIT DROP"
+        )
+        assert procedure.startswith("INSERT INTO entities.owner")
+        [(table, schema, staged)] = copied
+        assert (table, schema, len(staged)) == ("entities_owner_tmp_load", None, 2)
+
+    def test_base_table_layout_and_generated_upsert(self, upsert_client):
+        client, conn, _ = upsert_client
+        data = pd.DataFrame({"unique_id": ["a"], "horse_name": ["x"]})
+
+        client.upsert_data(
+            data,
+            schema="public",
+            table_name="results_data",
+            unique_columns=["unique_id"],
+            use_base_table=True,
+            generate_upsert=True,
+        )
+
+        create, upsert = executed_sql(conn)
+        assert create == (
+            "CREATE TEMP TABLE public_results_data_tmp_load "
+            "(LIKE public.results_data) ON COMMIT DROP"
+        )
+        assert upsert == upsert_statement(
+            "public.results_data",
+            "public_results_data_tmp_load",
+            ["unique_id", "horse_name"],
+            ["unique_id"],
+        )
+
+    def test_convention_named_procedure_by_default(self, upsert_client):
+        client, conn, _ = upsert_client
+
+        client.upsert_data(
+            pd.DataFrame({"unique_id": ["a"]}),
+            schema="public",
+            table_name="results_data",
+            unique_columns=["unique_id"],
+        )
+
+        assert executed_sql(conn)[-1] == "CALL public.upsert_results_data();"
+
+
+class TestStoreLatestData:
+    def test_keeps_newest_row_per_key_and_only_updates_forwards(self, upsert_client):
+        client, conn, copied = upsert_client
+        data = pd.DataFrame(
+            {
+                "unique_id": ["a", "a", "b"],
+                "horse_name": ["new", "old", "x"],
+                "created_at": [
+                    datetime(2026, 6, 6, 12, 5),
+                    datetime(2026, 6, 6, 12, 0),
+                    datetime(2026, 6, 6, 12, 0),
+                ],
+            }
+        )
+
+        client.store_latest_data(
+            data, "tf_unmatched_horses_todays", "data_quality", "unique_id"
+        )
+
+        create, upsert = executed_sql(conn)
+        assert create.startswith(
+            "CREATE TEMP TABLE data_quality_tf_unmatched_horses_todays_tmp_load "
+            "(LIKE data_quality.tf_unmatched_horses_todays)"
+        )
+        assert upsert.endswith(
+            "WHERE t.created_at IS NULL OR EXCLUDED.created_at >= t.created_at"
+        )
+        [(_, _, staged)] = copied
+        assert sorted(staged["horse_name"]) == ["new", "x"]
+
+    def test_table_without_unique_index_fails_without_migrating(self, upsert_client):
+        client, conn, _ = upsert_client
+        missing_index = sqlalchemy.exc.ProgrammingError(
+            "INSERT", {}, psycopg2.errors.InvalidColumnReference()
+        )
+        conn.execute.side_effect = [MagicMock(), missing_index]
+
+        with pytest.raises(ValueError, match="migrate_to_latest_by_key"):
+            client.store_latest_data(
+                pd.DataFrame({"unique_id": ["a"]}),
+                "bf_unmatched_horses_today",
+                "data_quality",
+                "unique_id",
+                created_at=True,
+            )
+
+        assert len(executed_sql(conn)) == 2
+
+    def test_rows_without_a_key_are_dropped(self, upsert_client):
+        client, _, copied = upsert_client
+
+        client.store_latest_data(
+            pd.DataFrame({"unique_id": ["a", None], "horse_name": ["x", "y"]}),
+            "bf_unmatched_horses_today",
+            "data_quality",
+            "unique_id",
+        )
+
+        [(_, _, staged)] = copied
+        assert staged["horse_name"].tolist() == ["x"]
+
+    def test_migration_removes_null_keys_then_duplicates(self, upsert_client):
+        client, conn, _ = upsert_client
+
+        client.migrate_to_latest_by_key(
+            "bf_unmatched_horses_today", "data_quality", "unique_id"
+        )
+
+        statements = executed_sql(conn)
+        assert statements[0].startswith("LOCK TABLE data_quality.bf_unmatched")
+        assert statements[1] == (
+            "DELETE FROM data_quality.bf_unmatched_horses_today "
+            'WHERE "unique_id" IS NULL'
+        )
+        assert statements[2] == (
+            "ALTER TABLE data_quality.bf_unmatched_horses_today "
+            'ALTER COLUMN "unique_id" SET NOT NULL'
+        )
+        assert "DISTINCT ON" in statements[3]
+        assert statements[4] == (
+            "CREATE UNIQUE INDEX IF NOT EXISTS bf_unmatched_horses_today_latest_key "
+            'ON data_quality.bf_unmatched_horses_today ("unique_id")'
+        )
@@ -0,0 +1,248 @@
+from itertools import permutations
+
+import numpy as np
+import pandas as pd
+import pytest
+from api_helpers.helpers.simulation import (
+    PlaceProbabilityCache,
+    card_place_probabilities,
+    exact_transitions,
+    place_probabilities,
+    simulate_place_counts,
+    simulate_place_prices,
+    to_betfair_ticks,
+    warm_up,
+)
+
+
+def race(prices: list[float]) -> pd.DataFrame:
+    return pd.DataFrame(
+        {"horse_name": [f"h{i}" for i in range(len(prices))], "betfair_win_sp": prices}
+    )
+
+
+def harville_by_enumeration(prices: list[float], n_places: int) -> np.ndarray:
+    probs = 1 / np.array(prices)
+    probs /= probs.sum()
+    place = np.zeros(len(prices))
+    for order in permutations(range(len(prices)), min(n_places, len(prices))):
+        prob, remaining = 1.0, 1.0
+        for horse in order:
+            prob *= probs[horse] / remaining
+            remaining -= probs[horse]
+        place[list(order)] += prob
+    return place
+
+
+def by_horse(out: pd.DataFrame) -> pd.DataFrame:
+    return out.set_index("horse").sort_index(key=lambda h: h.str[1:].astype(int))
+
+
+@pytest.mark.parametrize(
+    "prices, n_places",
+    [
+        ([2.0, 3.0, 5.0, 9.0, 12.0], 2),
+        ([1.5, 4.0, 8.0, 10.0, 21.0, 34.0, 50.0], 3),
+        ([3.0, 3.5, 6.0, 7.0, 11.0, 15.0, 26.0, 40.0], 4),
+        ([2.0, 2.5], 3),
+    ],
+)
+def test_exact_matches_enumerating_finishing_orders(prices, n_places):
+    out = by_horse(simulate_place_counts(race(prices), n_places=n_places))
+
+    expected = harville_by_enumeration(prices, n_places)
+    np.testing.assert_allclose(out["sim_place_prob"], expected, atol=1e-12)
+    np.testing.assert_allclose(out["sim_place_price"], 1 / expected)
+    assert out["win_prob"].sum() == pytest.approx(1.0)
+
+
+def test_large_fields_fall_back_to_monte_carlo():
+    prices = list(np.linspace(3, 40, 12))
+
+    exact = by_horse(simulate_place_counts(race(prices), n_places=3, cache=None))
+    simulated = by_horse(
+        simulate_place_counts(
+            race(prices),
+            n_places=3,
+            max_exact_transitions=exact_transitions(12, 3) - 1,
+            cache=None,
+        )
+    )
+
+    # Monte Carlo counts in whole simulations
+    counts = simulated["sim_place_prob"] * 10000
+    np.testing.assert_allclose(counts, counts.round())
+    np.testing.assert_allclose(
+        simulated["sim_place_prob"], exact["sim_place_prob"], atol=0.02
+    )
+
+
+def test_sorted_by_place_then_win_probability():
+    out = simulate_place_counts(race([9.0, 2.0, 5.0]), n_places=2)
+
+    assert out["horse"].tolist() == ["h1", "h2", "h0"]
+
+
+def test_prices_round_to_the_betfair_ladder():
+    ticks = to_betfair_ticks([1.0, 1.014, 2.03, 3.07, 5.37, 9.95, 37.0, 77.0, 2000])
+
+    assert ticks.tolist() == [1.01, 1.01, 2.02, 3.05, 5.4, 10.0, 38.0, 75.0, 1000.0]
+
+
+class TestPlaceProbabilityCache:
+    def test_same_prices_in_any_order_are_a_hit(self):
+        cache = PlaceProbabilityCache()
+        prices = np.array([3.0, 5.0, 8.0, 12.0])
+
+        win, place = place_probabilities(prices, 2, cache=cache)
+        win_again, place_again = place_probabilities(prices[::-1], 2, cache=cache)
+
+        assert (cache.hits, cache.misses) == (1, 1)
+        np.testing.assert_array_equal(place_again, place[::-1])
+        np.testing.assert_array_equal(win_again, win[::-1])
+
+    def test_moves_inside_a_tick_are_a_hit(self):
+        cache = PlaceProbabilityCache()
+
+        _, place = place_probabilities(np.array([5.4, 7.0, 9.0]), 2, cache=cache)
+        _, nudged = place_probabilities(np.array([5.37, 7.04, 9.0]), 2, cache=cache)
+
+        assert cache.hits == 1
+        np.testing.assert_array_equal(nudged, place)
+
+    def test_places_are_part_of_the_key(self):
+        cache = PlaceProbabilityCache()
+        prices = np.array([3.0, 5.0, 8.0, 12.0])
+
+        place_probabilities(prices, 2, cache=cache)
+        _, place = place_probabilities(prices, 3, cache=cache)
+
+        assert (cache.hits, cache.misses) == (0, 2)
+        assert place.sum() == pytest.approx(3.0)
+
+    def test_simulation_settings_are_part_of_the_key(self):
+        cache = PlaceProbabilityCache()
+        prices = np.array([2.5, 4.0, 6.0, 9.0, 15.0])
+        exact_win, exact_place = place_probabilities(prices, 3, cache=None)
+
+        place_probabilities(prices, 3, n_sims=50, max_exact_transitions=0, cache=cache)
+        place_probabilities(prices, 3, n_sims=50, seed=7, cache=cache)
+        win, place = place_probabilities(prices, 3, cache=cache)
+
+        assert (cache.hits, cache.misses) == (0, 3)
+        np.testing.assert_array_equal(win, exact_win)
+        np.testing.assert_array_equal(place, exact_place)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = PlaceProbabilityCache(maxsize=2)
+        fields = [np.array([2.0, p]) for p in (3.0, 4.0, 5.0)]
+
+        place_probabilities(fields[0], 1, cache=cache)
+        place_probabilities(fields[1], 1, cache=cache)
+        place_probabilities(fields[0], 1, cache=cache)
+        place_probabilities(fields[2], 1, cache=cache)
+        place_probabilities(fields[0], 1, cache=cache)
+        place_probabilities(fields[1], 1, cache=cache)
+
+        assert len(cache) == 2
+        assert (cache.hits, cache.misses) == (2, 4)
+
+
+def ragged_card(n_races: int = 6, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    sizes = rng.integers(5, 14, n_races)
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    prices = to_betfair_ticks(rng.lognormal(2.0, 0.7, offsets[-1]) + 1)
+    return offsets, prices, np.where(sizes < 8, 2, 3)
+
+
+class TestCardPlaceProbabilities:
+    def test_matches_each_race_on_its_own(self):
+        offsets, prices, n_places = ragged_card()
+
+        win, place = card_place_probabilities(offsets, prices, n_places, cache=None)
+
+        for race, (start, end) in enumerate(zip(offsets[:-1], offsets[1:])):
+            race_win, race_place = place_probabilities(
+                prices[start:end], n_places[race], cache=None
+            )
+            np.testing.assert_allclose(win[start:end], race_win, atol=1e-12)
+            np.testing.assert_allclose(place[start:end], race_place, atol=1e-12)
+
+    def test_monte_carlo_races_are_reproducible_on_their_own(self):
+        offsets, prices, n_places = ragged_card()
+        kwargs = {"n_sims": 2000, "seed": 3, "max_exact_transitions": 0, "cache": None}
+
+        _, card = card_place_probabilities(offsets, prices, n_places, **kwargs)
+        _, again = card_place_probabilities(offsets, prices, n_places, **kwargs)
+        _, first_two = card_place_probabilities(
+            offsets[:3], prices[: offsets[2]], n_places[:2], **kwargs
+        )
+
+        np.testing.assert_array_equal(card, again)
+        np.testing.assert_array_equal(card[: offsets[2]], first_two)
+
+    @pytest.mark.parametrize("variance_reduction", ["antithetic", "stratified"])
+    def test_variance_reduction_stays_unbiased(self, variance_reduction):
+        offsets, prices, n_places = ragged_card()
+        _, exact = card_place_probabilities(offsets, prices, n_places, cache=None)
+
+        _, simulated = card_place_probabilities(
+            offsets,
+            prices,
+            n_places,
+            n_sims=20000,
+            variance_reduction=variance_reduction,
+            max_exact_transitions=0,
+            cache=None,
+        )
+
+        np.testing.assert_allclose(simulated, exact, atol=0.02)
+        for start, end, places in zip(offsets[:-1], offsets[1:], n_places):
+            assert simulated[start:end].sum() == pytest.approx(places)
+
+    def test_stratified_draws_pin_down_the_winner(self):
+        offsets, prices, n_places = ragged_card()
+        win, _ = card_place_probabilities(offsets, prices, n_places, cache=None)
+
+        stratified, _ = card_place_probabilities(
+            offsets,
+            prices,
+            n_places,
+            n_sims=1000,
+            variance_reduction="stratified",
+            max_exact_transitions=0,
+            cache=None,
+        )
+
+        # One draw per stratum of the first pick: within a draw of exact
+        np.testing.assert_allclose(stratified, win, atol=2 / 1000)
+
+    def test_only_races_missing_from_the_cache_are_computed(self):
+        cache = PlaceProbabilityCache()
+        offsets, prices, n_places = ragged_card()
+        _, first = card_place_probabilities(offsets, prices, n_places, cache=cache)
+
+        reordered = prices.copy()
+        reordered[: offsets[1]] = reordered[: offsets[1]][::-1]
+        _, again = card_place_probabilities(offsets, reordered, n_places, cache=cache)
+
+        assert (cache.hits, cache.misses) == (6, 6)
+        np.testing.assert_array_equal(again[: offsets[1]], first[: offsets[1]][::-1])
+        np.testing.assert_array_equal(again[offsets[1] :], first[offsets[1] :])
+
+
+def test_simulate_place_prices_adds_simulated_place_columns():
+    data = race([2.0, 3.0, 5.0, 9.0, 12.0]).assign(
+        betfair_place_sp=[1.2, 1.4, 1.9, 2.8, 3.5], race_class="4"
+    )
+
+    out = simulate_place_prices(data)
+
+    expected = 1 / harville_by_enumeration([2.0, 3.0, 5.0, 9.0, 12.0], 2)
+    np.testing.assert_allclose(out["sim_place_sp"], expected.round(1))
+    assert out["diff_proba"].notna().all()
+
+
+def test_warm_up_runs_every_path():
+    assert warm_up() >= 0